@@ -7,17 +7,27 @@ consisting of three main contracts:
 1. Strahn Core - Factory contract for mandate deployment
 2. Strahn PI Base - User wallet and payment processor
 3. Mandate Record - Recurring payment state machine
+
+Strahn PI Shared is a multi-user variant of the PI Base that keeps each
+user's balance and nonce in boxes of one application, and Mandate Record
+Packed is a lighter mandate template that keeps its terms in one byte slice.
 """
 
 from .strahn_core import strahn_core_approval, strahn_core_clear
 from .strahn_pi_base import strahn_pi_base_approval, strahn_pi_base_clear
+from .strahn_pi_shared import strahn_pi_shared_approval, strahn_pi_shared_clear
 from .mandate_record import mandate_record_approval, mandate_record_clear
+from .mandate_record_packed import mandate_record_packed_approval, mandate_record_packed_clear
 
 __all__ = [
     'strahn_core_approval',
     'strahn_core_clear',
     'strahn_pi_base_approval', 
     'strahn_pi_base_clear',
+    'strahn_pi_shared_approval',
+    'strahn_pi_shared_clear',
     'mandate_record_approval',
-    'mandate_record_clear'
+    'mandate_record_clear',
+    'mandate_record_packed_approval',
+    'mandate_record_packed_clear'
 ]
\ No newline at end of file
@@ -4,6 +4,7 @@ from utils.common import *
 @Subroutine(TealType.none)
 def process_payment():
     """Process a recurring mandate payment"""
+    registry_slot = Txn.application_args[1]  # This mandate's slot in the PI Base registry
     current_time = Global.latest_timestamp()
     next_payment_time = App.globalGet(Bytes("next_pay_ts"))
     interval_sec = App.globalGet(Bytes("interval_sec"))
@@ -12,6 +13,7 @@ def process_payment():
     new_next_payment = next_payment_time + interval_sec
     
     return Seq([
+        # A lower bound only: keeper batches advance PI Base's registry, which decides
         Assert(current_time >= next_payment_time - Int(60)),
         
         # Overflow protection
@@ -29,6 +31,7 @@ def process_payment():
                 Itob(App.globalGet(Bytes("amount"))),
                 Itob(App.globalGet(Bytes("relayer_fee"))),
                 Txn.sender(),
+                registry_slot,  # PI Base checks the slot belongs to this mandate
             ],
             TxnField.assets: [App.globalGet(Bytes("usdc_asa_id"))],
             TxnField.applications: [App.globalGet(Bytes("pi_base_id"))],
@@ -0,0 +1,156 @@
+from pyteal import *
+from utils.common import *
+
+# All terms live in one global byte slice, read with extract_uint64:
+# dest_addr (32) | amount | interval_sec | next_pay_ts | relayer_fee | usdc_asa_id | pi_base_id
+TERMS_KEY = Bytes("t")
+PACKED_DEST = Int(0)
+PACKED_AMOUNT = Int(32)
+PACKED_INTERVAL = Int(40)
+PACKED_NEXT_PAY = Int(48)
+PACKED_FEE = Int(56)
+PACKED_USDC = Int(64)
+PACKED_PI_BASE = Int(72)
+
+@Subroutine(TealType.none)
+def process_payment():
+    """Process a recurring mandate payment"""
+    registry_slot = Txn.application_args[1]  # This mandate's slot in the PI Base registry
+    terms = ScratchVar(TealType.bytes)
+    next_payment_time = ScratchVar(TealType.uint64)
+    new_next_payment = ScratchVar(TealType.uint64)
+    
+    return Seq([
+        # One global read for every field
+        terms.store(App.globalGet(TERMS_KEY)),
+        next_payment_time.store(ExtractUint64(terms.load(), PACKED_NEXT_PAY)),
+        
+        # A lower bound only: keeper batches advance PI Base's registry, which decides
+        Assert(Global.latest_timestamp() >= next_payment_time.load() - Int(60)),
+        
+        # The addition fails on overflow
+        new_next_payment.store(next_payment_time.load() + ExtractUint64(terms.load(), PACKED_INTERVAL)),
+        Assert(new_next_payment.load() < Int(4102444800)),  # Max reasonable timestamp (2100)
+        
+        # Inner application call to PI Base to release funds
+        InnerTxnBuilder.Begin(),
+        InnerTxnBuilder.SetFields({
+            TxnField.type_enum: TxnType.ApplicationCall,
+            TxnField.application_id: ExtractUint64(terms.load(), PACKED_PI_BASE),
+            TxnField.application_args: [
+                Bytes("release_mandate_funds"),
+                Extract(terms.load(), PACKED_DEST, Int(32)),
+                Extract(terms.load(), PACKED_AMOUNT, Int(8)),
+                Extract(terms.load(), PACKED_FEE, Int(8)),
+                Txn.sender(),
+                registry_slot,  # PI Base checks the slot belongs to this mandate
+            ],
+            TxnField.assets: [ExtractUint64(terms.load(), PACKED_USDC)],
+            TxnField.applications: [ExtractUint64(terms.load(), PACKED_PI_BASE)],
+        }),
+        InnerTxnBuilder.Submit(),
+        
+        # State update - only executed if inner call succeeds
+        App.globalPut(TERMS_KEY, Replace(terms.load(), PACKED_NEXT_PAY, Itob(new_next_payment.load()))),
+        
+        # Log successful payment processing
+        Log(Concat(
+            Bytes("mandate_payment_processed:"),
+            Extract(terms.load(), PACKED_AMOUNT, Int(8)),
+            Bytes(":next_payment:"),
+            Itob(new_next_payment.load())
+        ))
+    ])
+
+def mandate_record_packed_approval():
+    """Packed Mandate Record approval program"""
+    
+    # Handle contract creation. Core passes the same arguments as for
+    # mandate_record; the mandate never holds USDC, so there is no opt-in.
+    on_create = Seq([
+        Assert(Len(Txn.application_args[0]) == Int(32)),  # Valid dest_addr
+        Assert(Btoi(Txn.application_args[1]) > Int(0)),   # Positive amount
+        Assert(Btoi(Txn.application_args[2]) >= Int(3600)),  # Min 1 hour interval
+        Assert(Btoi(Txn.application_args[3]) > Global.latest_timestamp()),  # Future start
+        Assert(Btoi(Txn.application_args[5]) > Int(0)),   # Valid USDC asset ID
+        Assert(Btoi(Txn.application_args[6]) > Int(0)),   # Valid PI Base ID
+        
+        # Additional validation
+        Assert(Btoi(Txn.application_args[2]) <= Int(31536000)),  # Max 1 year interval
+        Assert(Btoi(Txn.application_args[3]) < Int(4102444800)), # Max reasonable timestamp
+        
+        # Core passes integers as Itob, so they pack as-is
+        Assert(Len(Txn.application_args[1]) == Int(8)),
+        Assert(Len(Txn.application_args[2]) == Int(8)),
+        Assert(Len(Txn.application_args[3]) == Int(8)),
+        Assert(Len(Txn.application_args[4]) == Int(8)),
+        Assert(Len(Txn.application_args[5]) == Int(8)),
+        Assert(Len(Txn.application_args[6]) == Int(8)),
+        App.globalPut(TERMS_KEY, Concat(
+            Txn.application_args[0],  # dest_addr
+            Txn.application_args[1],  # amount
+            Txn.application_args[2],  # interval_sec
+            Txn.application_args[3],  # next_pay_ts (start_ts)
+            Txn.application_args[4],  # relayer_fee
+            Txn.application_args[5],  # usdc_asa_id
+            Txn.application_args[6],  # pi_base_id
+        )),
+        
+        Log(Concat(
+            Bytes("mandate_created:"),
+            Txn.application_args[1],  # amount
+            Bytes(":interval:"),
+            Txn.application_args[2]   # interval
+        )),
+        
+        Approve(),
+    ])
+    
+    # Handle method calls
+    method = Txn.application_args[0]
+    
+    program = Seq([
+        Assert(Txn.application_id() != Int(0)),  # Prevent creation calls here
+        
+        Cond(
+            [method == Bytes("process_payment"), process_payment()],
+        ),
+        
+        Approve(),
+    ])
+    
+    return Cond(
+        [Txn.application_id() == Int(0), on_create],
+        [Txn.on_completion() == OnComplete.NoOp, program],
+        # Mandate records are immutable once created - no updates allowed
+        [Txn.on_completion() == OnComplete.UpdateApplication, Reject()],
+        # Deletion is allowed (for mandate cancellation by PI Base)
+        [Txn.on_completion() == OnComplete.DeleteApplication, Approve()],
+    )
+
+def mandate_record_packed_clear():
+    """Packed Mandate Record clear state program"""
+    return Approve()
+
+if __name__ == "__main__":
+    # Compile the contract
+    approval_program = compileTeal(
+        mandate_record_packed_approval(),
+        Mode.Application,
+        version=8
+    )
+    
+    clear_program = compileTeal(
+        mandate_record_packed_clear(),
+        Mode.Application,
+        version=8
+    )
+    
+    # Save compiled programs
+    with open("../build/mandate_record_packed_approval.teal", "w") as f:
+        f.write(approval_program)
+    
+    with open("../build/mandate_record_packed_clear.teal", "w") as f:
+        f.write(clear_program)
+    
+    print("Packed Mandate Record contract compiled successfully!")
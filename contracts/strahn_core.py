@@ -5,8 +5,6 @@ from utils.common import *
 def is_owner():
     """Check if sender is the contract owner"""
     return Txn.sender() == App.globalGet(Bytes("owner_addr"))
-# In strahn_core.py
-# In strahn_core.py
 
 @Subroutine(TealType.none)
 def set_bytecode():
@@ -25,6 +23,9 @@ def set_bytecode():
             box_name == Bytes("clear")
         )),
 
+        # Programs with every extra page in use are the largest a template can be
+        Assert(total_size <= MAX_TEMPLATE_SIZE),
+
         # Pop() the result of App.box_delete to ensure TealType.none
         Pop(App.box_delete(box_name)), 
 
@@ -34,6 +35,9 @@ def set_bytecode():
         
         # Write the first chunk at offset 0.
         App.box_replace(box_name, Int(0), Txn.note()), 
+
+        # Track where the next chunk starts for appends without an offset
+        App.globalPut(Concat(box_name, Bytes("_written")), Len(Txn.note())),
         
         Log(Concat(Bytes("set_bytecode_complete:"), box_name))
     ])
@@ -42,16 +46,19 @@ def set_bytecode():
 @Subroutine(TealType.none)
 def append_bytecode():
     """
-    Appends the content of the transaction note to an existing box.
+    Writes the content of the transaction note into an existing box at the
+    given offset. set_bytecode allocates the box at its full size, so chunks
+    are written in place without resizing. Calls without an offset keep the
+    original call shape: the chunk is written where the previous one ended.
     This is an owner-only function.
     """
     box_name = Txn.application_args[1]
+    offset = ScratchVar(TealType.uint64)
+    written_key = Concat(box_name, Bytes("_written"))
     
-    # We now get the current length using App.box_len, not App.box_get,
+    # We get the current length using App.box_length, not App.box_get,
     # as App.box_get will fail for boxes > 4KB.
     current_len_maybe = App.box_length(box_name)
-    current_len_var = ScratchVar(TealType.uint64)
-    new_len_var = ScratchVar(TealType.uint64)
 
     return Seq([
         Assert(is_owner()),
@@ -61,43 +68,42 @@ def append_bytecode():
             box_name == Bytes("clear")
         )),
 
-        # Ensure the box exists and get its current length
-        current_len_maybe, # Execute App.box_len
-        Assert(current_len_maybe.hasValue()), # Check if box exists
-        current_len_var.store(current_len_maybe.value()), # Store current length
-
-        # Calculate the new total length after appending this chunk
-        new_len_var.store(current_len_var.load() + Len(Txn.note())),
-
-        # Explicitly resize the box to the new total length.
-        # This will only succeed if the box was originally created with enough
-        # capacity, or if the network allows dynamic growth (it does, but still needs `box_resize`).
-        App.box_resize(box_name, new_len_var.load()),
+        # Ensure the box exists
+        current_len_maybe,
+        Assert(current_len_maybe.hasValue()),
+        If(Txn.application_args.length() > Int(2))
+        .Then(Seq([
+            # The chunk must fit inside the allocated size
+            offset.store(Btoi(Txn.application_args[2])),
+            Assert(offset.load() + Len(Txn.note()) <= current_len_maybe.value()),
+        ]))
+        .Else(Seq([
+            # Continue where the previous chunk ended
+            offset.store(App.globalGet(written_key)),
+            Assert(offset.load() + Len(Txn.note()) <= current_len_maybe.value()),
+        ])),
         
-        # Now, replace (append) the new chunk at the previous end
-        App.box_replace(
-            box_name, 
-            current_len_var.load(), # Offset: start writing at the end of current content
-            Txn.note()               # Data to write (the chunk from Txn.note())
-        ),
+        # Write the chunk at its offset
+        App.box_replace(box_name, offset.load(), Txn.note()),
+        App.globalPut(written_key, offset.load() + Len(Txn.note())),
         
         Log(Concat(Bytes("append_bytecode_complete:"), box_name))
     ])
 
 
-# In strahn_core.py
-
-# ... (set_bytecode and append_bytecode are correct now, no changes needed to them) ...
-
 @Subroutine(TealType.none)
 def set_version():
     """
     Sets the bytecode version number and copies the current 'approval' and 'clear'
     boxes to versioned boxes ('approval_v{version}', 'clear_v{version}').
-    Handles large boxes by copying in chunks.
+    Handles large boxes by copying in chunks. An optional third argument of 1
+    records the template as mandate_record_packed, whose mandates get no
+    global uints; it defaults to 0, the mandate_record layout.
     """
     version = Btoi(Txn.application_args[1])
     current_version_on_chain = App.globalGet(Bytes("bytecode_version"))
+    packed = If(Txn.application_args.length() > Int(2), Btoi(Txn.application_args[2]), Int(0))
+    packed_value = ScratchVar(TealType.uint64)
 
     # Define a helper subroutine for copying a box without App.box_get
     @Subroutine(TealType.none)
@@ -143,32 +149,97 @@ def set_version():
             )
         ])
 
+    approval_len = App.box_length(Bytes("approval"))
+    clear_len = App.box_length(Bytes("clear"))
+
     return Seq([
         Assert(is_owner()),
         Assert(version > current_version_on_chain), # Prevent rollback
+        packed_value.store(packed),
+        Assert(packed_value.load() <= Int(1)),
+
+        # Both programs share the four pages a mandate can have, so a version
+        # whose boxes each fit can still be impossible to deploy
+        approval_len,
+        clear_len,
+        Assert(approval_len.hasValue()),
+        Assert(clear_len.hasValue()),
+        Assert(approval_len.value() + clear_len.value() <= MAX_TEMPLATE_SIZE),
 
         # Perform the actual copies by calling copy_box
         copy_box(Bytes("approval"), Concat(Bytes("approval_v"), Itob(version))),
         copy_box(Bytes("clear"), Concat(Bytes("clear_v"), Itob(version))),
 
-        # Update the master version number
+        # Update the master version number, and the layout that goes with it
         App.globalPut(Bytes("bytecode_version"), version),
+        App.globalPut(Bytes("template_packed"), packed_value.load()),
 
         Log(Concat(Bytes("version_set:v"), Itob(version)))
     ])
 
-# ... rest of strahn_core.py's main logic unchanged ...
-# ... rest of strahn_core.py's main logic unchanged ...
+def template_num_uints() -> Expr:
+    """Global uints for mandates created from the stored template"""
+    # Recorded by set_version with the template it describes
+    return If(App.globalGet(Bytes("template_packed")), PACKED_MANDATE_NUM_UINTS, MANDATE_NUM_UINTS)
+
+
+# The stored template, read once per deployment call. Approval programs over
+# TEMPLATE_SLICE_SIZE continue in approval_tail; it is empty otherwise.
+approval_head = ScratchVar(TealType.bytes)
+approval_tail = ScratchVar(TealType.bytes)
+clear_program = ScratchVar(TealType.bytes)
+
+def template_hash(head: Expr, tail: Expr) -> Expr:
+    """SHA-256 of a one-slice program, or of its two slices' SHA-256 hashes"""
+    return If(
+        Len(tail) == Int(0),
+        Sha256(head),
+        Sha256(Concat(Sha256(head), Sha256(tail)))
+    )
+
+@Subroutine(TealType.none)
+def load_program(box_name: Expr):
+    """Read a program box into approval_head and approval_tail"""
+    program_len = App.box_length(box_name)
+    head_len = ScratchVar(TealType.uint64)
+    
+    return Seq([
+        program_len,
+        Assert(program_len.hasValue()),
+        
+        # box_get stops at 4096 bytes, so read the box with box_extract
+        head_len.store(If(
+            program_len.value() < TEMPLATE_SLICE_SIZE,
+            program_len.value(),
+            TEMPLATE_SLICE_SIZE
+        )),
+        approval_head.store(App.box_extract(box_name, Int(0), head_len.load())),
+        approval_tail.store(App.box_extract(
+            box_name, head_len.load(), program_len.value() - head_len.load()
+        )),
+    ])
+
 @Subroutine(TealType.none)
-def deploy_internal(approval_bytecode: Expr, clear_bytecode: Expr):
-    """Internal deployment logic shared by both deployment methods"""
-    # Mandate parameters from application args
-    dest_addr = Txn.application_args[3]
-    amount = Btoi(Txn.application_args[4])
-    interval_sec = Btoi(Txn.application_args[5])
-    start_ts = Btoi(Txn.application_args[6])
-    relayer_fee = Btoi(Txn.application_args[7])
+def load_template_boxes(approval_box: Expr, clear_box: Expr):
+    """Read an approval box in slices, and a clear box, into scratch"""
+    clear_code = App.box_get(clear_box)
     
+    return Seq([
+        load_program(approval_box),
+        clear_code,
+        Assert(clear_code.hasValue()),
+        clear_program.store(clear_code.value()),
+    ])
+
+def load_template() -> Expr:
+    """Read the stored official template into scratch"""
+    return load_template_boxes(Bytes("approval"), Bytes("clear"))
+
+@Subroutine(TealType.none)
+def deploy_internal(approval_head: Expr, approval_tail: Expr, clear_bytecode: Expr, dest_addr: Expr,
+                    amount: Expr, interval_sec: Expr, start_ts: Expr, relayer_fee: Expr,
+                    num_uints: Expr):
+    """Internal deployment logic shared by all deployment methods"""
     # Get caller context
     # pi_base_id = Txn.sender()  # The calling PI Base application ID
     pi_base_id = Txn.applications[1]
@@ -194,10 +265,14 @@ def deploy_internal(approval_bytecode: Expr, clear_bytecode: Expr):
         InnerTxnBuilder.Begin(),
         InnerTxnBuilder.SetFields({
             TxnField.type_enum: TxnType.ApplicationCall,
-            TxnField.approval_program: approval_bytecode,
+            # Each page may hold up to a full stack value; an empty tail adds nothing
+            TxnField.approval_program_pages: [approval_head, approval_tail],
             TxnField.clear_state_program: clear_bytecode,
-            TxnField.global_num_uints: Int(6),  # FIXED: amount, interval_sec, next_pay_ts, relayer_fee, usdc_asa_id, pi_base_id
-            TxnField.global_num_byte_slices: Int(1),  # dest_addr
+            TxnField.extra_program_pages: (
+                Len(approval_head) + Len(approval_tail) + Len(clear_bytecode) - Int(1)
+            ) / PROGRAM_PAGE_SIZE,
+            TxnField.global_num_uints: num_uints,  # See MANDATE_NUM_UINTS
+            TxnField.global_num_byte_slices: Int(1),  # dest_addr, or the packed terms
             TxnField.application_args: [
                 dest_addr,
                 Itob(amount),
@@ -225,35 +300,78 @@ def deploy_mandate():
     expected_approval_hash = Txn.application_args[1]
     expected_clear_hash = Txn.application_args[2]
     
-    # Just define the recipes
-    approval_code = App.box_get(Bytes("approval"))
-    clear_code = App.box_get(Bytes("clear"))
-    
     # A scratch variable to hold the version we read at the start
     initial_version = ScratchVar(TealType.uint64)
     
     return Seq([
+        checkpoint("deploy_start"),
+        
         # Store the current version at the beginning of execution
         initial_version.store(App.globalGet(Bytes("bytecode_version"))),
         
         # Now execute the box reads
-        approval_code,
-        clear_code,
-
-        # Assert that the boxes have values
-        Assert(approval_code.hasValue()),
-        Assert(clear_code.hasValue()),
+        load_template(),
+        checkpoint("deploy_loaded"),
         
         # TOCTOU fix: Re-verify version hasn't changed during execution
         # Compare the current version against the one we saved at the start.
         Assert(initial_version.load() == App.globalGet(Bytes("bytecode_version"))),
         
         # Verify bytecode hashes match user expectations
-        Assert(Sha256(approval_code.value()) == expected_approval_hash),
-        Assert(Sha256(clear_code.value()) == expected_clear_hash),
+        Assert(template_hash(approval_head.load(), approval_tail.load()) == expected_approval_hash),
+        Assert(Sha256(clear_program.load()) == expected_clear_hash),
+        checkpoint("deploy_hashed"),
         
         # Deploy using internal helper
-        deploy_internal(approval_code.value(), clear_code.value()),
+        deploy_internal(
+            approval_head.load(),
+            approval_tail.load(),
+            clear_program.load(),
+            Txn.application_args[3],        # dest_addr
+            Btoi(Txn.application_args[4]),  # amount
+            Btoi(Txn.application_args[5]),  # interval_sec
+            Btoi(Txn.application_args[6]),  # start_ts
+            Btoi(Txn.application_args[7]),  # relayer_fee
+            template_num_uints(),
+        ),
+        # No checkpoint after this: PI Base reads mandate_deployed as the last log
+    ])
+
+@Subroutine(TealType.none)
+def deploy_mandates_batch():
+    """Deploy several mandates from the stored bytecode, verifying it only once"""
+    expected_approval_hash = Txn.application_args[1]
+    expected_clear_hash = Txn.application_args[2]
+    specs = Txn.application_args[3]  # Packed mandate specs, see MANDATE_SPEC_LENGTH
+    
+    spec_count = Len(specs) / MANDATE_SPEC_LENGTH
+    i = ScratchVar(TealType.uint64)
+    spec_field = lambda offset: ExtractUint64(specs, i.load() * MANDATE_SPEC_LENGTH + Int(offset))
+    
+    return Seq([
+        Assert(Len(specs) % MANDATE_SPEC_LENGTH == Int(0)),  # Whole specs only
+        Assert(spec_count > Int(0)),
+        Assert(spec_count <= MAX_BATCH_MANDATES),
+        
+        load_template(),
+        
+        # One hash check covers every mandate in the batch
+        Assert(template_hash(approval_head.load(), approval_tail.load()) == expected_approval_hash),
+        Assert(Sha256(clear_program.load()) == expected_clear_hash),
+        
+        For(i.store(Int(0)), i.load() < spec_count, i.store(i.load() + Int(1))).Do(
+            deploy_internal(
+                approval_head.load(),
+                approval_tail.load(),
+                clear_program.load(),
+                Extract(specs, i.load() * MANDATE_SPEC_LENGTH, Int(32)),  # dest_addr
+                spec_field(32),  # amount
+                spec_field(40),  # interval_sec
+                spec_field(48),  # start_ts
+                spec_field(56),  # relayer_fee
+                template_num_uints(),
+            )
+        ),
     ])
 
 @Subroutine(TealType.none)
@@ -264,35 +382,122 @@ def deploy_legacy_mandate():
     
     return Seq([
         # Validate bytecode size limits to prevent DoS
-        Assert(Len(legacy_approval) <= Int(8192)),  # 8KB limit
-        Assert(Len(legacy_clear) <= Int(1024)),     # 1KB limit
+        Assert(Len(legacy_approval) + Len(legacy_clear) <= MAX_TEMPLATE_SIZE),
         
-        # Deploy with provided legacy bytecode (bypasses stored code)
-        deploy_internal(legacy_approval, legacy_clear),
+        # Deploy with provided legacy bytecode (bypasses stored code). Both
+        # arrive as app args, so the approval program is a single page.
+        deploy_internal(
+            legacy_approval,
+            Bytes(""),
+            legacy_clear,
+            Txn.application_args[3],        # dest_addr
+            Btoi(Txn.application_args[4]),  # amount
+            Btoi(Txn.application_args[5]),  # interval_sec
+            Btoi(Txn.application_args[6]),  # start_ts
+            Btoi(Txn.application_args[7]),  # relayer_fee
+            MANDATE_NUM_UINTS,  # Legacy bytecode uses the unpacked layout
+        ),
     ])
 
+# Content-addressed legacy programs: "code:" + template_hash(program), written
+# once by publish_legacy_program from the publisher's "stage:" + sender box.
+def legacy_program_box_name(program_hash: Expr) -> Expr:
+    """Registry box holding the program whose template hash is program_hash"""
+    return Concat(Bytes("code:"), program_hash)
+
+def legacy_stage_box_name(publisher: Expr) -> Expr:
+    """Box a publisher uploads a legacy program into before publishing it"""
+    return Concat(Bytes("stage:"), publisher)
+
 @Subroutine(TealType.none)
-def get_current_bytecode_hashes():
-    """Return SHA-256 hashes of current official bytecode"""
-    # Define the recipes
-    approval_code = App.box_get(Bytes("approval"))
-    clear_code = App.box_get(Bytes("clear"))
+def stage_legacy_program():
+    """Upload a chunk (the note) of a legacy program into the sender's staging box"""
+    offset = Btoi(Txn.application_args[1])
+    total_size = Btoi(Txn.application_args[2])
+    stage = legacy_stage_box_name(Txn.sender())
+    payment_txn_index = Txn.group_index() - Int(1)
     
     return Seq([
-        # Step 1: Execute the box_get operations. The results are now available.
-        approval_code,
-        clear_code,
+        # The first chunk (re)creates the box, paid for by a preceding payment
+        If(offset == Int(0)).Then(Seq([
+            Assert(total_size > Int(0)),
+            Assert(total_size <= MAX_TEMPLATE_SIZE),
+            Assert(Txn.group_index() > Int(0)),
+            Assert(Gtxn[payment_txn_index].type_enum() == TxnType.Payment),
+            Assert(Gtxn[payment_txn_index].receiver() == Global.current_application_address()),
+            Assert(Gtxn[payment_txn_index].amount() >= Int(2500) + Int(400) * (Len(stage) + total_size)),
+            Pop(App.box_delete(stage)),
+            Assert(App.box_create(stage, total_size)),
+        ])),
         
-        # Step 2: Assert that the values were found.
-        Assert(approval_code.hasValue()),
-        Assert(clear_code.hasValue()),
+        # box_replace fails if the chunk runs past the allocated size
+        App.box_replace(stage, offset, Txn.note()),
+        
+        Log(Concat(Bytes("legacy_program_staged:"), Itob(offset + Len(Txn.note())))),
+    ])
+
+@Subroutine(TealType.none)
+def publish_legacy_program():
+    """Move the sender's staged program to its content address, storing each program once"""
+    stage = legacy_stage_box_name(Txn.sender())
+    program_hash = ScratchVar(TealType.bytes)
+    code_box = legacy_program_box_name(program_hash.load())
+    existing = App.box_length(code_box)
+    
+    return Seq([
+        load_program(stage),
+        program_hash.store(template_hash(approval_head.load(), approval_tail.load())),
+        
+        # The name commits to the content, so a published program never changes
+        existing,
+        If(Not(existing.hasValue())).Then(Seq([
+            Assert(App.box_create(code_box, Len(approval_head.load()) + Len(approval_tail.load()))),
+            App.box_replace(code_box, Int(0), approval_head.load()),
+            App.box_replace(code_box, Len(approval_head.load()), approval_tail.load()),
+        ])),
+        Assert(App.box_delete(stage)),
+        
+        Log(Concat(Bytes("legacy_program_published:"), program_hash.load())),
+    ])
+
+@Subroutine(TealType.none)
+def deploy_legacy_by_hash():
+    """Deploy a mandate from published legacy programs, referenced by hash (user-assumed risk)"""
+    approval_hash = Txn.application_args[1]
+    clear_hash = Txn.application_args[2]
+    
+    return Seq([
+        # Box names are content addresses checked at publish time
+        load_template_boxes(legacy_program_box_name(approval_hash), legacy_program_box_name(clear_hash)),
+        Assert(Len(approval_head.load()) + Len(approval_tail.load()) + Len(clear_program.load())
+               <= MAX_TEMPLATE_SIZE),
         
-        # Step 3: Log the hashes. Now it's safe to use .value() and App.globalGet()
+        deploy_internal(
+            approval_head.load(),
+            approval_tail.load(),
+            clear_program.load(),
+            Txn.application_args[3],        # dest_addr
+            Btoi(Txn.application_args[4]),  # amount
+            Btoi(Txn.application_args[5]),  # interval_sec
+            Btoi(Txn.application_args[6]),  # start_ts
+            Btoi(Txn.application_args[7]),  # relayer_fee
+            MANDATE_NUM_UINTS,  # Legacy bytecode uses the unpacked layout
+        ),
+    ])
+
+@Subroutine(TealType.none)
+def get_current_bytecode_hashes():
+    """Return SHA-256 hashes of current official bytecode"""
+    return Seq([
+        # Step 1: Read the boxes; load_template asserts they exist.
+        load_template(),
+        
+        # Step 2: Log the hashes, computed as deploy_mandate checks them
         Log(Concat(
             Bytes("approval_hash:"),
-            Sha256(approval_code.value()),
+            template_hash(approval_head.load(), approval_tail.load()),
             Bytes(":clear_hash:"),
-            Sha256(clear_code.value()),
+            Sha256(clear_program.load()),
             Bytes(":version:"),
             Itob(App.globalGet(Bytes("bytecode_version"))) # Get the value directly here
         )),
@@ -305,6 +510,7 @@ def strahn_core_approval():
     on_create = Seq([
         App.globalPut(Bytes("owner_addr"), Txn.application_args[0]),
         App.globalPut(Bytes("bytecode_version"), Int(0)),  # Initialize version
+        App.globalPut(Bytes("template_packed"), Int(0)),   # mandate_record layout
         Approve(),
     ])
     
@@ -325,12 +531,26 @@ def strahn_core_approval():
                 Assert(Txn.type_enum() == TxnType.ApplicationCall),
                 deploy_mandate()
             ])],
+            [method == Bytes("deploy_mandates_batch"),
+            Seq([
+                Assert(Txn.sender() != Global.zero_address()),
+                Assert(Txn.type_enum() == TxnType.ApplicationCall),
+                deploy_mandates_batch()
+            ])],
             [method == Bytes("deploy_legacy_mandate"), # This legacy one is still fine
             Seq([
                 Assert(Txn.sender() != Global.zero_address()),
                 Assert(Txn.type_enum() == TxnType.ApplicationCall),
                 deploy_legacy_mandate()
             ])],
+            [method == Bytes("deploy_legacy_by_hash"),
+            Seq([
+                Assert(Txn.sender() != Global.zero_address()),
+                Assert(Txn.type_enum() == TxnType.ApplicationCall),
+                deploy_legacy_by_hash()
+            ])],
+            [method == Bytes("stage_legacy_program"), stage_legacy_program()],
+            [method == Bytes("publish_legacy_program"), publish_legacy_program()],
             [method == Bytes("get_current_bytecode_hashes"), get_current_bytecode_hashes()],
         ),
         
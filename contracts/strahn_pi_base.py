@@ -4,19 +4,19 @@ from utils.common import *
 @Subroutine(TealType.uint64)
 def is_creator():
     """Check if sender is the contract creator"""
-    return Txn.sender() == App.globalGet(Bytes("creator_addr"))
+    return Txn.sender() == config_bytes("creator_addr")
 
 @Subroutine(TealType.none)
 def app_optin_usdc():
     """Opt the contract into USDC asset"""
     return Seq([
         # FIXED: Use stored creator_addr instead of Global.creator_address()
-        Assert(Txn.sender() == App.globalGet(Bytes("creator_addr"))),
+        Assert(Txn.sender() == config_bytes("creator_addr")),
         
         InnerTxnBuilder.Begin(),
         InnerTxnBuilder.SetFields({
             TxnField.type_enum: TxnType.AssetTransfer,
-            TxnField.xfer_asset: App.globalGet(Bytes("usdc_id")),
+            TxnField.xfer_asset: config_uint("usdc_id"),
             TxnField.asset_receiver: Global.current_application_address(),
             TxnField.asset_amount: Int(0),
         }),
@@ -25,6 +25,57 @@ def app_optin_usdc():
         Log(Bytes("usdc_optin_complete")),
     ])
 
+def is_usdc_deposit(index: Expr) -> Expr:
+    """Whether the group transaction at index transfers USDC to the contract"""
+    return And(
+        Gtxn[index].type_enum() == TxnType.AssetTransfer,
+        Gtxn[index].xfer_asset() == config_uint("usdc_id"),
+        Gtxn[index].asset_receiver() == Global.current_application_address(),
+        Gtxn[index].asset_amount() > Int(0),
+    )
+
+def log_usdc_deposit(index: Expr) -> Expr:
+    """Log the USDC transfer at index with its amount and sender"""
+    return Log(Concat(
+        Bytes("usdc_deposited:"),
+        Itob(Gtxn[index].asset_amount()),
+        Bytes(":from:"),
+        Gtxn[index].sender()
+    ))
+
+def may_top_up(deposit_index: Expr, call_index: Expr, owner: Expr) -> Expr:
+    """Only the call's sender or the funds' owner may top up a call"""
+    return Or(
+        Gtxn[deposit_index].sender() == Gtxn[call_index].sender(),
+        Gtxn[deposit_index].sender() == owner,
+    )
+
+@Subroutine(TealType.uint64)
+def preceding_usdc_deposit(owner: Expr):
+    """Amount of a USDC top-up just before this call in the group, or 0"""
+    payment_txn_index = Txn.group_index() - Int(1)
+    
+    # Gtxn fields are only read once the index is known to exist
+    return If(Txn.group_index() == Int(0)).Then(Int(0)).ElseIf(And(
+        is_usdc_deposit(payment_txn_index),
+        may_top_up(payment_txn_index, Txn.group_index(), owner),
+    )).Then(Gtxn[payment_txn_index].asset_amount()).Else(Int(0))
+
+@Subroutine(TealType.uint64)
+def spent_as_top_up(index: Expr):
+    """Whether the USDC deposit at index is a top-up of the process_intent right after it"""
+    call_index = index + Int(1)
+    
+    # Application args are only read once the call is known to have one
+    return If(And(
+        Gtxn[call_index].type_enum() == TxnType.ApplicationCall,
+        Gtxn[call_index].application_id() == Global.current_application_id(),
+        Gtxn[call_index].application_args.length() > Int(0),
+    )).Then(And(
+        Gtxn[call_index].application_args[0] == Bytes("process_intent"),
+        may_top_up(index, call_index, config_bytes("creator_addr")),
+    )).Else(Int(0))
+
 @Subroutine(TealType.none)
 def deposit_usdc():
     """Handle USDC deposit to the contract"""
@@ -38,28 +89,103 @@ def deposit_usdc():
         
         # Validate payment transaction
         Assert(Gtxn[payment_txn_index].type_enum() == TxnType.AssetTransfer),
-        Assert(Gtxn[payment_txn_index].xfer_asset() == App.globalGet(Bytes("usdc_id"))),
+        Assert(Gtxn[payment_txn_index].xfer_asset() == config_uint("usdc_id")),
         Assert(Gtxn[payment_txn_index].asset_receiver() == Global.current_application_address()),
         Assert(Gtxn[payment_txn_index].asset_amount() > Int(0)),
         
         # Validate sender consistency
         Assert(Gtxn[payment_txn_index].sender() == Txn.sender()),
         
-        Log(Concat(Bytes("usdc_deposited:"), Itob(Gtxn[payment_txn_index].asset_amount()))),
+        log_usdc_deposit(payment_txn_index),
+    ])
+
+@Subroutine(TealType.none)
+def deposit_usdc_batch():
+    """Acknowledge every USDC transfer to the contract that precedes this call in the group"""
+    i = ScratchVar(TealType.uint64)
+    deposits = ScratchVar(TealType.uint64)
+    total_amount = ScratchVar(TealType.uint64)
+    
+    return Seq([
+        # The call comes last, so every transfer it counts precedes it
+        Assert(Txn.group_index() == Global.group_size() - Int(1)),
+        Assert(Global.group_size() <= MAX_GROUP_SIZE),
+        
+        deposits.store(Int(0)),
+        total_amount.store(Int(0)),
+        For(i.store(Int(0)), i.load() < Txn.group_index(), i.store(i.load() + Int(1))).Do(
+            # Other transactions (fee payers, op-ups) may share the group, and
+            # a top-up is acknowledged by the intent that spends it
+            If(is_usdc_deposit(i.load())).Then(If(Not(spent_as_top_up(i.load()))).Then(Seq([
+                deposits.store(deposits.load() + Int(1)),
+                total_amount.store(total_amount.load() + Gtxn[i.load()].asset_amount()),
+                log_usdc_deposit(i.load()),
+            ])))
+        ),
+        Assert(deposits.load() > Int(0)),
+        
+        Log(Concat(
+            Bytes("usdc_batch_deposited:"),
+            Itob(total_amount.load()),
+            Bytes(":deposits:"),
+            Itob(deposits.load())
+        )),
     ])
 
 @Subroutine(TealType.none)
 def validate_balance(required_amount: Expr):
-    """Validate contract has sufficient USDC balance"""
+    """Validate contract has sufficient USDC balance, not counting fees owed to relayers"""
     contract_balance = AssetHolding.balance(
         Global.current_application_address(),
-        App.globalGet(Bytes("usdc_id"))
+        config_uint("usdc_id")
     )
     
     return Seq([
         contract_balance,
         Assert(contract_balance.hasValue()),
-        Assert(contract_balance.value() >= required_amount),
+        Assert(contract_balance.value() >= required_amount + App.globalGet(Bytes("fees_owed"))),
+    ])
+
+def relayer_fee_box_name(relayer_addr: Expr) -> Expr:
+    """Box holding a relayer's accrued, unclaimed fees (uint64)"""
+    return Concat(Bytes("fee:"), relayer_addr)
+
+@Subroutine(TealType.none)
+def accrue_relayer_fee(relayer_addr: Expr, fee: Expr):
+    """Credit a relayer fee to the relayer's ledger box instead of transferring it"""
+    accrued = App.box_get(relayer_fee_box_name(relayer_addr))
+    
+    return If(fee > Int(0)).Then(Seq([
+        accrued,
+        # A missing box reads as empty bytes, and Btoi of empty bytes is 0
+        App.box_put(relayer_fee_box_name(relayer_addr), Itob(Btoi(accrued.value()) + fee)),
+        App.globalPut(Bytes("fees_owed"), App.globalGet(Bytes("fees_owed")) + fee),
+    ]))
+
+@Subroutine(TealType.none)
+def claim_relayer_fees():
+    """Pay out the sender's accrued relayer fees in a single transfer"""
+    accrued = App.box_get(relayer_fee_box_name(Txn.sender()))
+    claimed = Btoi(accrued.value())
+    
+    return Seq([
+        accrued,
+        Assert(accrued.hasValue()),
+        
+        # Deleting the box returns its minimum balance to the contract
+        Assert(App.box_delete(relayer_fee_box_name(Txn.sender()))),
+        App.globalPut(Bytes("fees_owed"), App.globalGet(Bytes("fees_owed")) - claimed),
+        
+        InnerTxnBuilder.Begin(),
+        InnerTxnBuilder.SetFields({
+            TxnField.type_enum: TxnType.AssetTransfer,
+            TxnField.xfer_asset: config_uint("usdc_id"),
+            TxnField.asset_receiver: Txn.sender(),
+            TxnField.asset_amount: claimed,
+        }),
+        InnerTxnBuilder.Submit(),
+        
+        Log(Concat(Bytes("relayer_fees_claimed:"), Itob(claimed))),
     ])
 
 @Subroutine(TealType.none)
@@ -83,8 +209,11 @@ def process_intent():
     
     current_nonce = App.globalGet(Bytes("creator_nonce"))
     total_amount = amount + relayer_fee
+    top_up = ScratchVar(TealType.uint64)
     
     return Seq([
+        checkpoint("intent_start"),
+        
         # Input validation
         Assert(Len(destination) == Int(32)),  # Valid address
         Assert(amount > Int(0)),  # Positive amount
@@ -94,34 +223,40 @@ def process_intent():
         # Verify nonce
         Assert(nonce == current_nonce),
         
+        # A top-up transferred just before this call has already been applied
+        # to the contract's holding, so the balance check below counts it
+        top_up.store(preceding_usdc_deposit(config_bytes("creator_addr"))),
+        If(top_up.load() > Int(0)).Then(log_usdc_deposit(Txn.group_index() - Int(1))),
+        checkpoint("intent_checked"),
+        
+        # Raise our own opcode budget for the signature check
+        ensure_signature_budget(SIGNATURE_VERIFY_BUDGET),
+        checkpoint("intent_opup"),
+        
         # Verify signature
         Assert(Ed25519Verify(
             Sha256(message),
             signature,
-            App.globalGet(Bytes("creator_addr"))
+            config_bytes("creator_addr")
         )),
+        checkpoint("intent_verified"),
         
         # Validate sufficient balance
         validate_balance(total_amount),
         
-        # Execute payments (merchant first, then relayer)
+        # Execute payment to merchant
         InnerTxnBuilder.Begin(),
         InnerTxnBuilder.SetFields({
             TxnField.type_enum: TxnType.AssetTransfer,
-            TxnField.xfer_asset: App.globalGet(Bytes("usdc_id")),
+            TxnField.xfer_asset: config_uint("usdc_id"),
             TxnField.asset_receiver: destination,
             TxnField.asset_amount: amount,
         }),
-        InnerTxnBuilder.Next(),
-        
-        # Send fee to relayer
-        InnerTxnBuilder.SetFields({
-            TxnField.type_enum: TxnType.AssetTransfer,
-            TxnField.xfer_asset: App.globalGet(Bytes("usdc_id")),
-            TxnField.asset_receiver: Txn.sender(),
-            TxnField.asset_amount: relayer_fee,
-        }),
         InnerTxnBuilder.Submit(),
+        checkpoint("intent_paid"),
+        
+        # Credit the relayer's fee ledger
+        accrue_relayer_fee(Txn.sender(), relayer_fee),
         
         # FIXED: Increment nonce AFTER successful payment execution
         App.globalPut(Bytes("creator_nonce"), current_nonce + Int(1)),
@@ -132,6 +267,331 @@ def process_intent():
             Bytes(":nonce:"),
             Itob(current_nonce + Int(1))
         )),
+        checkpoint("intent_end"),
+    ])
+
+@Subroutine(TealType.none)
+def process_split_intent():
+    """Process one signed intent paying several destinations in a single inner group"""
+    payees = Txn.application_args[1]  # Packed (address, Itob(amount)) entries
+    relayer_fee = Btoi(Txn.application_args[2])
+    nonce = Btoi(Txn.application_args[3])
+    signature = Txn.application_args[4]
+    
+    message = Concat(
+        Bytes("SPLIT_V1:"),
+        Itob(Global.current_application_id()),  # Domain separation
+        Itob(nonce),
+        Itob(relayer_fee),
+        payees
+    )
+    
+    payee_count = Len(payees) / SPLIT_ENTRY_LENGTH
+    i = ScratchVar(TealType.uint64)
+    total_amount = ScratchVar(TealType.uint64)
+    payee_addr = Extract(payees, i.load() * SPLIT_ENTRY_LENGTH, Int(32))
+    payee_amount = ExtractUint64(payees, i.load() * SPLIT_ENTRY_LENGTH + Int(32))
+    
+    current_nonce = App.globalGet(Bytes("creator_nonce"))
+    
+    return Seq([
+        # Input validation
+        Assert(Len(payees) % SPLIT_ENTRY_LENGTH == Int(0)),  # Whole entries only
+        Assert(payee_count > Int(0)),
+        Assert(payee_count <= MAX_SPLIT_PAYEES),
+        Assert(relayer_fee >= Int(0)),  # Non-negative fee
+        
+        # Sum the payout, checking every entry and every addition
+        total_amount.store(relayer_fee),
+        For(i.store(Int(0)), i.load() < payee_count, i.store(i.load() + Int(1))).Do(Seq([
+            Assert(payee_amount > Int(0)),  # Positive amount
+            Assert(total_amount.load() + payee_amount > total_amount.load()),  # Overflow check
+            total_amount.store(total_amount.load() + payee_amount),
+        ])),
+        
+        # Verify nonce
+        Assert(nonce == current_nonce),
+        
+        # Raise our own opcode budget for the signature check and payouts
+        ensure_signature_budget(SPLIT_VERIFY_BUDGET),
+        
+        # Verify signature
+        Assert(Ed25519Verify(
+            Sha256(message),
+            signature,
+            config_bytes("creator_addr")
+        )),
+        
+        # Validate sufficient balance
+        validate_balance(total_amount.load()),
+        
+        # Execute all payments in one inner group, in payee order
+        InnerTxnBuilder.Begin(),
+        For(i.store(Int(0)), i.load() < payee_count, i.store(i.load() + Int(1))).Do(Seq([
+            If(i.load() > Int(0), InnerTxnBuilder.Next()),
+            InnerTxnBuilder.SetFields({
+                TxnField.type_enum: TxnType.AssetTransfer,
+                TxnField.xfer_asset: config_uint("usdc_id"),
+                TxnField.asset_receiver: payee_addr,
+                TxnField.asset_amount: payee_amount,
+            }),
+        ])),
+        InnerTxnBuilder.Submit(),
+        
+        # Credit the relayer's fee ledger
+        accrue_relayer_fee(Txn.sender(), relayer_fee),
+        
+        App.globalPut(Bytes("creator_nonce"), current_nonce + Int(1)),
+        
+        Log(Concat(
+            Bytes("split_payment_processed:"),
+            Itob(total_amount.load() - relayer_fee),
+            Bytes(":payees:"),
+            Itob(payee_count),
+            Bytes(":nonce:"),
+            Itob(current_nonce + Int(1))
+        )),
+    ])
+
+def allowance_box_name(relayer_addr: Expr) -> Expr:
+    """Box holding a relayer's allowance: remaining (uint64) | expiry (uint64)"""
+    return Concat(Bytes("allowance:"), relayer_addr)
+
+@Subroutine(TealType.none)
+def grant_allowance():
+    """Pre-authorize a relayer to spend up to a cap until an expiry"""
+    relayer_addr = Txn.application_args[1]
+    spending_cap = Btoi(Txn.application_args[2])
+    expiry_ts = Btoi(Txn.application_args[3])
+    nonce = Btoi(Txn.application_args[4])
+    signature = Txn.application_args[5]
+    
+    message = Concat(
+        Bytes("ALLOWANCE_V1:"),
+        Itob(Global.current_application_id()),  # Domain separation
+        Itob(nonce),
+        relayer_addr,
+        Itob(spending_cap),
+        Itob(expiry_ts)
+    )
+    
+    current_nonce = App.globalGet(Bytes("creator_nonce"))
+    
+    return Seq([
+        # Input validation
+        Assert(Len(relayer_addr) == Int(32)),  # Valid address
+        Assert(spending_cap > Int(0)),  # Positive cap
+        Assert(expiry_ts > Global.latest_timestamp()),  # Future expiry
+        Assert(expiry_ts < Int(4102444800)),  # Max reasonable timestamp
+        
+        # Verify nonce
+        Assert(nonce == current_nonce),
+        
+        # Raise our own opcode budget for the signature check
+        ensure_signature_budget(SIGNATURE_VERIFY_BUDGET),
+        
+        # Verify creator signature
+        Assert(Ed25519Verify(
+            Sha256(message),
+            signature,
+            config_bytes("creator_addr")
+        )),
+        
+        # Store (or replace) the grant
+        App.box_put(
+            allowance_box_name(relayer_addr),
+            Concat(Itob(spending_cap), Itob(expiry_ts))
+        ),
+        
+        # The grant consumes a nonce so it cannot be replayed
+        App.globalPut(Bytes("creator_nonce"), current_nonce + Int(1)),
+        
+        Log(Concat(
+            Bytes("allowance_granted:"),
+            Itob(spending_cap),
+            Bytes(":expiry:"),
+            Itob(expiry_ts)
+        )),
+    ])
+
+@Subroutine(TealType.none)
+def revoke_allowance():
+    """Remove a relayer's allowance - creator only"""
+    relayer_addr = Txn.application_args[1]
+    
+    return Seq([
+        Assert(is_creator()),
+        Assert(App.box_delete(allowance_box_name(relayer_addr))),
+        Log(Bytes("allowance_revoked")),
+    ])
+
+@Subroutine(TealType.none)
+def process_allowance_intent():
+    """Process a payment submitted by a relayer holding an allowance (no signature check)"""
+    destination = Txn.application_args[1]
+    amount = Btoi(Txn.application_args[2])
+    relayer_fee = Btoi(Txn.application_args[3])
+    nonce = Btoi(Txn.application_args[4])
+    
+    allowance = App.box_get(allowance_box_name(Txn.sender()))
+    remaining = ExtractUint64(allowance.value(), Int(0))
+    expiry_ts = ExtractUint64(allowance.value(), Int(8))
+    
+    current_nonce = App.globalGet(Bytes("creator_nonce"))
+    total_amount = amount + relayer_fee
+    
+    return Seq([
+        # Input validation
+        Assert(Len(destination) == Int(32)),  # Valid address
+        Assert(amount > Int(0)),  # Positive amount
+        Assert(relayer_fee >= Int(0)),  # Non-negative fee
+        Assert(total_amount > amount),  # Overflow check
+        
+        # Verify nonce
+        Assert(nonce == current_nonce),
+        
+        # Verify the sender holds a live allowance covering the payment
+        allowance,
+        Assert(allowance.hasValue()),
+        Assert(Global.latest_timestamp() < expiry_ts),
+        Assert(total_amount <= remaining),
+        
+        # Validate sufficient balance
+        validate_balance(total_amount),
+        
+        # Execute payment to merchant
+        InnerTxnBuilder.Begin(),
+        InnerTxnBuilder.SetFields({
+            TxnField.type_enum: TxnType.AssetTransfer,
+            TxnField.xfer_asset: config_uint("usdc_id"),
+            TxnField.asset_receiver: destination,
+            TxnField.asset_amount: amount,
+        }),
+        InnerTxnBuilder.Submit(),
+        
+        # Credit the relayer's fee ledger
+        accrue_relayer_fee(Txn.sender(), relayer_fee),
+        
+        # Draw down the allowance and advance the nonce
+        App.box_replace(allowance_box_name(Txn.sender()), Int(0), Itob(remaining - total_amount)),
+        App.globalPut(Bytes("creator_nonce"), current_nonce + Int(1)),
+        
+        Log(Concat(
+            Bytes("allowance_payment_processed:"),
+            Itob(amount),
+            Bytes(":remaining:"),
+            Itob(remaining - total_amount)
+        )),
+    ])
+
+# Mandate registry box "mandate:" + Itob(slot), one per mandate set up by this
+# PI Base. Slots come from the mandate_count global, so clients know the box
+# name before the mandate's app id exists. Layout:
+# app_id | dest_addr (32) | amount | relayer_fee | next_pay_ts | interval_sec |
+# due bucket | position in the bucket
+TERMS_APP_ID = Int(0)
+TERMS_DEST = Int(8)
+TERMS_AMOUNT = Int(40)
+TERMS_FEE = Int(48)
+TERMS_NEXT_PAY = Int(56)
+TERMS_INTERVAL = Int(64)
+TERMS_DUE_BUCKET = Int(72)
+TERMS_DUE_POSITION = Int(80)
+
+def mandate_box_name(slot: Expr) -> Expr:
+    """Registry box holding a mandate's app id, terms and schedule"""
+    return Concat(Bytes("mandate:"), Itob(slot))
+
+def mandate_deployed_id(core_log: Expr) -> Expr:
+    """App id from Core's "mandate_deployed:" + Itob(app_id) + ... log"""
+    return ExtractUint64(core_log, Int(17))
+
+# Due-time index box "due:" + Itob(next_pay_ts / DUE_BUCKET_SEC):
+# live count | entries of Itob(slot + 1), 0 once the mandate has moved on
+def due_box_name(bucket: Expr) -> Expr:
+    """Index box listing the mandates due in a bucket"""
+    return Concat(Bytes("due:"), Itob(bucket))
+
+@Subroutine(TealType.none)
+def index_insert(slot: Expr, next_pay_ts: Expr):
+    """Append a registered mandate to the bucket of its next payment time"""
+    bucket = ScratchVar(TealType.uint64)
+    current = ScratchVar(TealType.bytes)
+    entries = App.box_get(due_box_name(bucket.load()))
+    
+    return Seq([
+        # Find the first bucket with room, spilling full ones into the next
+        bucket.store(next_pay_ts / DUE_BUCKET_SEC),
+        While(Seq(entries, Len(entries.value()) >= DUE_BUCKET_MAX_BYTES)).Do(
+            bucket.store(bucket.load() + Int(1))
+        ),
+        current.store(If(entries.hasValue(), entries.value(), Itob(Int(0)))),
+        
+        # Boxes cannot grow in place at v8, so rewrite with the entry appended
+        Pop(App.box_delete(due_box_name(bucket.load()))),
+        App.box_put(due_box_name(bucket.load()), Concat(
+            Itob(ExtractUint64(current.load(), Int(0)) + Int(1)),
+            Suffix(current.load(), Int(8)),
+            Itob(slot + Int(1))
+        )),
+        
+        # Remember where the entry lives so it can be removed in O(1)
+        App.box_replace(mandate_box_name(slot), TERMS_DUE_BUCKET, Concat(
+            Itob(bucket.load()),
+            Itob((Len(current.load()) - Int(8)) / Int(8))
+        )),
+    ])
+
+@Subroutine(TealType.none)
+def index_remove(terms: Expr):
+    """Clear a mandate's entry from its bucket, deleting the bucket once empty"""
+    bucket_name = due_box_name(ExtractUint64(terms, TERMS_DUE_BUCKET))
+    live = ScratchVar(TealType.uint64)
+    entries = App.box_get(bucket_name)
+    
+    return Seq([
+        entries,
+        Assert(entries.hasValue()),
+        live.store(ExtractUint64(entries.value(), Int(0)) - Int(1)),
+        If(live.load() == Int(0))
+        .Then(Pop(App.box_delete(bucket_name)))
+        .Else(Seq([
+            App.box_replace(bucket_name, Int(0), Itob(live.load())),
+            App.box_replace(
+                bucket_name,
+                Int(8) + ExtractUint64(terms, TERMS_DUE_POSITION) * Int(8),
+                Itob(Int(0))
+            ),
+        ])),
+    ])
+
+@Subroutine(TealType.none)
+def reschedule_mandate(slot: Expr, terms: Expr):
+    """Advance a paid mandate by its interval and move it to its new bucket"""
+    next_pay_ts = ExtractUint64(terms, TERMS_NEXT_PAY) + ExtractUint64(terms, TERMS_INTERVAL)
+    
+    return Seq([
+        index_remove(terms),
+        # The addition fails on overflow
+        App.box_replace(mandate_box_name(slot), TERMS_NEXT_PAY, Itob(next_pay_ts)),
+        index_insert(slot, next_pay_ts),
+    ])
+
+@Subroutine(TealType.none)
+def register_mandate(mandate_id: Expr, dest_addr: Expr, amount: Expr, relayer_fee: Expr,
+                     next_pay_ts: Expr, interval_sec: Expr):
+    """Record a mandate this PI Base set up in the next registry slot"""
+    slot = App.globalGet(Bytes("mandate_count"))
+    
+    return Seq([
+        App.box_put(
+            mandate_box_name(slot),
+            Concat(Itob(mandate_id), dest_addr, Itob(amount), Itob(relayer_fee),
+                   Itob(next_pay_ts), Itob(interval_sec), BytesZero(Int(16)))
+        ),
+        index_insert(slot, next_pay_ts),
+        Log(Concat(Bytes("mandate_registered:"), Itob(slot), Bytes(":app:"), Itob(mandate_id))),
+        App.globalPut(Bytes("mandate_count"), slot + Int(1)),
     ])
 
 @Subroutine(TealType.none)
@@ -161,6 +621,8 @@ def setup_mandate_standard():
     total_amount = amount + relayer_fee
     
     return Seq([
+        checkpoint("mandate_start"),
+        
         # Input validation
         Assert(Len(dest_addr) == Int(32)),  # Valid address
         Assert(amount > Int(0)),  # Positive amount
@@ -168,13 +630,19 @@ def setup_mandate_standard():
         Assert(start_ts > Global.latest_timestamp()),  # Future start
         Assert(relayer_fee >= Int(0)),  # Non-negative fee
         Assert(total_amount > amount),  # Overflow check
+        checkpoint("mandate_checked"),
+        
+        # Raise our own opcode budget for the signature check
+        ensure_signature_budget(SIGNATURE_VERIFY_BUDGET),
+        checkpoint("mandate_opup"),
         
         # Verify creator signature
         Assert(Ed25519Verify(
             Sha256(message),
             signature,
-            App.globalGet(Bytes("creator_addr"))
+            config_bytes("creator_addr")
         )),
+        checkpoint("mandate_verified"),
         
         # Validate sufficient balance for initial payment
         validate_balance(total_amount),
@@ -183,7 +651,7 @@ def setup_mandate_standard():
         InnerTxnBuilder.Begin(),
         InnerTxnBuilder.SetFields({
             TxnField.type_enum: TxnType.ApplicationCall,
-            TxnField.application_id: App.globalGet(Bytes("strahn_core_app_id")),
+            TxnField.application_id: config_uint("strahn_core_app_id"),
             TxnField.application_args: [
                 Bytes("deploy_mandate"),
                 expected_approval_hash,
@@ -194,83 +662,192 @@ def setup_mandate_standard():
                 Itob(start_ts),
                 Itob(relayer_fee),
             ],
+            TxnField.applications: [Global.current_application_id()],  # Core reads usdc_id
         }),
         InnerTxnBuilder.Submit(),
+        checkpoint("mandate_deployed"),
+        register_mandate(mandate_deployed_id(InnerTxn.last_log()), dest_addr, amount,
+                         relayer_fee, start_ts, interval_sec),
+        checkpoint("mandate_registered"),
         
         # Execute initial payment
         InnerTxnBuilder.Begin(),
         InnerTxnBuilder.SetFields({
             TxnField.type_enum: TxnType.AssetTransfer,
-            TxnField.xfer_asset: App.globalGet(Bytes("usdc_id")),
+            TxnField.xfer_asset: config_uint("usdc_id"),
             TxnField.asset_receiver: dest_addr,
             TxnField.asset_amount: amount,
         }),
-        InnerTxnBuilder.Next(),
-        InnerTxnBuilder.SetFields({
-            TxnField.type_enum: TxnType.AssetTransfer,
-            TxnField.xfer_asset: App.globalGet(Bytes("usdc_id")),
-            TxnField.asset_receiver: Txn.sender(),
-            TxnField.asset_amount: relayer_fee,
-        }),
         InnerTxnBuilder.Submit(),
+        accrue_relayer_fee(Txn.sender(), relayer_fee),
         
         Log(Bytes("mandate_setup_complete")),
+        checkpoint("mandate_end"),
     ])
 
-# In strahn_pi_base.py
+@Subroutine(TealType.none)
+def setup_mandates_batch():
+    """Setup several mandates under one signature, verifying the template once"""
+    specs = Txn.application_args[1]  # Packed mandate specs, see MANDATE_SPEC_LENGTH
+    expected_approval_hash = Txn.application_args[2]
+    expected_clear_hash = Txn.application_args[3]
+    nonce = Btoi(Txn.application_args[4])
+    signature = Txn.application_args[5]
+    
+    message = Concat(
+        Bytes("MANDATE_BATCH_V1:"),
+        Itob(Global.current_application_id()),  # Domain separation
+        Itob(nonce),
+        expected_approval_hash,
+        expected_clear_hash,
+        specs
+    )
+    
+    spec_count = Len(specs) / MANDATE_SPEC_LENGTH
+    i = ScratchVar(TealType.uint64)
+    total_amount = ScratchVar(TealType.uint64)
+    total_fees = ScratchVar(TealType.uint64)
+    dest_addr = Extract(specs, i.load() * MANDATE_SPEC_LENGTH, Int(32))
+    amount = ExtractUint64(specs, i.load() * MANDATE_SPEC_LENGTH + Int(32))
+    interval_sec = ExtractUint64(specs, i.load() * MANDATE_SPEC_LENGTH + Int(40))
+    start_ts = ExtractUint64(specs, i.load() * MANDATE_SPEC_LENGTH + Int(48))
+    relayer_fee = ExtractUint64(specs, i.load() * MANDATE_SPEC_LENGTH + Int(56))
+    
+    current_nonce = App.globalGet(Bytes("creator_nonce"))
+    
+    return Seq([
+        # Input validation
+        Assert(Len(specs) % MANDATE_SPEC_LENGTH == Int(0)),  # Whole specs only
+        Assert(spec_count > Int(0)),
+        Assert(spec_count <= MAX_BATCH_MANDATES),
+        
+        # Validate every spec and sum the first payments and relayer fees
+        total_amount.store(Int(0)),
+        total_fees.store(Int(0)),
+        For(i.store(Int(0)), i.load() < spec_count, i.store(i.load() + Int(1))).Do(Seq([
+            Assert(amount > Int(0)),  # Positive amount
+            Assert(interval_sec >= Int(3600)),  # Minimum 1 hour interval
+            Assert(start_ts > Global.latest_timestamp()),  # Future start
+            # Additions fail on overflow
+            total_amount.store(total_amount.load() + amount),
+            total_fees.store(total_fees.load() + relayer_fee),
+        ])),
+        
+        # Verify nonce (a batch signature cannot be replayed)
+        Assert(nonce == current_nonce),
+        
+        # Raise our own opcode budget for the signature check and setup
+        ensure_signature_budget(MANDATE_BATCH_VERIFY_BUDGET),
+        
+        # Verify creator signature over every spec at once
+        Assert(Ed25519Verify(
+            Sha256(message),
+            signature,
+            config_bytes("creator_addr")
+        )),
+        
+        # Validate sufficient balance for all initial payments
+        validate_balance(total_amount.load() + total_fees.load()),
+        
+        # One Core call verifies the template hashes once and deploys every mandate
+        InnerTxnBuilder.Begin(),
+        InnerTxnBuilder.SetFields({
+            TxnField.type_enum: TxnType.ApplicationCall,
+            TxnField.application_id: config_uint("strahn_core_app_id"),
+            TxnField.application_args: [
+                Bytes("deploy_mandates_batch"),
+                expected_approval_hash,
+                expected_clear_hash,
+                specs,
+            ],
+            TxnField.applications: [Global.current_application_id()],  # Core reads usdc_id
+        }),
+        InnerTxnBuilder.Submit(),
+        
+        # Core logs one "mandate_deployed:" entry per spec, in order
+        For(i.store(Int(0)), i.load() < spec_count, i.store(i.load() + Int(1))).Do(
+            register_mandate(mandate_deployed_id(InnerTxn.logs[i.load()]), dest_addr, amount,
+                             relayer_fee, start_ts, interval_sec)
+        ),
+        
+        # Execute all initial payments in one inner group
+        InnerTxnBuilder.Begin(),
+        For(i.store(Int(0)), i.load() < spec_count, i.store(i.load() + Int(1))).Do(Seq([
+            If(i.load() > Int(0), InnerTxnBuilder.Next()),
+            InnerTxnBuilder.SetFields({
+                TxnField.type_enum: TxnType.AssetTransfer,
+                TxnField.xfer_asset: config_uint("usdc_id"),
+                TxnField.asset_receiver: dest_addr,
+                TxnField.asset_amount: amount,
+            }),
+        ])),
+        InnerTxnBuilder.Submit(),
+        
+        # Credit all first-payment fees to the relayer at once
+        accrue_relayer_fee(Txn.sender(), total_fees.load()),
+        
+        App.globalPut(Bytes("creator_nonce"), current_nonce + Int(1)),
+        
+        Log(Concat(
+            Bytes("mandates_batch_setup_complete:"),
+            Itob(spec_count),
+            Bytes(":nonce:"),
+            Itob(current_nonce + Int(1))
+        )),
+    ])
 
 @Subroutine(TealType.none)
 def release_mandate_funds():    
-    """Release funds for mandate payment - can only be called by created mandate contracts"""
+    """Release funds for mandate payment - can only be called by registered mandate contracts"""
     destination = Txn.application_args[1]
     amount = Btoi(Txn.application_args[2])
     relayer_fee = Btoi(Txn.application_args[3])
     relayer_addr = Txn.application_args[4]
-    # THE FIX IS HERE:
-    # Txn.sender() is the address of the calling mandate contract.
-    # Txn.applications[1] is the ID of the calling mandate contract.
-    # AppParam.creator requires the ID.
-    caller_app_id = Txn.applications[1]
-    caller_creator = AppParam.creator(caller_app_id) # Pass the uint64 ID
+    slot = Btoi(Txn.application_args[5])  # Registry slot, forwarded from the keeper
     
-    total_amount = amount + relayer_fee
+    # The calling mandate must be one this PI Base set up. Mandates are
+    # created by Core, so the registry, not the app creator, proves that.
+    caller_app_id = Global.caller_app_id()
+    terms = App.box_get(mandate_box_name(slot))
+    next_pay_ts = ExtractUint64(terms.value(), TERMS_NEXT_PAY)
     
     return Seq([
         # Input validation
-        Assert(Len(destination) == Int(32)),
-        Assert(amount > Int(0)),
-        Assert(relayer_fee >= Int(0)),
-        Assert(total_amount > amount),
         Assert(Len(relayer_addr) == Int(32)),
         
-        # Critical security check: only mandate contracts created by this PI Base can call this
-        caller_creator, # Execute the AppParam.creator call
-        Assert(caller_creator.hasValue()),
-        Assert(caller_creator.value() == Global.current_application_address()),
+        terms,
+        Assert(terms.hasValue()),
+        Assert(ExtractUint64(terms.value(), TERMS_APP_ID) == caller_app_id),
+        
+        # The mandate can only ask for the terms it was set up with
+        Assert(destination == Extract(terms.value(), TERMS_DEST, Int(32))),
+        Assert(amount == ExtractUint64(terms.value(), TERMS_AMOUNT)),
+        Assert(relayer_fee == ExtractUint64(terms.value(), TERMS_FEE)),
+        
+        # The registry schedule is authoritative. Keeper batches advance it
+        # without the mandate, so the mandate's own next_pay_ts can lag behind
+        # and only ever lets a call through to this check.
+        Assert(Global.latest_timestamp() >= next_pay_ts - MANDATE_EARLY_PAY_SEC),
         
         # Validate sufficient balance
-        validate_balance(total_amount),
+        validate_balance(amount + relayer_fee),
         
         # Execute payment to merchant
         InnerTxnBuilder.Begin(),
         InnerTxnBuilder.SetFields({
             TxnField.type_enum: TxnType.AssetTransfer,
-            TxnField.xfer_asset: App.globalGet(Bytes("usdc_id")),
+            TxnField.xfer_asset: config_uint("usdc_id"),
             TxnField.asset_receiver: destination,
             TxnField.asset_amount: amount,
         }),
-        InnerTxnBuilder.Next(),
-        
-        # Execute payment to relayer
-        InnerTxnBuilder.SetFields({
-            TxnField.type_enum: TxnType.AssetTransfer,
-            TxnField.asset_receiver: relayer_addr, # Pay the relayer fee to the Txn.sender(), which is sender of the original Mandate processing transaction
-                                                   # This is likely another bug. The fee should go to the relayer who called the mandate.
-            TxnField.xfer_asset: App.globalGet(Bytes("usdc_id")),
-            TxnField.asset_amount: relayer_fee,
-        }),
         InnerTxnBuilder.Submit(),
         
+        # Credit the fee to the relayer who processed the mandate
+        accrue_relayer_fee(relayer_addr, relayer_fee),
+        
+        # Advance the schedule and the due-time index
+        reschedule_mandate(slot, terms.value()),
+        
         Log(Concat(
             Bytes("mandate_payment_released:"),
             Itob(amount),
@@ -279,6 +856,103 @@ def release_mandate_funds():
         )),
     ])
 
+@Subroutine(TealType.none)
+def process_mandates_batch():
+    """Keeper entry point: pay every due mandate in a list with one call"""
+    slots = Txn.application_args[1]  # Packed Itob(registry slot) entries
+    
+    mandate_count = Len(slots) / Int(8)
+    i = ScratchVar(TealType.uint64)
+    slot = ScratchVar(TealType.uint64)
+    terms = ScratchVar(TealType.bytes)
+    total_amount = ScratchVar(TealType.uint64)
+    total_fees = ScratchVar(TealType.uint64)
+    registered = App.box_get(mandate_box_name(slot.load()))
+    next_pay_ts = ExtractUint64(terms.load(), TERMS_NEXT_PAY)
+    
+    return Seq([
+        # Input validation
+        Assert(Len(slots) % Int(8) == Int(0)),
+        Assert(mandate_count > Int(0)),
+        Assert(mandate_count <= MAX_KEEPER_BATCH),
+        
+        # Check every mandate is registered and due, and advance its schedule
+        total_amount.store(Int(0)),
+        total_fees.store(Int(0)),
+        For(i.store(Int(0)), i.load() < mandate_count, i.store(i.load() + Int(1))).Do(Seq([
+            slot.store(ExtractUint64(slots, i.load() * Int(8))),
+            # Slots must be strictly ascending, so no mandate is listed twice.
+            # An overdue mandate would otherwise still be due after one reschedule.
+            If(i.load() > Int(0)).Then(
+                Assert(slot.load() > ExtractUint64(slots, (i.load() - Int(1)) * Int(8)))
+            ),
+            registered,
+            Assert(registered.hasValue()),
+            terms.store(registered.value()),
+            Assert(Global.latest_timestamp() >= next_pay_ts - MANDATE_EARLY_PAY_SEC),
+            
+            total_amount.store(total_amount.load() + ExtractUint64(terms.load(), TERMS_AMOUNT)),
+            total_fees.store(total_fees.load() + ExtractUint64(terms.load(), TERMS_FEE)),
+            
+            # Only the registry schedule advances here, not the mandate's own
+            # next_pay_ts (see release_mandate_funds)
+            reschedule_mandate(slot.load(), terms.load()),
+        ])),
+        
+        # Validate sufficient balance for the whole batch
+        validate_balance(total_amount.load() + total_fees.load()),
+        
+        # Execute every payment in one inner group
+        InnerTxnBuilder.Begin(),
+        For(i.store(Int(0)), i.load() < mandate_count, i.store(i.load() + Int(1))).Do(Seq([
+            slot.store(ExtractUint64(slots, i.load() * Int(8))),
+            registered,
+            If(i.load() > Int(0), InnerTxnBuilder.Next()),
+            InnerTxnBuilder.SetFields({
+                TxnField.type_enum: TxnType.AssetTransfer,
+                TxnField.xfer_asset: config_uint("usdc_id"),
+                TxnField.asset_receiver: Extract(registered.value(), TERMS_DEST, Int(32)),
+                TxnField.asset_amount: ExtractUint64(registered.value(), TERMS_AMOUNT),
+            }),
+        ])),
+        InnerTxnBuilder.Submit(),
+        
+        # The keeper is the relayer for every mandate in the batch
+        accrue_relayer_fee(Txn.sender(), total_fees.load()),
+        
+        Log(Concat(
+            Bytes("mandates_batch_processed:"),
+            Itob(mandate_count),
+            Bytes(":total:"),
+            Itob(total_amount.load())
+        )),
+    ])
+
+@Subroutine(TealType.none)
+def cancel_mandate():
+    """Stop paying a mandate: drop its registry entry and due-time index entry - creator only"""
+    slot = Btoi(Txn.application_args[1])
+    terms = App.box_get(mandate_box_name(slot))
+    
+    return Seq([
+        Assert(is_creator()),
+        
+        terms,
+        Assert(terms.hasValue()),
+        
+        # Without the registry entry neither keeper batches nor the mandate's
+        # own release_mandate_funds call can pay it again
+        index_remove(terms.value()),
+        Pop(App.box_delete(mandate_box_name(slot))),
+        
+        Log(Concat(
+            Bytes("mandate_cancelled:"),
+            Itob(slot),
+            Bytes(":app:"),
+            Itob(ExtractUint64(terms.value(), TERMS_APP_ID))
+        )),
+    ])
+
 def strahn_pi_base_approval():
     """Strahn PI Base approval program"""
     
@@ -290,9 +964,18 @@ def strahn_pi_base_approval():
         Cond(
             [method == Bytes("app_optin_usdc"), app_optin_usdc()],
             [method == Bytes("deposit_usdc"), deposit_usdc()],
+            [method == Bytes("deposit_usdc_batch"), deposit_usdc_batch()],
             [method == Bytes("process_intent"), process_intent()],
+            [method == Bytes("process_split_intent"), process_split_intent()],
+            [method == Bytes("grant_allowance"), grant_allowance()],
+            [method == Bytes("revoke_allowance"), revoke_allowance()],
+            [method == Bytes("process_allowance_intent"), process_allowance_intent()],
             [method == Bytes("setup_mandate_standard"), setup_mandate_standard()],
+            [method == Bytes("setup_mandates_batch"), setup_mandates_batch()],
             [method == Bytes("release_mandate_funds"), release_mandate_funds()],
+            [method == Bytes("process_mandates_batch"), process_mandates_batch()],
+            [method == Bytes("cancel_mandate"), cancel_mandate()],
+            [method == Bytes("claim_relayer_fees"), claim_relayer_fees()],
         ),
         
         Approve(),
@@ -305,10 +988,19 @@ def strahn_pi_base_approval():
         Assert(Btoi(Txn.application_args[1]) > Int(0)),   # Valid USDC asset ID
         Assert(Btoi(Txn.application_args[2]) > Int(0)),   # Valid core app ID
         
+        # Templated builds bake these in; the globals stay readable by Core and clients
+        assert_config_args([
+            ("creator_addr", Txn.application_args[0]),
+            ("usdc_id", Btoi(Txn.application_args[1])),
+            ("strahn_core_app_id", Btoi(Txn.application_args[2])),
+        ]),
+        
         App.globalPut(Bytes("creator_addr"), Txn.application_args[0]),
         App.globalPut(Bytes("usdc_id"), Btoi(Txn.application_args[1])),
         App.globalPut(Bytes("strahn_core_app_id"), Btoi(Txn.application_args[2])),
         App.globalPut(Bytes("creator_nonce"), Int(0)),
+        App.globalPut(Bytes("fees_owed"), Int(0)),
+        App.globalPut(Bytes("mandate_count"), Int(0)),
         Approve(),
     ])
     
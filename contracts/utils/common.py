@@ -1,3 +1,5 @@
+import os
+
 from pyteal import *
 
 # Common constants
@@ -9,12 +11,60 @@ ADDRESS_LENGTH = Int(32)
 MIN_INTERVAL_SEC = Int(3600)    # 1 hour minimum
 MAX_INTERVAL_SEC = Int(31536000)  # 1 year maximum
 TIMESTAMP_TOLERANCE = Int(300)   # 5 minutes tolerance for mandate payments
+MANDATE_EARLY_PAY_SEC = Int(60)  # Mandate payments may run this early
 MAX_TIMESTAMP = Int(4102444800)  # Year 2100 (reasonable max)
 
 # Size limits
 MAX_BYTECODE_SIZE = Int(8192)   # 8KB max for approval program
 MAX_CLEAR_SIZE = Int(1024)      # 1KB max for clear program
 
+# Split payments: packed (address, uint64 amount) entries. Inner asset transfer
+# receivers must be in the calling transaction's accounts array (at most 4).
+SPLIT_ENTRY_LENGTH = Int(40)
+MAX_SPLIT_PAYEES = Int(4)
+
+# Batch mandate setup: packed specs of dest_addr (32) | amount | interval_sec |
+# start_ts | relayer_fee (uint64 each). Each first payment needs its receiver
+# in the accounts array, so the same limit of 4 applies.
+MANDATE_SPEC_LENGTH = Int(64)
+MAX_BATCH_MANDATES = Int(4)
+
+# Global uints of a mandate created from Core's template. mandate_record keeps
+# six; mandate_record_packed keeps its terms in its single byte slice. Core's
+# template_packed global, recorded by set_version with each template, selects
+# which schema deployments use.
+MANDATE_NUM_UINTS = Int(6)
+PACKED_MANDATE_NUM_UINTS = Int(0)
+
+# Mandate templates may use extra program pages. Approval and clear programs
+# together fit in 4 pages of 2048 bytes; Core reads and hashes the approval
+# box in slices of at most 4096 bytes, the largest stack value.
+PROGRAM_PAGE_SIZE = Int(2048)
+MAX_TEMPLATE_SIZE = Int(8192)
+TEMPLATE_SLICE_SIZE = Int(4096)
+
+# Keeper batches: one inner transfer per mandate in a single inner group. At
+# v8 a call references at most 4 accounts, and every receiver must be one.
+MAX_KEEPER_BATCH = Int(4)
+
+# Batch deposits: the app call closes a group of up to 15 USDC transfers
+MAX_GROUP_SIZE = Int(16)
+
+# Due-time index: mandates are listed in hourly buckets by next payment time.
+# A bucket box holds a live count and up to 127 entries, 1024 bytes in all, so
+# touching one costs a single box reference; a full bucket spills into the next.
+DUE_BUCKET_SEC = Int(3600)
+DUE_BUCKET_MAX_BYTES = Int(1024)
+
+# Opcode budget
+# Sha256 (35) + Ed25519Verify (1900) plus the message and payment logic around them
+# (up to 2090 still needs at most 3 op-up calls)
+SIGNATURE_VERIFY_BUDGET = Int(2090)
+# Split intents also pay out every payee after the check
+SPLIT_VERIFY_BUDGET = Int(2250)
+# Batch mandate setup also registers and pays every mandate after the check
+MANDATE_BATCH_VERIFY_BUDGET = Int(2450)
+
 # Common validation functions
 @Subroutine(TealType.uint64)
 def validate_signature_length(signature: Expr):
@@ -65,6 +115,64 @@ def check_overflow_add(a: Expr, b: Expr):
     """Check if addition would overflow"""
     return a + b > a
 
+@Subroutine(TealType.none)
+def ensure_signature_budget(required_budget: Expr):
+    """Raise the opcode budget with inner op-up calls before signature verification"""
+    # OnCall op-ups create and delete a one-line app per 700 budget; their fees
+    # come from the outer group's fee credit, never from the app account.
+    return OpUp(OpUpMode.OnCall).ensure_budget(
+        required_budget,
+        fee_source=OpUpFeeSource.GroupCredit
+    )
+
+# Immutable configuration. Built with STRAHN_TEMPLATE_CONFIG=1, values that
+# are fixed at creation compile to TEAL template variables (TMPL_<KEY>) that
+# scripts/template_config.py fills in per instance, instead of global reads.
+# The mode is read when a program is first compiled in the process.
+TEMPLATE_CONFIG_ENV = "STRAHN_TEMPLATE_CONFIG"
+
+def template_config() -> bool:
+    """Whether immutable configuration compiles to template variables"""
+    return os.environ.get(TEMPLATE_CONFIG_ENV) == "1"
+
+def config_uint(key: str) -> Expr:
+    """Immutable uint64 configuration value, e.g. usdc_id"""
+    if template_config():
+        return Tmpl.Int("TMPL_" + key.upper())
+    return App.globalGet(Bytes(key))
+
+def config_bytes(key: str) -> Expr:
+    """Immutable byte-slice configuration value, e.g. creator_addr"""
+    if template_config():
+        return Tmpl.Bytes("TMPL_" + key.upper())
+    return App.globalGet(Bytes(key))
+
+def assert_config_args(values) -> Expr:
+    """Check (key, creation argument) pairs against the baked-in values of a templated build"""
+    if not template_config():
+        return Seq()
+    return Seq([
+        Assert(value == (config_bytes(key) if value.type_of() == TealType.bytes else config_uint(key)))
+        for key, value in values
+    ])
+
+# Budget checkpoints. Built with STRAHN_BUDGET_CHECKPOINTS=1, named points in
+# the costly paths log "budget:<name>:" + Itob(Global.opcode_budget()) so
+# scripts/budget_profile.py can turn a debug deploy's logs into per-section
+# costs. Production builds compile them to nothing.
+BUDGET_CHECKPOINTS_ENV = "STRAHN_BUDGET_CHECKPOINTS"
+BUDGET_CHECKPOINT_PREFIX = "budget:"
+
+def budget_checkpoints() -> bool:
+    """Whether programs log their remaining opcode budget at checkpoints"""
+    return os.environ.get(BUDGET_CHECKPOINTS_ENV) == "1"
+
+def checkpoint(name: str) -> Expr:
+    """Log the remaining opcode budget at a named point in a debug build"""
+    if not budget_checkpoints():
+        return Seq()
+    return Log(Concat(Bytes(BUDGET_CHECKPOINT_PREFIX + name + ":"), Itob(Global.opcode_budget())))
+
 # Error handling constants
 ERROR_INVALID_SIGNATURE = Bytes("INVALID_SIGNATURE")
 ERROR_INVALID_NONCE = Bytes("INVALID_NONCE")
@@ -0,0 +1,932 @@
+#!/usr/bin/env python3
+"""
+In-memory algod stand-in for offline end-to-end runs
+
+Serves the algod v2 REST endpoints the scripts use (suggested params,
+transaction submission, pending transaction info, status and
+wait-for-block, account, application and box reads, TEAL compilation) from
+an in-memory ledger, so AlgodClient("", "http://localhost:4001") works with
+no network.
+
+The ledger keeps ALGO and ASA balances, rounds and block timestamps. Apps
+created from TEAL registered with register_teal(), or compiled through
+/v2/teal/compile, run their programs in the TEAL evaluator (teal_eval.py);
+the others are driven by Python models of their contracts (APP_MODELS),
+which mirror the on-chain checks and effects of the methods they implement,
+and a call to anything else is rejected. A submitted group is evaluated and
+applied atomically, then confirmed at the next block. With --block-time 0
+every group gets its own block at once. Groups can also be simulated
+(/v2/transactions/simulate) without being applied.
+
+Snapshots hold the whole ledger as JSON, so load tests can start from a fixed
+baseline: build one with the Ledger API (fund, create_asset, create_app),
+save_snapshot() it and serve it with --snapshot.
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import msgpack
+import nacl.exceptions
+import nacl.signing
+from algosdk import encoding, logic, transaction
+from algosdk.logic import get_application_address
+
+from teal_eval import OPUP_PROGRAM, OPUP_SOURCE, GroupEvaluation, LogicError, program
+
+GENESIS_ID = "strahn-standin-v1"
+GENESIS_HASH = base64.b64encode(hashlib.sha256(GENESIS_ID.encode()).digest()).decode()
+CONSENSUS_VERSION = "future"
+
+MIN_TXN_FEE = 1000
+MIN_BALANCE = 100_000         # per account, and per asset holding
+BOX_FLAT_MIN_BALANCE = 2500   # plus BOX_BYTE_MIN_BALANCE per name and value byte
+BOX_BYTE_MIN_BALANCE = 400
+MAX_GROUP_SIZE = 16
+WAIT_FOR_BLOCK_TIMEOUT = 60   # seconds, as algod's wait-for-block-after
+MAX_PENDING_INFO = 100_000    # transaction results kept for pending_transaction_info
+
+# PI Base mandate constants (mirror contracts/utils/common.py and strahn_pi_base.py;
+# tests/test_planners.py checks them)
+MANDATE_EARLY_PAY_SEC = 60
+MAX_KEEPER_BATCH = 4
+DUE_BUCKET_SEC = 3600
+DUE_BUCKET_MAX_BYTES = 1024
+TERMS_NEXT_PAY = 56
+TERMS_DUE_BUCKET = 72
+
+_MISSING = object()
+
+
+class Rejected(Exception):
+    """A transaction or group the ledger refuses; nothing of the group is applied"""
+
+
+class Journal:
+    """Undo log of dict writes, so a failed group leaves no trace"""
+
+    def __init__(self):
+        self.entries = []
+
+    def set(self, container, key, value):
+        self.entries.append((container, key, container.get(key, _MISSING)))
+        container[key] = value
+
+    def delete(self, container, key):
+        self.entries.append((container, key, container.get(key, _MISSING)))
+        container.pop(key, None)
+
+    def rollback(self):
+        for container, key, old in reversed(self.entries):
+            if old is _MISSING:
+                container.pop(key, None)
+            else:
+                container[key] = old
+        self.entries = []
+
+
+def mandate_box_name(slot):
+    return b"mandate:" + slot.to_bytes(8, "big")
+
+
+def due_box_name(bucket):
+    return b"due:" + bucket.to_bytes(8, "big")
+
+
+class PiBaseModel:
+    """Strahn PI Base (strahn_pi_base.py) single-user methods"""
+
+    INTENT_INNER_TXNS = 4  # the merchant transfer and 3 worst-case op-ups
+
+    @staticmethod
+    def create(ledger, app_id, txn):
+        args = txn.app_args
+        if len(args) < 3 or len(args[0]) != 32 or int.from_bytes(args[1], "big") <= 0 \
+                or int.from_bytes(args[2], "big") <= 0:
+            raise Rejected("invalid PI Base creation arguments")
+        return {
+            b"creator_addr": args[0],
+            b"usdc_id": int.from_bytes(args[1], "big"),
+            b"strahn_core_app_id": int.from_bytes(args[2], "big"),
+            b"creator_nonce": 0,
+            b"fees_owed": 0,
+            b"mandate_count": 0,
+        }
+
+    def call(self, ledger, app_id, group, index):
+        """Run one NoOp call; returns (logs, inner transaction count)"""
+        txn = group[index].transaction
+        method = txn.app_args[0] if txn.app_args else b""
+        handler = getattr(self, "method_" + method.decode(errors="replace"), None)
+        if handler is None:
+            raise Rejected(f"PI Base method {method!r} is not modelled")
+        return handler(ledger, app_id, group, index, txn)
+
+    @staticmethod
+    def preceding_deposit(ledger, app_id, group, index, usdc_id, owner=None):
+        """The USDC transfer just before the call, from its sender (or owner, if given)"""
+        if index == 0:
+            return None
+        prev = group[index - 1].transaction
+        if (isinstance(prev, transaction.AssetTransferTxn) and prev.index == usdc_id
+                and prev.receiver == get_application_address(app_id) and prev.amount > 0
+                and prev.sender in (group[index].transaction.sender, owner)):
+            return prev
+        return None
+
+    @staticmethod
+    def deposit_log(deposit):
+        return b"usdc_deposited:" + deposit.amount.to_bytes(8, "big") + b":from:" + encoding.decode_address(deposit.sender)
+
+    @staticmethod
+    def accrue_relayer_fee(ledger, app_id, relayer, fee):
+        if fee:
+            fee_box = b"fee:" + encoding.decode_address(relayer)
+            accrued = int.from_bytes(ledger.box_get(app_id, fee_box) or b"", "big")
+            ledger.box_put(app_id, fee_box, (accrued + fee).to_bytes(8, "big"))
+            ledger.global_put(app_id, b"fees_owed", ledger.global_get(app_id, b"fees_owed") + fee)
+
+    # --- Mandate registry and due-time index (see strahn_pi_base.py) ---
+
+    @staticmethod
+    def index_insert(ledger, app_id, slot, next_pay_ts):
+        bucket = next_pay_ts // DUE_BUCKET_SEC
+        while len(ledger.box_get(app_id, due_box_name(bucket)) or b"") >= DUE_BUCKET_MAX_BYTES:
+            bucket += 1
+        current = ledger.box_get(app_id, due_box_name(bucket)) or bytes(8)
+        ledger.box_put(app_id, due_box_name(bucket), b"".join([
+            (int.from_bytes(current[:8], "big") + 1).to_bytes(8, "big"), current[8:], (slot + 1).to_bytes(8, "big")
+        ]))
+        terms = ledger.box_get(app_id, mandate_box_name(slot))
+        position = (len(current) - 8) // 8
+        ledger.box_put(app_id, mandate_box_name(slot),
+                       terms[:TERMS_DUE_BUCKET] + bucket.to_bytes(8, "big") + position.to_bytes(8, "big"))
+
+    @staticmethod
+    def index_remove(ledger, app_id, terms):
+        name = due_box_name(int.from_bytes(terms[TERMS_DUE_BUCKET:TERMS_DUE_BUCKET + 8], "big"))
+        entries = ledger.box_get(app_id, name)
+        if entries is None:
+            raise Rejected("due-time index entry missing")
+        live = int.from_bytes(entries[:8], "big") - 1
+        if live == 0:
+            ledger.box_delete(app_id, name)
+        else:
+            offset = 8 + int.from_bytes(terms[TERMS_DUE_BUCKET + 8:], "big") * 8
+            ledger.box_put(app_id, name, live.to_bytes(8, "big") + entries[8:offset] + bytes(8) + entries[offset + 8:])
+
+    def register_mandate(self, ledger, app_id, mandate_id, destination, amount, relayer_fee,
+                         next_pay_ts, interval_sec):
+        """Record a mandate in the next registry slot, as setup does; returns the slot"""
+        slot = ledger.global_get(app_id, b"mandate_count")
+        ledger.box_put(app_id, mandate_box_name(slot), b"".join([
+            mandate_id.to_bytes(8, "big"), destination, amount.to_bytes(8, "big"), relayer_fee.to_bytes(8, "big"),
+            next_pay_ts.to_bytes(8, "big"), interval_sec.to_bytes(8, "big"), bytes(16),
+        ]))
+        self.index_insert(ledger, app_id, slot, next_pay_ts)
+        ledger.global_put(app_id, b"mandate_count", slot + 1)
+        return slot
+
+    def method_process_mandates_batch(self, ledger, app_id, group, index, txn):
+        slots = txn.app_args[1] if len(txn.app_args) > 1 else b""
+        count = len(slots) // 8
+        if len(slots) % 8 or not 0 < count <= MAX_KEEPER_BATCH:
+            raise Rejected("invalid mandate slot list")
+
+        payments = []
+        total_fees = 0
+        for i in range(count):
+            slot = int.from_bytes(slots[i * 8:i * 8 + 8], "big")
+            if i and slot <= int.from_bytes(slots[i * 8 - 8:i * 8], "big"):
+                raise Rejected("mandate slots must be strictly ascending")
+            terms = ledger.box_get(app_id, mandate_box_name(slot))
+            if terms is None:
+                raise Rejected(f"mandate slot {slot} is not registered")
+            next_pay_ts = int.from_bytes(terms[TERMS_NEXT_PAY:TERMS_NEXT_PAY + 8], "big")
+            if ledger.timestamp < next_pay_ts - MANDATE_EARLY_PAY_SEC:
+                raise Rejected(f"mandate slot {slot} is not due")
+            payments.append((terms[8:40], int.from_bytes(terms[40:48], "big")))
+            total_fees += int.from_bytes(terms[48:56], "big")
+
+            # Advance the schedule and move the mandate to its new bucket
+            self.index_remove(ledger, app_id, terms)
+            next_pay_ts += int.from_bytes(terms[TERMS_NEXT_PAY + 8:TERMS_NEXT_PAY + 16], "big")
+            ledger.box_put(app_id, mandate_box_name(slot),
+                           terms[:TERMS_NEXT_PAY] + next_pay_ts.to_bytes(8, "big") + terms[TERMS_NEXT_PAY + 8:])
+            self.index_insert(ledger, app_id, slot, next_pay_ts)
+
+        usdc_id = ledger.global_get(app_id, b"usdc_id")
+        app_address = get_application_address(app_id)
+        total_amount = sum(amount for _, amount in payments)
+        if ledger.holding(app_address, usdc_id) < total_amount + total_fees + ledger.global_get(app_id, b"fees_owed"):
+            raise Rejected("insufficient USDC balance")
+        for destination, amount in payments:
+            ledger.transfer_asset(app_address, encoding.encode_address(destination), usdc_id, amount)
+        self.accrue_relayer_fee(ledger, app_id, txn.sender, total_fees)
+        return [b"mandates_batch_processed:" + count.to_bytes(8, "big") + b":total:"
+                + total_amount.to_bytes(8, "big")], count
+
+    def method_app_optin_usdc(self, ledger, app_id, group, index, txn):
+        if encoding.decode_address(txn.sender) != ledger.global_get(app_id, b"creator_addr"):
+            raise Rejected("only the creator may opt in")
+        ledger.opt_in(get_application_address(app_id), ledger.global_get(app_id, b"usdc_id"))
+        return [b"usdc_optin_complete"], 1
+
+    def method_deposit_usdc(self, ledger, app_id, group, index, txn):
+        usdc_id = ledger.global_get(app_id, b"usdc_id")
+        deposit = self.preceding_deposit(ledger, app_id, group, index, usdc_id)
+        if len(group) != 2 or index != 1 or deposit is None:
+            raise Rejected("deposit_usdc needs a preceding USDC transfer from the sender")
+        return [self.deposit_log(deposit)], 0
+
+    def method_process_intent(self, ledger, app_id, group, index, txn):
+        args = txn.app_args
+        if len(args) != 6 or len(args[1]) != 32 or len(args[5]) != 64:
+            raise Rejected("malformed process_intent arguments")
+        destination, signature = args[1], args[5]
+        amount, relayer_fee, nonce = (int.from_bytes(a, "big") for a in args[2:5])
+        if amount <= 0 or amount + relayer_fee >= 2 ** 64:
+            raise Rejected("invalid amount")
+        if nonce != ledger.global_get(app_id, b"creator_nonce"):
+            raise Rejected("invalid nonce")
+
+        usdc_id = ledger.global_get(app_id, b"usdc_id")
+        logs = []
+        creator = encoding.encode_address(ledger.global_get(app_id, b"creator_addr"))
+        top_up = self.preceding_deposit(ledger, app_id, group, index, usdc_id, creator)
+        if top_up is not None:
+            logs.append(self.deposit_log(top_up))
+
+        message = b"".join([b"SPP_V1:", app_id.to_bytes(8, "big"), nonce.to_bytes(8, "big"),
+                            destination, amount.to_bytes(8, "big"), relayer_fee.to_bytes(8, "big")])
+        try:
+            nacl.signing.VerifyKey(ledger.global_get(app_id, b"creator_addr")).verify(
+                hashlib.sha256(message).digest(), signature)
+        except nacl.exceptions.BadSignatureError:
+            raise Rejected("signature verification failed")
+
+        app_address = get_application_address(app_id)
+        fees_owed = ledger.global_get(app_id, b"fees_owed")
+        if ledger.holding(app_address, usdc_id) < amount + relayer_fee + fees_owed:
+            raise Rejected("insufficient USDC balance")
+        ledger.transfer_asset(app_address, encoding.encode_address(destination), usdc_id, amount)
+
+        self.accrue_relayer_fee(ledger, app_id, txn.sender, relayer_fee)
+        ledger.global_put(app_id, b"creator_nonce", nonce + 1)
+        logs.append(b"payment_processed:" + amount.to_bytes(8, "big") + b":nonce:" + (nonce + 1).to_bytes(8, "big"))
+        return logs, self.INTENT_INNER_TXNS
+
+    def method_claim_relayer_fees(self, ledger, app_id, group, index, txn):
+        fee_box = b"fee:" + encoding.decode_address(txn.sender)
+        accrued = ledger.box_get(app_id, fee_box)
+        if accrued is None:
+            raise Rejected("no accrued fees")
+        claimed = int.from_bytes(accrued, "big")
+        ledger.box_delete(app_id, fee_box)
+        ledger.global_put(app_id, b"fees_owed", ledger.global_get(app_id, b"fees_owed") - claimed)
+        ledger.transfer_asset(get_application_address(app_id), txn.sender,
+                              ledger.global_get(app_id, b"usdc_id"), claimed)
+        return [b"relayer_fees_claimed:" + claimed.to_bytes(8, "big")], 1
+
+
+class OpUpModel:
+    """Approve-only app: the target of budget padding calls, which carry spare references"""
+
+    @staticmethod
+    def create(ledger, app_id, txn):
+        return {}
+
+    def call(self, ledger, app_id, group, index):
+        return [], 0
+
+
+# Contract models by name; apps created from a registered program use its model
+APP_MODELS = {
+    "strahn_pi_base": PiBaseModel,
+    "opup": OpUpModel,
+}
+
+
+class Ledger:
+    """Accounts, assets, applications and rounds of the stand-in network"""
+
+    def __init__(self, block_time=0.0, start_round=1000):
+        self.block_time = block_time
+        self.round = start_round
+        self.timestamp = int(time.time())
+        self.next_id = 1001
+        self.accounts = {}   # address -> {"amount": int, "assets": {asset_id: amount}}
+        self.assets = {}     # asset_id -> params
+        self.apps = {}       # app_id -> {"creator", "model", "global": {}, "boxes": {}, programs}
+        self.programs = {}   # SHA-256 of an approval program -> model name
+        self.teal = {hashlib.sha256(OPUP_PROGRAM).hexdigest(): OPUP_SOURCE}  # SHA-256 of a program -> TEAL
+        self.evaluation = None  # TEAL evaluation state of the group being applied
+        self.results = OrderedDict()  # txid -> pending transaction info
+        self.unconfirmed = []
+        self.lock = threading.Condition()
+        self.journal = Journal()
+        self.models = {name: model() for name, model in APP_MODELS.items()}
+
+    # --- State access (writes are journaled while a group runs) ---
+
+    def account(self, address):
+        if address not in self.accounts:
+            self.journal.set(self.accounts, address, {"amount": 0, "assets": {}})
+        return self.accounts[address]
+
+    def min_balance(self, address):
+        info = self.accounts.get(address, {"amount": 0, "assets": {}})
+        needed = MIN_BALANCE * (1 + len(info["assets"]))
+        for app_id, app in self.apps.items():
+            if get_application_address(app_id) == address:
+                needed += sum(BOX_FLAT_MIN_BALANCE + BOX_BYTE_MIN_BALANCE * (len(name) + len(value))
+                              for name, value in app["boxes"].items())
+        return needed
+
+    def move_algo(self, sender, receiver, amount):
+        source = self.account(sender)
+        if source["amount"] < amount:
+            raise Rejected(f"{sender} has too little ALGO")
+        self.journal.set(source, "amount", source["amount"] - amount)
+        target = self.account(receiver)
+        self.journal.set(target, "amount", target["amount"] + amount)
+
+    def holding(self, address, asset_id):
+        """Asset balance, or -1 if the account has not opted in"""
+        return self.accounts.get(address, {"assets": {}})["assets"].get(asset_id, -1)
+
+    def opt_in(self, address, asset_id):
+        if asset_id not in self.assets:
+            raise Rejected(f"asset {asset_id} does not exist")
+        assets = self.account(address)["assets"]
+        if asset_id not in assets:
+            self.journal.set(assets, asset_id, 0)
+
+    def transfer_asset(self, sender, receiver, asset_id, amount):
+        if self.holding(sender, asset_id) < amount or self.holding(sender, asset_id) < 0:
+            raise Rejected(f"{sender} has too little of asset {asset_id}")
+        if self.holding(receiver, asset_id) < 0:
+            raise Rejected(f"{receiver} is not opted in to asset {asset_id}")
+        sender_assets = self.accounts[sender]["assets"]
+        self.journal.set(sender_assets, asset_id, sender_assets[asset_id] - amount)
+        receiver_assets = self.accounts[receiver]["assets"]
+        self.journal.set(receiver_assets, asset_id, receiver_assets[asset_id] + amount)
+
+    def global_get(self, app_id, key):
+        return self.apps[app_id]["global"].get(key, 0)
+
+    def global_put(self, app_id, key, value):
+        self.journal.set(self.apps[app_id]["global"], key, value)
+
+    def box_get(self, app_id, name):
+        return self.apps[app_id]["boxes"].get(name)
+
+    def box_put(self, app_id, name, value):
+        self.journal.set(self.apps[app_id]["boxes"], name, value)
+
+    def box_delete(self, app_id, name):
+        self.journal.delete(self.apps[app_id]["boxes"], name)
+
+    def new_id(self):
+        self.next_id += 1
+        return self.next_id - 1
+
+    # --- Seeding ---
+
+    def fund(self, address, microalgos=0, assets=None):
+        """Credit ALGO and opt in to, and credit, assets: {asset_id: amount}"""
+        with self.lock:
+            account = self.account(address)
+            account["amount"] += microalgos
+            for asset_id, amount in (assets or {}).items():
+                account["assets"][asset_id] = account["assets"].get(asset_id, 0) + amount
+            self.journal.entries = []
+
+    def create_asset(self, creator, total, decimals=6, unit_name="USDC", name="USD Coin"):
+        """Create an asset held entirely by its creator; returns its id"""
+        with self.lock:
+            asset_id = self.new_id()
+            self.assets[asset_id] = {"creator": creator, "total": total, "decimals": decimals,
+                                     "unit-name": unit_name, "name": name}
+            self.account(creator)["assets"][asset_id] = total
+            self.journal.entries = []
+            return asset_id
+
+    def add_mandate(self, app_id, destination, amount, relayer_fee, next_pay_ts, interval_sec):
+        """
+        Register a mandate on a PI Base as a completed setup would; returns its slot.
+
+        Mandate setup deploys the mandate through Core, which is not modelled,
+        so seeded mandates get an app id but no app. They are paid through
+        process_mandates_batch.
+        """
+        with self.lock:
+            slot = self.models[self.apps[app_id]["model"]].register_mandate(
+                self, app_id, self.new_id(), encoding.decode_address(destination), amount, relayer_fee,
+                next_pay_ts, interval_sec)
+            self.journal.entries = []
+            return slot
+
+    def register_program(self, model, approval_program):
+        """Use a model for apps created from this approval program"""
+        if model not in self.models:
+            raise ValueError(f"No model named {model}")
+        self.programs[hashlib.sha256(approval_program).hexdigest()] = model
+
+    def register_teal(self, source, image=None):
+        """
+        Run apps created from this program image as TEAL source; returns the image.
+
+        The image defaults to the source itself; an OpUp app's one-line
+        program is registered already.
+        """
+        image = source.encode() if image is None else image
+        self.teal[hashlib.sha256(image).hexdigest()] = source
+        return image
+
+    def compile(self, source):
+        """
+        Assemble TEAL as algod's compile endpoint; the image is the source
+        itself, registered to run in the evaluator
+        """
+        try:
+            program(source)
+        except (LogicError, ValueError) as e:
+            raise Rejected(f"compile error: {e}")
+        image = self.register_teal(source)
+        return {"hash": logic.address(image), "result": base64.b64encode(image).decode()}
+
+    def teal_source(self, image):
+        return self.teal.get(hashlib.sha256(image).hexdigest())
+
+    def create_app(self, model, creator, app_args):
+        """Create an app of a model directly, as its creation call would; returns its id"""
+        with self.lock:
+            txn = transaction.ApplicationCallTxn(creator, self.suggested_params(), 0,
+                                                 transaction.OnComplete.NoOpOC, app_args=app_args)
+            app_id = self.new_id()
+            self.apps[app_id] = {"creator": creator, "model": model, "approval": b"", "clear": b"",
+                                 "global": self.models[model].create(self, app_id, txn), "boxes": {}}
+            self.account(get_application_address(app_id))
+            self.journal.entries = []
+            return app_id
+
+    # --- Transactions ---
+
+    def suggested_params(self):
+        return transaction.SuggestedParams(0, self.round, self.round + 1000, GENESIS_HASH, GENESIS_ID,
+                                           flat_fee=False, consensus_version=CONSENSUS_VERSION,
+                                           min_fee=MIN_TXN_FEE)
+
+    def verify_signature(self, stxn):
+        if not isinstance(stxn, transaction.SignedTransaction) or stxn.signature is None:
+            raise Rejected("only single-signature transactions are supported")
+        signer = stxn.authorizing_address or stxn.transaction.sender
+        message = b"TX" + base64.b64decode(encoding.msgpack_encode(stxn.transaction))
+        try:
+            nacl.signing.VerifyKey(encoding.decode_address(signer)).verify(
+                message, base64.b64decode(stxn.signature))
+        except nacl.exceptions.BadSignatureError:
+            raise Rejected(f"transaction {stxn.get_txid()}: invalid signature")
+
+    def check_group(self, group):
+        if not 0 < len(group) <= MAX_GROUP_SIZE:
+            raise Rejected(f"group of {len(group)} transactions")
+        txns = [stxn.transaction for stxn in group]
+        if len(group) > 1:
+            unsigned = [transaction.Transaction.undictify(txn.dictify()) for txn in txns]
+            for txn in unsigned:
+                txn.group = None
+            if any(txn.group != transaction.calculate_group_id(unsigned) for txn in txns):
+                raise Rejected("group id does not match the group")
+        for txn in txns:
+            if txn.genesis_hash != GENESIS_HASH:
+                raise Rejected("wrong genesis hash")
+            if not txn.first_valid_round <= self.round + 1 <= txn.last_valid_round:
+                raise Rejected(f"transaction {txn.get_txid()} is outside its validity window")
+            if txn.get_txid() in self.results:
+                raise Rejected(f"transaction {txn.get_txid()} already in ledger")
+
+    def apply_txn(self, group, index):
+        """Apply one transaction; returns (result fields, inner transaction count)"""
+        txn = group[index].transaction
+        fee_payer = self.account(txn.sender)
+        if fee_payer["amount"] < txn.fee:
+            raise Rejected(f"{txn.sender} cannot pay its fee")
+        self.journal.set(fee_payer, "amount", fee_payer["amount"] - txn.fee)
+
+        if isinstance(txn, transaction.PaymentTxn):
+            self.move_algo(txn.sender, txn.receiver, txn.amt)
+            return {}, 0
+        if isinstance(txn, transaction.AssetTransferTxn):
+            if txn.amount == 0 and txn.sender == txn.receiver:
+                self.opt_in(txn.sender, txn.index)
+            else:
+                self.transfer_asset(txn.sender, txn.receiver, txn.index, txn.amount)
+            return {}, 0
+        if isinstance(txn, transaction.ApplicationCallTxn):
+            return self.apply_app_call(group, index)
+        raise Rejected(f"{type(txn).__name__} is not supported")
+
+    def apply_app_call(self, group, index):
+        txn = group[index].transaction
+        app = self.apps.get(txn.index)
+        if (txn.index == 0 and self.teal_source(txn.approval_program or b"") is not None) \
+                or (app is not None and app["model"] is None):
+            return self.apply_teal_call(group, index)
+        if txn.index == 0:
+            approval = txn.approval_program or b""
+            model = self.programs.get(hashlib.sha256(approval).hexdigest())
+            if model is None:
+                raise Rejected("no model registered for this approval program")
+            app_id = self.new_id()
+            self.journal.set(self.apps, app_id, {
+                "creator": txn.sender, "model": model, "approval": approval,
+                "clear": txn.clear_program or b"", "global": self.models[model].create(self, app_id, txn),
+                "boxes": {},
+            })
+            self.account(get_application_address(app_id))
+            return {"application-index": app_id}, 0
+
+        if app is None:
+            raise Rejected(f"application {txn.index} does not exist")
+        if txn.on_complete != transaction.OnComplete.NoOpOC:
+            raise Rejected("only NoOp calls are modelled")
+        logs, inner = self.models[app["model"]].call(self, txn.index, group, index)
+        return {"logs": [base64.b64encode(log).decode() for log in logs]}, inner
+
+    def apply_teal_call(self, group, index):
+        """Run an app call through the TEAL evaluator; returns (result fields, inner transaction count)"""
+        if self.evaluation is None:
+            self.evaluation = GroupEvaluation(self, group)
+        inner_before = self.evaluation.inner_txns
+        try:
+            result = self.evaluation.outer_call(index)
+        except LogicError as e:
+            raise Rejected(f"logic eval error: {e}")
+        fields = {key: value for key, value in result.items() if key != "txn"}
+        return fields, self.evaluation.inner_txns - inner_before
+
+    def evaluate(self, group):
+        """
+        Apply a group, journaled; returns each transaction's result fields.
+
+        Raises Rejected with the failing transaction's index as failed_at;
+        the caller commits or rolls back the journal.
+        """
+        self.evaluation = None
+        results = []
+        inner_txns = 0
+        for index in range(len(group)):
+            try:
+                fields, inner = self.apply_txn(group, index)
+            except Rejected as e:
+                error = Rejected(f"transaction {group[index].get_txid()}: {e}")
+                error.failed_at = index
+                raise error
+            results.append(fields)
+            inner_txns += inner
+        # Fees are pooled across the group, inner transactions included
+        if sum(stxn.transaction.fee for stxn in group) < MIN_TXN_FEE * (len(group) + inner_txns):
+            raise Rejected("group fees do not cover its transactions")
+        for stxn in group:
+            if self.accounts[stxn.transaction.sender]["amount"] < self.min_balance(stxn.transaction.sender):
+                raise Rejected(f"{stxn.transaction.sender} would go below its minimum balance")
+        return results
+
+    def submit(self, group):
+        """Evaluate and apply a signed group atomically; returns the first txid"""
+        with self.lock:
+            self.check_group(group)
+            for stxn in group:
+                self.verify_signature(stxn)
+
+            next_id = self.next_id
+            try:
+                results = self.evaluate(group)
+            except Exception:
+                self.journal.rollback()
+                self.next_id = next_id
+                raise
+            self.journal.entries = []
+
+            for stxn, fields in zip(group, results):
+                txid = stxn.get_txid()
+                self.results[txid] = dict(fields, **{"pool-error": ""})
+                self.unconfirmed.append(txid)
+            while len(self.results) > MAX_PENDING_INFO:
+                self.results.popitem(last=False)
+            if self.block_time == 0:
+                self.close_block()
+            return group[0].get_txid()
+
+    def simulate(self, group):
+        """
+        Evaluate a group without applying it, as algod's simulate endpoint
+        with empty signatures allowed; returns the simulate response
+        """
+        with self.lock:
+            self.check_group(group)
+            next_id = self.next_id
+            response_group = {}
+            try:
+                results = self.evaluate(group)
+            except Rejected as e:
+                results = []
+                response_group["failure-message"] = str(e)
+                response_group["failed-at"] = [getattr(e, "failed_at", 0)]
+            finally:
+                self.journal.rollback()
+                self.next_id = next_id
+            response_group["txn-results"] = [
+                {"txn-result": dict(fields, **{"pool-error": ""})} for fields in results
+            ]
+            return {"version": 2, "last-round": self.round, "txn-groups": [response_group]}
+
+    # --- Rounds ---
+
+    def close_block(self):
+        """Advance one round, confirming every pending transaction (caller holds the lock)"""
+        self.round += 1
+        self.timestamp = max(self.timestamp, int(time.time()))
+        for txid in self.unconfirmed:
+            if txid in self.results:
+                self.results[txid]["confirmed-round"] = self.round
+        self.unconfirmed = []
+        self.lock.notify_all()
+
+    def run_blocks(self, stop):
+        """Close a block every block_time seconds until stop is set"""
+        while not stop.wait(self.block_time):
+            with self.lock:
+                self.close_block()
+
+    def wait_for_block_after(self, round_num, timeout=WAIT_FOR_BLOCK_TIMEOUT):
+        with self.lock:
+            self.lock.wait_for(lambda: self.round > round_num, timeout)
+            return self.status()
+
+    def status(self):
+        return {
+            "last-round": self.round,
+            "last-version": CONSENSUS_VERSION,
+            "time-since-last-round": 0,
+            "catchup-time": 0,
+        }
+
+    # --- Snapshots ---
+
+    def save_snapshot(self, path):
+        """Write the whole ledger as JSON"""
+        with self.lock:
+            state = {
+                "round": self.round,
+                "timestamp": self.timestamp,
+                "next_id": self.next_id,
+                "accounts": {addr: {"amount": a["amount"], "assets": {str(k): v for k, v in a["assets"].items()}}
+                             for addr, a in self.accounts.items()},
+                "assets": {str(k): v for k, v in self.assets.items()},
+                "apps": {str(app_id): {
+                    "creator": app["creator"],
+                    "model": app["model"],
+                    "approval": b64(app["approval"]),
+                    "clear": b64(app["clear"]),
+                    "global": [[b64(k), b64(v) if isinstance(v, bytes) else v] for k, v in app["global"].items()],
+                    "boxes": [[b64(k), b64(v)] for k, v in app["boxes"].items()],
+                } for app_id, app in self.apps.items()},
+                "programs": self.programs,
+                "teal": self.teal,
+            }
+        with open(path, "w") as f:
+            json.dump(state, f)
+
+    @classmethod
+    def load_snapshot(cls, path, block_time=0.0):
+        """A ledger restored from save_snapshot(); pending results are not kept"""
+        with open(path, "r") as f:
+            state = json.load(f)
+        ledger = cls(block_time=block_time, start_round=state["round"])
+        ledger.timestamp = state["timestamp"]
+        ledger.next_id = state["next_id"]
+        ledger.accounts = {addr: {"amount": a["amount"], "assets": {int(k): v for k, v in a["assets"].items()}}
+                           for addr, a in state["accounts"].items()}
+        ledger.assets = {int(k): v for k, v in state["assets"].items()}
+        ledger.apps = {int(app_id): {
+            "creator": app["creator"],
+            "model": app["model"],
+            "approval": base64.b64decode(app["approval"]),
+            "clear": base64.b64decode(app["clear"]),
+            "global": {base64.b64decode(k): base64.b64decode(v) if isinstance(v, str) else v
+                       for k, v in app["global"]},
+            "boxes": {base64.b64decode(k): base64.b64decode(v) for k, v in app["boxes"]},
+        } for app_id, app in state["apps"].items()}
+        ledger.programs = state["programs"]
+        ledger.teal.update(state.get("teal", {}))
+        return ledger
+
+    # --- REST views ---
+
+    def account_info(self, address):
+        with self.lock:
+            info = self.accounts.get(address, {"amount": 0, "assets": {}})
+            return {
+                "address": address,
+                "amount": info["amount"],
+                "min-balance": self.min_balance(address),
+                "round": self.round,
+                "assets": [{"asset-id": k, "amount": v, "is-frozen": False} for k, v in info["assets"].items()],
+                "created-apps": [{"id": app_id} for app_id, app in self.apps.items() if app["creator"] == address],
+                "status": "Offline",
+            }
+
+    def application_info(self, app_id):
+        with self.lock:
+            app = self.apps.get(app_id)
+            if app is None:
+                return None
+            return {"id": app_id, "params": {
+                "creator": app["creator"],
+                "approval-program": b64(app["approval"]),
+                "clear-state-program": b64(app["clear"]),
+                "global-state": [
+                    {"key": b64(k), "value": {"type": 1, "bytes": b64(v), "uint": 0} if isinstance(v, bytes)
+                     else {"type": 2, "bytes": "", "uint": v}}
+                    for k, v in app["global"].items()
+                ],
+            }}
+
+
+def b64(data):
+    return base64.b64encode(data).decode()
+
+
+def decode_signed_group(body):
+    """Signed transactions from a concatenated msgpack request body"""
+    group = []
+    unpacker = msgpack.Unpacker(raw=False, strict_map_key=False)
+    unpacker.feed(body)
+    for item in unpacker:
+        group.append(encoding.msgpack_decode(base64.b64encode(msgpack.packb(item, use_bin_type=True)).decode()))
+    return group
+
+
+def make_handler(ledger):
+    """HTTP request handler class serving a Ledger as algod v2"""
+
+    class AlgodHandler(BaseHTTPRequestHandler):
+        def reply(self, code, body):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def not_found(self, what):
+            self.reply(404, {"message": f"{what} not found"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path == "/v2/transactions/simulate":
+                return self.simulate()
+            if url.path == "/v2/teal/compile":
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                try:
+                    return self.reply(200, ledger.compile(body.decode()))
+                except Rejected as e:
+                    return self.reply(400, {"message": str(e)})
+            if url.path != "/v2/transactions":
+                return self.not_found(url.path)
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                txid = ledger.submit(decode_signed_group(body))
+            except Rejected as e:
+                return self.reply(400, {"message": f"TransactionPool.Remember: {e}"})
+            except Exception as e:
+                return self.reply(400, {"message": f"could not decode transactions: {e}"})
+            self.reply(200, {"txId": txid})
+
+        def simulate(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                request = msgpack.unpackb(body, raw=False, strict_map_key=False)
+                # Signatures are optional here, so decode each as a signed transaction
+                groups = [[transaction.SignedTransaction.undictify(stxn) for stxn in txn_group["txns"]]
+                          for txn_group in request["txn-groups"]]
+                if len(groups) != 1:
+                    raise ValueError("expected one transaction group")
+                return self.reply(200, ledger.simulate(groups[0]))
+            except Rejected as e:
+                return self.reply(400, {"message": str(e)})
+            except Exception as e:
+                return self.reply(400, {"message": f"could not decode transactions: {e}"})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = url.path.strip("/").split("/")
+            query = parse_qs(url.query)
+            if parts[:1] != ["v2"] and url.path not in ("/health", "/versions"):
+                return self.not_found(url.path)
+            route = parts[1:]
+
+            if url.path == "/health":
+                return self.reply(200, {})
+            if url.path == "/versions":
+                return self.reply(200, {"genesis_id": GENESIS_ID, "genesis_hash_b64": GENESIS_HASH})
+            if route == ["status"]:
+                with ledger.lock:
+                    return self.reply(200, ledger.status())
+            if route[:2] == ["status", "wait-for-block-after"] and len(route) == 3:
+                return self.reply(200, ledger.wait_for_block_after(int(route[2])))
+            if route == ["transactions", "params"]:
+                with ledger.lock:
+                    return self.reply(200, {
+                        "fee": 0, "min-fee": MIN_TXN_FEE, "last-round": ledger.round,
+                        "genesis-hash": GENESIS_HASH, "genesis-id": GENESIS_ID,
+                        "consensus-version": CONSENSUS_VERSION,
+                    })
+            if route[:2] == ["transactions", "pending"] and len(route) == 3:
+                with ledger.lock:
+                    result = ledger.results.get(route[2])
+                    if result is None:
+                        return self.not_found(f"transaction {route[2]}")
+                    return self.reply(200, dict(result))
+            if route[:1] == ["accounts"] and len(route) == 2:
+                return self.reply(200, ledger.account_info(route[1]))
+            if route[:1] == ["accounts"] and len(route) == 4 and route[2] == "assets":
+                amount = ledger.holding(route[1], int(route[3]))
+                if amount < 0:
+                    return self.not_found("asset holding")
+                return self.reply(200, {"asset-holding": {"asset-id": int(route[3]), "amount": amount,
+                                                          "is-frozen": False}, "round": ledger.round})
+            if route[:1] == ["applications"] and len(route) >= 2:
+                app_id = int(route[1])
+                info = ledger.application_info(app_id)
+                if info is None:
+                    return self.not_found(f"application {app_id}")
+                if len(route) == 2:
+                    return self.reply(200, info)
+                with ledger.lock:
+                    boxes = ledger.apps[app_id]["boxes"]
+                    if route[2] == "boxes":
+                        return self.reply(200, {"boxes": [{"name": b64(name)} for name in boxes]})
+                    if route[2] == "box":
+                        name = query.get("name", [""])[0]
+                        name = base64.b64decode(name[4:]) if name.startswith("b64:") else name.encode()
+                        if name not in boxes:
+                            return self.not_found("box")
+                        return self.reply(200, {"name": b64(name), "value": b64(boxes[name]), "round": ledger.round})
+            self.not_found(url.path)
+
+        def log_message(self, format, *args):
+            pass
+
+    return AlgodHandler
+
+
+def serve(ledger, port=4001):
+    """Serve a ledger on localhost until interrupted; returns the server and block thread stop event"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(ledger))
+    stop = threading.Event()
+    if ledger.block_time > 0:
+        threading.Thread(target=ledger.run_blocks, args=(stop,), daemon=True).start()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stop
+
+
+def main():
+    """Run the stand-in: algod_standin.py [--port N] [--block-time S] [--snapshot F] [--save-on-exit F]"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=4001)
+    parser.add_argument("--block-time", type=float, default=0.0, help="seconds per block; 0 closes a block per group")
+    parser.add_argument("--snapshot", help="ledger snapshot to start from")
+    parser.add_argument("--save-on-exit", help="write a snapshot here on shutdown")
+    args = parser.parse_args()
+
+    ledger = (Ledger.load_snapshot(args.snapshot, args.block_time) if args.snapshot
+              else Ledger(block_time=args.block_time))
+    server, stop = serve(ledger, args.port)
+    print(f"algod stand-in at round {ledger.round} on http://127.0.0.1:{args.port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.shutdown()
+        if args.save_on_exit:
+            ledger.save_snapshot(args.save_on_exit)
+            print(f"Snapshot written to {args.save_on_exit}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+"""
+Benchmark Strahn PI System contracts and gate on cost regressions
+
+For every contract (and every method of it, compiled in isolation) this
+measures compile time, TEAL line count, estimated assembled size, worst-case
+opcode cost, inner transaction count and box bytes touched. The
+deterministic metrics are compared against the committed baseline; a
+regression beyond the metric's threshold fails the run. Compile time is
+wall-clock and only reported. The baseline is only rewritten on request, when
+a cost change is intended, so every accepted increase shows up in review.
+
+Usage:
+    python scripts/benchmark_contracts.py            # check against the baseline
+    python scripts/benchmark_contracts.py --record   # replace the baseline
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add the parent directory to the path to import contracts, and the contracts
+# directory itself so their `utils.common` imports resolve
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "contracts"))
+
+from pyteal import *
+from contracts import strahn_core, strahn_pi_base, strahn_pi_shared, mandate_record, mandate_record_packed
+from compile_contracts import CONTRACT_VERSIONS
+from box_planner import box_io_bytes, core_box_accesses
+from template_config import TEMPLATE_TOKEN, TEMPLATE_VARIABLES
+
+BASELINE_PATH = Path(__file__).parent.parent / "build" / "benchmark_baseline.json"
+
+# PI Base allowance box: remaining (uint64) | expiry (uint64)
+ALLOWANCE_BOX_SIZE = 16
+# PI Base relayer fee ledger box: accrued fees (uint64)
+RELAYER_FEE_BOX_SIZE = 8
+# PI Base mandate registry box: app_id | dest_addr | amount | relayer_fee | next_pay_ts | interval_sec |
+# due bucket | position
+MANDATE_TERMS_BOX_SIZE = 88
+# PI Base due-time index bucket at capacity (DUE_BUCKET_MAX_BYTES)
+DUE_BUCKET_BOX_SIZE = 1024
+# Largest legacy approval program a published registry box can hold
+LEGACY_PROGRAM = bytes(8191)
+# Shared PI Base user box: balance | nonce | storage
+USER_BOX_SIZE = 24
+# Shared PI Base registry entries append the owning user's address
+SHARED_TERMS_BOX_SIZE = MANDATE_TERMS_BOX_SIZE + 32
+
+# Allowed relative increase per metric before a run is considered a regression.
+# Only metrics that are deterministic for a given source tree are gated.
+THRESHOLDS = {
+    "teal_lines": 0.05,
+    "assembled_size": 0.05,
+    "opcode_cost": 0.05,
+    "inner_txns": 0.0,
+    "box_bytes": 0.05,
+}
+
+DETERMINISTIC_METRICS = list(THRESHOLDS)
+
+# Wall-clock and machine dependent: reported, never gated
+TIMING_METRICS = ["compile_time_ms"]
+
+# Opcodes whose cost differs from the default of 1 (AVM v8-v10)
+OPCODE_COSTS = {
+    "sha256": 35,
+    "keccak256": 130,
+    "sha512_256": 45,
+    "sha3_256": 130,
+    "ed25519verify": 1900,
+    "ed25519verify_bare": 1900,
+    "ecdsa_verify": 1700,
+    "ecdsa_pk_decompress": 650,
+    "ecdsa_pk_recover": 2000,
+    "vrf_verify": 5700,
+}
+
+# Number of immediate bytes following the opcode byte, for fixed-width opcodes
+FIXED_IMMEDIATES = {
+    "intc": 1, "bytec": 1, "arg": 1, "load": 1, "store": 1,
+    "txn": 1, "global": 1, "gtxn": 2, "txna": 2, "gtxna": 3,
+    "gtxns": 1, "gtxnsa": 2, "gtxnas": 2, "txnas": 1, "gtxnsas": 1,
+    "gload": 2, "gloads": 1, "gaid": 1,
+    "itxn_field": 1, "itxn": 1, "itxna": 2, "gitxn": 2, "gitxna": 3,
+    "itxnas": 1, "gitxnas": 2,
+    "asset_holding_get": 1, "asset_params_get": 1, "app_params_get": 1,
+    "acct_params_get": 1, "voter_params_get": 1, "block": 1,
+    "extract": 2, "substring": 2, "replace2": 1,
+    "dig": 1, "bury": 1, "cover": 1, "uncover": 1, "popn": 1, "dupn": 1,
+    "frame_dig": 1, "frame_bury": 1, "proto": 2,
+    "ecdsa_verify": 1, "ecdsa_pk_decompress": 1, "ecdsa_pk_recover": 1,
+    "base64_decode": 1, "json_ref": 1, "vrf_verify": 1,
+    "bnz": 2, "bz": 2, "b": 2, "callsub": 2,
+}
+
+BRANCH_OPS = {"bnz", "bz"}
+TERMINAL_OPS = {"return", "err", "retsub"}
+
+
+def _varuint_size(value):
+    """Number of bytes needed to encode value as a varuint"""
+    size = 1
+    while value >= 0x80:
+        value >>= 7
+        size += 1
+    return size
+
+
+def _bytes_literal_size(token):
+    """Decoded length of a TEAL byte literal (0x.. or "..")"""
+    if token.startswith("0x"):
+        return (len(token) - 2) // 2
+    if token.startswith('"'):
+        return len(token[1:-1].encode().decode("unicode_escape"))
+    return len(token)
+
+
+def parse_teal(teal):
+    """
+    Parse TEAL source into (instructions, labels).
+
+    Each instruction is a tuple (opcode, args). Labels map to the index of the
+    instruction that follows them. Comments and blank lines are dropped.
+    """
+    instructions = []
+    labels = {}
+    for raw_line in teal.splitlines():
+        line = raw_line.strip()
+        if not line or line.startswith("//"):
+            continue
+        if " //" in line:
+            line = line.split(" //", 1)[0].strip()
+        if line.endswith(":"):
+            labels[line[:-1]] = len(instructions)
+            continue
+        parts = line.split()
+        instructions.append((parts[0], parts[1:]))
+    return instructions, labels
+
+
+# Template variable literals as large as any deployment fills in
+TEMPLATE_PLACEHOLDERS = {"address": "0x" + "00" * 32, "uint": str(2 ** 64 - 1)}
+
+
+def fill_placeholders(teal):
+    """Replace template variables with placeholder literals of their largest filled size"""
+    kinds = {name: kind for variables in TEMPLATE_VARIABLES.values() for name, kind in variables.items()}
+
+    def placeholder(match):
+        if match.group(0) not in kinds:
+            raise ValueError(f"Unknown template variable {match.group(0)}")
+        return TEMPLATE_PLACEHOLDERS[kinds[match.group(0)]]
+    return TEMPLATE_TOKEN.sub(placeholder, teal)
+
+
+def estimate_assembled_size(teal):
+    """
+    Estimate the size in bytes of the assembled program.
+
+    Expects TEAL compiled with assembleConstants=True so that constants are
+    already referenced through intcblock/bytecblock or push opcodes. Templated
+    builds are sized with placeholder values (see fill_placeholders).
+    """
+    instructions, _ = parse_teal(fill_placeholders(teal))
+    size = 0
+    for opcode, args in instructions:
+        if opcode == "#pragma":
+            size += _varuint_size(int(args[1]))
+        elif opcode == "intcblock":
+            size += 1 + _varuint_size(len(args)) + sum(_varuint_size(int(a)) for a in args)
+        elif opcode == "bytecblock":
+            size += 1 + _varuint_size(len(args))
+            for a in args:
+                length = _bytes_literal_size(a)
+                size += _varuint_size(length) + length
+        elif opcode == "pushint":
+            size += 1 + _varuint_size(int(args[0]))
+        elif opcode == "pushbytes":
+            length = _bytes_literal_size(args[0])
+            size += 1 + _varuint_size(length) + length
+        elif opcode == "int":
+            size += 1 + _varuint_size(int(args[0])) if args[0].isdigit() else 2
+        elif opcode in ("byte", "addr", "method"):
+            length = _bytes_literal_size(args[-1]) if opcode == "byte" else 32 if opcode == "addr" else 4
+            size += 1 + _varuint_size(length) + length
+        elif opcode in ("switch", "match"):
+            size += 2 + 2 * len(args)
+        else:
+            size += 1 + FIXED_IMMEDIATES.get(opcode, 0)
+    return size
+
+
+def _successors(instructions, labels, pc):
+    """Possible next program counters after executing instruction pc"""
+    opcode, args = instructions[pc]
+    if opcode in TERMINAL_OPS:
+        return []
+    if opcode == "b":
+        return [labels[args[0]]]
+    if opcode in BRANCH_OPS:
+        return [pc + 1, labels[args[0]]]
+    if opcode in ("switch", "match"):
+        return [pc + 1] + [labels[a] for a in args]
+    return [pc + 1]
+
+
+def _live_back_edges(instructions, labels, back_edges):
+    """
+    Per instruction, a bitmask of the back edges that can still be taken
+    from it (their source is reachable without returning from the routine).
+    """
+    successors = [_successors(instructions, labels, pc) for pc in range(len(instructions))]
+    live = []
+    for start in range(len(instructions)):
+        seen = {start}
+        stack = [start]
+        while stack:
+            for target in successors[stack.pop()]:
+                if target not in seen:
+                    seen.add(target)
+                    stack.append(target)
+        live.append(sum(1 << i for i, (source, _) in enumerate(back_edges) if source in seen))
+    return live
+
+
+def worst_case(teal, weight, loop_bound=1):
+    """
+    Worst-case total of weight(opcode) along any successful execution path.
+
+    Subroutines are costed once and charged at every callsub. Backward jumps
+    (loops) may be taken at most loop_bound times each. Paths that end in
+    `err` are ignored since they never succeed. Once a loop can no longer be
+    reached its count is dropped, so sequential loops do not multiply the
+    number of states explored.
+    """
+    instructions, labels = parse_teal(teal)
+    back_edges = sorted({
+        (pc, target)
+        for pc in range(len(instructions))
+        for target in _successors(instructions, labels, pc)
+        if target <= pc
+    })
+    edge_index = {edge: i for i, edge in enumerate(back_edges)}
+    live_edges = _live_back_edges(instructions, labels, back_edges)
+    subroutine_costs = {}
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 20 * len(instructions) + 1000))
+
+    def longest(pc, counts, memo):
+        counts = tuple(c if live_edges[pc] >> i & 1 else 0 for i, c in enumerate(counts))
+        key = (pc, counts)
+        if key in memo:
+            return memo[key]
+        opcode, args = instructions[pc]
+        cost = weight(opcode)
+        if opcode == "callsub":
+            cost += subroutine(labels[args[0]])
+        if opcode == "err":
+            best = None
+        elif opcode in ("return", "retsub"):
+            best = cost
+        else:
+            best = None
+            for target in _successors(instructions, labels, pc):
+                next_counts = counts
+                if (pc, target) in edge_index:
+                    i = edge_index[(pc, target)]
+                    if counts[i] >= loop_bound:
+                        continue
+                    next_counts = counts[:i] + (counts[i] + 1,) + counts[i + 1:]
+                tail = longest(target, next_counts, memo)
+                if tail is not None and (best is None or cost + tail > best):
+                    best = cost + tail
+        memo[key] = best
+        return best
+
+    def subroutine(start):
+        if start not in subroutine_costs:
+            subroutine_costs[start] = longest(start, (0,) * len(back_edges), {}) or 0
+        return subroutine_costs[start]
+
+    try:
+        return longest(0, (0,) * len(back_edges), {}) or 0
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+def opcode_cost(teal, loop_bound=1):
+    """Worst-case opcode budget consumed by a program"""
+    return worst_case(teal, lambda op: 0 if op == "#pragma" else OPCODE_COSTS.get(op, 1), loop_bound)
+
+
+def inner_txn_count(teal, loop_bound=1):
+    """Worst-case number of inner transactions submitted directly by a program"""
+    return worst_case(teal, lambda op: 1 if op in ("itxn_begin", "itxn_next") else 0, loop_bound)
+
+
+def template_sizes():
+    """Assembled sizes of the mandate template stored in Core's boxes"""
+    version = CONTRACT_VERSIONS["mandate_record"]
+    approval = compileTeal(mandate_record.mandate_record_approval(), Mode.Application,
+                           version=version, assembleConstants=True)
+    clear = compileTeal(mandate_record.mandate_record_clear(), Mode.Application,
+                        version=version, assembleConstants=True)
+    return {b"approval": estimate_assembled_size(approval), b"clear": estimate_assembled_size(clear)}
+
+
+def _copy_chunks(sizes):
+    """Iterations of set_version's 1KB copy loop for the larger template box"""
+    return max(1, (max(sizes.values()) + 1023) // 1024)
+
+
+def _core_box_bytes(method, **kwargs):
+    """Box bytes a Core method touches, per the box planner's model"""
+    return lambda sizes: box_io_bytes(core_box_accesses(method, sizes, **kwargs))
+
+
+# Per contract: approval/clear builders and the methods benchmarked in isolation.
+# Each method maps to (handler, box_bytes(sizes), loop_bound(sizes)).
+CONTRACTS = {
+    "strahn_core": {
+        "approval": strahn_core.strahn_core_approval,
+        "clear": strahn_core.strahn_core_clear,
+        "methods": {
+            "set_bytecode": (strahn_core.set_bytecode,
+                             _core_box_bytes("set_bytecode", box_name=b"approval"), None),
+            "append_bytecode": (strahn_core.append_bytecode,
+                                _core_box_bytes("append_bytecode", box_name=b"approval"), None),
+            "set_version": (strahn_core.set_version,
+                            _core_box_bytes("set_version", version=1), _copy_chunks),
+            "deploy_mandate": (strahn_core.deploy_mandate, _core_box_bytes("deploy_mandate"), None),
+            "deploy_mandates_batch": (strahn_core.deploy_mandates_batch,
+                                      _core_box_bytes("deploy_mandates_batch"),
+                                      lambda s: strahn_core.MAX_BATCH_MANDATES.value),
+            "deploy_legacy_mandate": (strahn_core.deploy_legacy_mandate,
+                                      _core_box_bytes("deploy_legacy_mandate"), None),
+            "stage_legacy_program": (strahn_core.stage_legacy_program,
+                                     _core_box_bytes("stage_legacy_program", publisher=bytes(32),
+                                                     programs=[LEGACY_PROGRAM]), None),
+            "publish_legacy_program": (strahn_core.publish_legacy_program,
+                                       _core_box_bytes("publish_legacy_program", publisher=bytes(32),
+                                                       programs=[LEGACY_PROGRAM]), None),
+            "deploy_legacy_by_hash": (strahn_core.deploy_legacy_by_hash,
+                                      _core_box_bytes("deploy_legacy_by_hash",
+                                                      programs=[LEGACY_PROGRAM, b"\x08"]), None),
+            "get_current_bytecode_hashes": (strahn_core.get_current_bytecode_hashes,
+                                            _core_box_bytes("get_current_bytecode_hashes"), None),
+        },
+    },
+    "strahn_pi_base": {
+        "approval": strahn_pi_base.strahn_pi_base_approval,
+        "clear": strahn_pi_base.strahn_pi_base_clear,
+        "methods": {
+            "app_optin_usdc": (strahn_pi_base.app_optin_usdc, lambda s: 0, None),
+            "deposit_usdc": (strahn_pi_base.deposit_usdc, lambda s: 0, None),
+            "deposit_usdc_batch": (strahn_pi_base.deposit_usdc_batch, lambda s: 0,
+                                   lambda s: strahn_pi_base.MAX_GROUP_SIZE.value - 1),
+            "process_intent": (strahn_pi_base.process_intent, lambda s: RELAYER_FEE_BOX_SIZE, None),
+            "process_split_intent": (strahn_pi_base.process_split_intent, lambda s: RELAYER_FEE_BOX_SIZE,
+                                     lambda s: strahn_pi_base.MAX_SPLIT_PAYEES.value),
+            "grant_allowance": (strahn_pi_base.grant_allowance, lambda s: ALLOWANCE_BOX_SIZE, None),
+            "revoke_allowance": (strahn_pi_base.revoke_allowance, lambda s: ALLOWANCE_BOX_SIZE, None),
+            "process_allowance_intent": (strahn_pi_base.process_allowance_intent,
+                                         lambda s: ALLOWANCE_BOX_SIZE + RELAYER_FEE_BOX_SIZE, None),
+            "setup_mandate_standard": (strahn_pi_base.setup_mandate_standard,
+                                       lambda s: MANDATE_TERMS_BOX_SIZE + DUE_BUCKET_BOX_SIZE
+                                                 + RELAYER_FEE_BOX_SIZE, None),
+            "setup_mandates_batch": (strahn_pi_base.setup_mandates_batch,
+                                     lambda s: (strahn_pi_base.MAX_BATCH_MANDATES.value
+                                                * (MANDATE_TERMS_BOX_SIZE + DUE_BUCKET_BOX_SIZE)
+                                                + RELAYER_FEE_BOX_SIZE),
+                                     lambda s: strahn_pi_base.MAX_BATCH_MANDATES.value),
+            "release_mandate_funds": (strahn_pi_base.release_mandate_funds,
+                                      lambda s: MANDATE_TERMS_BOX_SIZE + 2 * DUE_BUCKET_BOX_SIZE
+                                                + RELAYER_FEE_BOX_SIZE, None),
+            "process_mandates_batch": (strahn_pi_base.process_mandates_batch,
+                                       lambda s: (strahn_pi_base.MAX_KEEPER_BATCH.value
+                                                  * (MANDATE_TERMS_BOX_SIZE + 2 * DUE_BUCKET_BOX_SIZE)
+                                                  + RELAYER_FEE_BOX_SIZE),
+                                       lambda s: strahn_pi_base.MAX_KEEPER_BATCH.value),
+            "cancel_mandate": (strahn_pi_base.cancel_mandate,
+                               lambda s: MANDATE_TERMS_BOX_SIZE + DUE_BUCKET_BOX_SIZE, None),
+            "claim_relayer_fees": (strahn_pi_base.claim_relayer_fees,
+                                   lambda s: RELAYER_FEE_BOX_SIZE, None),
+        },
+    },
+    "strahn_pi_shared": {
+        "approval": strahn_pi_shared.strahn_pi_shared_approval,
+        "clear": strahn_pi_shared.strahn_pi_shared_clear,
+        "methods": {
+            "app_optin_usdc": (strahn_pi_shared.app_optin_usdc, lambda s: 0, None),
+            "register_user": (strahn_pi_shared.register_user, lambda s: USER_BOX_SIZE, None),
+            "fund_storage": (strahn_pi_shared.fund_storage, lambda s: USER_BOX_SIZE, None),
+            "deposit_usdc": (strahn_pi_shared.deposit_usdc, lambda s: USER_BOX_SIZE, None),
+            "withdraw_usdc": (strahn_pi_shared.withdraw_usdc, lambda s: USER_BOX_SIZE, None),
+            "process_intent": (strahn_pi_shared.process_intent,
+                               lambda s: USER_BOX_SIZE + RELAYER_FEE_BOX_SIZE, None),
+            "setup_mandate_standard": (strahn_pi_shared.setup_mandate_standard,
+                                       lambda s: USER_BOX_SIZE + SHARED_TERMS_BOX_SIZE
+                                                 + DUE_BUCKET_BOX_SIZE + RELAYER_FEE_BOX_SIZE, None),
+            "release_mandate_funds": (strahn_pi_shared.release_mandate_funds,
+                                      lambda s: USER_BOX_SIZE + SHARED_TERMS_BOX_SIZE
+                                                + 2 * DUE_BUCKET_BOX_SIZE + RELAYER_FEE_BOX_SIZE, None),
+            "claim_relayer_fees": (strahn_pi_shared.claim_relayer_fees,
+                                   lambda s: RELAYER_FEE_BOX_SIZE, None),
+        },
+    },
+    "mandate_record": {
+        "approval": mandate_record.mandate_record_approval,
+        "clear": mandate_record.mandate_record_clear,
+        "methods": {
+            "process_payment": (mandate_record.process_payment, lambda s: 0, None),
+        },
+    },
+    "mandate_record_packed": {
+        "approval": mandate_record_packed.mandate_record_packed_approval,
+        "clear": mandate_record_packed.mandate_record_packed_clear,
+        "methods": {
+            "process_payment": (mandate_record_packed.process_payment, lambda s: 0, None),
+        },
+    },
+}
+
+
+def measure_program(build, version, box_bytes=0, loop_bound=1):
+    """Compile a program and collect its metrics"""
+    start = time.perf_counter()
+    teal = compileTeal(build(), Mode.Application, version=version, assembleConstants=True)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return {
+        "compile_time_ms": round(elapsed_ms, 3),
+        "teal_lines": len(teal.splitlines()),
+        "assembled_size": estimate_assembled_size(teal),
+        "opcode_cost": opcode_cost(teal, loop_bound),
+        "inner_txns": inner_txn_count(teal, loop_bound),
+        "box_bytes": box_bytes,
+        "loop_bound": loop_bound,
+    }
+
+
+def run_benchmarks():
+    """Measure every contract and method, keyed '<contract>.<method>'"""
+    sizes = template_sizes()
+    results = {}
+    for contract_name, spec in CONTRACTS.items():
+        version = CONTRACT_VERSIONS[contract_name]
+        loop_bounds = [bound(sizes) for _, _, bound in spec["methods"].values() if bound]
+        results[f"{contract_name}.approval"] = measure_program(
+            spec["approval"], version,
+            box_bytes=max([box(sizes) for _, box, _ in spec["methods"].values()] or [0]),
+            loop_bound=max(loop_bounds or [1]),
+        )
+        results[f"{contract_name}.clear"] = measure_program(spec["clear"], version)
+        for method_name, (handler, box, bound) in spec["methods"].items():
+            results[f"{contract_name}.{method_name}"] = measure_program(
+                lambda handler=handler: Seq(handler(), Approve()), version,
+                box_bytes=box(sizes),
+                loop_bound=bound(sizes) if bound else 1,
+            )
+    return results
+
+
+def load_baseline(path=BASELINE_PATH):
+    """Load the baseline results keyed '<contract>.<method>', or None"""
+    if not Path(path).exists():
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def record_baseline(results, path=BASELINE_PATH):
+    """Replace the baseline with results, minus the timing metrics"""
+    baseline = {
+        key: {metric: value for metric, value in metrics.items() if metric not in TIMING_METRICS}
+        for key, metrics in results.items()
+    }
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def find_regressions(baseline, results, metrics=None, thresholds=THRESHOLDS):
+    """
+    Compare results against a baseline.
+
+    Returns a list of (key, metric, old, new) for every metric that grew by
+    more than its threshold. Programs missing from the baseline are skipped.
+    """
+    regressions = []
+    for key, metrics_now in sorted(results.items()):
+        before = baseline.get(key)
+        if before is None:
+            continue
+        for metric in metrics or thresholds:
+            old, new = before.get(metric), metrics_now.get(metric)
+            if old is None or new is None:
+                continue
+            if new > old * (1 + thresholds[metric]) and new - old > 0:
+                regressions.append((key, metric, old, new))
+    return regressions
+
+
+def print_table(results):
+    """Print results as an aligned table"""
+    columns = TIMING_METRICS + DETERMINISTIC_METRICS
+    width = max(len(k) for k in results) + 2
+    print("program".ljust(width) + "".join(c.rjust(17) for c in columns))
+    for key in sorted(results):
+        print(key.ljust(width) + "".join(str(results[key][c]).rjust(17) for c in columns))
+
+
+def main():
+    """Main benchmark function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--record", action="store_true", help="replace the baseline with these results")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="baseline file path")
+    args = parser.parse_args()
+
+    results = run_benchmarks()
+    print_table(results)
+
+    if args.record:
+        record_baseline(results, args.baseline)
+        print(f"\nBaseline recorded in {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print("\nNo baseline recorded yet; run with --record to create one.")
+        return 0
+
+    regressions = find_regressions(baseline, results, metrics=DETERMINISTIC_METRICS)
+    if regressions:
+        print("\n✗ Regressions against the recorded baseline:")
+        for key, metric, old, new in regressions:
+            print(f"  {key} {metric}: {old} -> {new} (limit +{THRESHOLDS[metric]:.0%})")
+        return 1
+
+    print("\n✓ No regressions against the recorded baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
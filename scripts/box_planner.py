@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Box reference planner for Strahn Core template operations
+
+Every box reference in a group adds BOX_IO_QUOTA bytes to the group's box I/O
+budget, and the bytes of every box touched count against it. This module
+knows which boxes each Core method touches and how large they are, and spreads
+the named and empty references across a group's transactions so that each
+call carries only what it needs.
+"""
+
+import hashlib
+import math
+
+BOX_IO_QUOTA = 1024       # bytes of box I/O budget per box reference
+MAX_TXN_REFERENCES = 8    # accounts + assets + apps + boxes per transaction
+EMPTY_BOX_REF = (0, b"")  # adds budget without naming a box
+
+TEMPLATE_BOXES = (b"approval", b"clear")
+MAX_TEMPLATE_SIZE = 8192     # approval + clear with every extra program page
+TEMPLATE_SLICE_SIZE = 4096   # largest stack value; Core reads the approval box in slices
+
+
+def versioned_box_name(box_name, version):
+    """Name of a versioned copy, matching Concat(name, "_v", Itob(version))"""
+    return box_name + b"_v" + version.to_bytes(8, 'big')
+
+
+def legacy_program_box_name(program):
+    """Content address of a published legacy program, matching Concat("code:", template_hash)"""
+    return b"code:" + template_hash(program)
+
+
+def legacy_stage_box_name(publisher):
+    """Staging box of a publisher's raw 32-byte address, matching Concat("stage:", sender)"""
+    return b"stage:" + publisher
+
+
+def core_box_accesses(method, sizes, box_name=None, version=None, publisher=None, programs=()):
+    """
+    Boxes touched by a Core method, as a list of (name, size).
+
+    sizes maps b"approval" and b"clear" to the template sizes in bytes.
+    set_bytecode and append_bytecode need the box_name being written;
+    set_version needs the version being created. The legacy program methods
+    need the programs (bytecode) concerned, and staging and publishing the
+    publisher's address.
+    """
+    if method in ("set_bytecode", "append_bytecode"):
+        if box_name not in TEMPLATE_BOXES:
+            raise ValueError(f"{method} needs box_name to be one of {TEMPLATE_BOXES}")
+        return [(box_name, sizes[box_name])]
+    if method == "set_version":
+        if version is None:
+            raise ValueError("set_version needs the version being created")
+        return [(name, sizes[name]) for name in TEMPLATE_BOXES] + [
+            (versioned_box_name(name, version), sizes[name]) for name in TEMPLATE_BOXES
+        ]
+    if method in ("deploy_mandate", "deploy_mandates_batch", "get_current_bytecode_hashes"):
+        return [(name, sizes[name]) for name in TEMPLATE_BOXES]
+    if method == "deploy_legacy_mandate":
+        return []
+    if method in ("stage_legacy_program", "publish_legacy_program"):
+        if publisher is None or len(programs) != 1:
+            raise ValueError(f"{method} needs the publisher and the one program being published")
+        program = programs[0]
+        boxes = [(legacy_stage_box_name(publisher), len(program))]
+        if method == "publish_legacy_program":
+            boxes.append((legacy_program_box_name(program), len(program)))
+        return boxes
+    if method == "deploy_legacy_by_hash":
+        if len(programs) != 2:
+            raise ValueError(f"{method} needs the approval and clear programs")
+        return [(legacy_program_box_name(program), len(program)) for program in programs]
+    raise ValueError(f"Unknown Core method {method}")
+
+
+def template_hash(approval):
+    """
+    Expected approval hash for deploy_mandate, matching Core's template_hash.
+
+    Programs up to TEMPLATE_SLICE_SIZE hash as SHA-256 of the bytecode;
+    larger ones as SHA-256 of the SHA-256 hashes of their two slices.
+    """
+    if len(approval) > MAX_TEMPLATE_SIZE:
+        raise ValueError(f"Template of {len(approval)} bytes exceeds {MAX_TEMPLATE_SIZE}")
+    if len(approval) <= TEMPLATE_SLICE_SIZE:
+        return hashlib.sha256(approval).digest()
+    head, tail = approval[:TEMPLATE_SLICE_SIZE], approval[TEMPLATE_SLICE_SIZE:]
+    return hashlib.sha256(hashlib.sha256(head).digest() + hashlib.sha256(tail).digest()).digest()
+
+
+def box_io_bytes(boxes):
+    """Total box bytes counted against the I/O budget (each box once)"""
+    return sum(dict(boxes).values())
+
+
+def references_needed(boxes):
+    """Box references needed to name every box and cover their bytes"""
+    distinct = dict(boxes)
+    return max(len(distinct), math.ceil(sum(distinct.values()) / BOX_IO_QUOTA))
+
+
+def plan_box_references(calls, app_id=0):
+    """
+    Spread box references across the transactions of a group.
+
+    calls lists the group's transactions in order, each a dict with
+    "boxes" (the (name, size) pairs it touches) and optionally
+    "other_references" (its accounts, assets and apps). Each call names the
+    boxes it touches and then takes the empty references covering the bytes
+    it is first to touch; any shortfall is placed on transactions with free
+    slots. Returns one list of (app_id, name) box references per call.
+
+    Raises ValueError when the group does not have enough free reference
+    slots; add more app calls to the group in that case.
+    """
+    plans = []
+    free_slots = []
+    shares = []
+    seen = set()
+    for call in calls:
+        names = list(dict(call["boxes"]))
+        refs = [(app_id, name) for name in names]
+        first_touch = {name: size for name, size in call["boxes"] if name not in seen}
+        seen.update(first_touch)
+
+        slots = MAX_TXN_REFERENCES - call.get("other_references", 0) - len(refs)
+        if slots < 0:
+            raise ValueError(f"Call touches more boxes than it can reference: {names}")
+        plans.append(refs)
+        free_slots.append(slots)
+        shares.append(max(0, math.ceil(sum(first_touch.values()) / BOX_IO_QUOTA) - len(first_touch)))
+
+    all_boxes = [box for call in calls for box in call["boxes"]]
+    missing = references_needed(all_boxes) - sum(len(refs) for refs in plans)
+
+    # Each call first carries the budget for the bytes it introduces
+    for i, share in enumerate(shares):
+        take = min(share, free_slots[i], max(missing, 0))
+        plans[i].extend([EMPTY_BOX_REF] * take)
+        free_slots[i] -= take
+        missing -= take
+
+    # Spill whatever is left onto any transaction with room
+    for i in range(len(plans)):
+        if missing <= 0:
+            break
+        take = min(free_slots[i], missing)
+        plans[i].extend([EMPTY_BOX_REF] * take)
+        free_slots[i] -= take
+        missing -= take
+
+    if missing > 0:
+        raise ValueError(f"Group is {missing} box references short; add {math.ceil(missing / MAX_TXN_REFERENCES)} more app call(s)")
+    return plans
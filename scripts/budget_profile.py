@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Per-section opcode costs from a debug build's budget checkpoints
+
+Debug builds (compile_contracts.py --budget-checkpoints, deployed with
+deploy_contracts.py --debug-build) log "budget:<name>:" + Itob(remaining
+budget) at named points of process_intent, setup_mandate_standard and Core's
+deploy_mandate. The cost of a section is the budget drop between two
+checkpoints, less the checkpoints' own ops.
+
+The budget is pooled across the group, so a section that makes inner app
+calls includes their cost, and a section that makes op-up calls shows the
+budget they added as a negative cost. Each app call, outer or inner, gets
+its own table.
+
+Usage:
+    python scripts/budget_profile.py <txid> ...        # recent, from algod
+    python scripts/budget_profile.py --file info.json  # saved pending info or simulate response
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+
+from algosdk.v2client import algod
+
+CHECKPOINT_PREFIX = b"budget:"
+
+# byte, global OpcodeBudget, itob, concat, log: whichever side the budget read
+# lands on, five checkpoint ops run between two readings
+CHECKPOINT_OVERHEAD = 5
+
+
+def decode_checkpoints(logs):
+    """(name, remaining budget) for each checkpoint log, in order; other logs are skipped"""
+    checkpoints = []
+    for log in logs:
+        raw = base64.b64decode(log) if isinstance(log, str) else log
+        if not raw.startswith(CHECKPOINT_PREFIX) or raw[-9:-8] != b":":
+            continue
+        name, budget = raw[len(CHECKPOINT_PREFIX):-9], raw[-8:]
+        checkpoints.append((name.decode(), int.from_bytes(budget, "big")))
+    return checkpoints
+
+
+def sections(checkpoints):
+    """Cost of the code between each pair of consecutive checkpoints"""
+    return [
+        {"section": f"{start} -> {end}", "cost": before - after - CHECKPOINT_OVERHEAD}
+        for (start, before), (end, after) in zip(checkpoints, checkpoints[1:])
+    ]
+
+
+def app_calls(tx_info, path="0"):
+    """(path, app id, checkpoints) of each app call with checkpoints, outer first"""
+    txn = tx_info.get("txn", {}).get("txn", {})
+    checkpoints = decode_checkpoints(tx_info.get("logs", []))
+    if checkpoints:
+        yield path, txn.get("apid", tx_info.get("application-index", 0)), checkpoints
+    for i, inner in enumerate(tx_info.get("inner-txns", [])):
+        yield from app_calls(inner, f"{path}.{i}")
+
+
+def profile(tx_infos):
+    """Section costs of every checkpointed app call in the given transactions"""
+    calls = []
+    for i, tx_info in enumerate(tx_infos):
+        for path, app_id, checkpoints in app_calls(tx_info, str(i)):
+            costs = sections(checkpoints)
+            calls.append({
+                "path": path,
+                "app_id": app_id,
+                "start_budget": checkpoints[0][1],
+                "end_budget": checkpoints[-1][1],
+                "sections": costs,
+                "total": sum(section["cost"] for section in costs),
+            })
+    return calls
+
+
+def load_tx_infos(data):
+    """Transaction results from a pending info dict, a list of them or a simulate response"""
+    if isinstance(data, list):
+        return data
+    if "txn-groups" in data:
+        return [result["txn-result"] for group in data["txn-groups"] for result in group["txn-results"]]
+    return [data]
+
+
+def print_profile(calls):
+    """Print one cost table per app call"""
+    if not calls:
+        print("No budget checkpoints found; was a debug build deployed?")
+        return
+    for call in calls:
+        width = max([len("section")] + [len(s["section"]) for s in call["sections"]]) + 2
+        print(f"\nTxn {call['path']} (app {call['app_id']}): budget {call['start_budget']} -> {call['end_budget']}")
+        print("section".ljust(width) + "cost".rjust(8))
+        for section in call["sections"]:
+            note = "  (op-up budget added)" if section["cost"] < 0 else ""
+            print(section["section"].ljust(width) + str(section["cost"]).rjust(8) + note)
+        print("total".ljust(width) + str(call["total"]).rjust(8))
+
+
+def main():
+    """Main profiling function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("txids", nargs="*", help="confirmed transaction ids to fetch from algod")
+    parser.add_argument("--file", help="saved pending transaction info or simulate response (JSON)")
+    parser.add_argument("--json", action="store_true", help="print the profile as JSON")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file) as f:
+            tx_infos = load_tx_infos(json.load(f))
+    elif args.txids:
+        client = algod.AlgodClient(os.getenv("ALGOD_TOKEN", ""),
+                                   os.getenv("ALGOD_ADDRESS", "https://testnet-api.algonode.cloud"))
+        tx_infos = [client.pending_transaction_info(txid) for txid in args.txids]
+    else:
+        parser.error("give transaction ids or --file")
+
+    calls = profile(tx_infos)
+    if args.json:
+        print(json.dumps(calls, indent=2))
+    else:
+        print_profile(calls)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
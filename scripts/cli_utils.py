@@ -3,15 +3,28 @@ import sys
 import json
 import base64
 import hashlib # For SHA-256 hashing
-import time    # To get a unique timestamp for no-op txns
+import time    # For allowance expiry timestamps
 import nacl.signing # New import for Ed25519 signing
+import argparse
+import csv       # Batch payout files
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal # Exact USDC amounts in batch mode
 
 from algosdk.v2client import algod
 from algosdk import account, transaction, encoding, util
+from algosdk.error import AlgodHTTPError
 from algosdk.logic import get_application_address
 
 # Assuming test_mnemonic.py is available and get_account_details_from_mnemonic is in it
 from test_mnemonic import get_account_details_from_mnemonic 
+from fee_planner import MAX_GROUP_SIZE, PLAIN_TXN, apply_fees, plan_group
+from group_packer import layout_group, pack_groups
+from relayer_service import (
+    CONFIRMATION_ROUNDS, CONFIRMED, FAILED, SUBMITTED, PiBaseQueue, RelayerService, intent_id, intent_message
+)
+from telemetry import REGISTRY as telemetry, configure_from_env
 
 # =================================================================================
 # 1. CONFIGURATION
@@ -71,6 +84,16 @@ def emulate_pyteal_itob(val: int) -> bytes:
     num_bytes = (val.bit_length() + 7) // 8
     return val.to_bytes(num_bytes, 'big')
 
+def sign_message_hash(private_key, message_bytes):
+    """Signs SHA-256(message) with the raw Ed25519 key, as the contract's Ed25519Verify expects.
+    
+    private_key is the algosdk base64 private key (str or its ASCII bytes); its first
+    32 decoded bytes are the Ed25519 seed. Returns the raw 64-byte signature.
+    """
+    hashed_message = hashlib.sha256(message_bytes).digest()
+    signing_key = nacl.signing.SigningKey(base64.b64decode(private_key)[:32])
+    return signing_key.sign(hashed_message).signature
+
 # =================================================================================
 # 4. INTERACTION FUNCTIONS
 # =================================================================================
@@ -88,40 +111,51 @@ def handle_deposit_usdc(creator_private_key, creator_address, pi_base_app_id, us
 
     print(f"Preparing to deposit {deposit_amount_usdc / 1_000_000} USDC to {pi_base_app_address}...")
 
-    params = algod_client.suggested_params()
-    params.flat_fee = True 
-    params.fee = 2 * 1000 # Corrected to use 1000 for min_fee (2 transaction group)
+    with telemetry.span("deposit", "build") as span:
+        params = algod_client.suggested_params()
+        params.flat_fee = True 
+        plan = plan_group([PLAIN_TXN, "strahn_pi_base.deposit_usdc"], min_fee=params.min_fee)
 
-    asset_xfer_txn = transaction.AssetTransferTxn(
-        sender=creator_address,
-        sp=params,
-        receiver=pi_base_app_address,
-        amt=deposit_amount_usdc,
-        index=usdc_id
-    )
+        asset_xfer_txn = transaction.AssetTransferTxn(
+            sender=creator_address,
+            sp=params,
+            receiver=pi_base_app_address,
+            amt=deposit_amount_usdc,
+            index=usdc_id
+        )
 
-    app_call_txn = transaction.ApplicationCallTxn(
-        sender=creator_address,
-        sp=params,
-        index=pi_base_app_id,
-        on_complete=transaction.OnComplete.NoOpOC,
-        app_args=[b"deposit_usdc"],
-        foreign_assets=[usdc_id]
-    )
+        app_call_txn = transaction.ApplicationCallTxn(
+            sender=creator_address,
+            sp=params,
+            index=pi_base_app_id,
+            on_complete=transaction.OnComplete.NoOpOC,
+            app_args=[b"deposit_usdc"],
+            foreign_assets=[usdc_id]
+        )
 
-    group_txns = [asset_xfer_txn, app_call_txn]
-    gid = transaction.calculate_group_id(group_txns)
-    # Corrected: Use .group instead of .group_id for assignment
-    for txn in group_txns:
-        txn.group = gid 
+        group_txns = apply_fees([asset_xfer_txn, app_call_txn], plan)
+        gid = transaction.calculate_group_id(group_txns)
+        # Corrected: Use .group instead of .group_id for assignment
+        for txn in group_txns:
+            txn.group = gid 
+        
+        # A deposit is traced by its app call's txid
+        trace = [app_call_txn.get_txid()]
+        span["traces"] = trace
     
-    signed_txns = []
-    for txn in group_txns:
-        signed_txns.append(txn.sign(creator_private_key))
+    with telemetry.span("deposit", "sign", traces=trace):
+        signed_txns = []
+        for txn in group_txns:
+            signed_txns.append(txn.sign(creator_private_key))
     
     try:
-        algod_client.send_transactions(signed_txns)
-        tx_info = wait_for_confirmation(algod_client, gid)
+        with telemetry.span("deposit", "submit", traces=trace, txid=trace[0]):
+            algod_client.send_transactions(signed_txns)
+        with telemetry.span("deposit", "confirm", traces=trace, txid=trace[0]) as span:
+            tx_info = wait_for_confirmation(algod_client, trace[0])
+            span["round"] = tx_info.get("confirmed-round")
+        with telemetry.span("deposit", "observe", traces=trace, txid=trace[0]):
+            telemetry.observe_logs(tx_info, "usdc_deposited")
         print(f"USDC deposit successful! Transaction Group ID: {gid.hex()}")
         
     except Exception as e:
@@ -152,9 +186,18 @@ def handle_process_intent(creator_private_key, creator_address, pi_base_app_id,
         print('Invalid fee. Fee must be a non-negative number. Payment cancelled.')
         return
 
+    top_up_str = input('Enter USDC to top up in the same group (0 for none): ')
+    try:
+        top_up_float = float(top_up_str or 0)
+        if top_up_float < 0: raise ValueError
+    except ValueError:
+        print('Invalid top-up. Top-up must be a non-negative number. Payment cancelled.')
+        return
+
     destination_raw_address = encoding.decode_address(dest_addr_str)
     send_amount_usdc = int(amount_float * 1_000_000) # Convert to microUSDC with decimals
     relayer_fee_usdc = int(relayer_fee_float * 1_000_000) # Convert to microUSDC with decimals
+    top_up_usdc = int(top_up_float * 1_000_000) # Convert to microUSDC with decimals
     
     # --- IMPORTANT: Off-chain message construction (must perfectly match contract) ---
     # Contract: Concat(Bytes("SPP_V1:"), Itob(Global.current_application_id()), Itob(nonce), destination, Itob(amount), Itob(relayer_fee))
@@ -171,80 +214,466 @@ def handle_process_intent(creator_private_key, creator_address, pi_base_app_id,
     # Hash the message (SHA-256)
     hashed_message = hashlib.sha256(message_bytes_for_signing).digest()
     
-    # --- CRITICAL FIX: Use nacl.signing for raw Ed25519 signature ---
-    # Create SigningKey from the private key bytes
-    # Private key for nacl must be 32 bytes (which account.private_key_from_seed/derive gives)
-    nacl_private_key = creator_private_key[:32] 
-    
-    # Create SigningKey from the correctly sized private key bytes
-    signing_key = nacl.signing.SigningKey(nacl_private_key)
-    # Sign the HASHED message. nacl produces a 64-byte raw signature.
-    # The signature object contains both the message and the signature; we want just the signature.
-    signed_offchain_nacl = signing_key.sign(hashed_message) # This creates a SignedMessage object
-    signature_bytes = signed_offchain_nacl.signature # This is the raw 64-byte signature Ed25519Verify expects
+    # Raw Ed25519 signature over the hash (nacl, not algosdk's prefixed sign_bytes)
+    trace = [f"{pi_base_app_id}:{current_nonce}"]
+    with telemetry.span("intent", "sign", traces=trace):
+        signature_bytes = sign_message_hash(creator_private_key, message_bytes_for_signing)
 
     print(f"\nMessage for signing (hex): {message_bytes_for_signing.hex()}")
     print(f"Hashed message (hex): {hashed_message.hex()}")
     print(f"Generated signature (base64): {base64.b64encode(signature_bytes).decode('utf-8')}")
     
+    with telemetry.span("intent", "build", traces=trace):
+        params = algod_client.suggested_params()
+        params.flat_fee = True
+        
+        # The PI Base raises its own opcode budget with inner op-up calls, so a
+        # single transaction is enough. Its fee pools the op-ups and both transfers.
+        # A top-up transferred just before the call settles with the payment.
+        methods = ([PLAIN_TXN] if top_up_usdc else []) + ["strahn_pi_base.process_intent"]
+        plan = plan_group(methods, min_fee=params.min_fee)
+
+        main_app_call_txn = transaction.ApplicationCallTxn(
+            sender=creator_address, # Creator acts as relayer here
+            sp=params,
+            index=pi_base_app_id,
+            on_complete=transaction.OnComplete.NoOpOC,
+            app_args=[
+                b"process_intent",
+                destination_raw_address,
+                emulate_pyteal_itob(send_amount_usdc),
+                emulate_pyteal_itob(relayer_fee_usdc),
+                emulate_pyteal_itob(current_nonce),
+                signature_bytes # Raw 64-byte signature
+            ],
+            foreign_assets=[usdc_id], # Indicate asset used in inner transfer
+            accounts=[dest_addr_str], # Receiver of the inner transfer
+            boxes=[(0, b"fee:" + encoding.decode_address(creator_address))] # Relayer fee ledger credited
+        )
+        
+        group_txns = [main_app_call_txn]
+        if top_up_usdc:
+            group_txns.insert(0, transaction.AssetTransferTxn(
+                sender=creator_address,
+                sp=params,
+                receiver=get_application_address(pi_base_app_id),
+                amt=top_up_usdc,
+                index=usdc_id
+            ))
+        group_txns = apply_fees(group_txns, plan)
+        if len(group_txns) > 1:
+            gid = transaction.calculate_group_id(group_txns)
+            for txn in group_txns:
+                txn.group = gid
+    
+    with telemetry.span("intent", "sign", traces=trace):
+        signed_txns = [txn.sign(creator_private_key) for txn in group_txns]
+    txid = group_txns[-1].get_txid()
+    
+    try:
+        with telemetry.span("intent", "submit", traces=trace, txid=txid):
+            algod_client.send_transactions(signed_txns)
+        with telemetry.span("intent", "confirm", traces=trace, txid=txid) as span:
+            tx_info = wait_for_confirmation(algod_client, txid)
+            span["round"] = tx_info.get("confirmed-round")
+        with telemetry.span("intent", "observe", traces=trace, txid=txid):
+            telemetry.observe_logs(tx_info, "payment_processed")
+        print(f"Payment intent processed successfully! Transaction ID: {txid}")
+        
+    except Exception as e:
+        print(f"Processing intent failed: {e}")
+
+def handle_claim_relayer_fees(creator_private_key, creator_address, pi_base_app_id, usdc_id):
+    print("\n--- Claim Accrued Relayer Fees ---")
+    
+    fee_box_name = b"fee:" + encoding.decode_address(creator_address)
+    try:
+        accrued = algod_client.application_box_by_name(pi_base_app_id, fee_box_name)
+        accrued_usdc = int.from_bytes(base64.b64decode(accrued['value']), 'big')
+    except Exception:
+        print("No relayer fees accrued for this account.")
+        return
+    
     params = algod_client.suggested_params()
     params.flat_fee = True
+    params.fee = plan_group(["strahn_pi_base.claim_relayer_fees"], min_fee=params.min_fee)["total_fee"]
     
-    # Increase dynamic cost budget using extra calls (Each provides 700 budget units)
-    num_extra_noop_txns = 2 # 2 extra no-ops for a total of 3 txns (main + 2 noop) => 2100 budget
-    params.fee = 1000 # Base fee for each txn in the group
-
-    # 1. Primary app call for process_intent
-    main_app_call_txn = transaction.ApplicationCallTxn(
+    claim_txn = transaction.ApplicationCallTxn(
         sender=creator_address, # Creator acts as relayer here
         sp=params,
         index=pi_base_app_id,
         on_complete=transaction.OnComplete.NoOpOC,
-        app_args=[
-            b"process_intent",
-            destination_raw_address,
-            emulate_pyteal_itob(send_amount_usdc),
-            emulate_pyteal_itob(relayer_fee_usdc),
-            emulate_pyteal_itob(current_nonce),
-            signature_bytes # Raw 64-byte signature
-        ],
-        foreign_assets=[usdc_id] # Indicate asset used in inner transfer
+        app_args=[b"claim_relayer_fees"],
+        foreign_assets=[usdc_id],
+        boxes=[(0, fee_box_name)]
     )
     
-    txns_in_group = [main_app_call_txn]
-    for i in range(num_extra_noop_txns):
-        noop_arg = b"noop_budget_" + str(i).encode() + b"_" + str(int(time.time())).encode()
-        noop_txn = transaction.ApplicationCallTxn(
-            sender=creator_address,
-            sp=params, 
-            index=pi_base_app_id,
-            on_complete=transaction.OnComplete.NoOpOC,
-            app_args=[noop_arg],
-        )
-        txns_in_group.append(noop_txn)
+    try:
+        tx_id = algod_client.send_transaction(claim_txn.sign(creator_private_key))
+        wait_for_confirmation(algod_client, tx_id)
+        print(f"Claimed {accrued_usdc / 1_000_000} USDC of relayer fees. Transaction ID: {tx_id}")
+        
+    except Exception as e:
+        print(f"Claiming relayer fees failed: {e}")
+
+def handle_grant_allowance(creator_private_key, creator_address, pi_base_app_id, current_nonce):
+    print("\n--- Grant Relayer Spending Allowance ---")
+    
+    relayer_addr_str = input('Enter relayer Algorand address: ')
+    if not encoding.is_valid_address(relayer_addr_str):
+        print('Invalid address. Grant cancelled.')
+        return
+
+    try:
+        cap_usdc = int(float(input('Enter spending cap in USDC (e.g., 250): ')) * 1_000_000)
+        valid_hours = int(input('Enter validity in hours (e.g., 24): '))
+        if cap_usdc <= 0 or valid_hours <= 0: raise ValueError
+    except ValueError:
+        print('Invalid cap or validity. Grant cancelled.')
+        return
 
-    # Group and sign all transactions
-    gid = transaction.calculate_group_id(txns_in_group)
-    for txn in txns_in_group:
-        txn.group = gid # Corrected assignment to .group
+    relayer_raw_address = encoding.decode_address(relayer_addr_str)
+    expiry_ts = int(time.time()) + valid_hours * 3600
     
-    signed_txns = []
-    for txn in txns_in_group:
-        signed_txns.append(txn.sign(creator_private_key))
+    # Contract: Concat(Bytes("ALLOWANCE_V1:"), Itob(app_id), Itob(nonce), relayer, Itob(cap), Itob(expiry))
+    message_bytes_for_signing = b"".join([
+        b"ALLOWANCE_V1:",
+        emulate_pyteal_itob(pi_base_app_id),
+        emulate_pyteal_itob(current_nonce),
+        relayer_raw_address,
+        emulate_pyteal_itob(cap_usdc),
+        emulate_pyteal_itob(expiry_ts)
+    ])
+    signature_bytes = sign_message_hash(creator_private_key, message_bytes_for_signing)
+
+    params = algod_client.suggested_params()
+    params.flat_fee = True
+    params.fee = plan_group(["strahn_pi_base.grant_allowance"], min_fee=params.min_fee)["total_fee"]
+
+    grant_txn = transaction.ApplicationCallTxn(
+        sender=creator_address,
+        sp=params,
+        index=pi_base_app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[
+            b"grant_allowance",
+            relayer_raw_address,
+            cap_usdc.to_bytes(8, 'big'),
+            expiry_ts.to_bytes(8, 'big'),
+            current_nonce.to_bytes(8, 'big'),
+            signature_bytes
+        ],
+        boxes=[(0, b"allowance:" + relayer_raw_address)] # The allowance box being written
+    )
     
     try:
-        algod_client.send_transactions(signed_txns)
-        tx_info = wait_for_confirmation(algod_client, gid) 
-        print(f"Payment intent processed successfully! Transaction Group ID: {gid.hex()}")
+        tx_id = algod_client.send_transaction(grant_txn.sign(creator_private_key))
+        wait_for_confirmation(algod_client, tx_id)
+        print(f"Allowance of {cap_usdc / 1_000_000} USDC granted to {relayer_addr_str} for {valid_hours}h.")
+        print("Note: the PI Base account pays the allowance box's minimum balance.")
         
     except Exception as e:
-        print(f"Processing intent failed: {e}")
+        print(f"Granting allowance failed: {e}")
 
 # =================================================================================
-# 5. MAIN SCRIPT LOGIC
+# 5. BATCH MODE
+# =================================================================================
+
+# Batch mode streams a payout file through parse -> encode -> sign -> group ->
+# submit -> confirm. At most one group of rows is held before it is submitted
+# and at most `concurrency` groups await confirmation, so memory stays
+# bounded however long the file is. Every row's outcome is appended to a
+# results file, and a rerun with the same results file resumes from it.
+#
+# Nonces must land in order, so groups are submitted one at a time (algod's
+# pool evaluates each on top of those before it) while confirmations overlap.
+# A row's nonce and txid are recorded before its group is sent, and the group
+# is only valid for BATCH_VALIDITY_ROUNDS. A resumed run waits that out before
+# paying an unconfirmed row again, so no row is paid twice. The batch must be
+# the only signer for the PI Base while it runs.
+
+BATCH_CONCURRENCY = 4  # Groups awaiting confirmation at once
+BATCH_VALIDITY_ROUNDS = 20  # A submitted group is dead after this many rounds
+
+def read_payout_rows(path):
+    """Yields (row number, fields) from a CSV file with a header row, or raw lines of a .jsonl file"""
+    with open(path, newline="") as f:
+        if path.endswith(".jsonl"):
+            rows = (line for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row, fields in enumerate(rows, start=1):
+            yield row, fields
+
+def usdc_units(value):
+    """Whole USDC (decimals allowed, e.g. "5.25") to micro-USDC, exactly"""
+    units = Decimal(str(value).strip()) * 1_000_000
+    if units != units.to_integral_value():
+        raise ValueError(f"{value} has more than 6 decimals")
+    return int(units)
+
+def parse_payout(fields):
+    """Intent values of a payout row: destination, amount and optional relayer_fee (whole USDC)"""
+    try:
+        if isinstance(fields, str):
+            fields = json.loads(fields)
+        destination = fields["destination"].strip()
+        amount = usdc_units(fields["amount"])
+        relayer_fee = usdc_units(fields.get("relayer_fee") or 0)
+    except (KeyError, TypeError, AttributeError, ValueError, ArithmeticError) as e:
+        raise ValueError(f"Malformed row: {e!r}")
+    if not encoding.is_valid_address(destination):
+        raise ValueError(f"Invalid address {destination}")
+    if amount <= 0 or relayer_fee < 0 or amount + relayer_fee >= 2 ** 64:
+        raise ValueError("amount must be positive and relayer_fee non-negative")
+    return {"destination": encoding.decode_address(destination), "amount": amount, "relayer_fee": relayer_fee}
+
+def load_batch_results(path):
+    """
+    Resume state from a results file: the row all rows up to which are
+    finished, the finished rows after it, and the submitted rows without an
+    outcome. Rows finish nearly in order, so both collections stay small.
+    """
+    done_through, finished, submitted = 0, set(), {}
+    if not os.path.exists(path):
+        return done_through, finished, submitted
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line torn by a crash
+            row = record["row"]
+            if record["status"] == SUBMITTED:
+                submitted[row] = record
+                continue
+            submitted.pop(row, None)
+            finished.add(row)
+            while done_through + 1 in finished:
+                done_through += 1
+                finished.discard(done_through)
+    return done_through, finished, submitted
+
+def chunked(items, size):
+    """Lists of up to size consecutive items"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class PayoutBatch:
+    """One run of a payout file against a PI Base, paid by its creator"""
+
+    def __init__(self, client, private_key, pi_base_app_id, results_path,
+                 concurrency=BATCH_CONCURRENCY, group_size=MAX_GROUP_SIZE):
+        self.client = client
+        self.private_key = private_key
+        self.concurrency = concurrency
+        self.group_size = group_size
+        # The relayer's group building, with the creator as relayer
+        self.service = RelayerService(client, private_key, max_in_flight=1, max_group_size=group_size,
+                                      telemetry=telemetry)
+        state = self.service.pi_base_state(pi_base_app_id)
+        self.chain_nonce = state.get("creator_nonce", 0)
+        self.queue = PiBaseQueue(pi_base_app_id, state["creator_addr"], state["usdc_id"], self.chain_nonce)
+        self.next_nonce = self.chain_nonce
+
+        self.min_fee = self.service.suggested_params().min_fee
+
+        self.done_through, self.finished, self.resumed = load_batch_results(results_path)
+        torn = False
+        if os.path.exists(results_path) and os.path.getsize(results_path):
+            with open(results_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read() != b"\n"
+        self.results = open(results_path, "a")
+        if torn:
+            self.results.write("\n")
+        self.counts = {CONFIRMED: 0, FAILED: 0, "skipped": 0}
+        self.aborted = None
+        self.lock = threading.Lock()
+
+    def record(self, row, status, **fields):
+        """Append a row's outcome to the results file"""
+        line = json.dumps({"row": row, "status": status, **fields})
+        with self.lock:
+            self.results.write(line + "\n")
+            self.results.flush()
+            if status in self.counts:
+                self.counts[status] += 1
+
+    def reconcile(self):
+        """
+        Settle the rows a stopped run left submitted. Once their groups'
+        last valid round has passed, a row whose nonce the chain has used was
+        paid; any other can no longer land and is paid again.
+        """
+        if not self.resumed:
+            return
+        last_valid = max(record["last_valid"] for record in self.resumed.values())
+        top_nonce = max(record["nonce"] for record in self.resumed.values())
+        status = self.client.status()
+        while self.chain_nonce <= top_nonce and status["last-round"] <= last_valid:
+            print(f"Waiting for round {last_valid + 1} to settle {len(self.resumed)} unconfirmed rows...")
+            status = self.client.status_after_block(status["last-round"])
+            self.chain_nonce = self.service.pi_base_state(self.queue.app_id).get("creator_nonce", 0)
+        for row, record in self.resumed.items():
+            if record["nonce"] < self.chain_nonce:
+                self.record(row, CONFIRMED, nonce=record["nonce"], txid=record["txid"])
+                self.finished.add(row)
+        self.resumed = {}
+        self.next_nonce = self.chain_nonce
+
+    def pending_payouts(self, rows):
+        """Parsed rows still to pay; finished rows are skipped and malformed ones fail"""
+        for row, fields in rows:
+            if row <= self.done_through or row in self.finished:
+                self.finished.discard(row)
+                self.counts["skipped"] += 1
+                continue
+            try:
+                payout = parse_payout(fields)
+            except ValueError as e:
+                self.record(row, FAILED, error=str(e))
+                continue
+            payout["row"] = row
+            yield payout
+
+    def sign(self, payouts):
+        """Give each payout the next nonce and the creator's signature over its intent"""
+        for payout in payouts:
+            payout["app_id"] = self.queue.app_id
+            payout["nonce"] = self.next_nonce
+            self.next_nonce += 1
+            message = intent_message(self.queue.app_id, payout["nonce"], payout["destination"],
+                                     payout["amount"], payout["relayer_fee"])
+            payout["signature"] = sign_message_hash(self.private_key, message)
+
+    def send(self, members, layout, params):
+        """Record and send one group; returns its txids, raising AlgodHTTPError if algod rejects it"""
+        keys = [intent_id(payout["app_id"], payout["nonce"]) for payout in members]
+        with telemetry.span("intent", "build", traces=keys, group_size=len(members)):
+            txns = self.service.build_group(self.queue, members, layout, params)
+        with telemetry.span("intent", "sign", traces=keys):
+            signed = [txn.sign(self.private_key) for txn in txns]
+        txids = [txn.get_txid() for txn in signed]
+
+        # Recorded before sending, so a resumed run knows what may still land
+        for payout, txid in zip(members, txids):
+            self.record(payout["row"], SUBMITTED, nonce=payout["nonce"], txid=txid, last_valid=params.last)
+        with telemetry.span("intent", "submit", traces=keys, txids=txids):
+            self.client.send_transactions(signed)
+        return txids
+
+    def submit(self, members, layout, params):
+        """
+        Send one signed group; returns the (members, txids) of each group algod
+        accepted.
+
+        A rejected group is atomic, so one bad row sinks the rest. Its rows
+        are sent again one at a time, and only those rejected alone fail.
+        A rejected send leaves its nonce unused, and the next row takes it.
+        """
+        try:
+            return [(members, self.send(members, layout, params))]
+        except AlgodHTTPError as e:
+            self.next_nonce = members[0]["nonce"]
+            if len(members) == 1:
+                self.record(members[0]["row"], FAILED, error=str(e))
+                return []
+
+        sent = []
+        for payout in members:
+            self.sign([payout])
+            single = layout_group([self.service.intent_call(self.queue, payout)], self.service.costs, self.min_fee)
+            try:
+                sent.append(([payout], self.send([payout], single, params)))
+            except AlgodHTTPError as e:
+                self.record(payout["row"], FAILED, error=str(e))
+                self.next_nonce = payout["nonce"]
+        return sent
+
+    def confirm(self, members, txids):
+        """Wait for a group and record its rows; a group that never confirms stops the run"""
+        keys = [intent_id(payout["app_id"], payout["nonce"]) for payout in members]
+        try:
+            with telemetry.span("intent", "confirm", traces=keys, txids=txids) as span:
+                info = transaction.wait_for_confirmation(self.client, txids[0], CONFIRMATION_ROUNDS)
+                span["round"] = info["confirmed-round"]
+        except Exception as e:
+            self.aborted = f"rows {members[0]['row']}-{members[-1]['row']} not confirmed: {e}"
+            return
+        for payout, txid in zip(members, txids):
+            self.record(payout["row"], CONFIRMED, nonce=payout["nonce"], txid=txid, round=info["confirmed-round"])
+
+    def run(self, path):
+        """Pay every unfinished row of a payout file; returns the counts of outcomes"""
+        self.reconcile()
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for chunk in chunked(self.pending_payouts(read_payout_rows(path)), self.group_size):
+                calls = [self.service.intent_call(self.queue, payout) for payout in chunk]
+                for group in pack_groups(calls, self.service.costs, self.min_fee):
+                    while len(in_flight) >= self.concurrency:
+                        in_flight.popleft().result()
+                    if self.aborted:
+                        break
+                    members = [chunk[i] for i in group["calls"]]
+                    params = self.service.suggested_params()
+                    params.last = params.first + BATCH_VALIDITY_ROUNDS
+                    self.sign(members)
+                    for sent, txids in self.submit(members, group, params):
+                        in_flight.append(executor.submit(self.confirm, sent, txids))
+                if self.aborted:
+                    break
+        self.results.close()
+        return self.counts
+
+def batch_main(argv):
+    """Non-interactive mode: pay every row of a CSV or JSONL payout file"""
+    parser = argparse.ArgumentParser(prog="cli_utils.py batch",
+                                     description="Pay a payout file from the PI Base in deployment_info.json")
+    parser.add_argument("payouts", help="CSV with a header row, or .jsonl; fields destination, amount, relayer_fee (USDC)")
+    parser.add_argument("--results", help="results file to append to and resume from (default: <payouts>.results.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="groups awaiting confirmation at once")
+    parser.add_argument("--group-size", type=int, default=MAX_GROUP_SIZE, help="intents per group at most")
+    args = parser.parse_args(argv)
+
+    creator_private_key, creator_address = get_account_details_from_mnemonic()
+    try:
+        with open("deployment_info.json", "r") as f:
+            pi_base_app_id = json.load(f)["pi_base_app_id"]
+    except (FileNotFoundError, KeyError):
+        print("Error: pi_base_app_id not found in deployment_info.json. Please run deploy.py first.")
+        return 1
+
+    results_path = args.results or args.payouts + ".results.jsonl"
+    batch = PayoutBatch(algod_client, creator_private_key.encode(), pi_base_app_id, results_path,
+                        concurrency=args.concurrency, group_size=args.group_size)
+    counts = batch.run(args.payouts)
+    print(f"Confirmed {counts[CONFIRMED]}, failed {counts[FAILED]}, already finished {counts['skipped']}.")
+    print(f"Results: {results_path}")
+    if batch.aborted:
+        print(f"Stopped early: {batch.aborted}. Run again with the same results file to resume.")
+        return 1
+    return 0
+
+# =================================================================================
+# 6. MAIN SCRIPT LOGIC
 # =================================================================================
 
 def main():
+    # Optional span file and metrics endpoint (STRAHN_TRACE_FILE, STRAHN_METRICS_PORT)
+    configure_from_env()
+    
+    # Non-interactive: python cli_utils.py batch payouts.csv [--results ...]
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        sys.exit(batch_main(sys.argv[2:]))
+    
     try:
         creator_private_key, creator_address = get_account_details_from_mnemonic()
         creator_private_key = creator_private_key.encode()
@@ -308,9 +737,11 @@ def main():
         print("\nWhat would you like to do?")
         print("1. Deposit tUSDC to PI Base")
         print("2. Process One-Time Payment Intent from PI Base")
-        print("3. Exit")
+        print("3. Grant Spending Allowance to a Relayer")
+        print("4. Claim Accrued Relayer Fees")
+        print("5. Exit")
         
-        choice = input("Enter your choice (1, 2, or 3): ").strip()
+        choice = input("Enter your choice (1-5): ").strip()
         
         if choice == '1':
             handle_deposit_usdc(creator_private_key, creator_address, pi_base_app_id, usdc_id)
@@ -325,9 +756,19 @@ def main():
             except Exception as e:
                 print(f"Could not refresh nonce for next action: {e}")
         elif choice == '3':
+            handle_grant_allowance(creator_private_key, creator_address, pi_base_app_id, current_nonce)
+            # Grants consume a nonce too
+            try:
+                current_nonce = get_app_global_state(algod_client, pi_base_app_id).get('creator_nonce', current_nonce)
+                print(f"Nonce refreshed: Current on-chain nonce is now {current_nonce}")
+            except Exception as e:
+                print(f"Could not refresh nonce for next action: {e}")
+        elif choice == '4':
+            handle_claim_relayer_fees(creator_private_key, creator_address, pi_base_app_id, usdc_id)
+        elif choice == '5':
             break
         else:
-            print("Invalid choice. Please enter 1, 2, or 3.")
+            print("Invalid choice. Please enter a number from 1 to 5.")
 
     print("Exiting interactive script.")
 
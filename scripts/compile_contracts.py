@@ -7,16 +7,30 @@ import os
 import sys
 from pathlib import Path
 
-# Add the parent directory to the path to import contracts
+# Add the parent directory to the path to import contracts, and the contracts
+# directory itself so their `utils.common` imports resolve
 sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "contracts"))
 
 from pyteal import *
+from utils.common import TEMPLATE_CONFIG_ENV, BUDGET_CHECKPOINTS_ENV, BUDGET_CHECKPOINT_PREFIX
 from contracts import (
     strahn_core_approval, strahn_core_clear,
     strahn_pi_base_approval, strahn_pi_base_clear,
-    mandate_record_approval, mandate_record_clear
+    strahn_pi_shared_approval, strahn_pi_shared_clear,
+    mandate_record_approval, mandate_record_clear,
+    mandate_record_packed_approval, mandate_record_packed_clear
 )
 
+# TEAL version each contract targets (matches each module's __main__ build)
+CONTRACT_VERSIONS = {
+    "strahn_core": 10,  # box_resize needs v10
+    "strahn_pi_base": 8,
+    "strahn_pi_shared": 8,
+    "mandate_record": 8,
+    "mandate_record_packed": 8,
+}
+
 def ensure_build_directory():
     """Ensure the build directory exists"""
     build_dir = Path(__file__).parent.parent / "build"
@@ -26,19 +40,20 @@ def ensure_build_directory():
 def compile_contract(approval_func, clear_func, contract_name):
     """Compile a single contract to TEAL"""
     print(f"Compiling {contract_name}...")
+    version = CONTRACT_VERSIONS.get(contract_name, 8)
     
     # Compile approval program
     approval_teal = compileTeal(
         approval_func(),
         Mode.Application,
-        version=8
+        version=version
     )
     
     # Compile clear program
     clear_teal = compileTeal(
         clear_func(),
         Mode.Application,
-        version=8
+        version=version
     )
     
     return approval_teal, clear_teal
@@ -47,10 +62,24 @@ def main():
     """Main compilation function"""
     build_dir = ensure_build_directory()
     
+    # Bake immutable configuration in as template variables (see template_config.py).
+    # Programs are evaluated at first compile, so the mode must be set before.
+    templated = "--template-config" in sys.argv
+    if templated:
+        os.environ[TEMPLATE_CONFIG_ENV] = "1"
+    
+    # Debug builds log the opcode budget at checkpoints (see budget_profile.py)
+    debug = "--budget-checkpoints" in sys.argv
+    if debug:
+        os.environ[BUDGET_CHECKPOINTS_ENV] = "1"
+    suffix = (".templated" if templated else "") + (".debug" if debug else "")
+    
     contracts = [
         (strahn_core_approval, strahn_core_clear, "strahn_core"),
         (strahn_pi_base_approval, strahn_pi_base_clear, "strahn_pi_base"),
+        (strahn_pi_shared_approval, strahn_pi_shared_clear, "strahn_pi_shared"),
         (mandate_record_approval, mandate_record_clear, "mandate_record"),
+        (mandate_record_packed_approval, mandate_record_packed_clear, "mandate_record_packed"),
     ]
     
     print("Starting contract compilation...")
@@ -61,6 +90,16 @@ def main():
                 approval_func, clear_func, contract_name
             )
             
+            # Only approval programs with configuration to fill have a templated
+            # build, and only those with checkpoints have a debug build
+            if suffix:
+                if (not templated or "TMPL_" in approval_teal) and \
+                        (not debug or BUDGET_CHECKPOINT_PREFIX in approval_teal):
+                    with open(build_dir / f"{contract_name}_approval{suffix}.teal", "w") as f:
+                        f.write(approval_teal)
+                    print(f"✓ {contract_name} {suffix[1:].replace('.', ' ')} approval compiled successfully")
+                continue
+            
             # Write approval program
             approval_path = build_dir / f"{contract_name}_approval.teal"
             with open(approval_path, "w") as f:
@@ -16,16 +16,21 @@ import base64
 sys.path.append(str(Path(__file__).parent.parent))
 
 class ContractDeployer:
-    def __init__(self, algod_client, private_key):
+    def __init__(self, algod_client, private_key, debug_build=False):
         self.algod_client = algod_client
         self.private_key = private_key
         self.sender = account.address_from_private_key(private_key)
+        # Deploy the budget-checkpoint builds where a contract has one
+        self.debug_build = debug_build
         
     def load_contract(self, contract_name):
         """Load compiled TEAL programs"""
         build_dir = Path(__file__).parent.parent / "build"
         
         approval_path = build_dir / f"{contract_name}_approval.teal"
+        debug_path = build_dir / f"{contract_name}_approval.debug.teal"
+        if self.debug_build and debug_path.exists():
+            approval_path = debug_path
         clear_path = build_dir / f"{contract_name}_clear.teal"
         
         with open(approval_path, "r") as f:
@@ -53,6 +58,9 @@ class ContractDeployer:
         # Get suggested parameters
         params = self.algod_client.suggested_params()
         
+        # Programs over one 2KB page need extra pages (approval + clear share them)
+        extra_pages = (len(approval_program) + len(clear_program) - 1) // 2048
+        
         # Create application transaction
         txn = ApplicationCreateTxn(
             sender=self.sender,
@@ -62,7 +70,8 @@ class ContractDeployer:
             clear_program=clear_program,
             global_schema=global_schema,
             local_schema=local_schema,
-            app_args=app_args or []
+            app_args=app_args or [],
+            extra_pages=extra_pages
         )
         
         # Sign and send transaction
@@ -101,14 +110,20 @@ def main():
         print(f"Error: Invalid mnemonic: {e}")
         return 1
     
-    deployer = ContractDeployer(algod_client, private_key)
+    # --debug-build deploys the checkpoint builds from
+    # `compile_contracts.py --budget-checkpoints`; never use them in production
+    debug_build = "--debug-build" in sys.argv
+    if debug_build:
+        print("Warning: deploying debug builds with opcode budget checkpoints")
+    
+    deployer = ContractDeployer(algod_client, private_key, debug_build=debug_build)
     
     try:
         # Deploy Strahn Core (factory contract)
         print("Deploying Strahn Core contract...")
         core_app_id, core_address = deployer.deploy_contract(
             "strahn_core",
-            global_schema={"num_uints": 1, "num_byte_slices": 1},  # owner_addr
+            global_schema={"num_uints": 4, "num_byte_slices": 1},  # bytecode_version, template_packed, approval/clear_written; owner_addr
             local_schema={"num_uints": 0, "num_byte_slices": 0}
         )
         
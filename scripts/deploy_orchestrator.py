@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Dependency-graph deployment orchestrator
+
+A deployment is a list of named steps, each naming the steps it runs after.
+A step starts once those have finished, and independent steps run
+concurrently. Each step returns a dict of values that later steps read from
+StepContext.info.
+
+After every checkpointed step the values and the step's status are saved
+to deployment_info.json, so a rerun skips finished steps and a failed
+deploy resumes where it stopped. Steps with checkpoint=False, such as
+compiling programs, are cheap and side-effect free. They are not saved and
+rerun whenever a pending step needs their values.
+
+Steps send transactions through StepContext.send, which saves the txids
+before sending. If a deploy stops after a transaction was sent but before
+its step finished, StepContext.recover on the rerun returns the confirmed
+transaction instead of sending it again.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from algosdk import transaction
+from algosdk.error import AlgodHTTPError, ConfirmationTimeoutError, TransactionRejectedError
+
+CONFIRMATION_ROUNDS = 10
+
+# Step statuses
+DONE = "done"
+FAILED = "failed"
+
+
+class DeploymentFailed(Exception):
+    """A step failed; the steps that finished are saved for the rerun"""
+
+
+class Step:
+    """A named unit of deployment work, run after the steps it depends on"""
+
+    def __init__(self, name, run, after=(), checkpoint=True):
+        self.name = name
+        self.run = run  # run(StepContext) -> dict of values
+        self.after = tuple(after)
+        self.checkpoint = checkpoint
+
+
+def validate_steps(steps):
+    """Raise ValueError for duplicate names, unknown dependencies or cycles"""
+    by_name = {}
+    for step in steps:
+        if step.name in by_name:
+            raise ValueError(f"Duplicate step {step.name}")
+        by_name[step.name] = step
+    for step in steps:
+        for dep in step.after:
+            if dep not in by_name:
+                raise ValueError(f"Step {step.name} runs after unknown step {dep}")
+
+    # Kahn's algorithm: a cycle leaves steps that never become ready
+    remaining = {step.name: len(step.after) for step in steps}
+    ready = [name for name, count in remaining.items() if count == 0]
+    while ready:
+        name = ready.pop()
+        del remaining[name]
+        for step in steps:
+            if name in step.after:
+                remaining[step.name] -= 1
+                if remaining[step.name] == 0:
+                    ready.append(step.name)
+    if remaining:
+        raise ValueError(f"Steps depend on each other in a cycle: {', '.join(sorted(remaining))}")
+    return by_name
+
+
+class StepContext:
+    """What a running step sees: the deployment's values and a way to send transactions"""
+
+    def __init__(self, orchestrator, name):
+        self.orchestrator = orchestrator
+        self.name = name
+        self.client = orchestrator.client
+
+    @property
+    def info(self):
+        return self.orchestrator.values
+
+    def send(self, signed_txns, confirm=True):
+        """
+        Send signed transactions, saving their txids first; waits for the last
+        one unless confirm is False, and returns its confirmed info or txid.
+        """
+        txids = [txn.get_txid() for txn in signed_txns]
+        self.orchestrator.record(self.name, txids=txids)
+        self.client.send_transactions(signed_txns)
+        if not confirm:
+            return txids[-1]
+        return self.confirm(txids[-1])
+
+    def confirm(self, txid):
+        """Wait for a transaction; returns its pending info"""
+        return transaction.wait_for_confirmation(self.client, txid, CONFIRMATION_ROUNDS)
+
+    def recover(self):
+        """Confirmed info of this step's last saved send, or None if it did not land"""
+        txids = self.orchestrator.steps_state.get(self.name, {}).get("txids")
+        if not txids:
+            return None
+        try:
+            return self.confirm(txids[-1])
+        except (AlgodHTTPError, ConfirmationTimeoutError, TransactionRejectedError):
+            return None
+
+
+class DeploymentOrchestrator:
+    """Runs a step graph concurrently, checkpointing to a JSON file"""
+
+    def __init__(self, client, steps, path="deployment_info.json", initial=None, fresh=False, max_workers=4):
+        self.client = client
+        self.steps = validate_steps(steps)
+        self.path = path
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+
+        saved = {}
+        if os.path.exists(path) and not fresh:
+            with open(path) as f:
+                saved = json.load(f)
+            if "steps" not in saved:
+                raise ValueError(f"{path} is not a deployment checkpoint; rerun with --fresh to start over")
+            for key, value in (initial or {}).items():
+                if key in saved and saved[key] != value:
+                    raise ValueError(f"{path} is for another deployment ({key} differs); rerun with --fresh")
+        self.steps_state = saved.pop("steps", {})
+        self.values = dict(initial or {}, **saved)
+        self.transient = set()  # Keys of uncheckpointed steps' values, never saved
+
+    def save(self):
+        """Write the checkpoint atomically (caller holds the lock)"""
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            values = {key: value for key, value in self.values.items() if key not in self.transient}
+            json.dump(dict(values, steps=self.steps_state), f, indent=4)
+        os.replace(temp_path, self.path)
+
+    def record(self, name, **fields):
+        """Update a step's saved state"""
+        with self.lock:
+            self.steps_state.setdefault(name, {}).update(fields)
+            self.save()
+
+    def finished(self, name):
+        return self.steps_state.get(name, {}).get("status") == DONE
+
+    def needed(self):
+        """Pending checkpointed steps, plus the uncheckpointed steps they need"""
+        needed = {name for name, step in self.steps.items() if step.checkpoint and not self.finished(name)}
+        frontier = list(needed)
+        while frontier:
+            for dep in self.steps[frontier.pop()].after:
+                if not self.steps[dep].checkpoint and dep not in needed:
+                    needed.add(dep)
+                    frontier.append(dep)
+        return needed
+
+    def run_step(self, name):
+        """Run one step; returns its values"""
+        print(f"→ {name}")
+        started = time.time()
+        values = self.steps[name].run(StepContext(self, name)) or {}
+        print(f"✓ {name} ({time.time() - started:.1f}s)")
+        return values
+
+    def complete(self, name, values):
+        """Merge a finished step's values and checkpoint it"""
+        with self.lock:
+            self.values.update(values)
+            if not self.steps[name].checkpoint:
+                self.transient.update(values)
+                return
+            state = self.steps_state.setdefault(name, {})
+            state.pop("error", None)
+            state["status"] = DONE
+            self.save()
+
+    def run(self):
+        """Run every unfinished step; returns the deployment's values"""
+        # Replace a --fresh run's old file before anything is sent
+        with self.lock:
+            self.save()
+        pending = self.needed()
+        finished = {name for name in self.steps if name not in pending}
+        running = {}
+        failures = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                # Start every step whose dependencies have finished, unless one failed
+                if not failures:
+                    for name in sorted(pending):
+                        if all(dep in finished for dep in self.steps[name].after):
+                            pending.discard(name)
+                            running[executor.submit(self.run_step, name)] = name
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.complete(name, future.result())
+                        finished.add(name)
+                    except Exception as e:
+                        print(f"✗ {name}: {e}")
+                        failures[name] = e
+                        self.record(name, status=FAILED, error=str(e))
+
+        if failures:
+            raise DeploymentFailed(f"Steps failed: {', '.join(sorted(failures))}; rerun to resume")
+        return dict(self.values)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Fee and opcode budget planner for grouped Strahn PI System calls
+
+Each method's own opcode cost and direct inner transaction count come from the
+benchmark baseline (build/benchmark_baseline.json, see
+benchmark_contracts.py). NESTED_CALLS describes which inner application calls a
+method makes, so the full inner transaction fan-out and the budget consumed by
+the whole call tree can be derived.
+
+Given the calls of a group, plan_group() returns the minimum pooled fee, the
+number of budget padding calls needed and the transaction layout.
+"""
+
+import json
+import math
+import sys
+from pathlib import Path
+
+BASELINE_PATH = Path(__file__).parent.parent / "build" / "benchmark_baseline.json"
+
+# Worst-case mandates per batch setup (mirrors MAX_BATCH_MANDATES in contracts/utils/common.py;
+# tests/test_planners.py checks every mirrored constant)
+MAX_BATCH_MANDATES = 4
+
+MIN_TXN_FEE = 1000     # microAlgos per outer or inner transaction
+APP_CALL_BUDGET = 700  # opcode budget added to the pool by every app call
+MAX_GROUP_SIZE = 16
+OPUP_BUFFER = 10       # PyTeal OpUp.ensure_budget tops up to required + 10
+
+# Inner application calls made by each method, as benchmark keys. The mandate
+# creation path is costed with the mandate approval program's worst case.
+NESTED_CALLS = {
+    "strahn_pi_base.setup_mandate_standard": ["strahn_core.deploy_mandate"],
+    "strahn_pi_base.setup_mandates_batch": ["strahn_core.deploy_mandates_batch"],
+    "strahn_pi_shared.setup_mandate_standard": ["strahn_core.deploy_mandate"],
+    "strahn_core.deploy_mandate": ["mandate_record.approval"],
+    "strahn_core.deploy_mandates_batch": ["mandate_record.approval"] * MAX_BATCH_MANDATES,
+    "strahn_core.deploy_legacy_mandate": ["mandate_record.approval"],
+    "mandate_record.process_payment": ["strahn_pi_base.release_mandate_funds"],
+    "mandate_record_packed.process_payment": ["strahn_pi_base.release_mandate_funds"],
+}
+
+# Methods that raise their own budget with inner op-up calls, and the budget
+# they ensure (mirrors the *_VERIFY_BUDGET constants in contracts/utils/common.py,
+# as passed to ensure_signature_budget).
+# Benchmark figures include one op-up iteration per loop bound, so those are
+# swapped for the worst-case number of calls: enough to reach the budget from
+# an empty pool.
+SELF_OPUP_BUDGETS = {
+    "strahn_pi_base.process_intent": 2090,
+    "strahn_pi_base.process_split_intent": 2250,
+    "strahn_pi_base.setup_mandate_standard": 2090,
+    "strahn_pi_base.setup_mandates_batch": 2450,
+    "strahn_pi_base.grant_allowance": 2090,
+    "strahn_pi_shared.process_intent": 2090,
+    "strahn_pi_shared.setup_mandate_standard": 2090,
+}
+
+# Transactions that run no program (payments, asset transfers, ...)
+PLAIN_TXN = "plain"
+# Budget padding app call added by the planner
+OPUP_TXN = "opup"
+
+
+def load_method_costs(path=BASELINE_PATH):
+    """Baseline benchmark results keyed '<contract>.<method>'"""
+    with open(path, "r") as f:
+        costs = json.load(f)
+    if not costs:
+        raise ValueError(f"No benchmark baseline recorded in {path}")
+    return costs
+
+
+def call_tree(method, costs):
+    """
+    Aggregate needs of a method and everything it calls.
+
+    Returns a dict with the opcode cost consumed, the inner transactions
+    submitted (at every depth) and the inner app calls among them.
+    """
+    if method in (PLAIN_TXN, OPUP_TXN):
+        return {"opcode_cost": 0, "inner_txns": 0, "inner_app_calls": 0}
+    if method not in costs:
+        raise ValueError(f"Unknown method {method}; is it in the benchmark baseline?")
+
+    tree = {
+        "opcode_cost": costs[method]["opcode_cost"],
+        "inner_txns": costs[method]["inner_txns"],
+        "inner_app_calls": 0,
+    }
+    if method in SELF_OPUP_BUDGETS:
+        opups = math.ceil((SELF_OPUP_BUDGETS[method] + OPUP_BUFFER) / APP_CALL_BUDGET)
+        tree["inner_txns"] += opups - costs[method].get("loop_bound", 1)
+        tree["inner_app_calls"] += opups
+    for nested in NESTED_CALLS.get(method, []):
+        child = call_tree(nested, costs)
+        tree["opcode_cost"] += child["opcode_cost"]
+        tree["inner_txns"] += child["inner_txns"]
+        tree["inner_app_calls"] += 1 + child["inner_app_calls"]
+    return tree
+
+
+def plan_group(methods, costs=None, min_fee=MIN_TXN_FEE, payer_index=0):
+    """
+    Plan fees and budget padding for a group.
+
+    methods lists the group's transactions in order, each either a benchmark
+    key such as 'strahn_pi_base.process_intent' or PLAIN_TXN. Padding app
+    calls are appended when the pooled budget does not cover the worst-case
+    cost. The whole fee is pooled on the transaction at payer_index.
+    """
+    costs = costs if costs is not None else load_method_costs()
+
+    trees = [call_tree(method, costs) for method in methods]
+    app_calls = sum(1 for method in methods if method != PLAIN_TXN)
+    opcode_cost = sum(tree["opcode_cost"] for tree in trees)
+    inner_txns = sum(tree["inner_txns"] for tree in trees)
+    budget = (app_calls + sum(tree["inner_app_calls"] for tree in trees)) * APP_CALL_BUDGET
+
+    padding = max(0, math.ceil((opcode_cost - budget) / APP_CALL_BUDGET))
+    layout = list(methods) + [OPUP_TXN] * padding
+    if len(layout) > MAX_GROUP_SIZE:
+        raise ValueError(f"Group needs {len(layout)} transactions, more than {MAX_GROUP_SIZE}")
+
+    total_fee = (len(layout) + inner_txns) * min_fee
+    return {
+        "transactions": [
+            {"index": i, "method": method, "fee": total_fee if i == payer_index else 0}
+            for i, method in enumerate(layout)
+        ],
+        "padding_calls": padding,
+        "inner_txns": inner_txns,
+        "opcode_cost": opcode_cost,
+        "opcode_budget": budget + padding * APP_CALL_BUDGET,
+        "total_fee": total_fee,
+    }
+
+
+def apply_fees(txns, plan):
+    """Set flat fees on algosdk transactions according to a plan's layout"""
+    for txn, planned in zip(txns, plan["transactions"]):
+        txn.fee = planned["fee"]
+    return txns
+
+
+def main():
+    """Print the plan for the methods given on the command line"""
+    if len(sys.argv) < 2:
+        print(f"Usage: {sys.argv[0]} <contract.method|{PLAIN_TXN}> ...")
+        return 1
+
+    plan = plan_group(sys.argv[1:])
+    for txn in plan["transactions"]:
+        print(f"  [{txn['index']}] {txn['method']:<45} fee {txn['fee']}")
+    print(f"Inner transactions: {plan['inner_txns']}")
+    print(f"Opcode cost / budget: {plan['opcode_cost']} / {plan['opcode_budget']}")
+    print(f"Minimum pooled fee: {plan['total_fee']} microAlgos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
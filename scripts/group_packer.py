@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Group packer for queued Strahn PI System app calls
+
+Packs calls into the fewest atomic groups that the AVM accepts. A group
+must satisfy all of the following:
+
+- It has at most 16 transactions, including budget padding calls.
+- Its pooled opcode budget, 700 per outer and inner app call, covers the
+  worst-case cost of every call tree (see fee_planner.call_tree).
+- It submits at most 256 inner transactions.
+- Each transaction carries at most 8 references, at most 4 of them
+  accounts.
+- It carries enough box references for the bytes of every box it touches.
+
+Contracts built for AVM v9 or later share references across the group, so
+their calls' apps, assets, accounts and boxes can sit on any transaction in
+it, and a reference two such calls need is carried once. Older contracts
+(the PI Base and mandates, v8) must carry their own. Padding calls add both
+budget and free reference slots.
+
+Calls are placed first-fit, largest first, so earlier groups are filled
+before a new one is opened. Calls with the same order_key (e.g. the
+intents of one PI Base, whose nonces must land in order) keep their
+relative order across and within groups.
+"""
+
+import json
+import math
+import sys
+
+from box_planner import BOX_IO_QUOTA, EMPTY_BOX_REF, MAX_TXN_REFERENCES
+from fee_planner import (
+    APP_CALL_BUDGET, MAX_GROUP_SIZE, MIN_TXN_FEE, OPUP_TXN, PLAIN_TXN, call_tree, load_method_costs
+)
+
+MAX_TXN_ACCOUNTS = 4
+MAX_GROUP_INNER_TXNS = 256  # 16 per outer transaction, pooled across the group
+
+# Contracts built for AVM v9+ (mirrors CONTRACT_VERSIONS in compile_contracts.py)
+RESOURCE_SHARING_CONTRACTS = {"strahn_core"}
+
+REFERENCE_KINDS = ("accounts", "assets", "apps", "boxes")
+
+
+def shares_references(method):
+    """Whether a method's contract can use references carried elsewhere in the group"""
+    return method.split(".")[0] in RESOURCE_SHARING_CONTRACTS
+
+
+def call_references(call):
+    """A call's references as (kind, value) pairs; boxes are (app_id, name)"""
+    refs = []
+    for kind in REFERENCE_KINDS:
+        for value in call.get(kind, []):
+            refs.append((kind, tuple(value[:2]) if kind == "boxes" else value))
+    return list(dict.fromkeys(refs))
+
+
+def fits_one_transaction(refs):
+    """Whether references fit the foreign arrays of a single transaction"""
+    return (len(refs) <= MAX_TXN_REFERENCES
+            and sum(1 for kind, _ in refs if kind == "accounts") <= MAX_TXN_ACCOUNTS)
+
+
+def layout_group(calls, costs, min_fee=MIN_TXN_FEE):
+    """
+    Lay out one group of calls, or return None if they cannot share a group.
+
+    calls are dicts with the method (a benchmark key), its references under
+    "accounts", "assets", "apps" and "boxes" ((app_id, name, size) triples),
+    and optionally an order_key. Returns the group's transactions (each call,
+    then padding calls) with the references each carries and the pooled fee
+    on the first, plus the group's budget and fee totals.
+    """
+    trees = [call_tree(call["method"], costs) for call in calls]
+    opcode_cost = sum(tree["opcode_cost"] for tree in trees)
+    inner_txns = sum(tree["inner_txns"] for tree in trees)
+    inner_app_calls = sum(tree["inner_app_calls"] for tree in trees)
+    if inner_txns > MAX_GROUP_INNER_TXNS:
+        return None
+
+    own = [[] if shares_references(call["method"]) else call_references(call) for call in calls]
+    carried = {ref for refs in own for ref in refs}
+    shared = list(dict.fromkeys(
+        ref for call in calls if shares_references(call["method"])
+        for ref in call_references(call) if ref not in carried
+    ))
+
+    # Box bytes are budgeted across the group; each box counts once
+    box_bytes = sum({(app, name): size for call in calls for app, name, size in call.get("boxes", [])}.values())
+    box_refs = sum(1 for refs in own for kind, _ in refs if kind == "boxes") + sum(1 for kind, _ in shared if kind == "boxes")
+    empty_refs = max(0, math.ceil(box_bytes / BOX_IO_QUOTA) - box_refs)
+    shared_accounts = [ref for ref in shared if ref[0] == "accounts"]
+    shared_others = [ref for ref in shared if ref[0] != "accounts"]
+
+    padding = max(0, math.ceil((opcode_cost - (len(calls) + inner_app_calls) * APP_CALL_BUDGET) / APP_CALL_BUDGET))
+    while True:
+        if len(calls) + padding > MAX_GROUP_SIZE:
+            return None
+        carriers = own + [[] for _ in range(padding)]
+        free = [MAX_TXN_REFERENCES - len(refs) for refs in carriers]
+        account_room = [min(MAX_TXN_ACCOUNTS - sum(1 for kind, _ in refs if kind == "accounts"), slots)
+                        for refs, slots in zip(carriers, free)]
+        if len(shared_accounts) <= sum(account_room) and len(shared) + empty_refs <= sum(free):
+            break
+        # Another padding call is another eight reference slots
+        padding += 1
+
+    # Place shared accounts where account slots remain, then everything else
+    placed = [list(refs) for refs in carriers]
+    pending_accounts = list(shared_accounts)
+    for i, room in enumerate(account_room):
+        take, pending_accounts = pending_accounts[:room], pending_accounts[room:]
+        placed[i].extend(take)
+    pending = shared_others + [("boxes", EMPTY_BOX_REF)] * empty_refs
+    for i, refs in enumerate(placed):
+        take = MAX_TXN_REFERENCES - len(refs)
+        refs.extend(pending[:take])
+        pending = pending[take:]
+
+    total_fee = (len(calls) + padding + inner_txns) * min_fee
+    transactions = []
+    for i, refs in enumerate(placed):
+        txn = {"call": i if i < len(calls) else OPUP_TXN, "fee": total_fee if i == 0 else 0}
+        for kind in REFERENCE_KINDS:
+            txn[kind] = [value for ref_kind, value in refs if ref_kind == kind]
+        transactions.append(txn)
+
+    return {
+        "transactions": transactions,
+        "padding_calls": padding,
+        "inner_txns": inner_txns,
+        "opcode_cost": opcode_cost,
+        "opcode_budget": (len(calls) + padding + inner_app_calls) * APP_CALL_BUDGET,
+        "total_fee": total_fee,
+    }
+
+
+def packing_order(calls, costs, min_fee):
+    """
+    Indices of calls, largest first, with each order_key's calls in input order.
+
+    A call's size is the transactions it needs alone. Sorting would reorder
+    calls that share an order_key, so the positions their key holds in the
+    sorted order are refilled with them in input order.
+    """
+    sizes = []
+    for i, call in enumerate(calls):
+        if call["method"] in (PLAIN_TXN, OPUP_TXN):
+            raise ValueError(f"Call {i}: only app calls are packed")
+        if not shares_references(call["method"]) and not fits_one_transaction(call_references(call)):
+            raise ValueError(f"Call {i} carries more references than one transaction holds")
+        alone = layout_group([call], costs, min_fee)
+        if alone is None:
+            raise ValueError(f"Call {i} ({call['method']}) does not fit a group on its own")
+        sizes.append((len(alone["transactions"]), alone["inner_txns"]))
+
+    order = sorted(range(len(calls)), key=lambda i: sizes[i], reverse=True)
+    by_key = {}
+    for i in range(len(calls)):
+        if calls[i].get("order_key") is not None:
+            by_key.setdefault(calls[i]["order_key"], []).append(i)
+    queues = {key: iter(members) for key, members in by_key.items()}
+    return [next(queues[calls[i]["order_key"]]) if calls[i].get("order_key") is not None else i for i in order]
+
+
+def pack_groups(calls, costs=None, min_fee=MIN_TXN_FEE):
+    """
+    Pack calls into the fewest groups found first-fit, largest first.
+
+    Returns the groups in submission order. Each is a layout_group() result
+    plus "calls", the indices into calls of its members, which are the first
+    transactions of the group in input order. Raises ValueError if a call
+    cannot be submitted even alone.
+    """
+    costs = costs if costs is not None else load_method_costs()
+    groups = []
+    layouts = []
+    last_group = {}
+
+    for i in packing_order(calls, costs, min_fee):
+        key = calls[i].get("order_key")
+        start = last_group.get(key, 0) if key is not None else 0
+        for g in range(start, len(groups)):
+            members = sorted(groups[g] + [i])
+            layout = layout_group([calls[m] for m in members], costs, min_fee)
+            if layout is not None:
+                groups[g], layouts[g] = members, layout
+                break
+        else:
+            g = len(groups)
+            groups.append([i])
+            layouts.append(layout_group([calls[i]], costs, min_fee))
+        if key is not None:
+            last_group[key] = g
+
+    return [dict(layout, calls=members) for members, layout in zip(groups, layouts)]
+
+
+def main():
+    """Pack calls read as a JSON list from a file: group_packer.py calls.json"""
+    if len(sys.argv) != 2:
+        print(f"Usage: {sys.argv[0]} <calls.json>")
+        return 1
+
+    with open(sys.argv[1], "r") as f:
+        calls = json.load(f)
+    for call in calls:
+        call["boxes"] = [(app, name.encode(), size) for app, name, size in call.get("boxes", [])]
+
+    groups = pack_groups(calls)
+    for n, group in enumerate(groups):
+        print(f"Group {n}: calls {group['calls']} + {group['padding_calls']} padding, "
+              f"{group['inner_txns']} inner, budget {group['opcode_cost']}/{group['opcode_budget']}, "
+              f"fee {group['total_fee']} microAlgos")
+    print(f"{len(calls)} calls in {len(groups)} groups")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Synthetic load generator for intents and mandates
+
+Builds a workload on the in-memory algod stand-in (algod_standin.py) and
+drives the two paths that carry payments. Intents go through the relayer
+service. Mandates are paid by a keeper loop, which reads the due-time index
+and submits process_mandates_batch groups. The workload has:
+
+- many PI Bases, each with its own creator key;
+- merchants chosen from a Zipf distribution, so a few receive most payments;
+- Poisson intent arrivals whose rate is multiplied during periodic bursts;
+- a mandate population spread over several intervals, each mandate at a
+  random phase within its interval.
+
+At the end it reports throughput, p50/p99 latency, the time spent in each
+stage of each flow (telemetry.py) and a breakdown of failures by reason as
+JSON. Run it again with larger --mandates or --pi-bases
+to see how latency degrades as the population grows.
+
+    load_generator.py --duration 30 --rate 100 --burst-factor 4 --mandates 20000
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import nacl.signing
+from algosdk import account, encoding, transaction
+from algosdk.logic import get_application_address
+from algosdk.v2client.algod import AlgodClient
+
+from algod_standin import (
+    DUE_BUCKET_SEC, MANDATE_EARLY_PAY_SEC, MAX_KEEPER_BATCH, TERMS_DUE_BUCKET, TERMS_NEXT_PAY, Ledger, serve
+)
+from box_planner import MAX_TXN_REFERENCES
+from fee_planner import apply_fees, plan_group
+from relayer_service import CONFIRMATION_ROUNDS, CONFIRMED, FAILED, QueueFull, RelayerService, intent_message
+from telemetry import Telemetry
+
+KEEPER_METHOD = "strahn_pi_base.process_mandates_batch"
+CORE_APP_ID = 1  # Recorded by each PI Base; Core itself is not called by these paths
+USDC = 1_000_000
+THROTTLE_BACKOFF = 0.05  # seconds before a throttled intent is offered again
+
+DEFAULT_CONFIG = {
+    "duration": 10.0,         # seconds of offered load
+    "rate": 50.0,             # mean intents per second outside bursts
+    "burst_factor": 1.0,      # rate multiplier during bursts
+    "burst_period": 10.0,     # seconds between burst starts
+    "burst_duty": 0.2,        # fraction of each period spent bursting
+    "pi_bases": 20,
+    "merchants": 200,
+    "zipf": 1.1,              # merchant skew; 0 is uniform
+    "mandates": 1000,         # across all PI Bases
+    "intervals": [60, 3600, 86400],
+    "keeper_interval": 1.0,   # seconds between due-index scans
+    "keeper_workers": 4,      # keeper groups in flight
+    "max_in_flight": 4,       # relayer groups in flight
+    "block_time": 0.0,        # stand-in seconds per block; 0 confirms each group at once
+    "drain_timeout": 30.0,    # seconds to wait for queued work after the load stops
+    "seed": 1,
+}
+
+
+def zipf_weights(n, s):
+    """Cumulative weights of ranks 1..n under a Zipf distribution with exponent s"""
+    weights = [1 / rank ** s for rank in range(1, n + 1)]
+    cumulative = []
+    total = 0.0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return cumulative
+
+
+def arrival_times(config, rng):
+    """Offsets in seconds of Poisson intent arrivals, with the rate raised during bursts"""
+    t = 0.0
+    burst_length = config["burst_period"] * config["burst_duty"]
+    while True:
+        bursting = config["burst_factor"] != 1 and t % config["burst_period"] < burst_length
+        t += rng.expovariate(config["rate"] * (config["burst_factor"] if bursting else 1))
+        if t >= config["duration"]:
+            return
+        yield t
+
+
+def percentiles(values):
+    """p50, p99 and max by nearest rank, in milliseconds from seconds"""
+    if not values:
+        return {"count": 0, "p50_ms": None, "p99_ms": None, "max_ms": None}
+    ordered = sorted(values)
+
+    def rank(p):
+        return round(ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)] * 1000, 1)
+
+    return {"count": len(ordered), "p50_ms": rank(50), "p99_ms": rank(99), "max_ms": round(ordered[-1] * 1000, 1)}
+
+
+def failure_reason(error):
+    """Error text with txids and numbers removed, so like failures group together"""
+    reason = str(error).replace("TransactionPool.Remember: ", "")
+    reason = re.sub(r"transaction [A-Z2-7]{52}: ", "", reason)
+    return re.sub(r"\d+", "N", reason)
+
+
+class Metrics:
+    """Latency samples and counters shared by the load threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {"intent": [], "keeper_group": [], "mandate_delay": [], "keeper_scan": []}
+        self.counters = Counter()
+        self.failures = Counter()
+        self.last_confirmed = {}
+
+    def sample(self, name, seconds):
+        with self.lock:
+            self.samples[name].append(seconds)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def fail(self, path, error, n=1):
+        with self.lock:
+            self.counters[path + "_failed"] += n
+            self.failures[f"{path}: {failure_reason(error)}"] += n
+
+    def confirmed(self, path, n=1):
+        with self.lock:
+            self.counters[path + "_confirmed"] += n
+            self.last_confirmed[path] = time.time()
+
+
+class TimedRelayer(RelayerService):
+    """Relayer service that reports each intent's submit-to-settle latency"""
+
+    def __init__(self, client, private_key, metrics, **kwargs):
+        super().__init__(client, private_key, **kwargs)
+        self.metrics = metrics
+        self.offered_at = {}
+
+    def settle_records(self, batch, status, **fields):
+        super().settle_records(batch, status, **fields)
+        if status not in (CONFIRMED, FAILED):
+            return
+        now = time.time()
+        for intent in batch:
+            offered = self.offered_at.pop((intent["app_id"], intent["nonce"]), None)
+            if status == CONFIRMED:
+                self.metrics.confirmed("intent")
+                if offered is not None:
+                    self.metrics.sample("intent", now - offered)
+            else:
+                self.metrics.fail("intent", fields.get("error", "failed"))
+
+
+class Keeper:
+    """Pays due mandates from the PI Bases' due-time indexes with batch calls"""
+
+    def __init__(self, client, private_key, pi_bases, opup_app_id, usdc_id, metrics, telemetry,
+                 workers=4, clock_lag=1.0):
+        self.client = client
+        self.private_key = private_key
+        self.address = account.address_from_private_key(private_key)
+        self.pi_bases = pi_bases
+        self.opup_app_id = opup_app_id
+        self.usdc_id = usdc_id
+        self.metrics = metrics
+        self.telemetry = telemetry
+        self.clock_lag = clock_lag
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.started = time.time()
+
+    def box(self, app_id, name):
+        return base64.b64decode(self.client.application_box_by_name(app_id, name)["value"])
+
+    def due_mandates(self, app_id, now):
+        """Registry slot and terms of every mandate of a PI Base payable at now, in slot order"""
+        hour = int(now + MANDATE_EARLY_PAY_SEC) // DUE_BUCKET_SEC
+        due = []
+        for entry in self.client.application_boxes(app_id)["boxes"]:
+            name = base64.b64decode(entry["name"])
+            if not name.startswith(b"due:") or int.from_bytes(name[4:], "big") > hour:
+                continue
+            value = self.box(app_id, name)
+            for i in range(8, len(value), 8):
+                if value[i:i + 8] == bytes(8):
+                    continue
+                slot = int.from_bytes(value[i:i + 8], "big") - 1
+                terms = self.box(app_id, b"mandate:" + slot.to_bytes(8, "big"))
+                next_pay_ts = int.from_bytes(terms[TERMS_NEXT_PAY:TERMS_NEXT_PAY + 8], "big")
+                if next_pay_ts - MANDATE_EARLY_PAY_SEC <= now:
+                    due.append((slot, terms))
+        # process_mandates_batch takes strictly ascending slots
+        return sorted(due, key=lambda item: item[0])
+
+    @staticmethod
+    def batches(due):
+        """Split due mandates into calls of at most MAX_KEEPER_BATCH slots (and so payees)"""
+        return [due[i:i + MAX_KEEPER_BATCH] for i in range(0, len(due), MAX_KEEPER_BATCH)]
+
+    def build_group(self, app_id, batch, params):
+        """The batch call plus padding calls that carry its box references"""
+        plan = plan_group([KEEPER_METHOD], min_fee=params.min_fee)
+        slots = b"".join(slot.to_bytes(8, "big") for slot, _ in batch)
+        buckets = set()
+        for _, terms in batch:
+            next_pay_ts = int.from_bytes(terms[TERMS_NEXT_PAY:TERMS_NEXT_PAY + 8], "big")
+            interval = int.from_bytes(terms[TERMS_NEXT_PAY + 8:TERMS_NEXT_PAY + 16], "big")
+            buckets.add(int.from_bytes(terms[TERMS_DUE_BUCKET:TERMS_DUE_BUCKET + 8], "big"))
+            buckets.add((next_pay_ts + interval) // DUE_BUCKET_SEC)
+        boxes = [b"mandate:" + slot.to_bytes(8, "big") for slot, _ in batch]
+        boxes += [b"due:" + bucket.to_bytes(8, "big") for bucket in sorted(buckets)]
+
+        txns = [transaction.ApplicationNoOpTxn(
+            self.address, params, app_id, [b"process_mandates_batch", slots],
+            accounts=list(dict.fromkeys(encoding.encode_address(terms[8:40]) for _, terms in batch)),
+            foreign_assets=[self.usdc_id],
+            boxes=[(0, b"fee:" + encoding.decode_address(self.address))],
+        )]
+        # Box references are shared across the group; each padding call names the PI Base once
+        per_call = MAX_TXN_REFERENCES - 1
+        for n in range(plan["padding_calls"]):
+            txns.append(transaction.ApplicationNoOpTxn(
+                self.address, params, self.opup_app_id, note=n.to_bytes(2, "big"), foreign_apps=[app_id],
+                boxes=[(app_id, name) for name in boxes[n * per_call:(n + 1) * per_call]],
+            ))
+        if len(boxes) > plan["padding_calls"] * per_call:
+            raise ValueError(f"Batch of {len(batch)} needs more box references than its padding carries")
+        txns = apply_fees(txns, plan)
+        gid = transaction.calculate_group_id(txns)
+        for txn in txns:
+            txn.group = gid
+        return txns
+
+    def pay(self, app_id, batch, params):
+        """Submit one batch and wait for it"""
+        started = time.time()
+        traces = [f"mandate:{app_id}:{slot}" for slot, _ in batch]
+        try:
+            with self.telemetry.span("mandate", "build", traces=traces, batch_size=len(batch)):
+                txns = self.build_group(app_id, batch, params)
+            with self.telemetry.span("mandate", "sign", traces=traces):
+                signed = [txn.sign(self.private_key) for txn in txns]
+            txid = signed[0].get_txid()
+            with self.telemetry.span("mandate", "submit", traces=traces, txid=txid):
+                self.client.send_transactions(signed)
+            with self.telemetry.span("mandate", "confirm", traces=traces, txid=txid) as span:
+                info = transaction.wait_for_confirmation(self.client, txid, CONFIRMATION_ROUNDS)
+                span["round"] = info["confirmed-round"]
+            with self.telemetry.span("mandate", "observe", traces=traces, txid=txid):
+                self.telemetry.observe_logs(info, "mandates_batch_processed")
+        except Exception as e:
+            self.metrics.fail("mandate", e, len(batch))
+            return
+        finished = time.time()
+        self.metrics.sample("keeper_group", finished - started)
+        self.metrics.confirmed("mandate", len(batch))
+        for _, terms in batch:
+            due_at = int.from_bytes(terms[TERMS_NEXT_PAY:TERMS_NEXT_PAY + 8], "big") - MANDATE_EARLY_PAY_SEC
+            # Mandates already due when the run began are late from its start
+            self.metrics.sample("mandate_delay", finished - max(due_at, self.started))
+
+    def scan(self):
+        """Pay everything due across all PI Bases; returns when the scan's groups have settled"""
+        started = time.time()
+        now = started - self.clock_lag
+        params = self.client.suggested_params()
+        params.flat_fee = True
+        futures = []
+        for app_id in self.pi_bases:
+            for batch in self.batches(self.due_mandates(app_id, now)):
+                futures.append(self.executor.submit(self.pay, app_id, batch, params))
+        self.metrics.sample("keeper_scan", time.time() - started)
+        for future in futures:
+            future.result()
+
+    def run(self, stop, interval):
+        """Scan every interval seconds until stop is set"""
+        self.started = time.time()
+        while not stop.is_set():
+            started = time.time()
+            try:
+                self.scan()
+            except Exception as e:
+                self.metrics.fail("keeper_scan", e)
+            stop.wait(max(0.0, interval - (time.time() - started)))
+        self.executor.shutdown(wait=True)
+
+
+def build_workload(config, rng):
+    """Stand-in ledger seeded with the workload's accounts, PI Bases and mandates"""
+    ledger = Ledger(block_time=config["block_time"])
+    funder = account.generate_account()[1]
+    ledger.fund(funder, 10 ** 12)
+    usdc_id = ledger.create_asset(funder, 10 ** 18)
+    opup_app_id = ledger.create_app("opup", funder, [])
+
+    relayer_key, relayer = account.generate_account()
+    keeper_key, keeper = account.generate_account()
+    ledger.fund(relayer, 10 ** 12)
+    ledger.fund(keeper, 10 ** 12)
+
+    merchants = [account.generate_account()[1] for _ in range(config["merchants"])]
+    for merchant in merchants:
+        ledger.fund(merchant, 1_000_000, {usdc_id: 0})
+
+    pi_bases = {}
+    for _ in range(config["pi_bases"]):
+        creator_key, creator = account.generate_account()
+        ledger.fund(creator, 10_000_000)
+        app_id = ledger.create_app("strahn_pi_base", creator, [
+            encoding.decode_address(creator), usdc_id.to_bytes(8, "big"), CORE_APP_ID.to_bytes(8, "big")
+        ])
+        ledger.fund(get_application_address(app_id), 10_000_000, {usdc_id: 10 ** 15})
+        pi_bases[app_id] = nacl.signing.SigningKey(base64.b64decode(creator_key)[:32])
+
+    # Each mandate starts at a random phase of its interval
+    now = int(time.time())
+    merchant_weights = zipf_weights(len(merchants), config["zipf"])
+    app_ids = list(pi_bases)
+    for i in range(config["mandates"]):
+        interval = config["intervals"][i % len(config["intervals"])]
+        ledger.add_mandate(
+            rng.choice(app_ids), rng.choices(merchants, cum_weights=merchant_weights)[0],
+            rng.randint(1, 100) * USDC, 10_000, now + rng.randrange(interval), interval,
+        )
+
+    return {
+        "ledger": ledger, "usdc_id": usdc_id, "opup_app_id": opup_app_id, "pi_bases": pi_bases,
+        "merchants": merchants, "merchant_weights": merchant_weights,
+        "relayer_key": relayer_key, "keeper_key": keeper_key,
+    }
+
+
+def offer_intents(config, workload, relayer, metrics, rng):
+    """Sign and submit intents on the arrival schedule, retrying throttled ones"""
+    nonces = {app_id: 0 for app_id in workload["pi_bases"]}
+    app_ids = list(nonces)
+    start = time.time()
+    for offset in arrival_times(config, rng):
+        delay = start + offset - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        app_id = rng.choice(app_ids)
+        merchant = rng.choices(workload["merchants"], cum_weights=workload["merchant_weights"])[0]
+        amount = rng.randint(1, 100) * USDC
+        message = intent_message(app_id, nonces[app_id], encoding.decode_address(merchant), amount, 10_000)
+        signature = workload["pi_bases"][app_id].sign(hashlib.sha256(message).digest()).signature
+        payload = {
+            "pi_base_app_id": app_id, "destination": merchant, "amount": amount, "relayer_fee": 10_000,
+            "nonce": nonces[app_id], "signature": base64.b64encode(signature).decode(),
+        }
+
+        metrics.count("intent_offered")
+        relayer.offered_at[(app_id, nonces[app_id])] = time.time()
+        while True:
+            try:
+                relayer.submit(payload)
+                nonces[app_id] += 1
+                break
+            except QueueFull:
+                # The intent must still land for later nonces to; back off and offer it again
+                metrics.count("intent_throttled")
+                time.sleep(THROTTLE_BACKOFF)
+            except Exception as e:
+                relayer.offered_at.pop((app_id, nonces[app_id]), None)
+                metrics.fail("intent", e)
+                break
+
+
+def run_load(config):
+    """Run one workload against a fresh stand-in and return the report"""
+    config = dict(DEFAULT_CONFIG, **config)
+    rng = random.Random(config["seed"])
+    metrics = Metrics()
+    telemetry = Telemetry()
+
+    setup_started = time.time()
+    workload = build_workload(config, rng)
+    server, block_stop = serve(workload["ledger"], port=0)
+    client = AlgodClient("", f"http://127.0.0.1:{server.server_address[1]}")
+    setup_seconds = time.time() - setup_started
+
+    relayer = TimedRelayer(client, workload["relayer_key"], metrics, max_in_flight=config["max_in_flight"],
+                           telemetry=telemetry)
+    keeper = Keeper(client, workload["keeper_key"], list(workload["pi_bases"]), workload["opup_app_id"],
+                    workload["usdc_id"], metrics, telemetry, workers=config["keeper_workers"],
+                    clock_lag=1.0 + config["block_time"])
+    keeper_stop = threading.Event()
+    keeper_thread = threading.Thread(target=keeper.run, args=(keeper_stop, config["keeper_interval"]), daemon=True)
+
+    started = time.time()
+    relayer.start()
+    keeper_thread.start()
+    try:
+        offer_intents(config, workload, relayer, metrics, rng)
+        offered_until = time.time()
+        deadline = offered_until + config["drain_timeout"]
+        while relayer.stats()["pending"] and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        keeper_stop.set()
+        keeper_thread.join()
+        relayer.stop()
+        block_stop.set()
+        server.shutdown()
+
+    counters = metrics.counters
+    elapsed = {path: max(metrics.last_confirmed.get(path, started) - started, 1e-9) for path in ("intent", "mandate")}
+    return {
+        "config": config,
+        "setup_seconds": round(setup_seconds, 2),
+        "offered_seconds": round(offered_until - started, 2),
+        "intents": {
+            "offered": counters["intent_offered"],
+            "confirmed": counters["intent_confirmed"],
+            "failed": counters["intent_failed"],
+            "throttled": counters["intent_throttled"],
+            "unsettled": relayer.stats()["pending"],
+            "throughput_per_s": round(counters["intent_confirmed"] / elapsed["intent"], 1),
+            "latency": percentiles(metrics.samples["intent"]),
+        },
+        "mandates": {
+            "population": config["mandates"],
+            "paid": counters["mandate_confirmed"],
+            "failed": counters["mandate_failed"],
+            "throughput_per_s": round(counters["mandate_confirmed"] / elapsed["mandate"], 1),
+            "group_latency": percentiles(metrics.samples["keeper_group"]),
+            "payment_delay": percentiles(metrics.samples["mandate_delay"]),
+            "scan_time": percentiles(metrics.samples["keeper_scan"]),
+        },
+        "stages": telemetry.summary(),
+        "failures": dict(metrics.failures.most_common()),
+        "relayer": relayer.stats()["counters"],
+        "rounds": workload["ledger"].round,
+    }
+
+
+def main():
+    """Run a workload and print its report: load_generator.py [options]"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    for key, default in DEFAULT_CONFIG.items():
+        flag = "--" + key.replace("_", "-")
+        if key == "intervals":
+            parser.add_argument(flag, default=",".join(map(str, default)),
+                                help="comma-separated mandate intervals in seconds")
+        else:
+            parser.add_argument(flag, type=type(default), default=default)
+    parser.add_argument("--output", help="also write the report to this file")
+    args = vars(parser.parse_args())
+
+    output = args.pop("output")
+    args["intervals"] = [int(interval) for interval in args["intervals"].split(",")]
+    report = run_load(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,7 @@ from algosdk.v2client import algod
 from algosdk import account, transaction, encoding
 from algosdk.logic import get_application_address
 from test_mnemonic import *
+from fee_planner import PLAIN_TXN, apply_fees, plan_group
 
 # =================================================================================
 # 1. CONFIGURATION
@@ -95,8 +96,10 @@ def opt_in_pi_base_to_usdc(creator_mnemonic, pi_base_app_id):
         )
         
         # --- Atomic Group Transaction Path ---
-        # 1. Create a list of the UNSIGNED transactions that will be in the group
-        txns_to_group = [funding_txn, app_call_txn]
+        # 1. Create a list of the UNSIGNED transactions that will be in the group,
+        #    pooling the fee of the inner opt-in onto the funding transaction
+        plan = plan_group([PLAIN_TXN, "strahn_pi_base.app_optin_usdc"], min_fee=params.min_fee)
+        txns_to_group = apply_fees([funding_txn, app_call_txn], plan)
         
         # 2. Calculate the group ID. This modifies the 'group_id' field on
         #    each transaction object *in the txns_to_group list* in-place.
@@ -129,6 +132,7 @@ def opt_in_pi_base_to_usdc(creator_mnemonic, pi_base_app_id):
         print("  Sufficient ALGO balance. Sending opt-in app call...")
         # No funding needed, just send the app call by itself
         # No group_id needed here, as it's a single transaction.
+        apply_fees([app_call_txn], plan_group(["strahn_pi_base.app_optin_usdc"], min_fee=params.min_fee))
         signed_app_call_txn = app_call_txn.sign(creator_private_key)
         algod_client.send_transactions([signed_app_call_txn])
         wait_for_confirmation(algod_client, app_call_txn.get_txid())
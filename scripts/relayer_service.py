@@ -0,0 +1,631 @@
+#!/usr/bin/env python3
+"""
+Relayer service for signed PI Base payment intents
+
+Signed process_intent payloads arrive over a local HTTP API. Each is checked
+off-chain against its PI Base's creator key and nonce before it is queued, so
+a bad intent never costs fees. Intents are queued per PI Base, and a queue's
+consecutive nonces are taken as a batch and submitted in as few atomic groups
+as group_packer finds. Batches for different PI Bases are in flight
+concurrently, up to a bound. Only one batch per PI Base is in flight at a
+time, since its nonces must land in order.
+
+    POST /intents        signed intent (JSON); 202 with its id, 429 when full
+    GET  /intents/<id>   status of an intent
+    GET  /intents/<id>/trace  timed stages of an intent (see telemetry.py)
+    GET  /stats          queue depths and counters
+    GET  /metrics        stage latencies and counters, Prometheus text format
+
+The algod client is a local node by default (ALGOD_ADDRESS, ALGOD_TOKEN).
+The relayer account, which pays the fees and accrues relayer fees, comes from
+RELAYER_MNEMONIC.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import nacl.exceptions
+import nacl.signing
+from algosdk import account, encoding, mnemonic, transaction
+from algosdk.v2client import algod
+
+from fee_planner import MAX_GROUP_SIZE, apply_fees, load_method_costs
+from group_packer import layout_group, pack_groups
+from telemetry import REGISTRY, configure_from_env
+
+DEFAULT_ALGOD_ADDRESS = "http://localhost:4001"
+
+INTENT_METHOD = "strahn_pi_base.process_intent"
+SIGNATURE_LENGTH = 64
+RELAYER_FEE_BOX_SIZE = 8
+CONFIRMATION_ROUNDS = 10
+# Seconds between chain nonce reads for an idle queue stuck on a gap
+RESYNC_SEC = 5
+
+# Intent statuses
+QUEUED = "queued"
+SUBMITTED = "submitted"
+CONFIRMED = "confirmed"
+FAILED = "failed"
+
+
+class IntentRejected(ValueError):
+    """An intent that fails validation; never queued"""
+
+
+class QueueFull(Exception):
+    """Backpressure: the intent is valid but there is no room for it yet"""
+
+
+def itob(value):
+    """8-byte big-endian encoding, matching PyTeal's Itob"""
+    return value.to_bytes(8, "big")
+
+
+def intent_message(app_id, nonce, destination, amount, relayer_fee):
+    """Signed message of process_intent, matching the PI Base's SPP_V1 layout"""
+    return b"".join([
+        b"SPP_V1:",
+        itob(app_id),
+        itob(nonce),
+        destination,
+        itob(amount),
+        itob(relayer_fee),
+    ])
+
+
+def parse_intent(payload):
+    """
+    Decode a JSON intent into its on-chain values.
+
+    payload carries pi_base_app_id, destination (address), amount and
+    relayer_fee (micro-USDC), nonce and signature (base64 of the raw 64-byte
+    Ed25519 signature of SHA-256(message)). Raises IntentRejected on any
+    malformed field.
+    """
+    try:
+        intent = {
+            "app_id": int(payload["pi_base_app_id"]),
+            "destination": encoding.decode_address(payload["destination"]),
+            "amount": int(payload["amount"]),
+            "relayer_fee": int(payload.get("relayer_fee", 0)),
+            "nonce": int(payload["nonce"]),
+            "signature": base64.b64decode(payload["signature"], validate=True),
+        }
+    except (KeyError, TypeError, ValueError) as e:
+        raise IntentRejected(f"Malformed intent: {e}")
+
+    if intent["app_id"] <= 0:
+        raise IntentRejected("pi_base_app_id must be positive")
+    if not 0 < intent["amount"] < 2 ** 64 or not 0 <= intent["relayer_fee"] < 2 ** 64:
+        raise IntentRejected("amount must be positive and relayer_fee non-negative uint64")
+    if intent["amount"] + intent["relayer_fee"] >= 2 ** 64:
+        raise IntentRejected("amount + relayer_fee overflows uint64")
+    if not 0 <= intent["nonce"] < 2 ** 64:
+        raise IntentRejected("nonce must be a uint64")
+    if len(intent["signature"]) != SIGNATURE_LENGTH:
+        raise IntentRejected(f"signature must be {SIGNATURE_LENGTH} bytes")
+    return intent
+
+
+def intent_id(app_id, nonce):
+    """Status key of an intent: a PI Base accepts each nonce once"""
+    return f"{app_id}:{nonce}"
+
+
+def verify_intent(intent, creator_addr):
+    """Check the intent's signature against the PI Base creator's key"""
+    message = intent_message(intent["app_id"], intent["nonce"], intent["destination"],
+                             intent["amount"], intent["relayer_fee"])
+    try:
+        nacl.signing.VerifyKey(creator_addr).verify(hashlib.sha256(message).digest(), intent["signature"])
+    except nacl.exceptions.BadSignatureError:
+        raise IntentRejected("signature does not match the PI Base creator")
+
+
+class PiBaseQueue:
+    """
+    Pending intents of one PI Base, keyed by nonce.
+
+    next_nonce is the nonce the next submitted group must start at: the
+    on-chain nonce plus whatever is in flight. Only a run of consecutive
+    nonces from there can be submitted; a gap waits for its intent, or for
+    the chain nonce to move past it (see needs_sync).
+    """
+
+    def __init__(self, app_id, creator_addr, usdc_id, chain_nonce):
+        self.app_id = app_id
+        self.creator_addr = creator_addr
+        self.usdc_id = usdc_id
+        self.next_nonce = chain_nonce
+        self.pending = {}
+        self.in_flight = False
+        self.syncing = False
+        self.synced_at = time.monotonic()
+        self.nonce_ahead = False  # an intent arrived past next_nonce since the last read
+
+    def add(self, intent, max_depth):
+        """Queue a verified intent, rejecting stale and duplicate nonces"""
+        nonce = intent["nonce"]
+        if nonce < self.next_nonce:
+            raise IntentRejected(f"nonce {nonce} is already used or in flight (next is {self.next_nonce})")
+        if nonce in self.pending:
+            raise IntentRejected(f"nonce {nonce} is already queued")
+        # Bounding the window also bounds the queue: nonces far ahead would
+        # hold a slot until every intent before them arrives
+        if nonce - self.next_nonce >= max_depth or len(self.pending) >= max_depth:
+            raise QueueFull(f"PI Base {self.app_id} queue is full")
+        self.pending[nonce] = intent
+        if nonce > self.next_nonce:
+            self.nonce_ahead = True
+
+    def needs_sync(self, now):
+        """
+        Whether an idle queue waiting on a gap should re-read the chain nonce.
+
+        Another relayer or the creator may have used the missing nonces, so
+        the queue checks when an intent arrives past next_nonce, and every
+        RESYNC_SEC while it is stuck.
+        """
+        if self.in_flight or self.syncing or not self.pending or self.next_nonce in self.pending:
+            return False
+        return self.nonce_ahead or now - self.synced_at >= RESYNC_SEC
+
+    def resync(self, chain_nonce):
+        """
+        Catch up with a chain nonce advanced outside the relayer.
+
+        Returns the queued intents below it, which can no longer land.
+        """
+        self.syncing = False
+        self.nonce_ahead = False
+        self.synced_at = time.monotonic()
+        if chain_nonce <= self.next_nonce:
+            return []
+        self.next_nonce = chain_nonce
+        return [self.pending.pop(n) for n in sorted(self.pending) if n < chain_nonce]
+
+    def take_batch(self, max_size):
+        """Remove and return the run of consecutive nonces from next_nonce"""
+        if self.in_flight or self.syncing:
+            return []
+        batch = []
+        while len(batch) < max_size and self.next_nonce + len(batch) in self.pending:
+            batch.append(self.pending.pop(self.next_nonce + len(batch)))
+        if batch:
+            self.next_nonce += len(batch)
+            self.in_flight = True
+        return batch
+
+    def settle(self, chain_nonce):
+        """
+        End the in-flight group, resuming from the nonce the chain reached.
+
+        Returns the queued intents whose nonces were used meanwhile, e.g. by
+        another relayer; they can no longer land.
+        """
+        self.in_flight = False
+        self.nonce_ahead = False
+        self.synced_at = time.monotonic()
+        self.next_nonce = chain_nonce
+        return [self.pending.pop(n) for n in sorted(self.pending) if n < chain_nonce]
+
+
+class RelayerService:
+    """Validates, queues and submits intents; safe to use from many threads"""
+
+    def __init__(self, client, private_key, max_in_flight=4, max_group_size=MAX_GROUP_SIZE,
+                 max_queue_depth=256, max_pending=4096, max_finished=100_000, costs=None, telemetry=None):
+        self.client = client
+        self.private_key = private_key
+        self.address = account.address_from_private_key(private_key)
+        self.max_in_flight = max_in_flight
+        self.max_group_size = max_group_size
+        self.max_queue_depth = max_queue_depth
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self.costs = costs if costs is not None else load_method_costs()
+        self.telemetry = telemetry or REGISTRY
+
+        self.queues = {}
+        self.records = OrderedDict()
+        self.counters = {QUEUED: 0, CONFIRMED: 0, FAILED: 0, "rejected": 0, "throttled": 0, "batches": 0, "groups": 0}
+        self.pending = 0  # queued or in flight
+        self.in_flight = 0
+        self.lock = threading.Condition()
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self.running = False
+        self.dispatcher = None
+
+    # --- Ingestion ---
+
+    def pi_base_state(self, app_id):
+        """Decoded global state of a PI Base"""
+        state = {}
+        for item in self.client.application_info(app_id)["params"].get("global-state", []):
+            key = base64.b64decode(item["key"]).decode()
+            if item["value"]["type"] == 1:
+                state[key] = base64.b64decode(item["value"]["bytes"])
+            else:
+                state[key] = item["value"]["uint"]
+        if len(state.get("creator_addr", b"")) != 32 or "usdc_id" not in state:
+            raise IntentRejected(f"Application {app_id} is not a PI Base")
+        return state
+
+    def submit(self, payload):
+        """
+        Validate and queue one intent, returning its id.
+
+        Raises IntentRejected if the intent can never succeed and QueueFull
+        when it should be retried later.
+        """
+        try:
+            intent = parse_intent(payload)
+            key = intent_id(intent["app_id"], intent["nonce"])
+            with self.telemetry.span("intent", "validate", traces=[key]):
+                with self.lock:
+                    queue = self.queues.get(intent["app_id"])
+                if queue is None:
+                    # Read outside the lock; the first reader to finish wins
+                    state = self.pi_base_state(intent["app_id"])
+                    with self.lock:
+                        queue = self.queues.setdefault(intent["app_id"], PiBaseQueue(
+                            intent["app_id"], state["creator_addr"], state["usdc_id"], state.get("creator_nonce", 0)))
+                verify_intent(intent, queue.creator_addr)
+
+            with self.lock:
+                if self.pending >= self.max_pending:
+                    raise QueueFull("Relayer is at capacity")
+                queue.add(intent, self.max_queue_depth)
+                self.records[key] = {"id": key, "status": QUEUED}
+                self.records.move_to_end(key)
+                self.counters[QUEUED] += 1
+                self.pending += 1
+                self.lock.notify_all()
+                return key
+        except IntentRejected:
+            with self.lock:
+                self.counters["rejected"] += 1
+            raise
+        except QueueFull:
+            with self.lock:
+                self.counters["throttled"] += 1
+            raise
+
+    def status(self, key):
+        """Status record of an intent, or None if it is unknown"""
+        with self.lock:
+            record = self.records.get(key)
+            return dict(record) if record else None
+
+    def stats(self):
+        """Counters and per-PI Base queue depths"""
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "pending": self.pending,
+                "in_flight_groups": self.in_flight,
+                "queues": {
+                    str(app_id): {"queued": len(q.pending), "next_nonce": q.next_nonce, "in_flight": q.in_flight}
+                    for app_id, q in self.queues.items()
+                },
+            }
+
+    # --- Submission ---
+
+    def intent_call(self, queue, intent):
+        """Group packer call for an intent; one PI Base's intents keep nonce order"""
+        return {
+            "method": INTENT_METHOD,
+            "accounts": [encoding.encode_address(intent["destination"])],
+            "assets": [queue.usdc_id],
+            "boxes": [(queue.app_id, b"fee:" + encoding.decode_address(self.address), RELAYER_FEE_BOX_SIZE)],
+            "order_key": queue.app_id,
+        }
+
+    def build_group(self, queue, members, layout, params):
+        """Unsigned, fee-pooled transactions for a packed group of one PI Base's intents"""
+        if layout["padding_calls"]:
+            raise ValueError("process_intent raises its own budget; no padding calls expected")
+
+        txns = [
+            transaction.ApplicationCallTxn(
+                sender=self.address,
+                sp=params,
+                index=queue.app_id,
+                on_complete=transaction.OnComplete.NoOpOC,
+                app_args=[
+                    b"process_intent",
+                    intent["destination"],
+                    itob(intent["amount"]),
+                    itob(intent["relayer_fee"]),
+                    itob(intent["nonce"]),
+                    intent["signature"],
+                ],
+                foreign_assets=txn["assets"],
+                accounts=txn["accounts"],
+                # The PI Base is the called app, index 0 in box references
+                boxes=[(0 if app == queue.app_id else app, name) for app, name in txn["boxes"]],
+            )
+            for intent, txn in zip(members, layout["transactions"])
+        ]
+        txns = apply_fees(txns, layout)
+        if len(txns) > 1:
+            gid = transaction.calculate_group_id(txns)
+            for txn in txns:
+                txn.group = gid
+        return txns
+
+    def suggested_params(self):
+        """Suggested params with flat, planner-set fees"""
+        params = self.client.suggested_params()
+        params.flat_fee = True
+        return params
+
+    def send_group(self, queue, members, params, layout=None):
+        """Submit intents as one atomic group and wait for it; returns (txids, round)"""
+        keys = [intent_id(intent["app_id"], intent["nonce"]) for intent in members]
+        with self.telemetry.span("intent", "build", traces=keys, group_size=len(members)):
+            if layout is None:
+                layout = layout_group([self.intent_call(queue, i) for i in members], self.costs, params.min_fee)
+            txns = self.build_group(queue, members, layout, params)
+        with self.telemetry.span("intent", "sign", traces=keys):
+            signed = [txn.sign(self.private_key) for txn in txns]
+        txids = [txn.get_txid() for txn in signed]
+        with self.telemetry.span("intent", "submit", traces=keys, txids=txids):
+            self.client.send_transactions(signed)
+        with self.telemetry.span("intent", "confirm", traces=keys, txids=txids) as span:
+            info = transaction.wait_for_confirmation(self.client, txids[0], CONFIRMATION_ROUNDS)
+            span["round"] = info["confirmed-round"]
+        with self.telemetry.span("intent", "observe", traces=keys, txids=txids) as span:
+            span["payments"] = self.observe_payments(txids, info)
+        return txids, info["confirmed-round"]
+
+    def observe_payments(self, txids, first_info):
+        """Count the payment_processed logs of a confirmed group"""
+        return sum(
+            self.telemetry.observe_logs(info, "payment_processed")
+            for info in [first_info] + [self.client.pending_transaction_info(txid) for txid in txids[1:]]
+        )
+
+    def settle_records(self, batch, status, **fields):
+        """Update the records of a batch (caller holds the lock)"""
+        for intent in batch:
+            key = intent_id(intent["app_id"], intent["nonce"])
+            self.records[key] = {"id": key, "status": status, **fields}
+            self.records.move_to_end(key)
+            if status in (CONFIRMED, FAILED):
+                self.counters[status] += 1
+                self.pending -= 1
+        # Forget the oldest finished intents beyond the retention bound
+        while len(self.records) > self.max_finished:
+            oldest = next(iter(self.records))
+            if self.records[oldest]["status"] in (QUEUED, SUBMITTED):
+                break
+            del self.records[oldest]
+
+    def run_batch(self, queue, batch):
+        """
+        Submit a batch, falling back to one intent at a time if a group fails.
+
+        An atomic group fails as a whole, so its members are retried alone, in
+        nonce order, to find the failing intent. The ones after it cannot land
+        with their nonces until a replacement for it arrives, so they fail too.
+        """
+        try:
+            landed = self.submit_batch(queue, batch)
+        except Exception as e:
+            # Raised before anything was sent: no params or no valid packing
+            with self.lock:
+                self.settle_records(batch, FAILED, error=str(e))
+            landed = 0
+        try:
+            chain_nonce = self.pi_base_state(queue.app_id).get("creator_nonce", 0)
+        except Exception:
+            # Without a fresh read, count what this batch is known to have landed
+            chain_nonce = batch[0]["nonce"] + landed
+        with self.lock:
+            stale = queue.settle(chain_nonce)
+            self.settle_records(stale, FAILED, error="nonce used by another transaction")
+            self.in_flight -= 1
+            self.lock.notify_all()
+
+    def submit_batch(self, queue, batch):
+        """
+        Submit a batch in as few groups as the packer finds and settle its
+        records; returns how many intents landed, which stops at the first
+        failure.
+        """
+        landed = 0
+        params = self.suggested_params()
+        for group in pack_groups([self.intent_call(queue, i) for i in batch], self.costs, params.min_fee):
+            members = [batch[i] for i in group["calls"]]
+            group_landed = self.submit_members(queue, members, group, params)
+            landed += group_landed
+            if group_landed < len(members):
+                with self.lock:
+                    failed = members[group_landed]["nonce"]
+                    self.settle_records(batch[landed + 1:], FAILED, error=f"nonce {failed} failed first")
+                break
+        return landed
+
+    def submit_members(self, queue, members, layout, params):
+        """Submit one packed group, retrying its members alone if it fails"""
+        with self.lock:
+            self.counters["groups"] += 1
+        try:
+            txids, confirmed_round = self.send_group(queue, members, params, layout)
+            with self.lock:
+                for intent, txid in zip(members, txids):
+                    self.settle_records([intent], CONFIRMED, txid=txid, round=confirmed_round)
+            return len(members)
+        except Exception as e:
+            if len(members) == 1:
+                with self.lock:
+                    self.settle_records(members, FAILED, error=str(e))
+                return 0
+
+        for i, intent in enumerate(members):
+            try:
+                txids, confirmed_round = self.send_group(queue, [intent], params)
+                with self.lock:
+                    self.settle_records([intent], CONFIRMED, txid=txids[0], round=confirmed_round)
+            except Exception as e:
+                with self.lock:
+                    self.settle_records([intent], FAILED, error=str(e))
+                return i
+        return len(members)
+
+    def resync_queue(self, queue):
+        """Re-read a stuck queue's chain nonce, failing the intents it overtook"""
+        try:
+            chain_nonce = self.pi_base_state(queue.app_id).get("creator_nonce", 0)
+        except Exception:
+            chain_nonce = 0  # keep waiting; the next read is RESYNC_SEC away
+        with self.lock:
+            stale = queue.resync(chain_nonce)
+            self.settle_records(stale, FAILED, error="nonce used by another transaction")
+            self.lock.notify_all()
+
+    def dispatch(self):
+        """Start groups for ready queues until stopped, bounded by max_in_flight"""
+        with self.lock:
+            while self.running:
+                started = False
+                now = time.monotonic()
+                for queue in list(self.queues.values()):
+                    if self.in_flight >= self.max_in_flight:
+                        break
+                    if queue.needs_sync(now):
+                        queue.syncing = True
+                        self.executor.submit(self.resync_queue, queue)
+                        continue
+                    batch = queue.take_batch(self.max_group_size)
+                    if batch:
+                        self.in_flight += 1
+                        self.counters["batches"] += 1
+                        self.settle_records(batch, SUBMITTED)
+                        self.executor.submit(self.run_batch, queue, batch)
+                        started = True
+                if not started:
+                    # Wake up to re-read the nonce of queues stuck on a gap
+                    stuck = any(q.pending and not q.in_flight for q in self.queues.values())
+                    self.lock.wait(RESYNC_SEC if stuck else None)
+
+    def start(self):
+        """Run the dispatcher in a background thread"""
+        with self.lock:
+            self.running = True
+        self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def stop(self):
+        """Stop dispatching and wait for in-flight groups"""
+        with self.lock:
+            self.running = False
+            self.lock.notify_all()
+        if self.dispatcher:
+            self.dispatcher.join()
+        self.executor.shutdown(wait=True)
+
+
+def make_handler(service):
+    """HTTP request handler class bound to a RelayerService"""
+
+    class RelayerHandler(BaseHTTPRequestHandler):
+        def reply(self, code, body, headers=()):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if self.path != "/intents":
+                return self.reply(404, {"error": "not found"})
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                key = service.submit(payload)
+            except QueueFull as e:
+                return self.reply(429, {"error": str(e)}, [("Retry-After", "1")])
+            except (IntentRejected, ValueError) as e:
+                return self.reply(400, {"error": str(e)})
+            self.reply(202, {"id": key, "status": QUEUED})
+
+        def do_GET(self):
+            if self.path == "/stats":
+                return self.reply(200, service.stats())
+            if self.path == "/metrics":
+                return self.reply_metrics()
+            if self.path.startswith("/intents/") and self.path.endswith("/trace"):
+                spans = service.telemetry.trace(self.path[len("/intents/"):-len("/trace")])
+                if spans:
+                    return self.reply(200, spans)
+            elif self.path.startswith("/intents/"):
+                record = service.status(self.path[len("/intents/"):])
+                if record:
+                    return self.reply(200, record)
+            self.reply(404, {"error": "not found"})
+
+        def reply_metrics(self):
+            stats = service.stats()
+            service.telemetry.set_gauge("strahn_relayer_pending_intents", stats["pending"])
+            service.telemetry.set_gauge("strahn_relayer_in_flight_groups", stats["in_flight_groups"])
+            for name, value in stats["counters"].items():
+                service.telemetry.set_gauge("strahn_relayer_events", value, kind=name)
+            data = service.telemetry.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return RelayerHandler
+
+
+def main():
+    """Serve the relayer API: relayer_service.py [port]"""
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    relayer_mnemonic = os.environ.get("RELAYER_MNEMONIC")
+    if not relayer_mnemonic:
+        print("Set RELAYER_MNEMONIC to the relayer account's 25-word phrase")
+        return 1
+
+    configure_from_env()
+    client = algod.AlgodClient(os.environ.get("ALGOD_TOKEN", ""),
+                               os.environ.get("ALGOD_ADDRESS", DEFAULT_ALGOD_ADDRESS))
+    service = RelayerService(
+        client,
+        mnemonic.to_private_key(relayer_mnemonic),
+        max_in_flight=int(os.environ.get("RELAYER_MAX_IN_FLIGHT", 4)),
+        max_pending=int(os.environ.get("RELAYER_MAX_PENDING", 4096)),
+    )
+    service.start()
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(service))
+    print(f"Relayer {service.address} listening on http://127.0.0.1:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
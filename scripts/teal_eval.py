@@ -0,0 +1,1104 @@
+#!/usr/bin/env python3
+"""
+TEAL evaluator for the algod stand-in
+
+Runs the approval programs of stand-in apps created from registered TEAL
+source (Ledger.register_teal), so tests exercise the compiled contracts
+themselves rather than Python models of them. It implements the opcodes,
+transaction fields and limits the Strahn contracts use; any other opcode
+fails the call, as an unknown opcode would on chain.
+
+Programs run from source and are never assembled, which leads to these
+differences from the AVM:
+- ed25519verify checks the signature over the data as given, which is how
+  the clients sign intents. The AVM signs over "ProgData" + the program
+  hash + the data, and that needs the assembled program.
+- A program image is its UTF-8 source, so program sizes and extra pages
+  are counted in source bytes.
+- Inner transactions pay no fee of their own. The stand-in instead checks
+  the fees pooled across the outer group, with inner transactions counted.
+- Resource references (accounts, assets, apps, boxes) are not checked.
+"""
+
+import base64
+import hashlib
+
+import nacl.exceptions
+import nacl.signing
+from algosdk import encoding, transaction
+from algosdk.logic import get_application_address
+
+APP_CALL_BUDGET = 700          # opcode budget each app call adds to the group's pool
+MAX_STACK_BYTES = 4096         # longest byte string on the stack
+MAX_LOG_COUNT = 32
+MAX_LOG_BYTES = 1024
+MAX_BOX_SIZE = 32768
+MAX_BOX_NAME = 64
+MAX_KEY_VALUE_BYTES = 128      # global state key plus value
+MAX_INNER_GROUP = 16
+MAX_INNER_TXNS = 256           # per outer group
+MAX_CALL_DEPTH = 8             # app calls nested through inner transactions
+MIN_BALANCE = 100_000          # an account's own minimum; an empty account needs none
+MAX_EXTRA_PAGES = 3
+PROGRAM_PAGE_SIZE = 2048
+ZERO_ADDRESS = bytes(32)
+
+# PyTeal's OpUp creates and deletes this one-line app (pushint 1) for budget
+OPUP_PROGRAM = bytes.fromhex("068101")
+OPUP_SOURCE = "#pragma version 6\npushint 1\n"
+
+# Opcodes costing more than 1
+OPCODE_COSTS = {"sha256": 35, "ed25519verify": 1900}
+
+NAMED_INTS = {
+    "pay": 1, "keyreg": 2, "acfg": 3, "axfer": 4, "afrz": 5, "appl": 6,
+    "NoOp": 0, "OptIn": 1, "CloseOut": 2, "ClearState": 3, "UpdateApplication": 4, "DeleteApplication": 5,
+}
+TYPE_NAMES = {1: b"pay", 4: b"axfer", 6: b"appl"}
+
+# Transaction fields that are addresses, byte strings, or arrays; the rest are uint64
+ADDRESS_FIELDS = {"Sender", "Receiver", "CloseRemainderTo", "AssetSender", "AssetReceiver", "AssetCloseTo", "RekeyTo"}
+BYTES_FIELDS = {"Note", "Lease", "Type", "ApprovalProgram", "ClearStateProgram", "LastLog", "TxID"}
+ARRAY_FIELDS = {"ApplicationArgs", "Accounts", "Applications", "Assets", "ApprovalProgramPages",
+                "ClearStateProgramPages", "Logs"}
+# Fields an inner transaction may set
+INNER_FIELDS = (ADDRESS_FIELDS | {"Note", "Type", "ApprovalProgram", "ClearStateProgram"} | ARRAY_FIELDS) - {"Logs"} | {
+    "Fee", "TypeEnum", "Amount", "XferAsset", "AssetAmount", "ApplicationID", "OnCompletion",
+    "GlobalNumUint", "GlobalNumByteSlice", "LocalNumUint", "LocalNumByteSlice", "ExtraProgramPages",
+}
+
+
+class LogicError(Exception):
+    """A program failed or rejected; the whole outer group fails"""
+
+
+def address_bytes(address):
+    return encoding.decode_address(address)
+
+
+def app_address(app_id):
+    """Raw 32-byte address of an app account"""
+    return address_bytes(get_application_address(app_id))
+
+
+def txn_fields(txn, group_index):
+    """TEAL fields of an SDK transaction"""
+    fields = {
+        "Sender": address_bytes(txn.sender),
+        "Fee": txn.fee,
+        "FirstValid": txn.first_valid_round,
+        "LastValid": txn.last_valid_round,
+        "Note": txn.note or b"",
+        "Lease": txn.lease or bytes(32),
+        "RekeyTo": address_bytes(txn.rekey_to) if txn.rekey_to else ZERO_ADDRESS,
+        "GroupIndex": group_index,
+        "TxID": txn.get_txid().encode(),
+    }
+    if isinstance(txn, transaction.PaymentTxn):
+        fields.update(TypeEnum=1, Receiver=address_bytes(txn.receiver), Amount=txn.amt,
+                      CloseRemainderTo=address_bytes(txn.close_remainder_to) if txn.close_remainder_to
+                      else ZERO_ADDRESS)
+    elif isinstance(txn, transaction.AssetTransferTxn):
+        fields.update(TypeEnum=4, XferAsset=txn.index, AssetAmount=txn.amount,
+                      AssetReceiver=address_bytes(txn.receiver),
+                      AssetCloseTo=address_bytes(txn.close_assets_to) if txn.close_assets_to else ZERO_ADDRESS,
+                      AssetSender=address_bytes(txn.revocation_target) if txn.revocation_target
+                      else ZERO_ADDRESS)
+    elif isinstance(txn, transaction.ApplicationCallTxn):
+        fields.update(
+            TypeEnum=6,
+            ApplicationID=txn.index,
+            OnCompletion=int(txn.on_complete),
+            ApplicationArgs=[arg.encode() if isinstance(arg, str) else arg for arg in txn.app_args or []],
+            Accounts=[address_bytes(a) for a in txn.accounts or []],
+            Applications=list(txn.foreign_apps or []),
+            Assets=list(txn.foreign_assets or []),
+            ApprovalProgram=txn.approval_program or b"",
+            ClearStateProgram=txn.clear_program or b"",
+            GlobalNumUint=txn.global_schema.num_uints if txn.global_schema else 0,
+            GlobalNumByteSlice=txn.global_schema.num_byte_slices if txn.global_schema else 0,
+            ExtraProgramPages=txn.extra_pages or 0,
+        )
+    fields["Type"] = TYPE_NAMES.get(fields.get("TypeEnum"), b"")
+    return fields
+
+
+def field_value(fields, name):
+    """A scalar transaction field, defaulting as the AVM does"""
+    if name == "NumAppArgs":
+        return len(fields.get("ApplicationArgs", []))
+    if name in ("NumAccounts", "NumApplications", "NumAssets", "NumLogs"):
+        return len(fields.get(name[3:], []))
+    if name == "LastLog":
+        logs = fields.get("Logs", [])
+        return logs[-1] if logs else b""
+    if name in ARRAY_FIELDS:
+        raise LogicError(f"{name} is an array field")
+    if name in fields:
+        return fields[name]
+    if name in ADDRESS_FIELDS:
+        return ZERO_ADDRESS
+    if name in BYTES_FIELDS:
+        return b""
+    return 0
+
+
+def field_item(fields, name, index):
+    """An element of an array field; Accounts and Applications start with the sender and the app"""
+    items = fields.get(name, [])
+    if name == "Accounts":
+        items = [fields["Sender"]] + items
+    elif name == "Applications":
+        items = [fields.get("ApplicationID", 0)] + items
+    elif name not in ARRAY_FIELDS:
+        raise LogicError(f"{name} is not an array field")
+    if index >= len(items):
+        raise LogicError(f"{name} index {index} beyond length {len(items)}")
+    return items[index]
+
+
+# --- Parsing ---
+
+def tokenize(line):
+    """Split a source line into tokens, keeping quoted strings whole and dropping comments"""
+    tokens = []
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if char.isspace():
+            i += 1
+        elif line.startswith("//", i):
+            break
+        elif char == '"':
+            end = i + 1
+            while end < len(line) and line[end] != '"':
+                end += 2 if line[end] == "\\" else 1
+            tokens.append(line[i:end + 1])
+            i = end + 1
+        else:
+            end = i
+            while end < len(line) and not line[end].isspace():
+                end += 1
+            tokens.append(line[i:end])
+            i = end
+    return tokens
+
+
+def parse_string(token):
+    """Bytes of a quoted TEAL string literal"""
+    body = token[1:-1]
+    out = bytearray()
+    i = 0
+    while i < len(body):
+        if body[i] != "\\":
+            out += body[i].encode()
+            i += 1
+            continue
+        escape = body[i + 1]
+        if escape == "x":
+            out.append(int(body[i + 2:i + 4], 16))
+            i += 4
+            continue
+        out += {"n": b"\n", "r": b"\r", "t": b"\t", '"': b'"', "\\": b"\\"}[escape]
+        i += 2
+    return bytes(out)
+
+
+def parse_bytes(args):
+    if args[0].startswith("TMPL_"):
+        raise LogicError(f"template variable {args[0]} is not filled")
+    if args[0].startswith('"'):
+        return parse_string(args[0])
+    if args[0].startswith("0x"):
+        return bytes.fromhex(args[0][2:])
+    if args[0] in ("base64", "b64"):
+        return base64.b64decode(args[1])
+    if args[0].startswith(("base64(", "b64(")):
+        return base64.b64decode(args[0][args[0].index("(") + 1:-1])
+    raise LogicError(f"unsupported byte constant {args[0]}")
+
+
+def parse_int(token):
+    if token.startswith("TMPL_"):
+        raise LogicError(f"template variable {token} is not filled")
+    if token in NAMED_INTS:
+        return NAMED_INTS[token]
+    return int(token, 0)
+
+
+class Program:
+    """Parsed TEAL source: (opcode, immediates, line) per instruction, and label targets"""
+
+    def __init__(self, source):
+        self.ops = []
+        self.labels = {}
+        for number, line in enumerate(source.splitlines(), 1):
+            tokens = tokenize(line)
+            if not tokens or tokens[0] == "#pragma":
+                continue
+            if tokens[0].endswith(":") and len(tokens) == 1:
+                self.labels[tokens[0][:-1]] = len(self.ops)
+                continue
+            opcode, args = tokens[0], tokens[1:]
+            if opcode in ("int", "pushint"):
+                args = parse_int(args[0])
+            elif opcode in ("byte", "pushbytes"):
+                args = parse_bytes(args)
+            elif opcode == "addr":
+                args = address_bytes(args[0])
+            self.ops.append((opcode, args, number))
+
+    def target(self, label):
+        if label not in self.labels:
+            raise LogicError(f"unknown label {label}")
+        return self.labels[label]
+
+
+_programs = {}
+
+
+def program(source):
+    """Parsed program, cached by source"""
+    key = hashlib.sha256(source.encode()).digest()
+    if key not in _programs:
+        _programs[key] = Program(source)
+    return _programs[key]
+
+
+# --- Evaluation ---
+
+class GroupEvaluation:
+    """
+    State shared by every program run in one outer group: the pooled
+    opcode budget and the number of inner transactions. ledger is the
+    stand-in Ledger; its writes are journaled, so a failure anywhere rolls
+    back the whole group.
+    """
+
+    def __init__(self, ledger, outer_group):
+        self.ledger = ledger
+        self.outer = [txn_fields(stxn.transaction, i) for i, stxn in enumerate(outer_group)]
+        app_calls = sum(1 for fields in self.outer if fields.get("TypeEnum") == 6)
+        self.budget = APP_CALL_BUDGET * app_calls
+        self.budget_added = self.budget
+        self.inner_txns = 0
+        self.touched = set()
+
+    def outer_call(self, index):
+        """Run the outer app call at index; returns its pending transaction result"""
+        self.touched = {self.outer[index]["Sender"]}
+        result = self.app_call(self.outer, index, caller_app_id=0, depth=0)
+        self.check_min_balances()
+        return result
+
+    def check_min_balances(self):
+        """Every account the call changed must keep its minimum balance, unless left empty"""
+        for address in self.touched:
+            name = encoding.encode_address(address)
+            account = self.ledger.accounts.get(name)
+            needed = self.ledger.min_balance(name)
+            if account is None or (account["amount"] == 0 and not account["assets"] and needed == MIN_BALANCE):
+                continue
+            if account["amount"] < needed:
+                raise LogicError(f"account {name} balance {account['amount']} below min {needed}")
+
+    def app_call(self, group, index, caller_app_id, depth):
+        """Run an app call, outer or inner, and apply its on-completion action"""
+        fields = group[index]
+        ledger = self.ledger
+        if depth > MAX_CALL_DEPTH:
+            raise LogicError("app calls nested too deep")
+
+        app_id = fields.get("ApplicationID", 0)
+        if app_id == 0:
+            approval = fields.get("ApprovalProgram") or b"".join(fields.get("ApprovalProgramPages", []))
+            clear = fields.get("ClearStateProgram") or b"".join(fields.get("ClearStateProgramPages", []))
+            if depth > 0:
+                self.check_program_pages(approval, clear, fields.get("ExtraProgramPages", 0))
+            source = ledger.teal_source(approval)
+            if source is None:
+                raise LogicError("approval program is not registered TEAL")
+            app_id = ledger.new_id()
+            ledger.journal.set(ledger.apps, app_id, {
+                "creator": encoding.encode_address(fields["Sender"]), "model": None,
+                "approval": approval, "clear": clear, "global": {}, "boxes": {},
+                "schema": [fields.get("GlobalNumUint", 0), fields.get("GlobalNumByteSlice", 0)],
+            })
+            ledger.account(get_application_address(app_id))
+            fields["CreatedApplicationID"] = app_id
+        else:
+            app = ledger.apps.get(app_id)
+            if app is None:
+                raise LogicError(f"application {app_id} does not exist")
+            source = ledger.teal_source(app["approval"])
+            if source is None:
+                raise LogicError(f"application {app_id} does not run registered TEAL")
+
+        run = AppRun(self, program(source), group, index, app_id, caller_app_id, depth)
+        if not run.execute():
+            raise LogicError(f"application {app_id} rejected the call")
+        self.touched.add(app_address(app_id))
+
+        on_complete = fields.get("OnCompletion", 0)
+        if on_complete == NAMED_INTS["DeleteApplication"]:
+            ledger.journal.delete(ledger.apps, app_id)
+        elif on_complete == NAMED_INTS["UpdateApplication"]:
+            app = ledger.apps[app_id]
+            ledger.journal.set(app, "approval", fields.get("ApprovalProgram", b""))
+            ledger.journal.set(app, "clear", fields.get("ClearStateProgram", b""))
+        elif on_complete not in (NAMED_INTS["NoOp"], NAMED_INTS["OptIn"], NAMED_INTS["CloseOut"]):
+            raise LogicError(f"on-completion {on_complete} is not supported")
+
+        fields["Logs"] = run.logs
+        result = {"logs": [base64.b64encode(log).decode() for log in run.logs],
+                  "txn": {"txn": {"type": "appl", "apid": app_id if fields.get("ApplicationID") else 0}}}
+        if run.inner_results:
+            result["inner-txns"] = run.inner_results
+        if "CreatedApplicationID" in fields:
+            result["application-index"] = app_id
+        return result
+
+    @staticmethod
+    def check_program_pages(approval, clear, extra_pages):
+        if extra_pages > MAX_EXTRA_PAGES:
+            raise LogicError(f"tx.ExtraProgramPages exceeds MaxExtraAppProgramPages = {MAX_EXTRA_PAGES}")
+        if len(approval) + len(clear) > PROGRAM_PAGE_SIZE * (1 + extra_pages):
+            raise LogicError(f"app programs too long: {len(approval) + len(clear)} bytes "
+                             f"for {extra_pages} extra pages")
+
+    def inner_group(self, run, group):
+        """Apply an inner group submitted by a running app; returns the results"""
+        self.inner_txns += len(group)
+        if self.inner_txns > MAX_INNER_TXNS:
+            raise LogicError(f"too many inner transactions: {self.inner_txns}")
+        ledger = self.ledger
+        results = []
+        for index, fields in enumerate(group):
+            fields["GroupIndex"] = index
+            sender = fields["Sender"]
+            if sender != app_address(run.app_id):
+                raise LogicError("inner transaction sender is not the app account")
+            sender_name = encoding.encode_address(sender)
+            self.touched.add(sender)
+            if fields.get("Fee", 0):
+                account = ledger.account(sender_name)
+                if account["amount"] < fields["Fee"]:
+                    raise LogicError("app account cannot pay its inner transaction fee")
+                ledger.journal.set(account, "amount", account["amount"] - fields["Fee"])
+
+            type_enum = fields.get("TypeEnum", 0)
+            if type_enum == 1:
+                receiver = fields.get("Receiver", ZERO_ADDRESS)
+                self.touched.add(receiver)
+                ledger.move_algo(sender_name, encoding.encode_address(receiver), fields.get("Amount", 0))
+                results.append({"txn": {"txn": {"type": "pay"}}})
+            elif type_enum == 4:
+                receiver = fields.get("AssetReceiver", ZERO_ADDRESS)
+                amount = fields.get("AssetAmount", 0)
+                self.touched.add(receiver)
+                if receiver == sender and amount == 0:
+                    ledger.opt_in(sender_name, fields.get("XferAsset", 0))
+                else:
+                    ledger.transfer_asset(sender_name, encoding.encode_address(receiver),
+                                          fields.get("XferAsset", 0), amount)
+                results.append({"txn": {"txn": {"type": "axfer"}}})
+            elif type_enum == 6:
+                self.budget += APP_CALL_BUDGET
+                self.budget_added += APP_CALL_BUDGET
+                results.append(self.app_call(group, index, run.app_id, run.depth + 1))
+            else:
+                raise LogicError(f"inner transaction type {type_enum} is not supported")
+        return results
+
+
+class AppRun:
+    """One execution of an approval program"""
+
+    def __init__(self, evaluation, program, group, index, app_id, caller_app_id, depth):
+        self.evaluation = evaluation
+        self.ledger = evaluation.ledger
+        self.program = program
+        self.group = group
+        self.index = index
+        self.txn = group[index]
+        self.app_id = app_id
+        self.caller_app_id = caller_app_id
+        self.depth = depth
+        self.pc = 0
+        self.stack = []
+        self.scratch = [0] * 256
+        self.frames = []
+        self.logs = []
+        self.inner_building = None   # inner group being assembled
+        self.last_inner = None       # fields of the last submitted inner group
+        self.inner_results = []
+
+    # --- Stack helpers ---
+
+    def push(self, value):
+        if isinstance(value, bytes) and len(value) > MAX_STACK_BYTES:
+            raise LogicError(f"byte string of {len(value)} bytes exceeds {MAX_STACK_BYTES}")
+        if isinstance(value, bool):
+            value = int(value)
+        self.stack.append(value)
+
+    def pop(self):
+        if not self.stack:
+            raise LogicError("stack underflow")
+        return self.stack.pop()
+
+    def pop_uint(self):
+        value = self.pop()
+        if not isinstance(value, int):
+            raise LogicError("expected uint64, got bytes")
+        return value
+
+    def pop_bytes(self):
+        value = self.pop()
+        if not isinstance(value, bytes):
+            raise LogicError("expected bytes, got uint64")
+        return value
+
+    def push_uint(self, value):
+        if not 0 <= value < 2 ** 64:
+            raise LogicError("uint64 overflow" if value > 0 else "uint64 underflow")
+        self.stack.append(value)
+
+    # --- Execution ---
+
+    def execute(self):
+        """Run to completion; returns whether the program approved"""
+        ops = self.program.ops
+        pc = 0
+        while pc < len(ops):
+            self.pc = pc
+            opcode, args, line = ops[pc]
+            self.evaluation.budget -= OPCODE_COSTS.get(opcode, 1)
+            if self.evaluation.budget < 0:
+                raise LogicError(f"dynamic cost budget exceeded at line {line}")
+            handler = OPCODES.get(opcode)
+            if handler is None:
+                raise LogicError(f"unsupported opcode {opcode} at line {line}")
+            try:
+                jump = handler(self, args)
+            except LogicError as e:
+                raise LogicError(f"{e} (line {line}: {opcode})") from None
+            except _Return as done:
+                return done.approved
+            pc = pc + 1 if jump is None else jump
+        if len(self.stack) != 1 or not isinstance(self.stack[0], int):
+            raise LogicError("program must end with exactly one uint64 on the stack")
+        return self.stack[0] != 0
+
+    def state(self, app_id):
+        app = self.ledger.apps.get(app_id)
+        if app is None:
+            raise LogicError(f"application {app_id} does not exist")
+        return app
+
+    def box(self, name):
+        if not 0 < len(name) <= MAX_BOX_NAME:
+            raise LogicError(f"box names are 1 to {MAX_BOX_NAME} bytes")
+        return self.ledger.box_get(self.app_id, name)
+
+
+class _Return(Exception):
+    def __init__(self, approved):
+        self.approved = approved
+
+
+# --- Opcodes: handler(run, immediates) returns a jump target or None ---
+
+def _binary(op):
+    def handler(run, args):
+        b, a = run.pop_uint(), run.pop_uint()
+        run.push_uint(op(a, b))
+    return handler
+
+
+def _divide(a, b):
+    if b == 0:
+        raise LogicError("division by zero")
+    return a // b
+
+
+def _modulo(a, b):
+    if b == 0:
+        raise LogicError("modulo by zero")
+    return a % b
+
+
+def _equal(run, args):
+    b, a = run.pop(), run.pop()
+    if type(a) is not type(b):
+        raise LogicError("cannot compare uint64 with bytes")
+    run.push(int(a == b))
+
+
+def _not_equal(run, args):
+    _equal(run, args)
+    run.push(int(not run.pop()))
+
+
+def _assert(run, args):
+    if run.pop_uint() == 0:
+        raise LogicError("assert failed")
+
+
+def _err(run, args):
+    raise LogicError("err opcode executed")
+
+
+def _return(run, args):
+    raise _Return(run.pop_uint() != 0)
+
+
+def _branch(condition):
+    def handler(run, args):
+        if condition is None or (run.pop_uint() != 0) == condition:
+            return run.program.target(args[0])
+    return handler
+
+
+def _callsub(run, args):
+    run.frames.append({"return": run.pc + 1})
+    return run.program.target(args[0])
+
+
+def _proto(run, args):
+    if not run.frames:
+        raise LogicError("proto outside a subroutine")
+    frame = run.frames[-1]
+    arg_count, frame["returns"] = int(args[0]), int(args[1])
+    if len(run.stack) < arg_count:
+        raise LogicError("proto arguments missing from the stack")
+    frame["args"] = len(run.stack) - arg_count
+    frame["base"] = len(run.stack)
+
+
+def _frame_dig(run, args):
+    frame = run.frames[-1] if run.frames else None
+    if frame is None or "base" not in frame:
+        raise LogicError("frame_dig without proto")
+    position = frame["base"] + int(args[0])
+    if not frame["args"] <= position < len(run.stack):
+        raise LogicError("frame_dig out of range")
+    run.push(run.stack[position])
+
+
+def _frame_bury(run, args):
+    frame = run.frames[-1] if run.frames else None
+    if frame is None or "base" not in frame:
+        raise LogicError("frame_bury without proto")
+    value = run.pop()
+    position = frame["base"] + int(args[0])
+    if not frame["args"] <= position < len(run.stack):
+        raise LogicError("frame_bury out of range")
+    run.stack[position] = value
+
+
+def _retsub(run, args):
+    if not run.frames:
+        raise LogicError("retsub with an empty call stack")
+    frame = run.frames.pop()
+    if "base" in frame:
+        returns = run.stack[len(run.stack) - frame["returns"]:] if frame["returns"] else []
+        if len(run.stack) - frame["returns"] < frame["base"]:
+            raise LogicError("retsub with too few return values")
+        del run.stack[frame["args"]:]
+        run.stack.extend(returns)
+    return frame["return"]
+
+
+def _load(run, args):
+    run.push(run.scratch[int(args[0])])
+
+
+def _store(run, args):
+    run.scratch[int(args[0])] = run.pop()
+
+
+def _pop(run, args):
+    run.pop()
+
+
+def _dup(run, args):
+    value = run.pop()
+    run.push(value)
+    run.push(value)
+
+
+def _swap(run, args):
+    b, a = run.pop(), run.pop()
+    run.push(b)
+    run.push(a)
+
+
+def _select(run, args):
+    condition, b, a = run.pop_uint(), run.pop(), run.pop()
+    run.push(b if condition else a)
+
+
+def _len(run, args):
+    run.push(len(run.pop_bytes()))
+
+
+def _itob(run, args):
+    run.push(run.pop_uint().to_bytes(8, "big"))
+
+
+def _btoi(run, args):
+    value = run.pop_bytes()
+    if len(value) > 8:
+        raise LogicError(f"btoi of {len(value)} bytes")
+    run.push(int.from_bytes(value, "big"))
+
+
+def _concat(run, args):
+    b, a = run.pop_bytes(), run.pop_bytes()
+    run.push(a + b)
+
+
+def _slice(value, start, length):
+    if start + length > len(value):
+        raise LogicError(f"extraction {start}+{length} beyond length {len(value)}")
+    return value[start:start + length]
+
+
+def _extract(run, args):
+    value = run.pop_bytes()
+    start, length = int(args[0]), int(args[1])
+    run.push(value[start:] if length == 0 and start <= len(value) else _slice(value, start, length))
+
+
+def _extract3(run, args):
+    length, start, value = run.pop_uint(), run.pop_uint(), run.pop_bytes()
+    run.push(_slice(value, start, length))
+
+
+def _extract_uint(size):
+    def handler(run, args):
+        start, value = run.pop_uint(), run.pop_bytes()
+        run.push(int.from_bytes(_slice(value, start, size), "big"))
+    return handler
+
+
+def _substring(run, args):
+    value = run.pop_bytes()
+    start, end = int(args[0]), int(args[1])
+    if not start <= end <= len(value):
+        raise LogicError("substring out of range")
+    run.push(value[start:end])
+
+
+def _substring3(run, args):
+    end, start, value = run.pop_uint(), run.pop_uint(), run.pop_bytes()
+    if not start <= end <= len(value):
+        raise LogicError("substring out of range")
+    run.push(value[start:end])
+
+
+def _replace(value, start, replacement):
+    if start + len(replacement) > len(value):
+        raise LogicError("replacement beyond the end")
+    return value[:start] + replacement + value[start + len(replacement):]
+
+
+def _replace2(run, args):
+    replacement, value = run.pop_bytes(), run.pop_bytes()
+    run.push(_replace(value, int(args[0]), replacement))
+
+
+def _replace3(run, args):
+    replacement, start, value = run.pop_bytes(), run.pop_uint(), run.pop_bytes()
+    run.push(_replace(value, start, replacement))
+
+
+def _bzero(run, args):
+    length = run.pop_uint()
+    if length > MAX_STACK_BYTES:
+        raise LogicError(f"bzero of {length} bytes")
+    run.push(bytes(length))
+
+
+def _sha256(run, args):
+    run.push(hashlib.sha256(run.pop_bytes()).digest())
+
+
+def _ed25519verify(run, args):
+    public_key, signature, data = run.pop_bytes(), run.pop_bytes(), run.pop_bytes()
+    if len(public_key) != 32 or len(signature) != 64:
+        raise LogicError("ed25519verify needs a 32-byte key and a 64-byte signature")
+    try:
+        nacl.signing.VerifyKey(public_key).verify(data, signature)
+        run.push(1)
+    except nacl.exceptions.BadSignatureError:
+        run.push(0)
+
+
+def _log(run, args):
+    message = run.pop_bytes()
+    run.logs.append(message)
+    if len(run.logs) > MAX_LOG_COUNT or sum(len(log) for log in run.logs) > MAX_LOG_BYTES:
+        raise LogicError("too many log calls or bytes")
+
+
+def _txn(run, args):
+    if len(args) == 2:
+        return _txna(run, args)
+    run.push(field_value(run.txn, args[0]))
+
+
+def _txna(run, args):
+    run.push(field_item(run.txn, args[0], int(args[1])))
+
+
+def _txnas(run, args):
+    run.push(field_item(run.txn, args[0], run.pop_uint()))
+
+
+def _group_txn(run, index):
+    if index >= len(run.group):
+        raise LogicError(f"group index {index} beyond group size {len(run.group)}")
+    return run.group[index]
+
+
+def _gtxn(run, args):
+    fields = _group_txn(run, int(args[0]))
+    run.push(field_value(fields, args[1]) if len(args) == 2 else field_item(fields, args[1], int(args[2])))
+
+
+def _gtxns(run, args):
+    fields = _group_txn(run, run.pop_uint())
+    run.push(field_value(fields, args[0]) if len(args) == 1 else field_item(fields, args[0], int(args[1])))
+
+
+def _gtxnsa(run, args):
+    fields = _group_txn(run, run.pop_uint())
+    run.push(field_item(fields, args[0], int(args[1])))
+
+
+def _global(run, args):
+    name = args[0]
+    ledger = run.ledger
+    values = {
+        "MinTxnFee": 1000,
+        "MinBalance": MIN_BALANCE,
+        "MaxTxnLife": 1000,
+        "ZeroAddress": ZERO_ADDRESS,
+        "GroupSize": len(run.group),
+        "LogicSigVersion": 10,
+        "Round": ledger.round,
+        "LatestTimestamp": ledger.timestamp,
+        "CurrentApplicationID": run.app_id,
+        "CurrentApplicationAddress": app_address(run.app_id),
+        "CallerApplicationID": run.caller_app_id,
+        "CallerApplicationAddress": app_address(run.caller_app_id) if run.caller_app_id else ZERO_ADDRESS,
+        "OpcodeBudget": run.evaluation.budget,
+        "GroupID": bytes(32),
+    }
+    if name == "CreatorAddress":
+        run.push(address_bytes(run.state(run.app_id)["creator"]))
+    elif name in values:
+        run.push(values[name])
+    else:
+        raise LogicError(f"unsupported global field {name}")
+
+
+def _app_id_operand(run, value):
+    """An app given by id or, below 256, by position in the Applications array"""
+    if value < 256 and value <= len(run.txn.get("Applications", [])):
+        return field_item(run.txn, "Applications", value)
+    return value
+
+
+def _app_global_get(run, args):
+    key = run.pop_bytes()
+    run.push(run.state(run.app_id)["global"].get(key, 0))
+
+
+def _app_global_get_ex(run, args):
+    key, app_id = run.pop_bytes(), _app_id_operand(run, run.pop_uint())
+    state = run.ledger.apps.get(app_id, {"global": {}})["global"]
+    run.push(state.get(key, 0))
+    run.push(int(key in state))
+
+
+def _app_global_put(run, args):
+    value, key = run.pop(), run.pop_bytes()
+    app = run.state(run.app_id)
+    if len(key) > 64 or len(key) + (len(value) if isinstance(value, bytes) else 0) > MAX_KEY_VALUE_BYTES:
+        raise LogicError("global state key or value too long")
+    after = {**app["global"], key: value}
+    uints = sum(1 for v in after.values() if isinstance(v, int))
+    if "schema" in app and (uints > app["schema"][0] or len(after) - uints > app["schema"][1]):
+        raise LogicError("global state schema exceeded")
+    run.ledger.global_put(run.app_id, key, value)
+
+
+def _app_global_del(run, args):
+    key = run.pop_bytes()
+    run.ledger.journal.delete(run.state(run.app_id)["global"], key)
+
+
+def _box_create(run, args):
+    size, name = run.pop_uint(), run.pop_bytes()
+    if size > MAX_BOX_SIZE:
+        raise LogicError(f"box size {size} exceeds {MAX_BOX_SIZE}")
+    existing = run.box(name)
+    if existing is not None:
+        if len(existing) != size:
+            raise LogicError("box already exists with a different size")
+        run.push(0)
+        return
+    run.ledger.box_put(run.app_id, name, bytes(size))
+    run.push(1)
+
+
+def _box_del(run, args):
+    name = run.pop_bytes()
+    if run.box(name) is None:
+        run.push(0)
+        return
+    run.ledger.box_delete(run.app_id, name)
+    run.push(1)
+
+
+def _box_len(run, args):
+    value = run.box(run.pop_bytes())
+    run.push(len(value) if value is not None else 0)
+    run.push(int(value is not None))
+
+
+def _box_get(run, args):
+    value = run.box(run.pop_bytes())
+    run.push(value if value is not None else b"")
+    run.push(int(value is not None))
+
+
+def _box_put(run, args):
+    value, name = run.pop_bytes(), run.pop_bytes()
+    existing = run.box(name)
+    if existing is not None and len(existing) != len(value):
+        raise LogicError("box_put of a different size than the existing box")
+    run.ledger.box_put(run.app_id, name, value)
+
+
+def _box_replace(run, args):
+    replacement, start, name = run.pop_bytes(), run.pop_uint(), run.pop_bytes()
+    existing = run.box(name)
+    if existing is None:
+        raise LogicError("no such box")
+    run.ledger.box_put(run.app_id, name, _replace(existing, start, replacement))
+
+
+def _box_extract(run, args):
+    length, start, name = run.pop_uint(), run.pop_uint(), run.pop_bytes()
+    existing = run.box(name)
+    if existing is None:
+        raise LogicError("no such box")
+    run.push(_slice(existing, start, length))
+
+
+def _account_operand(run, value):
+    """An account given as an address or by position in the Accounts array"""
+    if isinstance(value, int):
+        value = field_item(run.txn, "Accounts", value)
+    return encoding.encode_address(value)
+
+
+def _asset_holding_get(run, args):
+    asset_id, account = run.pop_uint(), _account_operand(run, run.pop())
+    if asset_id < 256 and asset_id < len(run.txn.get("Assets", [])):
+        asset_id = run.txn["Assets"][asset_id]
+    amount = run.ledger.holding(account, asset_id)
+    if args[0] == "AssetBalance":
+        run.push(max(amount, 0))
+    elif args[0] == "AssetFrozen":
+        run.push(0)
+    else:
+        raise LogicError(f"unsupported asset holding field {args[0]}")
+    run.push(int(amount >= 0))
+
+
+def _balance(run, args):
+    account = _account_operand(run, run.pop())
+    run.push(run.ledger.accounts.get(account, {"amount": 0})["amount"])
+
+
+def _acct_params_get(run, args):
+    account = _account_operand(run, run.pop())
+    info = run.ledger.accounts.get(account)
+    if args[0] == "AcctBalance":
+        run.push(info["amount"] if info else 0)
+    elif args[0] == "AcctMinBalance":
+        run.push(run.ledger.min_balance(account) if info else 0)
+    else:
+        raise LogicError(f"unsupported account parameter {args[0]}")
+    run.push(int(bool(info and info["amount"])))
+
+
+def _itxn_begin(run, args):
+    if run.inner_building is not None:
+        raise LogicError("itxn_begin without itxn_submit")
+    run.inner_building = [{"Sender": app_address(run.app_id)}]
+
+
+def _itxn_next(run, args):
+    if run.inner_building is None:
+        raise LogicError("itxn_next without itxn_begin")
+    run.inner_building.append({"Sender": app_address(run.app_id)})
+    if len(run.inner_building) > MAX_INNER_GROUP:
+        raise LogicError("inner group too large")
+
+
+def _itxn_field(run, args):
+    name = args[0]
+    if run.inner_building is None:
+        raise LogicError("itxn_field without itxn_begin")
+    if name not in INNER_FIELDS:
+        raise LogicError(f"unsupported inner transaction field {name}")
+    value = run.pop()
+    fields = run.inner_building[-1]
+    if name in ARRAY_FIELDS:
+        fields.setdefault(name, []).append(value)
+    elif name == "Type":
+        fields["TypeEnum"] = {v: k for k, v in TYPE_NAMES.items()}.get(value, 0)
+    else:
+        if (name in ADDRESS_FIELDS and (not isinstance(value, bytes) or len(value) != 32)) or \
+                (name not in ADDRESS_FIELDS | BYTES_FIELDS and not isinstance(value, int)):
+            raise LogicError(f"wrong type for inner transaction field {name}")
+        fields[name] = value
+    if name == "TypeEnum" or name == "Type":
+        fields["Type"] = TYPE_NAMES.get(fields["TypeEnum"], b"")
+
+
+def _itxn_submit(run, args):
+    if run.inner_building is None:
+        raise LogicError("itxn_submit without itxn_begin")
+    group, run.inner_building = run.inner_building, None
+    run.inner_results.extend(run.evaluation.inner_group(run, group))
+    run.last_inner = group
+
+
+def _inner(run, index=None):
+    if not run.last_inner:
+        raise LogicError("no inner transaction submitted")
+    if index is None:
+        return run.last_inner[-1]
+    if index >= len(run.last_inner):
+        raise LogicError("inner group index out of range")
+    return run.last_inner[index]
+
+
+def _itxn(run, args):
+    fields = _inner(run)
+    run.push(field_value(fields, args[0]) if len(args) == 1 else field_item(fields, args[0], int(args[1])))
+
+
+def _itxna(run, args):
+    run.push(field_item(_inner(run), args[0], int(args[1])))
+
+
+def _itxnas(run, args):
+    run.push(field_item(_inner(run), args[0], run.pop_uint()))
+
+
+def _gitxn(run, args):
+    fields = _inner(run, int(args[0]))
+    run.push(field_value(fields, args[1]) if len(args) == 2 else field_item(fields, args[1], int(args[2])))
+
+
+def _constant(run, args):
+    run.push(args)
+
+
+def _bitwise_not(run, args):
+    run.push_uint(~run.pop_uint() & (2 ** 64 - 1))
+
+
+OPCODES = {
+    "int": _constant, "pushint": _constant, "byte": _constant, "pushbytes": _constant, "addr": _constant,
+    "+": _binary(lambda a, b: a + b),
+    "-": _binary(lambda a, b: a - b),
+    "*": _binary(lambda a, b: a * b),
+    "/": _binary(_divide),
+    "%": _binary(_modulo),
+    "<": _binary(lambda a, b: int(a < b)),
+    ">": _binary(lambda a, b: int(a > b)),
+    "<=": _binary(lambda a, b: int(a <= b)),
+    ">=": _binary(lambda a, b: int(a >= b)),
+    "&&": _binary(lambda a, b: int(bool(a and b))),
+    "||": _binary(lambda a, b: int(bool(a or b))),
+    "&": _binary(lambda a, b: a & b),
+    "|": _binary(lambda a, b: a | b),
+    "^": _binary(lambda a, b: a ^ b),
+    "~": _bitwise_not,
+    "!": lambda run, args: run.push(int(run.pop_uint() == 0)),
+    "==": _equal,
+    "!=": _not_equal,
+    "assert": _assert,
+    "err": _err,
+    "return": _return,
+    "b": _branch(None),
+    "bz": _branch(False),
+    "bnz": _branch(True),
+    "callsub": _callsub,
+    "proto": _proto,
+    "frame_dig": _frame_dig,
+    "frame_bury": _frame_bury,
+    "retsub": _retsub,
+    "load": _load,
+    "store": _store,
+    "pop": _pop,
+    "dup": _dup,
+    "swap": _swap,
+    "select": _select,
+    "len": _len,
+    "itob": _itob,
+    "btoi": _btoi,
+    "concat": _concat,
+    "extract": _extract,
+    "extract3": _extract3,
+    "extract_uint16": _extract_uint(2),
+    "extract_uint32": _extract_uint(4),
+    "extract_uint64": _extract_uint(8),
+    "substring": _substring,
+    "substring3": _substring3,
+    "replace2": _replace2,
+    "replace3": _replace3,
+    "bzero": _bzero,
+    "sha256": _sha256,
+    "ed25519verify": _ed25519verify,
+    "log": _log,
+    "txn": _txn,
+    "txna": _txna,
+    "txnas": _txnas,
+    "gtxn": _gtxn,
+    "gtxna": _gtxn,
+    "gtxns": _gtxns,
+    "gtxnsa": _gtxnsa,
+    "global": _global,
+    "app_global_get": _app_global_get,
+    "app_global_get_ex": _app_global_get_ex,
+    "app_global_put": _app_global_put,
+    "app_global_del": _app_global_del,
+    "box_create": _box_create,
+    "box_del": _box_del,
+    "box_len": _box_len,
+    "box_get": _box_get,
+    "box_put": _box_put,
+    "box_replace": _box_replace,
+    "box_extract": _box_extract,
+    "asset_holding_get": _asset_holding_get,
+    "balance": _balance,
+    "acct_params_get": _acct_params_get,
+    "itxn_begin": _itxn_begin,
+    "itxn_next": _itxn_next,
+    "itxn_field": _itxn_field,
+    "itxn_submit": _itxn_submit,
+    "itxn": _itxn,
+    "itxna": _itxna,
+    "itxnas": _itxnas,
+    "gitxn": _gitxn,
+}
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Telemetry for the Strahn PI System payment flows
+
+Instrumented code wraps each stage of a flow in a span:
+
+    with REGISTRY.span("intent", "submit", traces=[intent_id]) as span:
+        txid = client.send_transactions(signed)
+        span["txid"] = txid
+
+The stages are sign, build, submit, confirm and observe (reading the logs of
+the confirmed transaction); the relayer adds validate. The flows are intent,
+deposit and mandate. Every span feeds these metrics:
+
+- strahn_stage_seconds{flow, stage}: a latency histogram
+- strahn_stage_total{flow, stage, status}: a counter
+
+Each span is also kept as a trace record under the ids it names. An intent's
+trace id is "<app_id>:<nonce>", as the relayer uses. A txid set on a span
+also finds the trace. Spans go to every registered exporter as they finish.
+
+render_prometheus() gives the Prometheus text format. The relayer serves it
+at GET /metrics, and serve_metrics() serves it for scripts without their own
+HTTP API. configure_from_env() attaches a JSON-lines span exporter when
+STRAHN_TRACE_FILE is set and starts the metrics server when
+STRAHN_METRICS_PORT is set.
+"""
+
+import base64
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = "strahn_stage_seconds"
+STAGE_TOTAL = "strahn_stage_total"
+
+METRIC_HELP = {
+    STAGE_SECONDS: "Time spent in each stage of a payment flow",
+    STAGE_TOTAL: "Stage executions by outcome",
+    "strahn_logs_observed_total": "Contract log events seen in confirmed transactions",
+}
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.total += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Estimate of a quantile by linear interpolation within its bucket"""
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.buckets[-1]  # beyond the last bucket
+
+
+def series_name(name, labels):
+    """name{label="value",...}, or just name without labels"""
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Telemetry:
+    """Counters, gauges, histograms and trace spans; safe to use from many threads"""
+
+    def __init__(self, max_spans=10_000, max_traces=10_000, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.max_traces = max_traces
+        self.counters = {}    # (name, labels) -> value
+        self.gauges = {}      # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> Histogram
+        self.spans = deque(maxlen=max_spans)
+        self.traces = OrderedDict()  # trace id -> spans
+        self.txids = OrderedDict()   # txid -> trace ids
+        self.exporters = []
+        self.lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(self.buckets)
+            self.histograms[key].observe(seconds)
+
+    def add_exporter(self, exporter):
+        """Call exporter(span) with every finished span"""
+        self.exporters.append(exporter)
+
+    @contextmanager
+    def span(self, flow, stage, traces=(), **attrs):
+        """
+        Time a stage of a flow for the given trace ids.
+
+        Yields the span's attributes, so the stage can add what it learns:
+        txid, round, or "traces" once the trace ids are known. An exception
+        marks the span as failed and propagates.
+        """
+        record = dict(attrs)
+        started = time.time()
+        clock = time.perf_counter()
+        status = "ok"
+        try:
+            yield record
+        except BaseException as e:
+            status = "error"
+            record["error"] = str(e)
+            raise
+        finally:
+            seconds = time.perf_counter() - clock
+            self.observe(STAGE_SECONDS, seconds, flow=flow, stage=stage)
+            self.inc(STAGE_TOTAL, flow=flow, stage=stage, status=status)
+            self.finish({
+                "flow": flow, "stage": stage, "traces": list(traces), "start": started,
+                "duration_ms": round(seconds * 1000, 3), "status": status, **record,
+            })
+
+    def finish(self, span):
+        """Keep a finished span under its trace ids and hand it to the exporters"""
+        with self.lock:
+            self.spans.append(span)
+            for trace_id in span["traces"]:
+                self.traces.setdefault(trace_id, []).append(span)
+                self.traces.move_to_end(trace_id)
+            for txid in span.get("txids", [span["txid"]] if "txid" in span else []):
+                self.txids[txid] = span["traces"]
+                self.txids.move_to_end(txid)
+            while len(self.traces) > self.max_traces:
+                self.traces.popitem(last=False)
+            while len(self.txids) > self.max_traces:
+                self.txids.popitem(last=False)
+        for exporter in self.exporters:
+            try:
+                exporter(span)
+            except Exception as e:
+                print(f"Telemetry exporter failed: {e}", file=sys.stderr)
+
+    def observe_logs(self, tx_info, event):
+        """Count a confirmed transaction's logs of one event, e.g. payment_processed:..."""
+        prefix = event.encode() + b":"
+        seen = sum(1 for log in tx_info.get("logs", []) if base64.b64decode(log).startswith(prefix))
+        self.inc("strahn_logs_observed_total", seen, event=event)
+        return seen
+
+    def trace(self, key):
+        """Spans of a trace id, or of the traces a txid belongs to, oldest first"""
+        with self.lock:
+            trace_ids = [key] if key in self.traces else self.txids.get(key, [])
+            spans = {id(span): span for trace_id in trace_ids for span in self.traces.get(trace_id, [])}
+        return sorted(spans.values(), key=lambda span: span["start"])
+
+    def summary(self):
+        """Per flow and stage: count, failures and estimated p50/p99 in milliseconds"""
+        with self.lock:
+            summary = {}
+            for (name, labels), histogram in self.histograms.items():
+                if name != STAGE_SECONDS:
+                    continue
+                labels = dict(labels)
+                failed = self.counters.get((STAGE_TOTAL, tuple(sorted(dict(labels, status="error").items()))), 0)
+                summary.setdefault(labels["flow"], {})[labels["stage"]] = {
+                    "count": histogram.total,
+                    "failed": failed,
+                    "total_ms": round(histogram.sum * 1000, 1),
+                    "p50_ms": round(histogram.quantile(0.5) * 1000, 1),
+                    "p99_ms": round(histogram.quantile(0.99) * 1000, 1),
+                }
+            return summary
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            families = {}
+            for (name, labels), value in self.counters.items():
+                families.setdefault((name, "counter"), []).append((labels, value))
+            for (name, labels), value in self.gauges.items():
+                families.setdefault((name, "gauge"), []).append((labels, value))
+            for (name, labels), histogram in self.histograms.items():
+                families.setdefault((name, "histogram"), []).append((labels, histogram))
+
+            for (name, kind), series in sorted(families.items()):
+                if name in METRIC_HELP:
+                    lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(series, key=lambda item: item[0]):
+                    if kind != "histogram":
+                        lines.append(f"{series_name(name, labels)} {value}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(value.buckets, value.counts):
+                        cumulative += count
+                        lines.append(f"{series_name(name + '_bucket', labels + (('le', bound),))} {cumulative}")
+                    lines.append(f"{series_name(name + '_bucket', labels + (('le', '+Inf'),))} {value.total}")
+                    lines.append(f"{series_name(name + '_sum', labels)} {value.sum}")
+                    lines.append(f"{series_name(name + '_count', labels)} {value.total}")
+        return "\n".join(lines) + "\n"
+
+
+class JsonLinesExporter:
+    """Appends each finished span to a file as one JSON line"""
+
+    def __init__(self, path):
+        self.file = open(path, "a")
+        self.lock = threading.Lock()
+
+    def __call__(self, span):
+        line = json.dumps(span, default=str)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+
+def serve_metrics(port, registry=None):
+    """Serve GET /metrics and GET /traces/<id> in a background thread; returns the server"""
+    registry = registry or REGISTRY
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = registry.render_prometheus().encode(), "text/plain; version=0.0.4"
+            elif self.path.startswith("/traces/"):
+                body, content_type = json.dumps(registry.trace(self.path[len("/traces/"):])).encode(), "application/json"
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def configure_from_env(registry=None):
+    """Attach exporters named by STRAHN_TRACE_FILE and STRAHN_METRICS_PORT"""
+    registry = registry or REGISTRY
+    if os.environ.get("STRAHN_TRACE_FILE"):
+        registry.add_exporter(JsonLinesExporter(os.environ["STRAHN_TRACE_FILE"]))
+    if os.environ.get("STRAHN_METRICS_PORT"):
+        serve_metrics(int(os.environ["STRAHN_METRICS_PORT"]), registry)
+    return registry
+
+
+# Process-wide registry used unless a component is given its own
+REGISTRY = Telemetry()
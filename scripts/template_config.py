@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Deploy-time filling of templated Strahn PI System programs
+
+Built with `compile_contracts.py --template-config`, the PI Base programs
+read their immutable configuration (creator or admin address, USDC asset id,
+Core app id) from TEAL template variables instead of global state. This
+module substitutes an instance's values into such a program and hashes the
+compiled result, so the deployed bytecode can be checked against the
+expected configuration.
+"""
+
+import base64
+import hashlib
+import os
+import re
+import sys
+from pathlib import Path
+
+from algosdk.encoding import decode_address
+from algosdk.v2client import algod
+
+BUILD_DIR = Path(__file__).parent.parent / "build"
+
+# Template variables of each templated contract and their kind
+TEMPLATE_VARIABLES = {
+    "strahn_pi_base": {
+        "TMPL_CREATOR_ADDR": "address",
+        "TMPL_USDC_ID": "uint",
+        "TMPL_STRAHN_CORE_APP_ID": "uint",
+    },
+    "strahn_pi_shared": {
+        "TMPL_ADMIN_ADDR": "address",
+        "TMPL_USDC_ID": "uint",
+        "TMPL_STRAHN_CORE_APP_ID": "uint",
+    },
+}
+
+TEMPLATE_TOKEN = re.compile(r"\bTMPL_[A-Z0-9_]+\b")
+
+
+def templated_teal_path(contract_name):
+    """Where compile_contracts.py --template-config writes a templated approval program"""
+    return BUILD_DIR / f"{contract_name}_approval.templated.teal"
+
+
+def template_value(kind, value):
+    """TEAL literal for a template value: 0x-hex bytes or a decimal uint64"""
+    if kind == "address":
+        raw = decode_address(value) if isinstance(value, str) else bytes(value)
+        if len(raw) != 32:
+            raise ValueError(f"Address template values must be 32 bytes, got {len(raw)}")
+        return "0x" + raw.hex()
+    if kind == "uint":
+        if not 0 < int(value) < 2 ** 64:
+            raise ValueError(f"Uint template values must be positive uint64, got {value}")
+        return str(int(value))
+    raise ValueError(f"Unknown template value kind {kind}")
+
+
+def fill_template(teal, contract_name, values):
+    """
+    Substitute an instance's configuration into a templated program.
+
+    values maps variable names such as "TMPL_USDC_ID" to addresses (string or
+    32 bytes) or integers. Every variable of the contract must be given, and
+    no variable may be left unfilled.
+    """
+    variables = TEMPLATE_VARIABLES[contract_name]
+    missing = set(variables) - set(values)
+    unknown = set(values) - set(variables)
+    if missing or unknown:
+        raise ValueError(f"Template values for {contract_name}: missing {sorted(missing)}, unknown {sorted(unknown)}")
+
+    literals = {name: template_value(variables[name], value) for name, value in values.items()}
+    filled = TEMPLATE_TOKEN.sub(lambda match: literals.get(match.group(0), match.group(0)), teal)
+    left = sorted(set(TEMPLATE_TOKEN.findall(filled)))
+    if left:
+        raise ValueError(f"Unfilled template variables: {left}")
+    return filled
+
+
+def program_hash(bytecode):
+    """SHA-256 of compiled bytecode, as Core's template hashes are computed"""
+    return hashlib.sha256(bytecode).hexdigest()
+
+
+def compile_filled(client, teal):
+    """Compile a filled program with algod, returning (bytecode, hash)"""
+    bytecode = base64.b64decode(client.compile(teal)["result"])
+    return bytecode, program_hash(bytecode)
+
+
+def build_filled(client, contract_name, values):
+    """Fill a contract's templated build with an instance's values and compile it"""
+    teal = templated_teal_path(contract_name).read_text()
+    return compile_filled(client, fill_template(teal, contract_name, values))
+
+
+def main():
+    """
+    Fill a templated program: template_config.py <contract> TMPL_X=value ...
+
+    The filled source is written next to the build, then compiled with the
+    algod at ALGOD_ADDRESS to report the hash of the bytecode to deploy.
+    """
+    if len(sys.argv) < 3 or sys.argv[1] not in TEMPLATE_VARIABLES:
+        print(f"Usage: {sys.argv[0]} <{'|'.join(TEMPLATE_VARIABLES)}> TMPL_NAME=value ...")
+        return 1
+
+    contract_name = sys.argv[1]
+    values = dict(arg.split("=", 1) for arg in sys.argv[2:])
+    teal = templated_teal_path(contract_name).read_text()
+    filled = fill_template(teal, contract_name, values)
+
+    out_path = BUILD_DIR / f"{contract_name}_approval.filled.teal"
+    out_path.write_text(filled)
+    print(f"Filled program written to {out_path}")
+
+    client = algod.AlgodClient(os.getenv("ALGOD_TOKEN", ""),
+                               os.getenv("ALGOD_ADDRESS", "https://testnet-api.algonode.cloud"))
+    _, bytecode_hash = compile_filled(client, filled)
+    print(f"Bytecode SHA-256: {bytecode_hash}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
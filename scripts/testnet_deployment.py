@@ -1,8 +1,13 @@
 import os
-import json, base64
+import sys
+import base64, hashlib
 from algosdk.v2client import algod
 from algosdk import account, mnemonic, transaction, encoding
 from algosdk.logic import get_application_address
+from fee_planner import plan_group
+from box_planner import core_box_accesses, plan_box_references, template_hash
+from deploy_orchestrator import DeploymentFailed, DeploymentOrchestrator, Step
+from template_config import build_filled, program_hash
 
 # =================================================================================
 # 1. CONFIGURE YOUR ENVIRONMENT
@@ -33,6 +38,17 @@ algod_client = algod.AlgodClient(algod_token, algod_address)
 # Official TestNet USDC Asset ID
 USDC_ASSET_ID = 10458941
 
+# Bytes of approval + clear program per application page
+PROGRAM_PAGE_SIZE = 2048
+
+# Mandate template stored in Core: "mandate_record", or "mandate_record_packed"
+# for the packed-state template (no USDC opt-in, one global byte slice)
+MANDATE_TEMPLATE = os.environ.get("MANDATE_TEMPLATE", "mandate_record")
+
+# TEMPLATE_CONFIG=1 deploys the PI Base from its templated build
+# (compile_contracts.py --template-config), filled with this deployment's values
+TEMPLATED_PI_BASE = os.environ.get("TEMPLATE_CONFIG") == "1"
+
 print(f"Using sender address: {sender_address}")
 print(f"Using official TestNet USDC ID: {USDC_ASSET_ID}")
 # exit()
@@ -40,18 +56,6 @@ print(f"Using official TestNet USDC ID: {USDC_ASSET_ID}")
 # 2. HELPER FUNCTIONS (same as before)
 # =================================================================================
 
-def wait_for_confirmation(client, txid):
-    """Waits for a transaction to be confirmed."""
-    last_round = client.status().get('last-round')
-    txinfo = client.pending_transaction_info(txid)
-    while not (txinfo.get('confirmed-round') and txinfo.get('confirmed-round') > 0):
-        print("Waiting for confirmation...")
-        last_round += 1
-        client.status_after_block(last_round)
-        txinfo = client.pending_transaction_info(txid)
-    print(f"Transaction {txid} confirmed in round {txinfo.get('confirmed-round')}")
-    return txinfo
-
 def compile_program(client, source_code):
     """Compiles TEAL source code."""
     compile_response = client.compile(source_code)
@@ -62,239 +66,262 @@ def read_teal_file(file_path):
     with open(file_path, 'r') as f:
         return f.read()
 
-def create_app(client, private_key, approval_program, clear_program, global_schema, local_schema, app_args=None):
-    """Creates a new application."""
-    sender = account.address_from_private_key(private_key)
-    params = client.suggested_params()
-    
-    txn = transaction.ApplicationCreateTxn(
-        sender,
-        params,
-        transaction.OnComplete.NoOpOC,
-        approval_program,
-        clear_program,
-        global_schema,
-        local_schema,
-        app_args
-    )
-    
-    signed_txn = txn.sign(private_key)
-    tx_id = signed_txn.transaction.get_txid()
-    client.send_transactions([signed_txn])
+def create_app(ctx, approval_program, clear_program, global_schema, local_schema, app_args=None):
+    """Creates a new application, or finds the one a stopped deploy created."""
+    tx_info = ctx.recover()
+    if tx_info is None:
+        params = ctx.client.suggested_params()
+        
+        # Programs over one 2KB page need extra pages (approval + clear share them)
+        extra_pages = (len(approval_program) + len(clear_program) - 1) // PROGRAM_PAGE_SIZE
+        
+        txn = transaction.ApplicationCreateTxn(
+            sender_address,
+            params,
+            transaction.OnComplete.NoOpOC,
+            approval_program,
+            clear_program,
+            global_schema,
+            local_schema,
+            app_args,
+            extra_pages=extra_pages
+        )
+        tx_info = ctx.send([txn.sign(sender_private_key)])
     
-    tx_info = wait_for_confirmation(client, tx_id)
     app_id = tx_info['application-index']
     print(f"Created new application with App ID: {app_id}")
     return app_id
 
 # =================================================================================
-# 3. DEPLOYMENT LOGIC
+# 3. DEPLOYMENT STEPS
 # =================================================================================
 
-def main():
-    print("\n--- Starting Deployment to TestNet ---")
+# Constants for chunking
+NOTE_MAX_LEN = 1024 # Max bytes for a transaction note
+
+def compile_contract(contract_name, key):
+    """Step assembling a contract's programs into bytecode, as <key>_approval and <key>_clear"""
+    def run(ctx):
+        return {
+            f"{key}_approval": base64.b64decode(compile_program(ctx.client, read_teal_file(f"../build/{contract_name}_approval.teal"))),
+            f"{key}_clear": base64.b64decode(compile_program(ctx.client, read_teal_file(f"../build/{contract_name}_clear.teal"))),
+        }
+    return run
+
+def compile_templated_pi_base(ctx):
+    """Step filling the templated PI Base with its creation arguments and compiling it"""
+    approval, approval_hash = build_filled(ctx.client, "strahn_pi_base", {
+        "TMPL_CREATOR_ADDR": sender_address,
+        "TMPL_USDC_ID": USDC_ASSET_ID,
+        "TMPL_STRAHN_CORE_APP_ID": ctx.info["core_app_id"],
+    })
+    print(f"Filled PI Base approval bytecode SHA-256: {approval_hash}")
+    return {
+        "pi_base_approval": approval,
+        "pi_base_clear": base64.b64decode(compile_program(ctx.client, read_teal_file("../build/strahn_pi_base_clear.teal"))),
+    }
 
-    # --- Step 1: Compile and Deploy `strahn_core_app` ---
-    print("\nStep 1: Deploying Strahn Core App...")
-    core_approval_teal = read_teal_file("../build/strahn_core_approval.teal")
-    core_clear_teal = read_teal_file("../build/strahn_core_clear.teal")
-    
-    # THE FIX IS HERE: Use base64.b64decode instead of bytes.fromhex
-    core_approval_code = base64.b64decode(compile_program(algod_client, core_approval_teal))
-    core_clear_code = base64.b64decode(compile_program(algod_client, core_clear_teal))
-    
+def template_sizes(info):
+    """Box sizes drive both the storage fee and the box references each call needs"""
+    return {b"approval": len(info["mandate_approval"]), b"clear": len(info["mandate_clear"])}
+
+def create_core(ctx):
     core_app_id = create_app(
-        client=algod_client,
-        private_key=sender_private_key,
-        approval_program=core_approval_code,
-        clear_program=core_clear_code,
-        global_schema=transaction.StateSchema(num_uints=2, num_byte_slices=1),
+        ctx,
+        approval_program=ctx.info["core_approval"],
+        clear_program=ctx.info["core_clear"],
+        global_schema=transaction.StateSchema(num_uints=4, num_byte_slices=1),
         local_schema=transaction.StateSchema(num_uints=0, num_byte_slices=0),
         app_args=[encoding.decode_address(sender_address)]
     )
+    return {"core_app_id": core_app_id}
 
-    # --- Step 2: Compile and Deploy `strahn_pi_base` ---
-    print("\nStep 2: Deploying Strahn PI Base App...")
-    pi_base_approval_teal = read_teal_file("../build/strahn_pi_base_approval.teal")
-    pi_base_clear_teal = read_teal_file("../build/strahn_pi_base_clear.teal")
-
-    # THE FIX IS HERE: Use base64.b64decode instead of bytes.fromhex
-    pi_base_approval_code = base64.b64decode(compile_program(algod_client, pi_base_approval_teal))
-    pi_base_clear_code = base64.b64decode(compile_program(algod_client, pi_base_clear_teal))
-
+def create_pi_base(ctx):
     # Creation args: creator_addr, usdc_id, strahn_core_app_id
     pi_base_app_args = [
         encoding.decode_address(sender_address),
         USDC_ASSET_ID.to_bytes(8, 'big'),
-        core_app_id.to_bytes(8, 'big')
+        ctx.info["core_app_id"].to_bytes(8, 'big')
     ]
-
     pi_base_app_id = create_app(
-        client=algod_client,
-        private_key=sender_private_key,
-        approval_program=pi_base_approval_code,
-        clear_program=pi_base_clear_code,
-        global_schema=transaction.StateSchema(num_uints=3, num_byte_slices=1),
+        ctx,
+        approval_program=ctx.info["pi_base_approval"],
+        clear_program=ctx.info["pi_base_clear"],
+        global_schema=transaction.StateSchema(num_uints=5, num_byte_slices=1),
         local_schema=transaction.StateSchema(num_uints=0, num_byte_slices=0),
         app_args=pi_base_app_args
     )
-    
-    # --- Step 3: Configure `strahn_core_app` with Mandate Bytecode ---
-    # This part was already correct, as it was using .encode() on the raw TEAL
-    # and not using the compile_program function.
-    print("\nStep 3: Configuring Strahn Core App with Mandate bytecode...")
-    mandate_approval_teal = read_teal_file("../build/mandate_record_approval.teal")
-    mandate_clear_teal = read_teal_file("../build/mandate_record_clear.teal")
-    
-    mandate_approval_bytecode = mandate_approval_teal.encode()
-    mandate_clear_bytecode = mandate_clear_teal.encode()
+    return {
+        "pi_base_app_id": pi_base_app_id,
+        "pi_base_address": get_application_address(pi_base_app_id),
+        # What the deployed program must hash to, templated build or not
+        "pi_base_approval_hash": program_hash(ctx.info["pi_base_approval"]),
+    }
 
-    # Constants for chunking
-    NOTE_MAX_LEN = 1024 # Max bytes for a transaction note
-    total_approval_size = len(mandate_approval_bytecode)
-    total_clear_size = len(mandate_clear_bytecode)
-    # We need to reference the app ID in the transaction
-    # And pay for the boxes we are creating
-    # Box reference format: (app_id, box_name_bytes)
-    approval_box_ref = (core_app_id, b"approval")
-    clear_box_ref = (core_app_id, b"clear")
-    v1_approval_box_ref = (core_app_id, b"approval_v1") # For set_version
-    v1_clear_box_ref = (core_app_id, b"clear_v1")       # For set_version
-    
+def fund_core(ctx):
+    """Fund the core app so it can pay for its boxes"""
     # Calculate box storage fees: 2500 + 400 * (key_len + value_len)
     # This is a one-time fee paid by the deployer
     # We need fees for the main boxes AND the versioned copies
-    min_bal_increase = (2500 + 400 * (len(b"approval") + len(mandate_approval_bytecode)))
-    min_bal_increase += (2500 + 400 * (len(b"clear") + len(mandate_clear_bytecode)))
-    min_bal_increase += (2500 + 400 * (len(b"approval_v1") + len(mandate_approval_bytecode)))
-    min_bal_increase += (2500 + 400 * (len(b"clear_v1") + len(mandate_clear_bytecode)))
-
-
-    # Fund the core app so it can pay for its boxes
-    print(f"Funding core app with {min_bal_increase / 1_000_000} ALGO for box storage...")
-    params = algod_client.suggested_params()
-    funding_txn = transaction.PaymentTxn(
-        sender=sender_address,
-        sp=params,
-        receiver=get_application_address(core_app_id),
-        amt=min_bal_increase
+    min_bal_increase = sum(
+        2500 + 400 * (len(name) + size)
+        for name, size in core_box_accesses("set_version", template_sizes(ctx.info), version=1)
     )
-    signed_funding_txn = funding_txn.sign(sender_private_key)
-    tx_id = algod_client.send_transaction(signed_funding_txn)
-    wait_for_confirmation(algod_client, tx_id)
-
-    # --- Helper to upload bytecode in chunks ---
-    def upload_bytecode_in_chunks(box_name, bytecode, total_box_size):
+    
+    # Only the shortfall, so a resumed deploy never funds twice
+    core_address = get_application_address(ctx.info["core_app_id"])
+    shortfall = min_bal_increase - ctx.client.account_info(core_address)["amount"]
+    if shortfall > 0:
+        print(f"Funding core app with {shortfall / 1_000_000} ALGO for box storage...")
+        funding_txn = transaction.PaymentTxn(
+            sender=sender_address,
+            sp=ctx.client.suggested_params(),
+            receiver=core_address,
+            amt=shortfall
+        )
+        ctx.send([funding_txn.sign(sender_private_key)])
+    return {}
+
+def upload_template(box_name):
+    """Step uploading a compiled mandate program into Core's box in chunks"""
+    def run(ctx):
+        core_app_id = ctx.info["core_app_id"]
+        bytecode = ctx.info["mandate_" + box_name.decode()]
         print(f"  Uploading {box_name} in chunks...")
-        current_offset = 0 # Keep track of where we are in the box
-
-        # Calculate the number of 1KB budget units needed for the entire box size
-        # (Total size + 1023) // 1024 effectively rounds up to the nearest KB
-        # Max budget for a single txn is 8KB (8 references)
-        needed_budget_kb = (total_box_size + 1023) // 1024
         
-        # Ensure at least 1KB budget if the box exists or is small
-        needed_budget_kb = 8
+        # Every chunk touches the whole preallocated box, so each call carries
+        # exactly the references covering the box size.
+        method_boxes = core_box_accesses("set_bytecode", template_sizes(ctx.info), box_name=box_name)
+        box_ref_list = plan_box_references([{"boxes": method_boxes}], app_id=core_app_id)[0]
         
-        # Ensure we don't exceed the 8 box reference limit per transaction for now
-        # If your bytecode is > 8KB, you'd need multiple transactions or atomic groups
-        if needed_budget_kb > 8:
-            raise ValueError(f"Bytecode size {total_box_size} bytes exceeds single transaction box reference limit (8KB). Consider splitting into multiple txns.")
-
-
+        params = ctx.client.suggested_params()
+        params.flat_fee = True
+        # Write budget is tied to box references, not fees, so the
+        # planned minimum fee is enough.
+        params.fee = plan_group(["strahn_core.append_bytecode"], min_fee=params.min_fee)["total_fee"]
+        
+        calls = []
         for i in range(0, len(bytecode), NOTE_MAX_LEN):
-            chunk = bytecode[i:i + NOTE_MAX_LEN]
-            params = algod_client.suggested_params()
-            
-            method_name = b"set_bytecode" if i == 0 else b"append_bytecode"
-            
-            app_args_list = [method_name, box_name]
             if i == 0:
-                # Only pass the total_box_size for the initial 'set_bytecode' call
-                app_args_list.append(total_box_size.to_bytes(8, 'big')) 
-                
-                # We don't need to increase the fee for write budget here,
-                # as it's tied to box references.
-                params.fee = 3000 # Ensure it's default
-                params.flat_fee = True 
+                # set_bytecode (re)creates the box at its total size
+                app_args_list = [b"set_bytecode", box_name, len(bytecode).to_bytes(8, 'big')]
+            else:
+                # Later chunks are written at their offset in the box
+                app_args_list = [b"append_bytecode", box_name, i.to_bytes(8, 'big')]
             
-            # Construct the list of box references for the transaction
-            box_ref_list = []
-            # Always add the primary box reference
-            box_ref_list.append((core_app_id, box_name))
-
-            # Add dummy box references to increase the write budget
-            # This is the key change to solve the "write budget exceeded" error.
-            # We need `needed_budget_kb` total references.
-            for k in range(needed_budget_kb - 1): # -1 because we already added the main box_name
-                # Use unique dummy names for each reference to ensure they are counted distinctly
-                dummy_box_name = box_name + b"_dummy_box_" + str(k).encode()
-                box_ref_list.append((core_app_id, dummy_box_name))
-
-            upload_txn = transaction.ApplicationCallTxn(
+            calls.append(transaction.ApplicationCallTxn(
                 sender=sender_address,
                 sp=params,
                 index=core_app_id,
                 on_complete=transaction.OnComplete.NoOpOC,
                 app_args=app_args_list,
-                note=chunk,
+                note=bytecode[i:i + NOTE_MAX_LEN],
                 boxes=box_ref_list # Pass the list of box references
-            )
-            
-            signed_upload_txn = upload_txn.sign(sender_private_key)
-            tx_id = algod_client.send_transaction(signed_upload_txn)
-            wait_for_confirmation(algod_client, tx_id)
-            print(f"    Chunk {i // NOTE_MAX_LEN + 1} uploaded for {box_name}.")
-            current_offset += len(chunk) # Update offset for next chunk if needed
-    # --- Upload Approval Program ---
-    upload_bytecode_in_chunks(b"approval", mandate_approval_bytecode, total_approval_size)
+            ).sign(sender_private_key))
+        
+        # Chunks land at their own offsets, so once the box exists they are
+        # sent together and confirmed in any order
+        ctx.send(calls[:1])
+        txids = [ctx.send([call], confirm=False) for call in calls[1:]]
+        for txid in txids:
+            ctx.confirm(txid)
+        print(f"    {len(calls)} chunks uploaded for {box_name}.")
+        return {}
+    return run
+
+def set_version(ctx):
+    """Finalize the uploaded bytecode as version 1"""
+    if ctx.recover() is None:
+        print("Finalizing bytecode by setting version to 1...")
+        params = ctx.client.suggested_params()
+        # Creating the versioned boxes needs box references, not a higher fee.
+        params.fee = plan_group(["strahn_core.set_version"], min_fee=params.min_fee)["total_fee"]
+        params.flat_fee = True
+        
+        # Source and versioned boxes, plus empty references covering their bytes
+        box_ref_list = plan_box_references(
+            [{"boxes": core_box_accesses("set_version", template_sizes(ctx.info), version=1)}],
+            app_id=ctx.info["core_app_id"]
+        )[0]
+        
+        # The template's global schema is recorded with it
+        packed = int(MANDATE_TEMPLATE == "mandate_record_packed")
+        set_version_txn = transaction.ApplicationCallTxn(
+            sender=sender_address,
+            sp=params,
+            index=ctx.info["core_app_id"],
+            on_complete=transaction.OnComplete.NoOpOC,
+            app_args=[b"set_version", (1).to_bytes(8, 'big'), packed.to_bytes(8, 'big')],
+            boxes=box_ref_list
+        )
+        ctx.send([set_version_txn.sign(sender_private_key)])
     
-    # --- Upload Clear Program ---
-    upload_bytecode_in_chunks(b"clear", mandate_clear_bytecode, total_clear_size)
-
-    # --- Finalize by setting the version ---
-    print("Finalizing bytecode by setting version to 1...")
-    params = algod_client.suggested_params()
-    # This call still creates versioned boxes, so it's good to have a slightly higher fee.
-    params.fee = 6000
-    params.flat_fee = True
-
-    box_ref_list = [approval_box_ref, clear_box_ref, v1_approval_box_ref, v1_clear_box_ref]
+    # The hashes callers pass to deploy_mandate
+    return {
+        "bytecode_version": 1,
+        "mandate_approval_hash": template_hash(ctx.info["mandate_approval"]).hex(),
+        "mandate_clear_hash": hashlib.sha256(ctx.info["mandate_clear"]).hexdigest(),
+    }
 
-    for k in range(4): # -1 because we already added the main box_name
-        # Use unique dummy names for each reference to ensure they are counted distinctly
-        dummy_box_name = b"_dummy_box_" + str(k).encode()
-        box_ref_list.append((core_app_id, dummy_box_name))
+def deployment_steps():
+    """
+    The deployment as a dependency graph. Compiling all three programs runs
+    alongside the app creations; the PI Base is created with Core's app ID,
+    so it follows Core. Both template boxes upload in parallel. A templated
+    PI Base bakes Core's app ID in, so it is only compiled once Core exists.
+    """
+    if TEMPLATED_PI_BASE:
+        compile_pi_base = Step("compile_pi_base", compile_templated_pi_base, after=["create_core"],
+                               checkpoint=False)
+    else:
+        compile_pi_base = Step("compile_pi_base", compile_contract("strahn_pi_base", "pi_base"), checkpoint=False)
+    return [
+        Step("compile_core", compile_contract("strahn_core", "core"), checkpoint=False),
+        compile_pi_base,
+        Step("assemble_mandate", compile_contract(MANDATE_TEMPLATE, "mandate"), checkpoint=False),
+        Step("create_core", create_core, after=["compile_core"]),
+        Step("create_pi_base", create_pi_base, after=["compile_pi_base", "create_core"]),
+        Step("fund_core", fund_core, after=["create_core", "assemble_mandate"]),
+        Step("upload_approval", upload_template(b"approval"), after=["fund_core", "assemble_mandate"]),
+        Step("upload_clear", upload_template(b"clear"), after=["fund_core", "assemble_mandate"]),
+        Step("set_version", set_version, after=["upload_approval", "upload_clear", "assemble_mandate"]),
+    ]
 
-    set_version_txn = transaction.ApplicationCallTxn(
-        sender=sender_address,
-        sp=params,
-        index=core_app_id,
-        on_complete=transaction.OnComplete.NoOpOC,
-        app_args=[b"set_version", (1).to_bytes(8, 'big')],
-        boxes=box_ref_list
-    )
-    signed_set_version_txn = set_version_txn.sign(sender_private_key)
-    tx_id = algod_client.send_transaction(signed_set_version_txn)
-    wait_for_confirmation(algod_client, tx_id)
+# =================================================================================
+# 4. DEPLOYMENT LOGIC
+# =================================================================================
 
-    print("Strahn Core App has been configured with mandate bytecode using boxes.")
+def main():
+    print("\n--- Starting Deployment to TestNet ---")
+    
+    # deployment_info.json doubles as the checkpoint: a rerun resumes a failed
+    # deploy, and --fresh starts over
+    try:
+        orchestrator = DeploymentOrchestrator(
+            algod_client,
+            deployment_steps(),
+            path="deployment_info.json",
+            initial={"usdc_id": USDC_ASSET_ID, "deployer_address": sender_address},
+            fresh="--fresh" in sys.argv
+        )
+    except ValueError as e:
+        # A deployment_info.json from before checkpointing, or from another
+        # deployer, cannot be resumed
+        print(f"\nCannot resume: {e}")
+        return 1
+    try:
+        deployment_info = orchestrator.run()
+    except DeploymentFailed as e:
+        print(f"\nDeployment stopped: {e}")
+        return 1
 
     print("\n--- Deployment Complete! ---")
     print(f"Official TestNet USDC ID: {USDC_ASSET_ID}")
-    print(f"Strahn Core App ID: {core_app_id}")
-    print(f"Strahn PI Base App ID: {pi_base_app_id}")
-    
-    deployment_info = {
-        "usdc_id": USDC_ASSET_ID,
-        "core_app_id": core_app_id,
-        "pi_base_app_id": pi_base_app_id,
-        "pi_base_address": get_application_address(pi_base_app_id),
-        "deployer_address": sender_address
-    }
-    with open("deployment_info.json", "w") as f:
-        json.dump(deployment_info, f, indent=4)
+    print(f"Strahn Core App ID: {deployment_info['core_app_id']}")
+    print(f"Strahn PI Base App ID: {deployment_info['pi_base_app_id']}")
+    print(f"Strahn PI Base approval SHA-256: {deployment_info['pi_base_approval_hash']}")
     print("\nDeployment info saved to deployment_info.json")
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
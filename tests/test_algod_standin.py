@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Test suite for the in-memory algod stand-in, driven through a real AlgodClient
+"""
+
+import base64
+import hashlib
+import sys
+import time
+from pathlib import Path
+
+import nacl.signing
+import pytest
+from algosdk import account, encoding, transaction
+from algosdk.error import AlgodHTTPError
+from algosdk.logic import get_application_address
+from algosdk.v2client.algod import AlgodClient
+
+# Add the scripts directory to the path
+sys.path.append(str(Path(__file__).parent.parent / "scripts"))
+
+from algod_standin import Ledger, serve
+from relayer_service import CONFIRMED, RelayerService, intent_message
+
+CORE_APP_ID = 5
+DEPOSIT = 5_000_000
+
+
+@pytest.fixture
+def network():
+    """A served ledger with a funded PI Base, its creator, a relayer and a merchant"""
+    ledger = Ledger()
+    creator_key, creator = account.generate_account()
+    relayer_key, relayer = account.generate_account()
+    merchant = account.generate_account()[1]
+
+    ledger.fund(creator, 10_000_000)
+    ledger.fund(relayer, 10_000_000)
+    usdc_id = ledger.create_asset(creator, 10 ** 12)
+    ledger.fund(merchant, 1_000_000, {usdc_id: 0})
+    app_id = ledger.create_app("strahn_pi_base", creator, [
+        encoding.decode_address(creator), usdc_id.to_bytes(8, "big"), CORE_APP_ID.to_bytes(8, "big")
+    ])
+    ledger.fund(get_application_address(app_id), 1_000_000, {usdc_id: DEPOSIT})
+
+    server, stop = serve(ledger, port=0)
+    client = AlgodClient("", f"http://127.0.0.1:{server.server_address[1]}")
+    yield {
+        "ledger": ledger, "client": client, "app_id": app_id, "usdc_id": usdc_id,
+        "creator": (creator_key, creator), "relayer": (relayer_key, relayer), "merchant": merchant,
+    }
+    stop.set()
+    server.shutdown()
+
+
+def intent_call(net, nonce, amount=1_000_000, relayer_fee=10_000, fee=5000):
+    """A signed process_intent call from the relayer"""
+    creator_key = net["creator"][0]
+    relayer_key, relayer = net["relayer"]
+    destination = encoding.decode_address(net["merchant"])
+    message = intent_message(net["app_id"], nonce, destination, amount, relayer_fee)
+    signature = nacl.signing.SigningKey(base64.b64decode(creator_key)[:32]).sign(
+        hashlib.sha256(message).digest()).signature
+    txn = transaction.ApplicationNoOpTxn(relayer, net["client"].suggested_params(), net["app_id"], [
+        b"process_intent", destination, amount.to_bytes(8, "big"), relayer_fee.to_bytes(8, "big"),
+        nonce.to_bytes(8, "big"), signature,
+    ])
+    txn.fee = fee
+    return txn.sign(relayer_key)
+
+
+def global_state(net):
+    state = net["client"].application_info(net["app_id"])["params"]["global-state"]
+    return {base64.b64decode(e["key"]).decode(): e["value"]["uint"] for e in state if e["value"]["type"] == 2}
+
+
+class TestStandinLedger:
+    """Test transactions are evaluated, applied and confirmed like algod"""
+
+    def test_intent_pays_merchant_and_confirms(self, network):
+        """A process_intent moves USDC, accrues the fee and advances the nonce"""
+        client = network["client"]
+        txid = client.send_transaction(intent_call(network, 0))
+        info = transaction.wait_for_confirmation(client, txid, 4)
+
+        assert info["confirmed-round"] > 0
+        assert base64.b64decode(info["logs"][-1]).startswith(b"payment_processed:")
+        assert client.account_asset_info(network["merchant"], network["usdc_id"])["asset-holding"]["amount"] == 1_000_000
+        assert global_state(network)["creator_nonce"] == 1
+        fee_box = b"fee:" + encoding.decode_address(network["relayer"][1])
+        assert base64.b64decode(client.application_box_by_name(network["app_id"], fee_box)["value"]) == (10_000).to_bytes(8, "big")
+
+    def test_rejected_group_leaves_no_trace(self, network):
+        """A failing call rolls back the transactions before it in the group"""
+        client = network["client"]
+        creator_key, creator = network["creator"]
+        top_up = transaction.AssetTransferTxn(creator, client.suggested_params(),
+                                              get_application_address(network["app_id"]), 1_000_000, network["usdc_id"])
+        call = intent_call(network, 7).transaction  # wrong nonce
+        transaction.assign_group_id([top_up, call])
+
+        with pytest.raises(AlgodHTTPError, match="invalid nonce"):
+            client.send_transactions([top_up.sign(creator_key), call.sign(network["relayer"][0])])
+        app_holding = network["ledger"].holding(get_application_address(network["app_id"]), network["usdc_id"])
+        assert app_holding == DEPOSIT
+
+    def test_fees_and_signatures_checked(self, network):
+        """Underpaid inner transactions and bad signatures are refused"""
+        client = network["client"]
+        with pytest.raises(AlgodHTTPError, match="fees"):
+            client.send_transaction(intent_call(network, 0, fee=1000))
+
+        forged = intent_call(network, 0)
+        forged.signature = base64.b64encode(bytes(64)).decode()
+        with pytest.raises(AlgodHTTPError, match="invalid signature"):
+            client.send_transaction(forged)
+
+    def test_simulate_reports_without_applying(self, network):
+        """Simulated groups return their results or failure, and change nothing"""
+        client = network["client"]
+        call = intent_call(network, 0).transaction
+        response = client.simulate_raw_transactions([transaction.SignedTransaction(call, None)])
+        result = response["txn-groups"][0]["txn-results"][0]["txn-result"]
+        assert base64.b64decode(result["logs"][-1]).startswith(b"payment_processed:")
+
+        response = client.simulate_raw_transactions([intent_call(network, 3)])
+        assert "invalid nonce" in response["txn-groups"][0]["failure-message"]
+        assert response["txn-groups"][0]["failed-at"] == [0]
+        assert global_state(network)["creator_nonce"] == 0
+        assert network["ledger"].holding(network["merchant"], network["usdc_id"]) == 0
+
+    def test_snapshot_round_trip(self, network, tmp_path):
+        """A saved ledger loads back with the same balances and app state"""
+        network["client"].send_transaction(intent_call(network, 0))
+        path = tmp_path / "ledger.json"
+        network["ledger"].save_snapshot(path)
+        restored = Ledger.load_snapshot(path)
+
+        assert restored.accounts == network["ledger"].accounts
+        assert restored.apps == network["ledger"].apps
+        assert restored.round == network["ledger"].round
+
+    def test_relayer_service_end_to_end(self, network):
+        """The relayer service submits queued intents against the stand-in"""
+        service = RelayerService(network["client"], network["relayer"][0])
+        for nonce in range(3):
+            message = intent_message(network["app_id"], nonce, encoding.decode_address(network["merchant"]), 100_000, 1000)
+            signature = nacl.signing.SigningKey(base64.b64decode(network["creator"][0])[:32]).sign(
+                hashlib.sha256(message).digest()).signature
+            service.submit({
+                "pi_base_app_id": network["app_id"], "destination": network["merchant"], "amount": 100_000,
+                "relayer_fee": 1000, "nonce": nonce, "signature": base64.b64encode(signature).decode(),
+            })
+        service.start()
+        deadline = time.time() + 10
+        while service.stats()["pending"] and time.time() < deadline:
+            time.sleep(0.01)
+        service.stop()
+
+        assert [service.status(f"{network['app_id']}:{n}")["status"] for n in range(3)] == [CONFIRMED] * 3
+        assert global_state(network)["creator_nonce"] == 3
+
+    def test_keeper_batch_pays_and_reschedules(self, network):
+        """process_mandates_batch pays due mandates and moves them a bucket on"""
+        ledger, client, app_id = network["ledger"], network["client"], network["app_id"]
+        relayer_key, relayer = network["relayer"]
+        now = ledger.timestamp
+        due = ledger.add_mandate(app_id, network["merchant"], 250_000, 1000, now, 3600)
+        later = ledger.add_mandate(app_id, network["merchant"], 250_000, 1000, now + 7200, 3600)
+        opup_app_id = ledger.create_app("opup", relayer, [])
+
+        def keeper_group(slots):
+            params = client.suggested_params()
+            call = transaction.ApplicationNoOpTxn(relayer, params, app_id, [
+                b"process_mandates_batch", b"".join(slot.to_bytes(8, "big") for slot in slots)])
+            padding = transaction.ApplicationNoOpTxn(relayer, params, opup_app_id, foreign_apps=[app_id])
+            call.fee, padding.fee = 3000 + 1000 * len(slots), 0
+            transaction.assign_group_id([call, padding])
+            return [call.sign(relayer_key), padding.sign(relayer_key)]
+
+        with pytest.raises(AlgodHTTPError, match="not due"):
+            client.send_transactions(keeper_group([due, later]))
+        client.send_transactions(keeper_group([due]))
+
+        assert ledger.holding(network["merchant"], network["usdc_id"]) == 250_000
+        terms = ledger.box_get(app_id, b"mandate:" + due.to_bytes(8, "big"))
+        assert int.from_bytes(terms[56:64], "big") == now + 3600
+        assert ledger.box_get(app_id, b"due:" + (now // 3600).to_bytes(8, "big")) is None
+        assert ledger.box_get(app_id, b"due:" + ((now + 3600) // 3600).to_bytes(8, "big")) is not None
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark regression gates for Strahn PI System contracts
+"""
+
+import json
+import pytest
+import sys
+from pathlib import Path
+
+# Add the scripts and contracts directories to the path
+sys.path.append(str(Path(__file__).parent.parent / "scripts"))
+sys.path.append(str(Path(__file__).parent.parent / "contracts"))
+
+import benchmark_contracts
+from benchmark_contracts import (
+    DETERMINISTIC_METRICS, estimate_assembled_size, find_regressions,
+    inner_txn_count, load_baseline, opcode_cost, run_benchmarks
+)
+
+class TestTealAnalysis:
+    """Test the static TEAL analysis used by the benchmarks"""
+    
+    def test_opcode_cost_takes_most_expensive_branch(self):
+        """Test worst-case cost follows the costlier branch"""
+        teal = "\n".join([
+            "#pragma version 8",
+            "txn NumAppArgs",
+            "bnz expensive",
+            "int 1",
+            "return",
+            "expensive:",
+            "byte 0x00",
+            "sha256",
+            "pop",
+            "int 1",
+            "return",
+        ])
+        
+        # txn, bnz, byte, sha256 (35), pop, int, return
+        assert opcode_cost(teal) == 41
+    
+    def test_error_paths_are_ignored(self):
+        """Test paths ending in err do not count as successful executions"""
+        teal = "\n".join([
+            "#pragma version 8",
+            "txn NumAppArgs",
+            "bnz fail",
+            "int 1",
+            "return",
+            "fail:",
+            "byte 0x00",
+            "sha256",
+            "err",
+        ])
+        
+        assert opcode_cost(teal) == 4
+    
+    def test_loops_respect_bound(self):
+        """Test backward jumps are charged once per allowed iteration"""
+        teal = "\n".join([
+            "#pragma version 8",
+            "int 0",
+            "loop:",
+            "itxn_begin",
+            "itxn_submit",
+            "txn NumAppArgs",
+            "bnz loop",
+            "int 1",
+            "return",
+        ])
+        
+        assert inner_txn_count(teal, loop_bound=1) == 2
+        assert inner_txn_count(teal, loop_bound=3) == 4
+    
+    def test_assembled_size_estimate(self):
+        """Test assembled size counts opcodes, immediates and constants"""
+        teal = "\n".join([
+            "#pragma version 8",
+            "intcblock 0 1",
+            "pushbytes 0x0102",
+            "txna ApplicationArgs 0",
+            "==",
+            "bnz done",
+            "done:",
+            "intc_1 // 1",
+            "return",
+        ])
+        
+        # version 1, intcblock 4, pushbytes 4, txna 3, == 1, bnz 3, intc_1 1, return 1
+        assert estimate_assembled_size(teal) == 18
+
+class TestBenchmarkRegressions:
+    """Gate contract metrics against the recorded baseline"""
+    
+    def test_regression_detection(self):
+        """Test metrics above threshold are reported"""
+        baseline = {"strahn_pi_base.process_intent": {"opcode_cost": 2000, "inner_txns": 2}}
+        results = {"strahn_pi_base.process_intent": {"opcode_cost": 2050, "inner_txns": 3}}
+        
+        regressions = find_regressions(baseline, results, metrics=DETERMINISTIC_METRICS)
+        assert regressions == [("strahn_pi_base.process_intent", "inner_txns", 2, 3)]
+    
+    def test_cli_does_not_gate_on_compile_time(self, tmp_path, monkeypatch):
+        """Test a slower compile alone never fails the CLI gate"""
+        baseline = {"strahn_core.set_version": {"compile_time_ms": 10.0, "opcode_cost": 900}}
+        results = {"strahn_core.set_version": {
+            "compile_time_ms": 95.0, "teal_lines": 1, "assembled_size": 1,
+            "opcode_cost": 900, "inner_txns": 0, "box_bytes": 0,
+        }}
+        path = tmp_path / "baseline.json"
+        path.write_text(json.dumps(baseline))
+        monkeypatch.setattr(benchmark_contracts, "run_benchmarks", lambda: results)
+        monkeypatch.setattr(sys, "argv", ["benchmark_contracts.py", "--baseline", str(path)])
+        assert benchmark_contracts.main() == 0
+        
+        results["strahn_core.set_version"]["opcode_cost"] = 1000
+        assert benchmark_contracts.main() == 1
+    
+    def test_no_regressions_against_baseline(self):
+        """Test current contracts do not regress the recorded baseline"""
+        baseline = load_baseline()
+        if baseline is None:
+            pytest.skip("No benchmark baseline recorded")
+        
+        results = run_benchmarks()
+        regressions = find_regressions(baseline, results, metrics=DETERMINISTIC_METRICS)
+        
+        assert not regressions, "\n".join(
+            f"{key} {metric}: {old} -> {new}" for key, metric, old, new in regressions
+        )
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test suite for budget checkpoint builds and the budget profile decoder
+"""
+
+import base64
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the scripts directory to the path
+sys.path.append(str(Path(__file__).parent.parent / "scripts"))
+
+from budget_profile import CHECKPOINT_OVERHEAD, decode_checkpoints, load_tx_infos, profile
+
+ROOT = Path(__file__).parent.parent
+
+# Compiled in a fresh process: the build mode is fixed at first compile
+DEBUG_BUILD = """
+from pyteal import *
+from strahn_pi_base import strahn_pi_base_approval
+print(compileTeal(strahn_pi_base_approval(), Mode.Application, version=8))
+"""
+
+
+@pytest.fixture(scope="module")
+def debug_pi_base():
+    env = dict(os.environ, STRAHN_BUDGET_CHECKPOINTS="1", PYTHONPATH=str(ROOT / "contracts"))
+    result = subprocess.run([sys.executable, "-c", DEBUG_BUILD], env=env,
+                            capture_output=True, text=True, check=True)
+    return result.stdout
+
+
+def checkpoint_log(name, budget):
+    return base64.b64encode(b"budget:" + name.encode() + b":" + budget.to_bytes(8, "big")).decode()
+
+
+class TestBudgetCheckpoints:
+    """Test checkpoint builds and their decoding"""
+    
+    def test_debug_build_logs_checkpoints(self, debug_pi_base):
+        """Checkpoints appear in execution order and cost the assumed overhead"""
+        names = ["intent_start", "intent_checked", "intent_opup", "intent_verified", "intent_paid", "intent_end"]
+        positions = [debug_pi_base.index(f'byte "budget:{name}:"') for name in names]
+        assert positions == sorted(positions)
+        
+        lines = debug_pi_base.splitlines()
+        start = lines.index('byte "budget:intent_start:"')
+        assert lines[start:start + CHECKPOINT_OVERHEAD] == [
+            'byte "budget:intent_start:"', "global OpcodeBudget", "itob", "concat", "log"]
+    
+    def test_production_builds_have_no_checkpoints(self):
+        """Only the .debug.teal builds carry checkpoints"""
+        for path in (ROOT / "build").glob("*.teal"):
+            if ".debug." not in path.name:
+                assert "budget:" not in path.read_text(), path.name
+        assert "budget:deploy_hashed:" in (ROOT / "build" / "strahn_core_approval.debug.teal").read_text()
+    
+    def test_profile_sections(self):
+        """Section costs come per app call, with op-up budget shown as negative"""
+        tx_info = {
+            "txn": {"txn": {"apid": 7}},
+            "logs": [
+                checkpoint_log("mandate_checked", 700),
+                checkpoint_log("mandate_opup", 2080),
+                base64.b64encode(b"usdc_deposited:" + bytes(8)).decode(),
+                checkpoint_log("mandate_verified", 175),
+            ],
+            "inner-txns": [
+                {"txn": {"txn": {"type": "appl", "apid": 0}}},
+                {"txn": {"txn": {"apid": 5}}, "logs": [
+                    checkpoint_log("deploy_start", 150), checkpoint_log("deploy_hashed", 60)]},
+            ],
+        }
+        calls = profile(load_tx_infos({"txn-groups": [{"txn-results": [{"txn-result": tx_info}]}]}))
+        
+        assert [(call["path"], call["app_id"]) for call in calls] == [("0", 7), ("0.1", 5)]
+        assert [s["cost"] for s in calls[0]["sections"]] == [700 - 2080 - 5, 2080 - 175 - 5]
+        assert calls[1]["sections"] == [{"section": "deploy_start -> deploy_hashed", "cost": 85}]
+        assert decode_checkpoints([b"budget:odd:name:" + (3).to_bytes(8, "big")]) == [("odd:name", 3)]
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Test suite for the streaming batch mode of cli_utils, run against the algod stand-in
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+from algosdk import account, encoding
+from algosdk.error import ConfirmationTimeoutError
+from algosdk.logic import get_application_address
+from algosdk.v2client.algod import AlgodClient
+
+# Add the scripts directory to the path
+sys.path.append(str(Path(__file__).parent.parent / "scripts"))
+
+from algod_standin import Ledger, serve
+from cli_utils import PayoutBatch, load_batch_results, parse_payout
+
+CORE_APP_ID = 5
+
+
+@pytest.fixture
+def network():
+    """A served ledger with a funded PI Base whose creator pays the batch"""
+    ledger = Ledger()
+    creator_key, creator = account.generate_account()
+    merchant = account.generate_account()[1]
+
+    ledger.fund(creator, 100_000_000)
+    usdc_id = ledger.create_asset(creator, 10 ** 12)
+    ledger.fund(merchant, 1_000_000, {usdc_id: 0})
+    app_id = ledger.create_app("strahn_pi_base", creator, [
+        encoding.decode_address(creator), usdc_id.to_bytes(8, "big"), CORE_APP_ID.to_bytes(8, "big")
+    ])
+    ledger.fund(get_application_address(app_id), 1_000_000, {usdc_id: 500_000_000})
+
+    server, stop = serve(ledger, port=0)
+    client = AlgodClient("", f"http://127.0.0.1:{server.server_address[1]}")
+    yield {"ledger": ledger, "client": client, "app_id": app_id, "usdc_id": usdc_id,
+           "creator_key": creator_key.encode(), "merchant": merchant}
+    stop.set()
+    server.shutdown()
+
+
+def nonce(net):
+    return net["ledger"].global_get(net["app_id"], b"creator_nonce")
+
+
+def statuses(path):
+    """Last status of each row in a results file"""
+    last = {}
+    for line in path.read_text().splitlines():
+        if line.endswith("}"):  # skips a torn line
+            record = json.loads(line)
+            last[record["row"]] = record["status"]
+    return last
+
+
+class TestPayoutParsing:
+    """Test payout rows are decoded exactly"""
+
+    def test_amounts_and_rejections(self):
+        """USDC decimals convert exactly; bad rows raise ValueError"""
+        address = account.generate_account()[1]
+        payout = parse_payout({"destination": address, "amount": "12.345678", "relayer_fee": ""})
+        assert (payout["amount"], payout["relayer_fee"]) == (12_345_678, 0)
+        assert parse_payout(json.dumps({"destination": address, "amount": 0.1}))["amount"] == 100_000
+
+        for fields in ({"destination": address, "amount": "0.0000001"}, {"destination": "nope", "amount": "1"},
+                       {"destination": address, "amount": "-1"}, {"amount": "1"}, "{not json"):
+            with pytest.raises(ValueError):
+                parse_payout(fields)
+
+
+class TestPayoutBatch:
+    """Test batch runs settle every row once, across crashes and reruns"""
+
+    def test_batch_pays_and_rerun_skips(self, network, tmp_path):
+        """Every valid row is paid once; a rerun finds nothing left to do"""
+        payouts = tmp_path / "payouts.csv"
+        rows = ["destination,amount,relayer_fee"]
+        for i in range(1, 41):
+            rows.append(f"{network['merchant']},{'abc' if i == 7 else '0.5'},0.01")
+        payouts.write_text("\n".join(rows) + "\n")
+        results = tmp_path / "results.jsonl"
+
+        counts = PayoutBatch(network["client"], network["creator_key"], network["app_id"], str(results),
+                             concurrency=3, group_size=8).run(str(payouts))
+        assert (counts["confirmed"], counts["failed"]) == (39, 1)
+        assert statuses(results)[7] == "failed"
+        assert network["ledger"].holding(network["merchant"], network["usdc_id"]) == 39 * 500_000
+        assert nonce(network) == 39
+
+        counts = PayoutBatch(network["client"], network["creator_key"], network["app_id"], str(results)).run(str(payouts))
+        assert counts == {"confirmed": 0, "failed": 0, "skipped": 40}
+        assert nonce(network) == 39
+        assert load_batch_results(str(results)) == (40, set(), {})
+
+    def test_rejected_group_fails_only_the_bad_row(self, network, tmp_path):
+        """One unpayable row in a group does not take the others down with it"""
+        stranger = account.generate_account()[1]  # not opted in to USDC
+        network["ledger"].fund(stranger, 1_000_000)
+        payouts = tmp_path / "payouts.csv"
+        rows = ["destination,amount"]
+        rows += [f"{stranger if i == 3 else network['merchant']},1" for i in range(1, 9)]
+        payouts.write_text("\n".join(rows) + "\n")
+        results = tmp_path / "results.jsonl"
+
+        counts = PayoutBatch(network["client"], network["creator_key"], network["app_id"], str(results),
+                             group_size=8).run(str(payouts))
+        assert (counts["confirmed"], counts["failed"]) == (7, 1)
+        assert statuses(results) == {row: "failed" if row == 3 else "confirmed" for row in range(1, 9)}
+        assert network["ledger"].holding(network["merchant"], network["usdc_id"]) == 7_000_000
+        # The bad row's nonce went to the next row
+        assert nonce(network) == 7
+
+    def test_resume_after_crash(self, network, tmp_path, monkeypatch):
+        """Rows in flight when a run stops are settled from the chain, never paid twice"""
+        payouts = tmp_path / "payouts.jsonl"
+        payouts.write_text("".join(
+            json.dumps({"destination": network["merchant"], "amount": str(i)}) + "\n" for i in range(1, 13)))
+        results = tmp_path / "results.jsonl"
+        client = network["client"]
+        real_send, real_info = client.send_transactions, client.pending_transaction_info
+
+        def run():
+            return PayoutBatch(client, network["creator_key"], network["app_id"], str(results),
+                               concurrency=1, group_size=4).run(str(payouts))
+
+        # The second group lands but its confirmation is lost: the run stops
+        sent = []
+
+        def send_transactions(signed):
+            sent.append(signed[0].get_txid())
+            return real_send(signed)
+
+        def pending_transaction_info(txid):
+            if sent[1:2] == [txid]:
+                raise ConfirmationTimeoutError("timed out")
+            return real_info(txid)
+
+        monkeypatch.setattr(client, "send_transactions", send_transactions)
+        monkeypatch.setattr(client, "pending_transaction_info", pending_transaction_info)
+        assert run()["confirmed"] == 4
+        assert [statuses(results).get(row) for row in (4, 5, 9)] == ["confirmed", "submitted", None]
+
+        # The next run settles it from the chain, then crashes sending rows 9-12
+        def lost_send(signed):
+            raise ConnectionError("connection reset")
+
+        monkeypatch.setattr(client, "send_transactions", lost_send)
+        with pytest.raises(ConnectionError):
+            run()
+        monkeypatch.undo()
+        assert [statuses(results)[row] for row in (8, 9)] == ["confirmed", "submitted"]
+        with open(results, "a") as f:
+            f.write('{"row": 13, "sta')  # torn by the crash
+
+        # Once the unsent group's validity window passes, its rows are paid again
+        with network["ledger"].lock:
+            for _ in range(25):
+                network["ledger"].close_block()
+        counts = run()
+
+        assert (counts["confirmed"], counts["skipped"]) == (4, 8)
+        assert set(statuses(results).values()) == {"confirmed"}
+        assert network["ledger"].holding(network["merchant"], network["usdc_id"]) == sum(range(1, 13)) * 1_000_000
+        assert nonce(network) == 12
@@ -0,0 +1,706 @@
+#!/usr/bin/env python3
+"""
+Test suite running the compiled contracts' TEAL on the algod stand-in
+
+Each test submits real transaction groups against Core and a PI Base created
+from freshly compiled programs, so the checks and effects under test are
+the ones the AVM would run. Rejections are checked with simulate, which
+reports the failure without applying anything.
+"""
+
+import base64
+import hashlib
+import sys
+from pathlib import Path
+
+import nacl.signing
+import pytest
+from algosdk import account, encoding, transaction
+from algosdk.logic import get_application_address
+
+# Add the scripts directory and the repository root to the path
+sys.path.append(str(Path(__file__).parent.parent / "scripts"))
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "contracts"))
+
+from algod_standin import Ledger, Rejected
+from box_planner import template_hash
+from compile_contracts import compile_contract
+from contracts import (
+    mandate_record_approval, mandate_record_clear,
+    mandate_record_packed_approval, mandate_record_packed_clear,
+    strahn_core_approval, strahn_core_clear,
+    strahn_pi_base_approval, strahn_pi_base_clear,
+    strahn_pi_shared_approval, strahn_pi_shared_clear,
+)
+from relayer_service import intent_message
+
+DEPOSIT = 50_000_000
+CALL_FEE = 40_000  # covers the inner transactions of any call here
+NOTE_CHUNK = 1024
+HOUR = 3600
+DAY = 86400
+
+
+def itob(value):
+    return value.to_bytes(8, "big")
+
+
+@pytest.fixture(scope="module")
+def programs():
+    """Approval and clear TEAL of each contract the tests deploy"""
+    return {
+        "strahn_core": compile_contract(strahn_core_approval, strahn_core_clear, "strahn_core"),
+        "strahn_pi_base": compile_contract(strahn_pi_base_approval, strahn_pi_base_clear, "strahn_pi_base"),
+        "strahn_pi_shared": compile_contract(strahn_pi_shared_approval, strahn_pi_shared_clear,
+                                             "strahn_pi_shared"),
+        "mandate_record": compile_contract(mandate_record_approval, mandate_record_clear, "mandate_record"),
+        "mandate_record_packed": compile_contract(mandate_record_packed_approval, mandate_record_packed_clear,
+                                                  "mandate_record_packed"),
+    }
+
+
+def app_call(net, sender, app_id, args, fee=CALL_FEE):
+    """An unsigned NoOp call paired with its signer"""
+    txn = transaction.ApplicationNoOpTxn(sender[1], net["ledger"].suggested_params(), app_id, args)
+    txn.fee = fee
+    return txn, sender[0]
+
+
+def usdc_transfer(net, sender, receiver, amount):
+    txn = transaction.AssetTransferTxn(sender[1], net["ledger"].suggested_params(), receiver, amount,
+                                       net["usdc_id"])
+    return txn, sender[0]
+
+
+def grouped(pairs):
+    txns = [txn for txn, _ in pairs]
+    if len(txns) > 1:
+        transaction.assign_group_id(txns)
+    return pairs
+
+
+def submit(net, *pairs):
+    """Apply a group; returns the last transaction's result"""
+    pairs = grouped(pairs)
+    net["ledger"].submit([txn.sign(key) for txn, key in pairs])
+    return net["ledger"].results[pairs[-1][0].get_txid()]
+
+
+def simulate(net, *pairs):
+    """Simulate a group; returns its failure message, or None if it would succeed"""
+    pairs = grouped(pairs)
+    response = net["ledger"].simulate([transaction.SignedTransaction(txn, None) for txn, _ in pairs])
+    return response["txn-groups"][0].get("failure-message")
+
+
+def rejection(net, *pairs):
+    """Simulate a group that must fail; returns the failure message"""
+    failure = simulate(net, *pairs)
+    assert failure, "the group was expected to fail"
+    return failure
+
+
+def logs(result):
+    return [base64.b64decode(log) for log in result.get("logs", [])]
+
+
+def sign(net, message, signer=None):
+    """Creator (or signer) signature over a message's SHA-256, as the clients sign intents"""
+    key = nacl.signing.SigningKey(base64.b64decode((signer or net["creator"])[0])[:32])
+    return key.sign(hashlib.sha256(message).digest()).signature
+
+
+def create_app(net, sender, name, num_uints, num_byte_slices, app_args):
+    approval, clear = net["images"][name]
+    txn = transaction.ApplicationCreateTxn(
+        sender[1], net["ledger"].suggested_params(), transaction.OnComplete.NoOpOC, approval, clear,
+        transaction.StateSchema(num_uints, num_byte_slices), transaction.StateSchema(0, 0), app_args=app_args,
+    )
+    return submit(net, (txn, sender[0]))["application-index"]
+
+
+def holding(net, address):
+    return net["ledger"].holding(address, net["usdc_id"])
+
+
+def global_state(net):
+    return net["ledger"].apps[net["app_id"]]["global"]
+
+
+def boxes(net, app_id=None):
+    return net["ledger"].apps[app_id or net["app_id"]]["boxes"]
+
+
+@pytest.fixture
+def net(programs):
+    """A ledger running Core and a funded, opted-in PI Base from TEAL"""
+    ledger = Ledger()
+    creator, relayer, stranger = (account.generate_account() for _ in range(3))
+    for _, address in (creator, relayer, stranger):
+        ledger.fund(address, 100_000_000)
+    usdc_id = ledger.create_asset(creator[1], 10 ** 12)
+    merchants = [account.generate_account()[1] for _ in range(5)]
+    for merchant in merchants:
+        ledger.fund(merchant, 1_000_000, {usdc_id: 0})
+
+    net = {
+        "ledger": ledger, "usdc_id": usdc_id, "creator": creator, "relayer": relayer,
+        "stranger": stranger, "merchants": merchants,
+        "images": {name: (ledger.register_teal(approval), ledger.register_teal(clear))
+                   for name, (approval, clear) in programs.items()},
+    }
+    net["core_id"] = create_app(net, creator, "strahn_core", 4, 1, [encoding.decode_address(creator[1])])
+    net["app_id"] = create_app(net, creator, "strahn_pi_base", 5, 1, [
+        encoding.decode_address(creator[1]), itob(usdc_id), itob(net["core_id"])
+    ])
+    net["app_address"] = get_application_address(net["app_id"])
+    ledger.fund(net["app_address"], 10_000_000)
+    ledger.fund(get_application_address(net["core_id"]), 10_000_000)
+    submit(net, app_call(net, creator, net["app_id"], [b"app_optin_usdc"]))
+    return net
+
+
+def fund_pi_base(net, amount=DEPOSIT):
+    submit(net, usdc_transfer(net, net["creator"], net["app_address"], amount))
+
+
+def intent_args(net, destination, amount, relayer_fee, nonce):
+    message = intent_message(net["app_id"], nonce, destination, amount, relayer_fee)
+    return [b"process_intent", destination, itob(amount), itob(relayer_fee), itob(nonce), sign(net, message)]
+
+
+class TestDeposits:
+    """deposit_usdc_batch and the top-up read by preceding_usdc_deposit"""
+
+    def test_batch_counts_every_preceding_deposit(self, net):
+        ledger = net["ledger"]
+        depositors = [account.generate_account() for _ in range(3)]
+        for i, (_, address) in enumerate(depositors):
+            ledger.fund(address, 1_000_000, {net["usdc_id"]: (i + 1) * 1_000_000})
+        fee_payer = transaction.PaymentTxn(net["relayer"][1], ledger.suggested_params(), net["relayer"][1], 0)
+
+        result = submit(net, *[usdc_transfer(net, d, net["app_address"], (i + 1) * 1_000_000)
+                               for i, d in enumerate(depositors)],
+                        (fee_payer, net["relayer"][0]),
+                        app_call(net, net["relayer"], net["app_id"], [b"deposit_usdc_batch"]))
+
+        entries = logs(result)
+        assert entries[:3] == [b"usdc_deposited:" + itob((i + 1) * 1_000_000) + b":from:"
+                               + encoding.decode_address(address) for i, (_, address) in enumerate(depositors)]
+        assert entries[3] == b"usdc_batch_deposited:" + itob(6_000_000) + b":deposits:" + itob(3)
+        assert holding(net, net["app_address"]) == 6_000_000
+
+    def test_batch_must_come_last_and_count_a_deposit(self, net):
+        deposit = usdc_transfer(net, net["creator"], net["app_address"], 1_000_000)
+        call = app_call(net, net["relayer"], net["app_id"], [b"deposit_usdc_batch"])
+        assert "assert failed" in rejection(net, call, deposit)
+
+        alone = app_call(net, net["relayer"], net["app_id"], [b"deposit_usdc_batch"])
+        assert "assert failed" in rejection(net, alone)
+
+    def test_intent_spends_preceding_top_up(self, net):
+        merchant = encoding.decode_address(net["merchants"][0])
+        call = app_call(net, net["relayer"], net["app_id"], intent_args(net, merchant, 1_500_000, 10_000, 0))
+
+        # Nothing deposited yet: the balance check fails
+        assert "assert failed" in rejection(net, call)
+
+        top_up = usdc_transfer(net, net["creator"], net["app_address"], 2_000_000)
+        result = submit(net, top_up, app_call(net, net["relayer"], net["app_id"],
+                                              intent_args(net, merchant, 1_500_000, 10_000, 0)))
+        assert logs(result)[0] == b"usdc_deposited:" + itob(2_000_000) + b":from:" \
+            + encoding.decode_address(net["creator"][1])
+        assert holding(net, net["merchants"][0]) == 1_500_000
+        assert holding(net, net["app_address"]) == 500_000
+        assert global_state(net)[b"creator_nonce"] == 1
+
+    def test_each_transfer_is_logged_once(self, net):
+        merchant = encoding.decode_address(net["merchants"][0])
+        net["ledger"].fund(net["stranger"][1], 1_000_000, {net["usdc_id"]: 1_000_000})
+        top_up = usdc_transfer(net, net["creator"], net["app_address"], 2_000_000)
+        intent = app_call(net, net["relayer"], net["app_id"], intent_args(net, merchant, 1_500_000, 10_000, 0))
+        deposit = usdc_transfer(net, net["stranger"], net["app_address"], 1_000_000)
+        batch = app_call(net, net["relayer"], net["app_id"], [b"deposit_usdc_batch"])
+        result = submit(net, top_up, intent, deposit, batch)
+
+        # The batch leaves the top-up to the intent that spent it
+        assert logs(net["ledger"].results[intent[0].get_txid()])[0] == \
+            b"usdc_deposited:" + itob(2_000_000) + b":from:" + encoding.decode_address(net["creator"][1])
+        assert logs(result) == [
+            b"usdc_deposited:" + itob(1_000_000) + b":from:" + encoding.decode_address(net["stranger"][1]),
+            b"usdc_batch_deposited:" + itob(1_000_000) + b":deposits:" + itob(1),
+        ]
+
+    def test_top_up_only_from_creator_or_relayer(self, net):
+        merchant = encoding.decode_address(net["merchants"][0])
+        net["ledger"].fund(net["stranger"][1], 1_000_000, {net["usdc_id"]: 2_000_000})
+        top_up = usdc_transfer(net, net["stranger"], net["app_address"], 2_000_000)
+        intent = app_call(net, net["relayer"], net["app_id"], intent_args(net, merchant, 1_500_000, 10_000, 0))
+        batch = app_call(net, net["relayer"], net["app_id"], [b"deposit_usdc_batch"])
+        result = submit(net, top_up, intent, batch)
+
+        # Not the intent's top-up, so the batch acknowledges it instead
+        assert not any(entry.startswith(b"usdc_deposited:")
+                       for entry in logs(net["ledger"].results[intent[0].get_txid()]))
+        assert logs(result) == [
+            b"usdc_deposited:" + itob(2_000_000) + b":from:" + encoding.decode_address(net["stranger"][1]),
+            b"usdc_batch_deposited:" + itob(2_000_000) + b":deposits:" + itob(1),
+        ]
+
+
+class TestSplitIntent:
+    """process_split_intent totals and payee limit"""
+
+    def split_call(self, net, payees, relayer_fee=20_000, nonce=0):
+        packed = b"".join(encoding.decode_address(address) + itob(amount) for address, amount in payees)
+        message = b"SPLIT_V1:" + itob(net["app_id"]) + itob(nonce) + itob(relayer_fee) + packed
+        return app_call(net, net["relayer"], net["app_id"], [
+            b"process_split_intent", packed, itob(relayer_fee), itob(nonce), sign(net, message)
+        ])
+
+    def test_pays_every_payee_and_accrues_fee(self, net):
+        fund_pi_base(net)
+        payees = list(zip(net["merchants"][:3], (1_000_000, 2_000_000, 3_000_000)))
+        result = submit(net, self.split_call(net, payees))
+
+        assert [holding(net, address) for address, _ in payees] == [1_000_000, 2_000_000, 3_000_000]
+        assert logs(result)[-1] == (b"split_payment_processed:" + itob(6_000_000) + b":payees:" + itob(3)
+                                    + b":nonce:" + itob(2))
+        assert global_state(net)[b"creator_nonce"] == 1
+        assert global_state(net)[b"fees_owed"] == 20_000
+        assert boxes(net)[b"fee:" + encoding.decode_address(net["relayer"][1])] == itob(20_000)
+
+    def test_rejects_too_many_payees_and_empty_amounts(self, net):
+        fund_pi_base(net)
+        five = [(address, 1_000_000) for address in net["merchants"]]
+        assert "assert failed" in rejection(net, self.split_call(net, five))
+
+        zero = [(net["merchants"][0], 1_000_000), (net["merchants"][1], 0)]
+        assert "assert failed" in rejection(net, self.split_call(net, zero))
+
+    def test_rejects_total_above_balance(self, net):
+        fund_pi_base(net, 3_000_000)
+        payees = [(net["merchants"][0], 2_000_000), (net["merchants"][1], 1_000_000)]
+        # The relayer fee pushes the total past the deposit
+        assert "assert failed" in rejection(net, self.split_call(net, payees, relayer_fee=1))
+        submit(net, self.split_call(net, payees, relayer_fee=0))
+        assert holding(net, net["app_address"]) == 0
+
+
+class TestAllowance:
+    """grant_allowance, process_allowance_intent and revoke_allowance"""
+
+    CAP = 3_000_000
+
+    def grant(self, net, expiry, nonce=0):
+        relayer = encoding.decode_address(net["relayer"][1])
+        message = b"ALLOWANCE_V1:" + itob(net["app_id"]) + itob(nonce) + relayer + itob(self.CAP) + itob(expiry)
+        return app_call(net, net["relayer"], net["app_id"], [
+            b"grant_allowance", relayer, itob(self.CAP), itob(expiry), itob(nonce), sign(net, message)
+        ])
+
+    def spend(self, net, amount, relayer_fee, nonce):
+        return app_call(net, net["relayer"], net["app_id"], [
+            b"process_allowance_intent", encoding.decode_address(net["merchants"][0]), itob(amount),
+            itob(relayer_fee), itob(nonce),
+        ])
+
+    def allowance(self, net):
+        return boxes(net).get(b"allowance:" + encoding.decode_address(net["relayer"][1]))
+
+    def test_spend_down_to_the_cap(self, net):
+        fund_pi_base(net)
+        expiry = net["ledger"].timestamp + DAY
+        submit(net, self.grant(net, expiry))
+        assert self.allowance(net) == itob(self.CAP) + itob(expiry)
+
+        # The grant used nonce 0; each payment uses the next one
+        result = submit(net, self.spend(net, 1_000_000, 50_000, 1))
+        assert logs(result)[-1] == b"allowance_payment_processed:" + itob(1_000_000) + b":remaining:" + itob(1_950_000)
+        submit(net, self.spend(net, 1_900_000, 50_000, 2))
+        assert self.allowance(net) == itob(0) + itob(expiry)
+        assert holding(net, net["merchants"][0]) == 2_900_000
+        assert global_state(net)[b"fees_owed"] == 100_000
+
+        assert "assert failed" in rejection(net, self.spend(net, 1, 1, 3))
+
+    def test_grant_cannot_be_replayed(self, net):
+        expiry = net["ledger"].timestamp + DAY
+        submit(net, self.grant(net, expiry))
+        assert "assert failed" in rejection(net, self.grant(net, expiry))
+
+    def test_expired_allowance_rejected(self, net):
+        fund_pi_base(net)
+        expiry = net["ledger"].timestamp + HOUR
+        submit(net, self.grant(net, expiry))
+        assert simulate(net, self.spend(net, 1_000_000, 1, 1)) is None
+        net["ledger"].timestamp = expiry
+        assert "assert failed" in rejection(net, self.spend(net, 1_000_000, 1, 1))
+
+    def test_revoke_is_creator_only(self, net):
+        fund_pi_base(net)
+        submit(net, self.grant(net, net["ledger"].timestamp + DAY))
+        relayer = encoding.decode_address(net["relayer"][1])
+        assert simulate(net, self.spend(net, 1_000_000, 1, 1)) is None
+        assert "assert failed" in rejection(net, app_call(net, net["stranger"], net["app_id"],
+                                                          [b"revoke_allowance", relayer]))
+
+        result = submit(net, app_call(net, net["creator"], net["app_id"], [b"revoke_allowance", relayer]))
+        assert logs(result) == [b"allowance_revoked"]
+        assert self.allowance(net) is None
+        assert "assert failed" in rejection(net, self.spend(net, 1_000_000, 1, 1))
+
+
+def upload_programs(net, approval, clear):
+    """Write programs into Core's approval and clear boxes in note-sized chunks"""
+    for box_name, program in ((b"approval", approval), (b"clear", clear)):
+        chunks = [program[i:i + NOTE_CHUNK] for i in range(0, len(program), NOTE_CHUNK)]
+        for i, chunk in enumerate(chunks):
+            method, size = (b"set_bytecode", len(program)) if i == 0 else (b"append_bytecode", i * NOTE_CHUNK)
+            txn, key = app_call(net, net["creator"], net["core_id"], [method, box_name, itob(size)])
+            txn.note = chunk
+            submit(net, (txn, key))
+
+
+def upload_template(net, name="mandate_record"):
+    """Store a mandate template in Core as its owner would, and publish it as version 1"""
+    upload_programs(net, *net["images"][name])
+    packed = itob(int(name == "mandate_record_packed"))
+    submit(net, app_call(net, net["creator"], net["core_id"], [b"set_version", itob(1), packed]))
+
+
+def fund_next_apps(net, count=16):
+    """
+    Fund the accounts of the next apps the ledger will create.
+
+    A new mandate opts in to USDC at creation, which needs its account's
+    minimum balance, and nothing in the setup call pays it.
+    """
+    ledger = net["ledger"]
+    for app_id in range(ledger.next_id, ledger.next_id + count):
+        ledger.fund(get_application_address(app_id), 300_000)
+
+
+def registry(net, slot):
+    terms = boxes(net)[b"mandate:" + itob(slot)]
+    return {
+        "app_id": int.from_bytes(terms[:8], "big"),
+        "next_pay_ts": int.from_bytes(terms[56:64], "big"),
+        "bucket": int.from_bytes(terms[72:80], "big"),
+        "position": int.from_bytes(terms[80:88], "big"),
+    }
+
+
+class TestMandates:
+    """setup_mandates_batch and the due-time index it maintains"""
+
+    INTERVAL = DAY
+
+    def batch_call(self, net, specs, nonce=0, template="mandate_record"):
+        packed = b"".join(encoding.decode_address(dest) + itob(amount) + itob(self.INTERVAL) + itob(start)
+                          + itob(fee) for dest, amount, start, fee in specs)
+        approval, clear = net["images"][template]
+        approval_hash, clear_hash = template_hash(approval), hashlib.sha256(clear).digest()
+        message = b"MANDATE_BATCH_V1:" + itob(net["app_id"]) + itob(nonce) + approval_hash + clear_hash + packed
+        return app_call(net, net["relayer"], net["app_id"], [
+            b"setup_mandates_batch", packed, approval_hash, clear_hash, itob(nonce), sign(net, message)
+        ])
+
+    def setup(self, net, specs, nonce=0, template="mandate_record"):
+        fund_next_apps(net)
+        return submit(net, self.batch_call(net, specs, nonce, template))
+
+    def test_batch_setup_deploys_registers_and_consumes_nonce(self, net):
+        fund_pi_base(net)
+        upload_template(net)
+        start = net["ledger"].timestamp + 2 * HOUR
+        specs = [(net["merchants"][0], 1_000_000, start, 10_000), (net["merchants"][1], 2_000_000, start, 10_000)]
+        result = self.setup(net, specs)
+
+        assert logs(result)[-1] == b"mandates_batch_setup_complete:" + itob(2) + b":nonce:" + itob(2)
+        assert global_state(net)[b"creator_nonce"] == 1
+        assert global_state(net)[b"mandate_count"] == 2
+        for slot, (merchant, amount, _, _) in enumerate(specs):
+            mandate = net["ledger"].apps[registry(net, slot)["app_id"]]
+            assert mandate["global"][b"dest_addr"] == encoding.decode_address(merchant)
+            assert mandate["global"][b"pi_base_id"] == net["app_id"]
+            assert holding(net, merchant) == amount  # the first payment
+        assert global_state(net)[b"fees_owed"] == 20_000
+
+        # The signature was for nonce 0, which is spent
+        assert "assert failed" in rejection(net, self.batch_call(net, specs))
+        fund_next_apps(net)
+        assert simulate(net, self.batch_call(net, specs, nonce=1)) is None
+
+    def test_batch_setup_needs_the_stored_template(self, net):
+        fund_pi_base(net)
+        upload_template(net, "mandate_record_packed")  # not the template the signer approved
+        start = net["ledger"].timestamp + 2 * HOUR
+        failure = rejection(net, self.batch_call(net, [(net["merchants"][0], 1_000_000, start, 0)]))
+        assert "assert failed" in failure
+        assert global_state(net)[b"creator_nonce"] == 0
+
+    def test_full_bucket_spills_and_entries_are_removed(self, net):
+        fund_pi_base(net)
+        upload_template(net)
+        ledger = net["ledger"]
+        start = ledger.timestamp + 2 * HOUR
+        bucket = start // HOUR
+
+        # Another 127 mandates already fill the start bucket to 1024 bytes
+        boxes(net)[b"due:" + itob(bucket)] = itob(127) + b"".join(itob(1000 + i) for i in range(127))
+        self.setup(net, [(net["merchants"][0], 1_000_000, start, 0), (net["merchants"][1], 1_000_000, start, 0)])
+        assert [(registry(net, s)["bucket"], registry(net, s)["position"]) for s in (0, 1)] == \
+            [(bucket + 1, 0), (bucket + 1, 1)]
+        assert boxes(net)[b"due:" + itob(bucket + 1)] == itob(2) + itob(1) + itob(2)
+
+        # Paying slot 0 clears its entry and files it under its next payment
+        ledger.timestamp = start
+        submit(net, app_call(net, net["relayer"], net["app_id"], [b"process_mandates_batch", itob(0)]))
+        assert boxes(net)[b"due:" + itob(bucket + 1)] == itob(1) + itob(0) + itob(2)
+        next_bucket = (start + self.INTERVAL) // HOUR
+        assert registry(net, 0) == dict(registry(net, 0), next_pay_ts=start + self.INTERVAL,
+                                         bucket=next_bucket, position=0)
+        assert boxes(net)[b"due:" + itob(next_bucket)] == itob(1) + itob(1)
+
+        # The bucket's last live entry leaving deletes it
+        submit(net, app_call(net, net["relayer"], net["app_id"], [b"process_mandates_batch", itob(1)]))
+        assert b"due:" + itob(bucket + 1) not in boxes(net)
+        assert boxes(net)[b"due:" + itob(next_bucket)] == itob(2) + itob(1) + itob(2)
+        assert holding(net, net["merchants"][1]) == 2_000_000
+
+    def test_keeper_rejects_a_slot_listed_twice(self, net):
+        fund_pi_base(net)
+        upload_template(net)
+        start = net["ledger"].timestamp + 2 * HOUR
+        self.setup(net, [(net["merchants"][0], 1_000_000, start, 0)])
+
+        # Two intervals overdue, so the slot is still due after one reschedule
+        net["ledger"].timestamp = start + 2 * self.INTERVAL
+        twice = app_call(net, net["relayer"], net["app_id"], [b"process_mandates_batch", itob(0) + itob(0)])
+        assert "assert failed" in rejection(net, twice)
+        once = app_call(net, net["relayer"], net["app_id"], [b"process_mandates_batch", itob(0)])
+        assert simulate(net, once) is None
+
+    def test_cancelled_mandate_is_never_paid_again(self, net):
+        fund_pi_base(net)
+        upload_template(net)
+        start = net["ledger"].timestamp + 2 * HOUR
+        self.setup(net, [(net["merchants"][0], 1_000_000, start, 0), (net["merchants"][1], 1_000_000, start, 0)])
+        mandate_id = registry(net, 0)["app_id"]
+
+        cancel = [b"cancel_mandate", itob(0)]
+        assert "assert failed" in rejection(net, app_call(net, net["stranger"], net["app_id"], cancel))
+        result = submit(net, app_call(net, net["creator"], net["app_id"], cancel))
+        assert logs(result) == [b"mandate_cancelled:" + itob(0) + b":app:" + itob(mandate_id)]
+        assert b"mandate:" + itob(0) not in boxes(net)
+        assert boxes(net)[b"due:" + itob(start // HOUR)] == itob(1) + itob(0) + itob(2)
+
+        net["ledger"].timestamp = start
+        keeper = app_call(net, net["relayer"], net["app_id"], [b"process_mandates_batch", itob(0)])
+        assert "assert failed" in rejection(net, keeper)
+        direct = app_call(net, net["stranger"], mandate_id, [b"process_payment", itob(0)])
+        assert "assert failed" in rejection(net, direct)
+        assert holding(net, net["merchants"][0]) == 1_000_000  # the first payment only
+
+    def test_set_version_records_the_template_layout(self, net):
+        fund_pi_base(net)
+        upload_template(net, "mandate_record_packed")
+        assert net["ledger"].apps[net["core_id"]]["global"][b"template_packed"] == 1
+        start = net["ledger"].timestamp + 2 * HOUR
+        self.setup(net, [(net["merchants"][0], 1_000_000, start, 0)], template="mandate_record_packed")
+        assert net["ledger"].apps[registry(net, 0)["app_id"]]["schema"] == [0, 1]
+
+        # Publishing without a layout goes back to mandate_record's
+        upload_programs(net, *net["images"]["mandate_record"])
+        bad_layout = app_call(net, net["creator"], net["core_id"], [b"set_version", itob(2), itob(2)])
+        assert "assert failed" in rejection(net, bad_layout)
+        submit(net, app_call(net, net["creator"], net["core_id"], [b"set_version", itob(2)]))
+        assert net["ledger"].apps[net["core_id"]]["global"][b"template_packed"] == 0
+
+    def test_append_without_offset_continues_the_upload(self, net):
+        approval, _ = net["images"]["mandate_record"]
+        chunks = [approval[i:i + NOTE_CHUNK] for i in range(0, len(approval), NOTE_CHUNK)]
+        for i, chunk in enumerate(chunks):
+            # The call shape from before offsets: only set_bytecode takes a size
+            args = [b"set_bytecode", b"approval", itob(len(approval))] if i == 0 else [b"append_bytecode", b"approval"]
+            txn, key = app_call(net, net["creator"], net["core_id"], args)
+            txn.note = chunk
+            submit(net, (txn, key))
+        assert boxes(net, net["core_id"])[b"approval"] == approval
+
+    def test_set_version_bounds_approval_and_clear_together(self, net):
+        # Either box fits alone, but together they need five pages
+        upload_programs(net, bytes(8192), bytes(4))
+        set_version = app_call(net, net["creator"], net["core_id"], [b"set_version", itob(1)])
+        assert "assert failed" in rejection(net, set_version)
+
+        upload_programs(net, bytes(8188), bytes(4))
+        submit(net, app_call(net, net["creator"], net["core_id"], [b"set_version", itob(1)]))
+        assert len(boxes(net, net["core_id"])[b"approval_v" + itob(1)]) == 8188
+
+    def test_keeper_rejects_mandates_not_yet_due(self, net):
+        fund_pi_base(net)
+        upload_template(net)
+        start = net["ledger"].timestamp + 2 * HOUR
+        self.setup(net, [(net["merchants"][0], 1_000_000, start, 0)])
+        call = app_call(net, net["relayer"], net["app_id"], [b"process_mandates_batch", itob(0)])
+        assert "assert failed" in rejection(net, call)
+
+
+USER_BOX_MBR = 26_900
+FEE_BOX_MBR = 2500 + 400 * (4 + 32 + 8)
+REGISTRY_MBR = 2500 + 400 * (8 + 8 + 120)
+DUE_BUCKET_MBR = 2500 + 400 * (4 + 8 + 16)
+
+
+class TestShared:
+    """The shared PI Base: user sub-balances, and users paying for their boxes"""
+
+    @pytest.fixture
+    def shared(self, net):
+        """The net with a funded, opted-in shared PI Base and one user"""
+        shared_id = create_app(net, net["creator"], "strahn_pi_shared", 4, 1, [
+            encoding.decode_address(net["creator"][1]), itob(net["usdc_id"]), itob(net["core_id"])
+        ])
+        net["ledger"].fund(get_application_address(shared_id), 10_000_000)
+        submit(net, app_call(net, net["creator"], shared_id, [b"app_optin_usdc"]))
+        user = account.generate_account()
+        net["ledger"].fund(user[1], 1_000_000)
+        return dict(net, shared_id=shared_id, shared_address=get_application_address(shared_id), user=user)
+
+    def pay_app(self, net, amount):
+        txn = transaction.PaymentTxn(net["creator"][1], net["ledger"].suggested_params(),
+                                     net["shared_address"], amount)
+        return txn, net["creator"][0]
+
+    def register(self, net, storage=0):
+        submit(net, self.pay_app(net, USER_BOX_MBR + storage), app_call(
+            net, net["creator"], net["shared_id"], [b"register_user", encoding.decode_address(net["user"][1])]))
+
+    def deposit(self, net, amount):
+        submit(net, usdc_transfer(net, net["creator"], net["shared_address"], amount), app_call(
+            net, net["creator"], net["shared_id"], [b"deposit_usdc", encoding.decode_address(net["user"][1])]))
+
+    def fund_storage(self, net, amount):
+        return [self.pay_app(net, amount), app_call(net, net["creator"], net["shared_id"],
+                                                    [b"fund_storage", encoding.decode_address(net["user"][1])])]
+
+    def user_box(self, net):
+        value = boxes(net, net["shared_id"])[b"user:" + encoding.decode_address(net["user"][1])]
+        return [int.from_bytes(value[i:i + 8], "big") for i in range(0, 24, 8)]
+
+    def intent(self, net, amount, relayer_fee, nonce, relayer=None):
+        user = encoding.decode_address(net["user"][1])
+        merchant = encoding.decode_address(net["merchants"][0])
+        message = (b"SPP_SHARED_V1:" + itob(net["shared_id"]) + user + itob(nonce) + merchant
+                   + itob(amount) + itob(relayer_fee))
+        return app_call(net, relayer or net["relayer"], net["shared_id"], [
+            b"process_intent", user, merchant, itob(amount), itob(relayer_fee), itob(nonce),
+            sign(net, message, net["user"])
+        ])
+
+    def setup_mandate(self, net, amount, start, relayer_fee, nonce):
+        user = encoding.decode_address(net["user"][1])
+        merchant = encoding.decode_address(net["merchants"][1])
+        approval, clear = net["images"]["mandate_record"]
+        message = (b"MANDATE_SHARED_V1:" + itob(net["shared_id"]) + user + itob(nonce) + merchant
+                   + itob(amount) + itob(DAY) + itob(start) + itob(relayer_fee))
+        return app_call(net, net["relayer"], net["shared_id"], [
+            b"setup_mandate_standard", user, merchant, itob(amount), itob(DAY), itob(start),
+            itob(relayer_fee), itob(nonce), template_hash(approval), hashlib.sha256(clear).digest(),
+            sign(net, message, net["user"])
+        ])
+
+    def test_register_and_deposit(self, shared):
+        user_call = app_call(shared, shared["creator"], shared["shared_id"],
+                             [b"register_user", encoding.decode_address(shared["user"][1])])
+        assert "assert failed" in rejection(shared, self.pay_app(shared, USER_BOX_MBR - 1), user_call)
+
+        # The payment's excess over the box minimum balance prepays storage
+        self.register(shared, storage=5_000)
+        assert self.user_box(shared) == [0, 0, 5_000]
+        self.deposit(shared, 3_000_000)
+        assert self.user_box(shared) == [3_000_000, 0, 5_000]
+
+        stranger = encoding.decode_address(shared["stranger"][1])
+        assert "assert failed" in rejection(
+            shared, usdc_transfer(shared, shared["creator"], shared["shared_address"], 1),
+            app_call(shared, shared["creator"], shared["shared_id"], [b"deposit_usdc", stranger]))
+
+    def test_intent_charges_a_new_fee_box_to_the_user(self, shared):
+        self.register(shared)
+        self.deposit(shared, 3_000_000)
+
+        # The relayer's first fee creates its box, which the user has not paid for
+        assert "assert failed" in rejection(shared, self.intent(shared, 1_000_000, 10_000, 0))
+
+        # Funding the storage in the same group pays for it
+        submit(shared, *self.fund_storage(shared, FEE_BOX_MBR), self.intent(shared, 1_000_000, 10_000, 0))
+        assert self.user_box(shared) == [1_990_000, 1, 0]
+        assert holding(shared, shared["merchants"][0]) == 1_000_000
+        fee_box = b"fee:" + encoding.decode_address(shared["relayer"][1])
+        assert boxes(shared, shared["shared_id"])[fee_box] == itob(10_000)
+
+        # The box exists now, so the next intent costs no storage
+        submit(shared, self.intent(shared, 1_000_000, 10_000, 1))
+        assert self.user_box(shared) == [980_000, 2, 0]
+
+    def test_mandate_setup_and_release_charge_the_owner(self, shared):
+        upload_template(shared)
+        fund_next_apps(shared)
+        start = shared["ledger"].timestamp + 2 * HOUR
+        setup_cost = REGISTRY_MBR + DUE_BUCKET_MBR + FEE_BOX_MBR
+        self.register(shared, storage=setup_cost - 1)
+        self.deposit(shared, 5_000_000)
+
+        assert "assert failed" in rejection(shared, self.setup_mandate(shared, 1_000_000, start, 10_000, 0))
+        submit(shared, *self.fund_storage(shared, 1), self.setup_mandate(shared, 1_000_000, start, 10_000, 0))
+        assert self.user_box(shared) == [3_990_000, 1, 0]
+        terms = boxes(shared, shared["shared_id"])[b"mandate:" + itob(0)]
+        assert terms[88:] == encoding.decode_address(shared["user"][1])
+        mandate_id = int.from_bytes(terms[:8], "big")
+
+        # A relayer without a fee box yet needs a new one, which the owner pays for
+        shared["ledger"].timestamp = start
+        release = app_call(shared, shared["stranger"], mandate_id, [b"process_payment", itob(0)])
+        assert "assert failed" in rejection(shared, release)
+        submit(shared, *self.fund_storage(shared, FEE_BOX_MBR))
+        submit(shared, app_call(shared, shared["stranger"], mandate_id, [b"process_payment", itob(0)]))
+
+        # The entry moved buckets, so only the fee box was charged
+        assert self.user_box(shared) == [2_980_000, 1, 0]
+        assert holding(shared, shared["merchants"][1]) == 2_000_000
+        assert registry(dict(shared, app_id=shared["shared_id"]), 0)["next_pay_ts"] == start + DAY
+
+    def test_admin_cannot_update_or_delete(self, shared):
+        params = shared["ledger"].suggested_params()
+        approval, clear = shared["images"]["mandate_record"]
+        update = transaction.ApplicationUpdateTxn(shared["creator"][1], params, shared["shared_id"], approval, clear)
+        delete = transaction.ApplicationDeleteTxn(shared["creator"][1], params, shared["shared_id"])
+        for txn in (update, delete):
+            assert "rejected" in rejection(shared, (txn, shared["creator"][0]))
+        assert shared["ledger"].apps[shared["shared_id"]]
+
+
+class TestEvaluator:
+    """Stand-in behaviour the contract tests rely on"""
+
+    def test_failed_group_rolls_back_everything(self, net):
+        fund_pi_base(net)
+        before = (dict(global_state(net)), holding(net, net["app_address"]), net["ledger"].next_id)
+        merchant = encoding.decode_address(net["merchants"][0])
+        bad = intent_args(net, merchant, 1_000_000, 0, 0)
+        bad[-1] = bytes(64)  # not the creator's signature
+        with pytest.raises(Rejected, match="logic eval error"):
+            submit(net, app_call(net, net["relayer"], net["app_id"], bad))
+        assert (global_state(net), holding(net, net["app_address"]), net["ledger"].next_id) == before
+
+    def test_inner_fees_come_from_the_group(self, net):
+        fund_pi_base(net)
+        merchant = encoding.decode_address(net["merchants"][0])
+        # Three op-ups and the payment ride on the outer fee
+        with pytest.raises(Rejected, match="group fees"):
+            submit(net, app_call(net, net["relayer"], net["app_id"], intent_args(net, merchant, 1, 1, 0),
+                                 fee=1000))
@@ -14,7 +14,9 @@ from pyteal import *
 from contracts import (
     strahn_core_approval, strahn_core_clear,
     strahn_pi_base_approval, strahn_pi_base_clear,
-    mandate_record_approval, mandate_record_clear
+    strahn_pi_shared_approval, strahn_pi_shared_clear,
+    mandate_record_approval, mandate_record_clear,
+    mandate_record_packed_approval, mandate_record_packed_clear
 )
 
 class TestContractCompilation:
@@ -62,6 +64,27 @@ class TestContractCompilation:
         except Exception as e:
             pytest.fail(f"Strahn PI Base compilation failed: {e}")
     
+    def test_strahn_pi_shared_compilation(self):
+        """Test shared PI Base contract compiles without errors"""
+        try:
+            approval_teal = compileTeal(
+                strahn_pi_shared_approval(),
+                Mode.Application,
+                version=8
+            )
+            clear_teal = compileTeal(
+                strahn_pi_shared_clear(),
+                Mode.Application,
+                version=8
+            )
+            
+            assert len(approval_teal) > 0
+            assert len(clear_teal) > 0
+            assert "box_replace" in approval_teal  # Per-user balances live in boxes
+            
+        except Exception as e:
+            pytest.fail(f"Strahn PI Shared compilation failed: {e}")
+    
     def test_mandate_record_compilation(self):
         """Test Mandate Record contract compiles without errors"""
         try:
@@ -134,7 +157,9 @@ def test_all_contracts_compile():
     contracts = [
         ("strahn_core", strahn_core_approval, strahn_core_clear),
         ("strahn_pi_base", strahn_pi_base_approval, strahn_pi_base_clear),
+        ("strahn_pi_shared", strahn_pi_shared_approval, strahn_pi_shared_clear),
         ("mandate_record", mandate_record_approval, mandate_record_clear),
+        ("mandate_record_packed", mandate_record_packed_approval, mandate_record_packed_clear),
     ]
     
     compiled_contracts = {}
@@ -161,7 +186,7 @@ def test_all_contracts_compile():
             pytest.fail(f"Contract {name} compilation failed: {e}")
     
     # Verify all contracts compiled
-    assert len(compiled_contracts) == 3
+    assert len(compiled_contracts) == 5
     
     # Verify basic structure
     for name, programs in compiled_contracts.items():
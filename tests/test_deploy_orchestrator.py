@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Test suite for the deployment orchestrator's scheduling and checkpoint resume
+"""
+
+import json
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+from algosdk import account, transaction
+from algosdk.v2client.algod import AlgodClient
+
+# Add the scripts directory to the path
+sys.path.append(str(Path(__file__).parent.parent / "scripts"))
+
+from algod_standin import Ledger, serve
+from deploy_orchestrator import DeploymentFailed, DeploymentOrchestrator, Step, validate_steps
+
+
+class Recorder:
+    """Steps that log their runs; a named step can be made to fail"""
+
+    def __init__(self):
+        self.runs = []
+        self.failing = set()
+        self.lock = threading.Lock()
+
+    def step(self, name, value, **kwargs):
+        def run(ctx):
+            with self.lock:
+                self.runs.append(name)
+            if name in self.failing:
+                raise RuntimeError(f"{name} broke")
+            return {name: value(ctx.info) if callable(value) else value}
+        return Step(name, run, **kwargs)
+
+
+class TestScheduling:
+    """Dependency order and concurrency"""
+
+    def test_independent_steps_overlap(self, tmp_path):
+        both_started = threading.Barrier(2, timeout=5)
+
+        def meet(ctx):
+            both_started.wait()  # times out unless both run at once
+            return {ctx.name: True}
+
+        steps = [Step("a", meet), Step("b", meet),
+                 Step("c", lambda ctx: {"c": ctx.info["a"] and ctx.info["b"]}, after=["a", "b"])]
+        info = DeploymentOrchestrator(None, steps, path=str(tmp_path / "info.json")).run()
+        assert info == {"a": True, "b": True, "c": True}
+
+    def test_validate_steps_rejects_bad_graphs(self):
+        noop = lambda ctx: {}
+        with pytest.raises(ValueError, match="unknown step"):
+            validate_steps([Step("a", noop, after=["missing"])])
+        with pytest.raises(ValueError, match="cycle"):
+            validate_steps([Step("a", noop, after=["b"]), Step("b", noop, after=["a"])])
+        with pytest.raises(ValueError, match="Duplicate"):
+            validate_steps([Step("a", noop), Step("a", noop)])
+
+    def test_testnet_deployment_graph(self):
+        import testnet_deployment
+
+        steps = validate_steps(testnet_deployment.deployment_steps())
+        assert "create_core" in steps["create_pi_base"].after
+        assert steps["upload_approval"].after == steps["upload_clear"].after
+
+    def test_templated_pi_base_compiles_after_core(self, monkeypatch):
+        import testnet_deployment
+
+        # Core's app ID is baked into the templated program
+        monkeypatch.setattr(testnet_deployment, "TEMPLATED_PI_BASE", True)
+        steps = validate_steps(testnet_deployment.deployment_steps())
+        assert steps["compile_pi_base"].run is testnet_deployment.compile_templated_pi_base
+        assert list(steps["compile_pi_base"].after) == ["create_core"]
+
+    def test_testnet_deployment_rejects_legacy_info(self, tmp_path, monkeypatch, capsys):
+        import testnet_deployment
+
+        # Written before deployments were checkpointed: no "steps" to resume
+        (tmp_path / "deployment_info.json").write_text(json.dumps({"pi_base_app_id": 742113829}))
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(sys, "argv", ["testnet_deployment.py"])
+        assert testnet_deployment.main() == 1
+        assert "--fresh" in capsys.readouterr().out
+
+
+class TestResume:
+    """Checkpointing to the deployment file and resuming from it"""
+
+    def graph(self, recorder):
+        return [
+            recorder.step("compile", "code", checkpoint=False),
+            recorder.step("create", 7, after=["compile"]),
+            recorder.step("fund", True, after=["create"]),
+            recorder.step("upload", lambda info: info["compile"] + "!", after=["fund", "compile"]),
+        ]
+
+    def test_rerun_skips_finished_steps(self, tmp_path):
+        path = tmp_path / "info.json"
+        recorder = Recorder()
+        recorder.failing.add("fund")
+        with pytest.raises(DeploymentFailed, match="fund"):
+            DeploymentOrchestrator(None, self.graph(recorder), path=str(path)).run()
+
+        saved = json.loads(path.read_text())
+        assert saved["create"] == 7 and "compile" not in saved
+        assert saved["steps"]["fund"]["status"] == "failed"
+
+        # Compiling is not checkpointed, so it reruns for the upload
+        recorder.failing.clear()
+        recorder.runs.clear()
+        info = DeploymentOrchestrator(None, self.graph(recorder), path=str(path)).run()
+        assert sorted(recorder.runs) == ["compile", "fund", "upload"]
+        assert info["upload"] == "code!"
+
+        # Nothing left to do, and nothing recompiled
+        recorder.runs.clear()
+        DeploymentOrchestrator(None, self.graph(recorder), path=str(path)).run()
+        assert recorder.runs == []
+
+    def test_refuses_other_deployments(self, tmp_path):
+        path = tmp_path / "info.json"
+        path.write_text(json.dumps({"pi_base_app_id": 1}))
+        with pytest.raises(ValueError, match="--fresh"):
+            DeploymentOrchestrator(None, [], path=str(path))
+
+        DeploymentOrchestrator(None, [], path=str(path), initial={"usdc_id": 1}, fresh=True).run()
+        with pytest.raises(ValueError, match="usdc_id"):
+            DeploymentOrchestrator(None, [], path=str(path), initial={"usdc_id": 2})
+
+    def test_recover_finds_sent_transaction(self, tmp_path):
+        ledger = Ledger()
+        sender_key, sender = account.generate_account()
+        receiver = account.generate_account()[1]
+        ledger.fund(sender, 10_000_000)
+        ledger.fund(receiver, 1_000_000)
+        server, stop = serve(ledger, port=0)
+        client = AlgodClient("", f"http://127.0.0.1:{server.server_address[1]}")
+        path = tmp_path / "info.json"
+
+        def pay(ctx):
+            tx_info = ctx.recover()
+            if tx_info is None:
+                txn = transaction.PaymentTxn(sender, client.suggested_params(), receiver, 250_000)
+                tx_info = ctx.send([txn.sign(sender_key)])
+                if not ctx.info.get("resumed"):
+                    raise RuntimeError("stopped after sending")
+            return {"paid_round": tx_info["confirmed-round"]}
+
+        try:
+            with pytest.raises(DeploymentFailed):
+                DeploymentOrchestrator(client, [Step("pay", pay)], path=str(path)).run()
+            info = DeploymentOrchestrator(client, [Step("pay", pay)], path=str(path),
+                                          initial={"resumed": True}).run()
+        finally:
+            stop.set()
+            server.shutdown()
+
+        # Paid once: the rerun found the first payment instead of sending again
+        assert ledger.account(receiver)["amount"] == 1_250_000
+        assert info["paid_round"] > 0
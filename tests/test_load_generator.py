@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test suite for the synthetic load generator
+"""
+
+import random
+import sys
+from pathlib import Path
+
+# Add the scripts directory to the path
+sys.path.append(str(Path(__file__).parent.parent / "scripts"))
+
+from load_generator import DEFAULT_CONFIG, Keeper, arrival_times, failure_reason, percentiles, run_load
+
+
+class TestWorkload:
+    """Test workload shaping and reporting helpers"""
+
+    def test_bursts_raise_the_arrival_rate(self):
+        """Arrivals cluster in the burst part of each period"""
+        config = dict(DEFAULT_CONFIG, duration=200.0, rate=20.0, burst_factor=5.0, burst_period=10.0, burst_duty=0.2)
+        times = list(arrival_times(config, random.Random(3)))
+        in_burst = sum(1 for t in times if t % 10.0 < 2.0)
+        
+        # Per period, 2 s at 100/s and 8 s at 20/s: 200 and 160 arrivals, over 20 periods
+        assert 3600 < in_burst < 4400
+        assert 2880 < len(times) - in_burst < 3520
+
+    def test_percentiles_and_failure_reasons(self):
+        """Latencies are reported by nearest rank; failures group by reason"""
+        report = percentiles([i / 1000 for i in range(1, 101)])
+        assert (report["p50_ms"], report["p99_ms"], report["max_ms"]) == (50.0, 99.0, 100.0)
+        assert percentiles([])["count"] == 0
+        
+        txid = "A" * 52
+        assert failure_reason(f"TransactionPool.Remember: transaction {txid}: mandate slot 12 is not due") \
+            == failure_reason(f"TransactionPool.Remember: transaction {txid}: mandate slot 7 is not due")
+
+    def test_keeper_batches_respect_call_limits(self):
+        """Keeper calls hold at most 4 slots and so 4 distinct payees"""
+        due = [(slot, bytes(8) + bytes([slot % 6]) * 32 + bytes(48)) for slot in range(30)]
+        batches = Keeper.batches(due)
+        
+        assert all(len(batch) <= 4 for batch in batches)
+        assert all(len({terms[8:40] for _, terms in batch}) <= 4 for batch in batches)
+        assert [slot for batch in batches for slot, _ in batch] == list(range(30))
+
+
+class TestLoadRun:
+    """Test a short run against the stand-in"""
+
+    def test_short_run_settles_everything(self):
+        """Every offered intent confirms and every due mandate is paid"""
+        report = run_load({
+            "duration": 1.0, "rate": 20.0, "pi_bases": 2, "merchants": 5, "mandates": 20,
+            "intervals": [60], "keeper_interval": 0.2, "drain_timeout": 10.0,
+        })
+        
+        assert report["intents"]["offered"] > 0
+        assert report["intents"]["confirmed"] == report["intents"]["offered"]
+        assert report["intents"]["latency"]["count"] == report["intents"]["confirmed"]
+        assert report["mandates"]["paid"] >= 20
+        assert report["failures"] == {}
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Test suite for the off-chain fee and budget planners
+"""
+
+import hashlib
+import pytest
+import sys
+from pathlib import Path
+
+# Add the scripts directory to the path, and the repo root and contracts
+# directory for the contract constants the planners mirror
+sys.path.append(str(Path(__file__).parent.parent / "scripts"))
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "contracts"))
+
+from fee_planner import OPUP_TXN, PLAIN_TXN, call_tree, plan_group
+from box_planner import (
+    EMPTY_BOX_REF, core_box_accesses, legacy_program_box_name, plan_box_references,
+    template_hash, versioned_box_name
+)
+from group_packer import RESOURCE_SHARING_CONTRACTS, layout_group, pack_groups
+import algod_standin
+import box_planner
+import fee_planner
+
+from pyteal import Seq, SubroutineFnWrapper
+from contracts import strahn_pi_base, strahn_pi_shared
+from compile_contracts import CONTRACT_VERSIONS
+from utils import common
+
+# Synthetic benchmark results, independent of the recorded history
+COSTS = {
+    "strahn_pi_base.process_intent": {"opcode_cost": 2109, "inner_txns": 2},
+    "strahn_pi_base.process_split_intent": {"opcode_cost": 2503, "inner_txns": 8, "loop_bound": 4},
+    "strahn_pi_base.deposit_usdc": {"opcode_cost": 64, "inner_txns": 0},
+    "strahn_pi_base.process_allowance_intent": {"opcode_cost": 167, "inner_txns": 1},
+    "strahn_pi_base.setup_mandate_standard": {"opcode_cost": 2130, "inner_txns": 3},
+    "strahn_pi_base.release_mandate_funds": {"opcode_cost": 139, "inner_txns": 1},
+    "strahn_pi_base.process_mandates_batch": {"opcode_cost": 1396, "inner_txns": 5, "loop_bound": 4},
+    "strahn_pi_base.setup_mandates_batch": {"opcode_cost": 2581, "inner_txns": 9, "loop_bound": 4},
+    "strahn_core.deploy_mandate": {"opcode_cost": 196, "inner_txns": 1},
+    "strahn_core.deploy_mandates_batch": {"opcode_cost": 642, "inner_txns": 4, "loop_bound": 4},
+    "mandate_record.approval": {"opcode_cost": 103, "inner_txns": 1},
+    "mandate_record.process_payment": {"opcode_cost": 80, "inner_txns": 1},
+}
+
+class TestFeePlanner:
+    """Test pooled fee and budget planning"""
+    
+    def test_deposit_group_fee(self):
+        """Test a deposit group pays one minimum fee per transaction"""
+        plan = plan_group([PLAIN_TXN, "strahn_pi_base.deposit_usdc"], costs=COSTS)
+        
+        assert plan["total_fee"] == 2000
+        assert plan["padding_calls"] == 0
+        assert [t["fee"] for t in plan["transactions"]] == [2000, 0]
+    
+    def test_process_intent_raises_its_own_budget(self):
+        """Test intents need no padding and pay for inner op-ups and transfers"""
+        plan = plan_group(["strahn_pi_base.process_intent"], costs=COSTS)
+        
+        assert plan["padding_calls"] == 0
+        assert len(plan["transactions"]) == 1
+        assert plan["opcode_budget"] >= plan["opcode_cost"]
+        # 3 worst-case op-ups + 1 transfer (the relayer fee is accrued)
+        assert plan["inner_txns"] == 4
+        assert plan["total_fee"] == (1 + 4) * 1000
+    
+    def test_split_intent_counts_op_ups_once(self):
+        """Test op-ups benchmarked once per loop iteration are not double counted"""
+        plan = plan_group(["strahn_pi_base.process_split_intent"], costs=COSTS)
+        
+        assert plan["padding_calls"] == 0
+        # 4 worst-case op-ups + 4 payees
+        assert plan["inner_txns"] == 8
+        assert plan["total_fee"] == (1 + 8) * 1000
+    
+    def test_allowance_intent_skips_op_ups(self):
+        """Test allowance intents fit one call's budget and pay only their transfers"""
+        plan = plan_group(["strahn_pi_base.process_allowance_intent"], costs=COSTS)
+        
+        assert plan["padding_calls"] == 0
+        assert plan["inner_txns"] == 1
+        assert plan["total_fee"] == (1 + 1) * 1000
+    
+    def test_padding_added_when_budget_short(self):
+        """Test padding calls cover methods without built-in op-up"""
+        costs = dict(COSTS, **{"strahn_pi_base.release_mandate_funds": {"opcode_cost": 1500, "inner_txns": 1}})
+        plan = plan_group(["strahn_pi_base.release_mandate_funds"], costs=costs)
+        
+        assert plan["padding_calls"] == 2
+        assert [t["method"] for t in plan["transactions"]][1:] == [OPUP_TXN, OPUP_TXN]
+        assert plan["total_fee"] == (3 + 1) * 1000
+    
+    def test_nested_mandate_setup_fan_out(self):
+        """Test nested Core and mandate creation calls are counted"""
+        tree = call_tree("strahn_pi_base.setup_mandate_standard", COSTS)
+        
+        # 3 op-ups, Core call + 1 transfer, mandate create, mandate opt-in
+        assert tree["inner_txns"] == 7
+        assert tree["inner_app_calls"] == 5
+        assert tree["opcode_cost"] == 2130 + 196 + 103
+    
+    def test_batch_mandate_setup_cheaper_than_singles(self):
+        """Test one batch setup costs less than the same mandates set up one by one"""
+        batch = plan_group(["strahn_pi_base.setup_mandates_batch"], costs=COSTS)
+        single = plan_group(["strahn_pi_base.setup_mandate_standard"], costs=COSTS)
+        
+        # 4 op-ups, Core call, 4 first payments, 4 mandate creates + opt-ins
+        assert batch["inner_txns"] == 17
+        assert batch["padding_calls"] == 0
+        assert batch["total_fee"] < 4 * single["total_fee"]
+    
+    def test_keeper_batch_padded_for_budget(self):
+        """Test a full keeper batch gets padding calls instead of one call per mandate"""
+        plan = plan_group(["strahn_pi_base.process_mandates_batch"], costs=COSTS)
+        
+        assert plan["padding_calls"] == 1
+        assert plan["opcode_budget"] >= plan["opcode_cost"]
+        assert plan["total_fee"] == (2 + 5) * 1000
+    
+    def test_unknown_method_rejected(self):
+        """Test planning fails for methods without benchmark data"""
+        with pytest.raises(ValueError):
+            plan_group(["strahn_pi_base.unknown"], costs=COSTS)
+
+class TestBoxPlanner:
+    """Test box reference planning for Core template operations"""
+    
+    SIZES = {b"approval": 2738, b"clear": 30}
+    
+    def test_set_bytecode_references_cover_box_size(self):
+        """Test an upload call carries exactly the budget for its box"""
+        boxes = core_box_accesses("set_bytecode", self.SIZES, box_name=b"approval")
+        refs = plan_box_references([{"boxes": boxes}], app_id=42)[0]
+        
+        assert refs == [(42, b"approval"), EMPTY_BOX_REF, EMPTY_BOX_REF]
+    
+    def test_set_version_uses_real_versioned_names(self):
+        """Test versioned boxes match Concat(name, "_v", Itob(version))"""
+        boxes = core_box_accesses("set_version", self.SIZES, version=1)
+        refs = plan_box_references([{"boxes": boxes}], app_id=42)[0]
+        
+        assert (42, b"approval_v" + (1).to_bytes(8, "big")) in refs
+        assert versioned_box_name(b"clear", 1) == b"clear_v\x00\x00\x00\x00\x00\x00\x00\x01"
+        # 2 * (2738 + 30) bytes -> 6 references, 4 of them named
+        assert len(refs) == 6
+        assert refs.count(EMPTY_BOX_REF) == 2
+    
+    def test_shortfall_spills_to_other_transactions(self):
+        """Test references spread onto group members with free slots"""
+        sizes = {b"approval": 7000, b"clear": 1000}
+        calls = [
+            {"boxes": core_box_accesses("deploy_mandate", sizes), "other_references": 3},
+            {"boxes": []},
+        ]
+        plans = plan_box_references(calls, app_id=42)
+        
+        assert len(plans[0]) == 5
+        assert sum(len(refs) for refs in plans) == 8
+        assert all(ref == EMPTY_BOX_REF for ref in plans[1])
+    
+    def test_group_without_room_is_rejected(self):
+        """Test planning fails when the group cannot hold enough references"""
+        sizes = {b"approval": 8192, b"clear": 1024}
+        with pytest.raises(ValueError):
+            plan_box_references(
+                [{"boxes": core_box_accesses("set_version", sizes, version=2)}], app_id=42
+            )
+    
+    def test_template_hash_of_paged_program(self):
+        """Test small templates keep their plain hash and large ones hash per slice"""
+        small, large = b"\x08" * 3000, b"\x08" * 6000
+        
+        assert template_hash(small) == hashlib.sha256(small).digest()
+        assert template_hash(large) == hashlib.sha256(
+            hashlib.sha256(large[:4096]).digest() + hashlib.sha256(large[4096:]).digest()
+        ).digest()
+        with pytest.raises(ValueError):
+            template_hash(b"\x08" * 9000)
+    
+    def test_legacy_deploy_references_programs_by_hash(self):
+        """Test a hash-referenced legacy deploy touches only the published boxes"""
+        approval, clear = b"\x08" * 5000, b"\x08\x81\x01"
+        boxes = core_box_accesses("deploy_legacy_by_hash", self.SIZES, programs=[approval, clear])
+        refs = plan_box_references([{"boxes": boxes}], app_id=42)[0]
+        
+        assert boxes[0] == (b"code:" + template_hash(approval), 5000)
+        assert (42, legacy_program_box_name(clear)) in refs
+        assert len(refs) == 5  # 5003 bytes
+        with pytest.raises(ValueError):
+            core_box_accesses("publish_legacy_program", self.SIZES, programs=[approval])
+
+class TestGroupPacker:
+    """Test packing queued calls into the fewest valid groups"""
+    
+    @staticmethod
+    def intent(n, app_id=1001):
+        return {
+            "method": "strahn_pi_base.process_intent",
+            "accounts": [f"MERCHANT{n}"], "assets": [31566704],
+            "boxes": [(app_id, b"fee:relayer", 8)], "order_key": app_id,
+        }
+    
+    @staticmethod
+    def deploy():
+        return {
+            "method": "strahn_core.deploy_mandate", "apps": [7],
+            "boxes": [(7, b"approval", 3000), (7, b"clear", 30)],
+        }
+    
+    def test_groups_filled_before_opening_another(self):
+        """Test 20 intents need two groups, the first of them full"""
+        groups = pack_groups([self.intent(n) for n in range(20)], costs=COSTS)
+        
+        assert [len(g["transactions"]) for g in groups] == [16, 4]
+        assert all(g["opcode_budget"] >= g["opcode_cost"] for g in groups)
+    
+    def test_order_key_keeps_nonce_order(self):
+        """Test calls sharing an order key stay in input order across groups"""
+        calls = [self.deploy() for _ in range(3)] + [self.intent(n) for n in range(16)]
+        groups = pack_groups(calls, costs=COSTS)
+        intents = [i for g in groups for i in g["calls"] if i >= 3]
+        
+        assert intents == list(range(3, 19))
+    
+    def test_shared_references_carried_once(self):
+        """Test v9+ calls share one copy of a reference and ride on free slots"""
+        layout = layout_group([self.deploy(), self.deploy(), self.intent(0)], COSTS)
+        carried = [ref for txn in layout["transactions"] for ref in txn["apps"] + txn["boxes"]]
+        
+        assert carried.count(7) == 1
+        assert carried.count((7, b"approval")) == 1
+        # 3038 box bytes need 3 box references, covered by the named ones
+        assert sum(1 for ref in carried if isinstance(ref, tuple)) == 3
+        assert layout["padding_calls"] == 0
+    
+    def test_own_references_stay_on_v8_calls(self):
+        """Test PI Base calls carry their own references and may not exceed one transaction"""
+        layout = layout_group([self.intent(0)], COSTS)
+        assert layout["transactions"][0]["accounts"] == ["MERCHANT0"]
+        
+        crowded = dict(self.intent(0), accounts=[f"A{n}" for n in range(5)])
+        with pytest.raises(ValueError):
+            pack_groups([crowded], costs=COSTS)
+    
+    def test_padding_adds_reference_slots(self):
+        """Test shared references beyond the members' slots get carrier calls"""
+        many = dict(self.deploy(), assets=list(range(1, 12)))
+        layout = layout_group([many], COSTS)
+        
+        # 1 app + 11 assets + 2 named boxes + 1 empty > 8 slots of one call
+        assert layout["padding_calls"] == 1
+
+
+def self_opup_budgets(monkeypatch, module):
+    """Budget each method of a contract module passes to ensure_signature_budget"""
+    budgets = {}
+    for name, method in vars(module).items():
+        if not isinstance(method, SubroutineFnWrapper) or method.subroutine.argument_count() != 0:
+            continue
+        ensured = []
+        monkeypatch.setattr(module, "ensure_signature_budget",
+                            lambda budget: ensured.append(budget.value) or Seq())
+        method.subroutine.implementation()
+        if ensured:
+            budgets[f"{module.__name__.split('.')[-1]}.{name}"] = max(ensured)
+    return budgets
+
+
+class TestMirroredConstants:
+    """Constants the planners and the stand-in copy must match the contracts"""
+    
+    def test_self_opup_budgets(self, monkeypatch):
+        """Test every self op-up method and its budget match the contracts"""
+        budgets = {}
+        for module in (strahn_pi_base, strahn_pi_shared):
+            budgets.update(self_opup_budgets(monkeypatch, module))
+        assert fee_planner.SELF_OPUP_BUDGETS == budgets
+    
+    def test_limits(self):
+        """Test batch, bucket and template limits match the contracts"""
+        assert fee_planner.MAX_BATCH_MANDATES == common.MAX_BATCH_MANDATES.value
+        assert algod_standin.MAX_KEEPER_BATCH == common.MAX_KEEPER_BATCH.value
+        assert algod_standin.MANDATE_EARLY_PAY_SEC == common.MANDATE_EARLY_PAY_SEC.value
+        assert algod_standin.DUE_BUCKET_SEC == common.DUE_BUCKET_SEC.value
+        assert algod_standin.DUE_BUCKET_MAX_BYTES == common.DUE_BUCKET_MAX_BYTES.value
+        assert algod_standin.TERMS_NEXT_PAY == strahn_pi_base.TERMS_NEXT_PAY.value
+        assert algod_standin.TERMS_DUE_BUCKET == strahn_pi_base.TERMS_DUE_BUCKET.value
+        assert box_planner.MAX_TEMPLATE_SIZE == common.MAX_TEMPLATE_SIZE.value
+        assert box_planner.TEMPLATE_SLICE_SIZE == common.TEMPLATE_SLICE_SIZE.value
+    
+    def test_resource_sharing_contracts(self):
+        """Test the contracts sharing references are the ones built for v9+"""
+        assert RESOURCE_SHARING_CONTRACTS == {name for name, v in CONTRACT_VERSIONS.items() if v >= 9}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Test suite for the relayer service's validation, queueing and group submission
+"""
+
+import base64
+import hashlib
+import sys
+import time
+from pathlib import Path
+
+import nacl.signing
+import pytest
+from algosdk import account, encoding, transaction
+
+# Add the scripts directory to the path
+sys.path.append(str(Path(__file__).parent.parent / "scripts"))
+
+from relayer_service import (
+    CONFIRMED, FAILED, IntentRejected, PiBaseQueue, QueueFull, RelayerService,
+    intent_message, parse_intent
+)
+from telemetry import Telemetry
+
+APP_ID = 1001
+USDC_ID = 10458941
+COSTS = {"strahn_pi_base.process_intent": {"opcode_cost": 2153, "inner_txns": 2}}
+
+CREATOR_KEY, CREATOR = account.generate_account()
+RELAYER_KEY, RELAYER = account.generate_account()
+MERCHANT = account.generate_account()[1]
+
+
+def signed_intent(nonce, amount=1_000_000, relayer_fee=10_000, key=CREATOR_KEY):
+    """JSON intent signed the way the PI Base verifies it"""
+    destination = encoding.decode_address(MERCHANT)
+    message = intent_message(APP_ID, nonce, destination, amount, relayer_fee)
+    signature = nacl.signing.SigningKey(base64.b64decode(key)[:32]).sign(
+        hashlib.sha256(message).digest()).signature
+    return {
+        "pi_base_app_id": APP_ID,
+        "destination": MERCHANT,
+        "amount": amount,
+        "relayer_fee": relayer_fee,
+        "nonce": nonce,
+        "signature": base64.b64encode(signature).decode(),
+    }
+
+
+class LedgerDouble:
+    """Just enough of an algod client for one PI Base whose nonce advances per intent"""
+
+    def __init__(self, failing_nonces=()):
+        self.nonce = 0
+        self.failing_nonces = set(failing_nonces)
+        self.groups = []
+
+    def application_info(self, app_id):
+        def entry(key, value):
+            if isinstance(value, bytes):
+                return {"key": base64.b64encode(key).decode(),
+                        "value": {"type": 1, "bytes": base64.b64encode(value).decode()}}
+            return {"key": base64.b64encode(key).decode(), "value": {"type": 2, "uint": value}}
+        return {"params": {"global-state": [
+            entry(b"creator_addr", encoding.decode_address(CREATOR)),
+            entry(b"usdc_id", USDC_ID),
+            entry(b"creator_nonce", self.nonce),
+        ]}}
+
+    def suggested_params(self):
+        return transaction.SuggestedParams(0, 1, 1000, base64.b64encode(bytes(32)).decode(),
+                                           "test", flat_fee=True, min_fee=1000)
+
+    def send_transactions(self, signed):
+        nonces = [int.from_bytes(txn.transaction.app_args[4], "big") for txn in signed]
+        self.groups.append(nonces)
+        if self.failing_nonces & set(nonces):
+            raise Exception("logic eval error")
+        self.nonce += len(nonces)
+        return signed[0].get_txid()
+
+    def status(self):
+        return {"last-round": 10}
+
+    def pending_transaction_info(self, txid):
+        return {"confirmed-round": 11, "pool-error": ""}
+
+
+def settle(service, timeout=5):
+    """Wait until the running service has nothing queued or in flight"""
+    deadline = time.time() + timeout
+    while service.stats()["pending"] and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def drain(service, timeout=5):
+    """Run the service until nothing is queued or in flight"""
+    service.start()
+    settle(service, timeout)
+    service.stop()
+
+
+class TestIntentValidation:
+    """Test intents are checked before they are queued"""
+
+    def test_signature_verified_against_creator(self):
+        """Only the PI Base creator's signature is accepted"""
+        service = RelayerService(LedgerDouble(), RELAYER_KEY, costs=COSTS)
+        assert service.submit(signed_intent(0)) == f"{APP_ID}:0"
+        
+        with pytest.raises(IntentRejected):
+            service.submit(signed_intent(1, key=RELAYER_KEY))
+
+    def test_malformed_intent_rejected(self):
+        """Bad amounts and truncated signatures never reach the queue"""
+        with pytest.raises(IntentRejected):
+            parse_intent(dict(signed_intent(0), amount=0))
+        with pytest.raises(IntentRejected):
+            parse_intent(dict(signed_intent(0), signature=base64.b64encode(bytes(32)).decode()))
+
+    def test_stale_and_duplicate_nonces_rejected(self):
+        """A nonce below the chain's or already queued is refused"""
+        ledger = LedgerDouble()
+        ledger.nonce = 5
+        service = RelayerService(ledger, RELAYER_KEY, costs=COSTS)
+        
+        with pytest.raises(IntentRejected):
+            service.submit(signed_intent(4))
+        service.submit(signed_intent(5))
+        with pytest.raises(IntentRejected):
+            service.submit(signed_intent(5))
+
+
+class TestQueueing:
+    """Test per-PI Base queues and backpressure"""
+
+    def test_batches_follow_consecutive_nonces(self):
+        """A gap holds back every later nonce"""
+        queue = PiBaseQueue(APP_ID, b"", USDC_ID, 0)
+        for nonce in (0, 1, 3):
+            queue.add({"nonce": nonce}, max_depth=16)
+        
+        assert [i["nonce"] for i in queue.take_batch(16)] == [0, 1]
+        assert queue.take_batch(16) == []  # one group in flight per PI Base
+        queue.settle(2)
+        assert queue.take_batch(16) == []  # nonce 2 missing
+    
+    def test_resync_skips_nonces_used_elsewhere(self):
+        """A chain nonce past the gap drops the stale intents and resumes"""
+        queue = PiBaseQueue(APP_ID, b"", USDC_ID, 0)
+        queue.add({"nonce": 2}, max_depth=16)
+        queue.add({"nonce": 3}, max_depth=16)
+        assert queue.needs_sync(time.monotonic())
+        
+        assert [i["nonce"] for i in queue.resync(3)] == [2]
+        assert not queue.needs_sync(time.monotonic())
+        assert [i["nonce"] for i in queue.take_batch(16)] == [3]
+
+    def test_backpressure(self):
+        """Valid intents beyond capacity are throttled, not rejected"""
+        service = RelayerService(LedgerDouble(), RELAYER_KEY, max_queue_depth=2, costs=COSTS)
+        service.submit(signed_intent(0))
+        
+        with pytest.raises(QueueFull):
+            service.submit(signed_intent(2))
+        assert service.stats()["counters"]["throttled"] == 1
+
+
+class TestSubmission:
+    """Test groups are packed, submitted and settled"""
+
+    def test_consecutive_intents_share_a_group(self):
+        """Queued nonces are submitted as one atomic group"""
+        ledger = LedgerDouble()
+        service = RelayerService(ledger, RELAYER_KEY, costs=COSTS, telemetry=Telemetry())
+        for nonce in range(4):
+            service.submit(signed_intent(nonce))
+        drain(service)
+        
+        assert ledger.groups == [[0, 1, 2, 3]]
+        assert service.status(f"{APP_ID}:3")["status"] == CONFIRMED
+        assert service.stats()["pending"] == 0
+        stages = [span["stage"] for span in service.telemetry.trace(f"{APP_ID}:3")]
+        assert stages == ["validate", "build", "sign", "submit", "confirm", "observe"]
+
+    def test_failed_group_isolates_the_bad_intent(self):
+        """Members are retried alone; the failing nonce and those after it fail"""
+        ledger = LedgerDouble(failing_nonces={2})
+        service = RelayerService(ledger, RELAYER_KEY, costs=COSTS)
+        for nonce in range(4):
+            service.submit(signed_intent(nonce))
+        drain(service)
+        
+        assert ledger.groups[0] == [0, 1, 2, 3]
+        assert [service.status(f"{APP_ID}:{n}")["status"] for n in range(4)] == [CONFIRMED, CONFIRMED, FAILED, FAILED]
+        assert service.queues[APP_ID].next_nonce == 2
+    
+    def test_nonce_advanced_outside_the_relayer(self):
+        """An intent past a nonce another relayer used is not held forever"""
+        ledger = LedgerDouble()
+        service = RelayerService(ledger, RELAYER_KEY, costs=COSTS)
+        service.start()
+        try:
+            service.submit(signed_intent(0))
+            settle(service)
+            ledger.nonce = 2  # nonce 1 landed through someone else
+            service.submit(signed_intent(2))
+            settle(service)
+        finally:
+            service.stop()
+        
+        assert ledger.groups == [[0], [2]]
+        assert service.status(f"{APP_ID}:2")["status"] == CONFIRMED
+        assert service.queues[APP_ID].next_nonce == 3
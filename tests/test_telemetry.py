@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test suite for payment flow telemetry: stage metrics, traces and exporters
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the scripts directory to the path
+sys.path.append(str(Path(__file__).parent.parent / "scripts"))
+
+from telemetry import STAGE_SECONDS, Histogram, Telemetry
+
+
+class TestSpans:
+    """Test stage spans feed metrics and traces"""
+
+    def test_spans_are_traced_by_id_and_txid(self):
+        """A trace collects its stages; a txid finds the same trace"""
+        telemetry = Telemetry()
+        with telemetry.span("intent", "sign", traces=["7:3"]):
+            pass
+        with telemetry.span("intent", "submit", traces=["7:3", "7:4"], txids=["TXA", "TXB"]):
+            pass
+        with telemetry.span("intent", "confirm", traces=["7:3"], txid="TXA") as span:
+            span["round"] = 12
+        
+        assert [s["stage"] for s in telemetry.trace("7:3")] == ["sign", "submit", "confirm"]
+        assert [s["stage"] for s in telemetry.trace("TXB")] == ["sign", "submit", "confirm"]
+        assert telemetry.trace("7:3")[-1]["round"] == 12
+        assert telemetry.summary()["intent"]["submit"]["count"] == 1
+
+    def test_failed_stage_counted_and_raised(self):
+        """An exception fails the span and still reaches the caller"""
+        telemetry = Telemetry()
+        exported = []
+        telemetry.add_exporter(exported.append)
+        with pytest.raises(RuntimeError):
+            with telemetry.span("deposit", "submit", traces=["TX"]):
+                raise RuntimeError("overspend")
+        
+        assert exported[0]["status"] == "error" and exported[0]["error"] == "overspend"
+        assert telemetry.summary()["deposit"]["submit"]["failed"] == 1
+
+    def test_trace_ids_learned_inside_the_span(self):
+        """A stage can name its trace once it knows the txid"""
+        telemetry = Telemetry()
+        with telemetry.span("deposit", "build") as span:
+            span["traces"] = ["TXID"]
+        
+        assert telemetry.trace("TXID")[0]["stage"] == "build"
+
+    def test_observe_logs_counts_events(self):
+        """Only logs of the named event are counted"""
+        telemetry = Telemetry()
+        info = {"logs": ["cGF5bWVudF9wcm9jZXNzZWQ6AAAAAAAPQkA=", "dXNkY19kZXBvc2l0ZWQ6AAAAAAAPQkA="]}
+        
+        assert telemetry.observe_logs(info, "payment_processed") == 1
+        assert telemetry.observe_logs({}, "payment_processed") == 0
+
+
+class TestExposition:
+    """Test Prometheus text output and quantile estimates"""
+
+    def test_prometheus_text(self):
+        """Histograms render cumulative buckets, sum and count per label set"""
+        telemetry = Telemetry(buckets=(0.01, 0.1))
+        telemetry.observe(STAGE_SECONDS, 0.005, flow="intent", stage="submit")
+        telemetry.observe(STAGE_SECONDS, 0.05, flow="intent", stage="submit")
+        telemetry.inc("strahn_logs_observed_total", 2, event="payment_processed")
+        telemetry.set_gauge("strahn_relayer_pending_intents", 5)
+        text = telemetry.render_prometheus()
+        
+        assert "# TYPE strahn_stage_seconds histogram" in text
+        assert 'strahn_stage_seconds_bucket{flow="intent",stage="submit",le="0.01"} 1' in text
+        assert 'strahn_stage_seconds_bucket{flow="intent",stage="submit",le="+Inf"} 2' in text
+        assert 'strahn_stage_seconds_count{flow="intent",stage="submit"} 2' in text
+        assert 'strahn_logs_observed_total{event="payment_processed"} 2' in text
+        assert "strahn_relayer_pending_intents 5" in text
+
+    def test_histogram_quantiles(self):
+        """Quantiles interpolate within the bucket holding their rank"""
+        histogram = Histogram(buckets=(1.0, 2.0))
+        for value in (0.5, 1.5, 1.5, 1.5):
+            histogram.observe(value)
+        
+        assert histogram.quantile(0.25) == 1.0
+        assert histogram.quantile(1.0) == 2.0
+        assert Histogram().quantile(0.5) is None
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test suite for templated builds and deploy-time template filling
+"""
+
+import hashlib
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from algosdk import account, error, transaction
+from algosdk.v2client.algod import AlgodClient
+
+# Add the scripts directory to the path
+sys.path.append(str(Path(__file__).parent.parent / "scripts"))
+
+from algod_standin import Ledger, Rejected, serve
+from benchmark_contracts import estimate_assembled_size
+from template_config import compile_filled, fill_template
+
+ROOT = Path(__file__).parent.parent
+CREATOR = bytes(range(32))
+VALUES = {
+    "TMPL_CREATOR_ADDR": CREATOR,
+    "TMPL_USDC_ID": 10458941,
+    "TMPL_STRAHN_CORE_APP_ID": 42,
+}
+
+# Compiled in a fresh process: the build mode is fixed at first compile
+TEMPLATED_BUILD = """
+from pyteal import *
+from strahn_pi_base import strahn_pi_base_approval
+print(compileTeal(strahn_pi_base_approval(), Mode.Application, version=8))
+"""
+
+
+@pytest.fixture(scope="module")
+def templated_pi_base():
+    env = dict(os.environ, STRAHN_TEMPLATE_CONFIG="1", PYTHONPATH=str(ROOT / "contracts"))
+    result = subprocess.run([sys.executable, "-c", TEMPLATED_BUILD], env=env,
+                            capture_output=True, text=True, check=True)
+    return result.stdout
+
+
+class TestTemplateConfig:
+    """Test template variable builds and filling"""
+    
+    def test_templated_build_skips_config_lookups(self, templated_pi_base):
+        """Hot paths read configuration from template variables"""
+        default_build = (ROOT / "build" / "strahn_pi_base_approval.teal").read_text()
+        assert "TMPL_USDC_ID" in templated_pi_base
+        assert "TMPL_CREATOR_ADDR" in templated_pi_base
+        assert 'byte "usdc_id"\napp_global_get' in default_build
+        assert 'byte "usdc_id"\napp_global_get' not in templated_pi_base
+    
+    def test_fill_template(self, templated_pi_base):
+        """Every variable is replaced with its literal"""
+        filled = fill_template(templated_pi_base, "strahn_pi_base", VALUES)
+        assert "TMPL_" not in filled
+        assert "0x" + CREATOR.hex() in filled
+        assert "int 10458941" in filled
+    
+    def test_missing_value_rejected(self, templated_pi_base):
+        """A partially filled program is never produced"""
+        with pytest.raises(ValueError):
+            fill_template(templated_pi_base, "strahn_pi_base", {"TMPL_USDC_ID": 1})
+    
+    def test_benchmark_sizes_templated_builds(self, templated_pi_base):
+        """Placeholders are sized as the largest values a deployment fills in"""
+        filled = fill_template(templated_pi_base, "strahn_pi_base", VALUES)
+        assert estimate_assembled_size(templated_pi_base) >= estimate_assembled_size(filled)
+
+
+class TestFilledDeployment:
+    """Compiling a filled program and creating the app it configures"""
+
+    @pytest.fixture
+    def ledger_client(self):
+        ledger = Ledger()
+        server, stop = serve(ledger, port=0)
+        yield ledger, AlgodClient("", f"http://127.0.0.1:{server.server_address[1]}")
+        stop.set()
+        server.shutdown()
+    
+    def test_compile_and_create_with_matching_args(self, templated_pi_base, ledger_client):
+        ledger, client = ledger_client
+        with pytest.raises(error.AlgodHTTPError, match="TMPL_"):
+            compile_filled(client, templated_pi_base)
+
+        bytecode, bytecode_hash = compile_filled(client, fill_template(templated_pi_base, "strahn_pi_base", VALUES))
+        assert bytecode_hash == hashlib.sha256(bytecode).hexdigest()
+
+        creator_key, creator = account.generate_account()
+        ledger.fund(creator, 10_000_000)
+
+        def create(args):
+            txn = transaction.ApplicationCreateTxn(
+                creator, ledger.suggested_params(), transaction.OnComplete.NoOpOC, bytecode,
+                ledger.register_teal("#pragma version 8\nint 1\n"),
+                transaction.StateSchema(5, 1), transaction.StateSchema(0, 0), app_args=args,
+            )
+            return ledger.submit([txn.sign(creator_key)])
+
+        # The baked-in values must match the creation arguments
+        with pytest.raises(Rejected, match="logic eval error"):
+            create([bytes(32), (10458941).to_bytes(8, "big"), (42).to_bytes(8, "big")])
+        create([CREATOR, (10458941).to_bytes(8, "big"), (42).to_bytes(8, "big")])
+        app_id = max(ledger.apps)
+        assert ledger.apps[app_id]["global"][b"usdc_id"] == 10458941